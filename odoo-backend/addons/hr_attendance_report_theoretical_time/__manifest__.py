@@ -12,6 +12,7 @@
     "data": [
         "security/ir.model.access.csv",
         "security/hr_attendance_report_theoretical_time_security.xml",
+        "data/ir_cron.xml",
         "views/hr_leave_type_views.xml",
         "views/hr_employee_views.xml",
         "reports/hr_attendance_report_views.xml",
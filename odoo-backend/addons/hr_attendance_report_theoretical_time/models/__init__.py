@@ -2,8 +2,12 @@
 
 from . import calendar_public_holiday_line
 from . import hr_attendance
+from . import hr_attendance_theoretical_calendar_day
+from . import hr_attendance_theoretical_employee_day
 from . import hr_employee
 from . import hr_employee_public
 from . import hr_leave
 from . import hr_leave_type
 from . import resource_calendar
+from . import resource_calendar_attendance
+from . import resource_calendar_leaves
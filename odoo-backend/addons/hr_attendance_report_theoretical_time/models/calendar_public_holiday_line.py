@@ -21,6 +21,9 @@ class CalendarHolidaysPublicLine(models.Model):
             return
         if isinstance(date, str):
             date = fields.Date.from_string(date)
+        self.env["hr.attendance.theoretical.calendar.day"].sudo()._invalidate(
+            date_from=date, date_to=date
+        )
         from_datetime = datetime.combine(date, time(0, 0, 0, 0))
         to_datetime = datetime.combine(date, time(23, 59, 59, 99999))
         records = self.env["hr.attendance"].search(
@@ -51,3 +54,11 @@ class CalendarHolidaysPublicLine(models.Model):
             for date in dates:
                 self._check_theoretical_hours(date=date)
         return res
+
+    def unlink(self):
+        """Recompute the theoretical hours of the dates of removed lines."""
+        dates = set(self.mapped("date"))
+        res = super().unlink()
+        for date in dates:
+            self._check_theoretical_hours(date=date)
+        return res
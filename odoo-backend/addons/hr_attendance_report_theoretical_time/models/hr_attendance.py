@@ -13,10 +13,12 @@ class HrAttendance(models.Model):
 
     @api.depends("check_in", "employee_id")
     def _compute_theoretical_hours(self):
-        obj = self.env["hr.attendance.theoretical.time.report"]
+        hours = self.env["hr.attendance.theoretical.calendar.day"]._get_hours(
+            [(record.employee_id, record.check_in.date()) for record in self]
+        )
         for record in self:
-            record.theoretical_hours = obj._theoretical_hours(
-                record.employee_id, record.check_in
+            record.theoretical_hours = hours.get(
+                (record.employee_id.id, record.check_in.date()), 0
             )
 
     @api.model
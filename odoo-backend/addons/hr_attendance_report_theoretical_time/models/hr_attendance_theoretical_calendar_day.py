@@ -0,0 +1,217 @@
+# Copyright 2026 Quelyos
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import api, fields, models
+
+# Rolling horizon kept materialized by the cron (days before/after today)
+HORIZON_PAST_DAYS = 400
+HORIZON_FUTURE_DAYS = 31
+
+
+class HrAttendanceTheoreticalCalendarDay(models.Model):
+    """Theoretical hours of a working schedule for each day.
+
+    This is the calendar expansion used by the theoretical time report:
+    attendance lines minus global leaves of the calendar, one row per day
+    (including non working days, so that a complete range can be detected
+    with a simple count). Employee specific differences (own leaves,
+    public holidays of their address) are stored aside in
+    ``hr.attendance.theoretical.employee.day``.
+
+    Rows are deleted on any change of the computation conditions and
+    rebuilt lazily when the report or the attendances need them.
+    """
+
+    _name = "hr.attendance.theoretical.calendar.day"
+    _description = "Theoretical hours per working schedule and day"
+    _log_access = False
+    _order = "calendar_id, date"
+
+    calendar_id = fields.Many2one(
+        comodel_name="resource.calendar",
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+    )
+    date = fields.Date(required=True, readonly=True)
+    hours = fields.Float(readonly=True)
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS
+                hr_attendance_theoretical_calendar_day_calendar_date_uniq
+            ON hr_attendance_theoretical_calendar_day (calendar_id, date)
+            """
+        )
+
+    # Materialization
+
+    @api.model
+    def _is_materialized(self, calendar, date_from, date_to):
+        self.env.cr.execute(
+            """
+            SELECT count(*)
+            FROM hr_attendance_theoretical_calendar_day
+            WHERE calendar_id = %s AND date BETWEEN %s AND %s
+            """,
+            (calendar.id, date_from, date_to),
+        )
+        return self.env.cr.fetchone()[0] == (date_to - date_from).days + 1
+
+    @api.model
+    def _expand_calendar(self, calendar, date_from, date_to):
+        """Theoretical hours per local day of the calendar, without employee
+        specific leaves nor public holidays.
+
+        :return: dict {date: hours} with an entry for every day of the range.
+        """
+        report = self.env["hr.attendance.theoretical.time.report"]
+        tz = pytz.timezone(calendar.tz or "UTC")
+        start_dt = tz.localize(datetime.combine(date_from, time.min))
+        end_dt = tz.localize(datetime.combine(date_to, time.max))
+        intervals = calendar._work_intervals_batch(
+            start_dt, end_dt, domain=report._theoretical_leave_domain()
+        )[False]
+        day_hours = {
+            date_from + timedelta(days=offset): 0.0
+            for offset in range((date_to - date_from).days + 1)
+        }
+        for start, stop, _meta in intervals:
+            day = start.astimezone(tz).date()
+            if day in day_hours:
+                day_hours[day] += (stop - start).total_seconds() / 3600
+        return day_hours
+
+    @api.model
+    def _materialize(self, calendar, date_from, date_to):
+        """(Re)build calendar days and employee exceptions of the range."""
+        day_hours = self._expand_calendar(calendar, date_from, date_to)
+        cr = self.env.cr
+        cr.execute(
+            """
+            DELETE FROM hr_attendance_theoretical_calendar_day
+            WHERE calendar_id = %s AND date BETWEEN %s AND %s
+            """,
+            (calendar.id, date_from, date_to),
+        )
+        cr.execute(
+            """
+            INSERT INTO hr_attendance_theoretical_calendar_day
+                (calendar_id, date, hours)
+            SELECT %s, day, hours
+            FROM unnest(%s::date[], %s::float8[]) AS t(day, hours)
+            """,
+            (calendar.id, list(day_hours), list(day_hours.values())),
+        )
+        employees = (
+            self.env["hr.employee"]
+            .with_context(active_test=False)
+            .search([("resource_id.calendar_id", "=", calendar.id)])
+        )
+        self.env["hr.attendance.theoretical.employee.day"]._materialize(
+            calendar, employees, day_hours
+        )
+        self.invalidate_model()
+        return day_hours
+
+    @api.model
+    def _ensure_materialized(self, calendar_ranges):
+        """Materialize missing days.
+
+        :param calendar_ranges: dict {calendar: (date_from, date_to)}
+        """
+        for calendar, (date_from, date_to) in calendar_ranges.items():
+            if not self._is_materialized(calendar, date_from, date_to):
+                self._materialize(calendar, date_from, date_to)
+
+    @api.model
+    def _get_hours(self, employee_dates):
+        """Theoretical hours for several employees and days at once.
+
+        :param employee_dates: iterable of (employee, date)
+        :return: dict {(employee_id, date): hours}
+        """
+        by_calendar = defaultdict(set)
+        for employee, date in employee_dates:
+            calendar = employee.resource_id.calendar_id
+            if calendar:
+                by_calendar[calendar].add((employee.id, date))
+        self._ensure_materialized(
+            {
+                calendar: (min(d for _e, d in keys), max(d for _e, d in keys))
+                for calendar, keys in by_calendar.items()
+            }
+        )
+        result = {}
+        for calendar, keys in by_calendar.items():
+            employee_ids = list({employee_id for employee_id, _d in keys})
+            self.env.cr.execute(
+                """
+                SELECT e.id, cd.date, COALESCE(ed.hours, cd.hours)
+                FROM hr_attendance_theoretical_calendar_day cd
+                CROSS JOIN unnest(%s::int[]) AS e(id)
+                LEFT JOIN hr_attendance_theoretical_employee_day ed
+                    ON ed.calendar_id = cd.calendar_id
+                    AND ed.employee_id = e.id
+                    AND ed.date = cd.date
+                WHERE cd.calendar_id = %s AND cd.date = ANY(%s::date[])
+                """,
+                (
+                    employee_ids,
+                    calendar.id,
+                    list({date for _e, date in keys}),
+                ),
+            )
+            for employee_id, date, hours in self.env.cr.fetchall():
+                if (employee_id, date) in keys:
+                    result[(employee_id, date)] = hours
+        return result
+
+    # Invalidation
+
+    @api.model
+    def _invalidate(self, calendars=None, date_from=None, date_to=None):
+        """Drop materialized days, they are rebuilt on next access.
+
+        :param calendars: resource.calendar recordset, None for all of them
+        """
+        where = ["TRUE"]
+        params = []
+        if calendars is not None:
+            if not calendars:
+                return
+            where.append("calendar_id = ANY(%s)")
+            params.append(calendars.ids)
+        if date_from:
+            where.append("date >= %s")
+            params.append(date_from)
+        if date_to:
+            where.append("date <= %s")
+            params.append(date_to)
+        for table in (
+            "hr_attendance_theoretical_calendar_day",
+            "hr_attendance_theoretical_employee_day",
+        ):
+            self.env.cr.execute(
+                f"DELETE FROM {table} WHERE {' AND '.join(where)}",  # noqa: S608
+                params,
+            )
+        self.invalidate_model()
+        self.env["hr.attendance.theoretical.employee.day"].invalidate_model()
+
+    @api.model
+    def _cron_materialize_horizon(self):
+        """Keep the rolling horizon of every used calendar materialized."""
+        today = fields.Date.context_today(self)
+        date_from = today - timedelta(days=HORIZON_PAST_DAYS)
+        date_to = today + timedelta(days=HORIZON_FUTURE_DAYS)
+        calendars = self.env["hr.employee"].search([]).resource_id.calendar_id
+        self._ensure_materialized(
+            {calendar: (date_from, date_to) for calendar in calendars}
+        )
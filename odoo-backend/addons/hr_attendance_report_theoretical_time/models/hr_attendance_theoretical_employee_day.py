@@ -0,0 +1,182 @@
+# Copyright 2026 Quelyos
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import api, fields, models
+from odoo.tools import float_compare
+
+
+class HrAttendanceTheoreticalEmployeeDay(models.Model):
+    """Employee days whose theoretical hours differ from their calendar.
+
+    Only days touched by an employee leave or a public holiday of the
+    employee address are stored, the rest of the days are read from
+    ``hr.attendance.theoretical.calendar.day``.
+    """
+
+    _name = "hr.attendance.theoretical.employee.day"
+    _description = "Theoretical hours exceptions per employee and day"
+    _log_access = False
+    _order = "employee_id, date"
+
+    employee_id = fields.Many2one(
+        comodel_name="hr.employee",
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+    )
+    calendar_id = fields.Many2one(
+        comodel_name="resource.calendar",
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+    )
+    date = fields.Date(required=True, readonly=True)
+    hours = fields.Float(readonly=True)
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS
+                hr_attendance_theoretical_employee_day_employee_date_uniq
+            ON hr_attendance_theoretical_employee_day
+                (employee_id, calendar_id, date)
+            """
+        )
+
+    @api.model
+    def _candidate_days(self, calendar, employees, date_from, date_to):
+        """Days where employee specific conditions may reduce the hours.
+
+        A superset is fine, as the hours of these days are then computed
+        exactly.
+
+        :return: tuple of dicts {employee: set of dates}, for the days
+            covered by employee leaves and the public holidays days.
+        """
+        tz = pytz.timezone(calendar.tz or "UTC")
+        start_dt = tz.localize(datetime.combine(date_from, time.min))
+        end_dt = tz.localize(datetime.combine(date_to, time.max))
+        utc_from = start_dt.astimezone(pytz.utc).replace(tzinfo=None)
+        utc_to = end_dt.astimezone(pytz.utc).replace(tzinfo=None)
+        # Employee leaves
+        leave_days = defaultdict(set)
+        employee_by_resource = {e.resource_id.id: e for e in employees}
+        leaves = (
+            self.env["resource.calendar.leaves"]
+            .sudo()
+            .search(
+                [
+                    ("resource_id", "in", list(employee_by_resource)),
+                    ("date_from", "<=", utc_to),
+                    ("date_to", ">=", utc_from),
+                ]
+            )
+        )
+        for leave in leaves:
+            employee = employee_by_resource[leave.resource_id.id]
+            day = pytz.utc.localize(leave.date_from).astimezone(tz).date()
+            last = pytz.utc.localize(leave.date_to).astimezone(tz).date()
+            day, last = max(day, date_from), min(last, date_to)
+            while day <= last:
+                leave_days[employee].add(day)
+                day += timedelta(days=1)
+        # Public holidays, once per address
+        holiday_days = {}
+        Holiday = self.env["calendar.public.holiday"].sudo()
+        by_address = defaultdict(list)
+        for employee in employees:
+            by_address[employee.address_id].append(employee)
+        for address, address_employees in by_address.items():
+            days = {
+                line.date
+                for line in Holiday.get_holidays_list(
+                    start_dt=start_dt, end_dt=end_dt, partner_id=address.id
+                )
+                if date_from <= line.date <= date_to
+            }
+            for employee in address_employees:
+                holiday_days[employee] = days
+        return leave_days, holiday_days
+
+    @api.model
+    def _materialize(self, calendar, employees, day_hours):
+        """Store the exceptions of the employees for the days of ``day_hours``.
+
+        :param day_hours: dict {date: calendar hours} of a materialized range
+        """
+        if not employees or not day_hours:
+            return
+        date_from, date_to = min(day_hours), max(day_hours)
+        self.env.cr.execute(
+            """
+            DELETE FROM hr_attendance_theoretical_employee_day
+            WHERE calendar_id = %s AND employee_id = ANY(%s)
+                AND date BETWEEN %s AND %s
+            """,
+            (calendar.id, employees.ids, date_from, date_to),
+        )
+        leave_days, holiday_days = self._candidate_days(
+            calendar, employees, date_from, date_to
+        )
+        report = self.env["hr.attendance.theoretical.time.report"]
+        # Days only affected by a public holiday give the same result for
+        # every employee of an address
+        holiday_hours = {}
+        rows = []
+        for employee in employees:
+            own_days = leave_days.get(employee, set())
+            for day in sorted(own_days | holiday_days.get(employee, set())):
+                if not day_hours.get(day):
+                    continue
+                if day in own_days:
+                    hours = report._theoretical_hours(employee.sudo(), day)
+                else:
+                    key = (employee.address_id.id, day)
+                    if key not in holiday_hours:
+                        holiday_hours[key] = report._theoretical_hours(
+                            employee.sudo(), day
+                        )
+                    hours = holiday_hours[key]
+                if float_compare(hours, day_hours[day], precision_digits=4):
+                    rows.append((employee.id, day, hours))
+        if rows:
+            employee_ids, days, hours = zip(*rows, strict=True)
+            self.env.cr.execute(
+                """
+                INSERT INTO hr_attendance_theoretical_employee_day
+                    (employee_id, calendar_id, date, hours)
+                SELECT employee_id, %s, day, hours
+                FROM unnest(%s::int[], %s::date[], %s::float8[])
+                    AS t(employee_id, day, hours)
+                """,
+                (calendar.id, list(employee_ids), list(days), list(hours)),
+            )
+        self.invalidate_model()
+
+    @api.model
+    def _refresh(self, employees, date_from=None, date_to=None):
+        """Recompute the exceptions of some employees on the materialized
+        days of their current calendar (employee creation, calendar or
+        address change, own leaves).
+        """
+        CalendarDay = self.env["hr.attendance.theoretical.calendar.day"]
+        by_calendar = defaultdict(lambda: self.env["hr.employee"])
+        for employee in employees:
+            if employee.resource_id.calendar_id:
+                by_calendar[employee.resource_id.calendar_id] |= employee
+        for calendar, calendar_employees in by_calendar.items():
+            domain = [("calendar_id", "=", calendar.id)]
+            if date_from:
+                domain.append(("date", ">=", date_from))
+            if date_to:
+                domain.append(("date", "<=", date_to))
+            day_hours = {
+                day.date: day.hours
+                for day in CalendarDay.search_fetch(domain, ["date", "hours"])
+            }
+            self._materialize(calendar, calendar_employees, day_hours)
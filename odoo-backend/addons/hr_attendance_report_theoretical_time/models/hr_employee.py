@@ -1,7 +1,7 @@
 # Copyright 2018 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class HrEmployee(models.Model):
@@ -13,3 +13,17 @@ class HrEmployee(models.Model):
         "not filled, employee creation date or the calendar start date "
         "will be used (the greatest of both)."
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Compute the theoretical hours exceptions (public holidays) of the
+        new employees on the already materialized days."""
+        records = super().create(vals_list)
+        self.env["hr.attendance.theoretical.employee.day"].sudo()._refresh(records)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"resource_calendar_id", "address_id"} & set(vals):
+            self.env["hr.attendance.theoretical.employee.day"].sudo()._refresh(self)
+        return res
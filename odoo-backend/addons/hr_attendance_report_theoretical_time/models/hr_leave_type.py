@@ -12,3 +12,9 @@ class HrLeaveType(models.Model):
         help="If you check this mark, leaves in this category won't reduce "
         "the number of theoretical hours in the attendance report.",
     )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "include_in_theoretical" in vals:
+            self.env["hr.attendance.theoretical.calendar.day"].sudo()._invalidate()
+        return res
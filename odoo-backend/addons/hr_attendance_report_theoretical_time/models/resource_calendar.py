@@ -4,10 +4,21 @@
 
 from odoo import models
 
+# Calendar fields changing the theoretical hours of its days
+THEORETICAL_FIELDS = {"attendance_ids", "tz", "two_weeks_calendar", "leave_ids"}
+
 
 class ResourceCalendar(models.Model):
     _inherit = "resource.calendar"
 
+    def write(self, vals):
+        res = super().write(vals)
+        if THEORETICAL_FIELDS & set(vals):
+            self.env["hr.attendance.theoretical.calendar.day"].sudo()._invalidate(
+                calendars=self
+            )
+        return res
+
     def _attendance_intervals_batch_exclude_public_holidays(
         self, start_dt, end_dt, intervals, resources, tz
     ):
@@ -0,0 +1,31 @@
+# Copyright 2026 Quelyos
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = "resource.calendar.attendance"
+
+    def _invalidate_theoretical_days(self, calendars):
+        self.env["hr.attendance.theoretical.calendar.day"].sudo()._invalidate(
+            calendars=calendars
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._invalidate_theoretical_days(records.calendar_id)
+        return records
+
+    def write(self, vals):
+        calendars = self.calendar_id
+        res = super().write(vals)
+        self._invalidate_theoretical_days(calendars | self.calendar_id)
+        return res
+
+    def unlink(self):
+        calendars = self.calendar_id
+        res = super().unlink()
+        self._invalidate_theoretical_days(calendars.exists())
+        return res
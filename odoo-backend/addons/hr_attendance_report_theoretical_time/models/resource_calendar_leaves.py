@@ -0,0 +1,68 @@
+# Copyright 2026 Quelyos
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from datetime import timedelta
+
+from odoo import api, models
+
+
+class ResourceCalendarLeaves(models.Model):
+    _inherit = "resource.calendar.leaves"
+
+    def _theoretical_days_scopes(self):
+        """Scopes of materialized theoretical hours covered by the leaves.
+
+        :return: list of (resource, calendar, date_from, date_to), with one
+            day margin for the timezone of the calendars.
+        """
+        return [
+            (
+                leave.resource_id,
+                leave.calendar_id,
+                leave.date_from.date() - timedelta(days=1),
+                leave.date_to.date() + timedelta(days=1),
+            )
+            for leave in self
+            if leave.date_from and leave.date_to
+        ]
+
+    @api.model
+    def _check_theoretical_days(self, scopes):
+        """Global leaves change the calendar days, which are dropped for being
+        rebuilt, resource leaves only the exceptions of their employee, which
+        are recomputed right away.
+        """
+        CalendarDay = self.env["hr.attendance.theoretical.calendar.day"].sudo()
+        ExceptionDay = self.env["hr.attendance.theoretical.employee.day"].sudo()
+        Employee = self.env["hr.employee"].sudo().with_context(active_test=False)
+        for resource, calendar, date_from, date_to in scopes:
+            if resource:
+                ExceptionDay._refresh(
+                    Employee.search([("resource_id", "=", resource.id)]),
+                    date_from=date_from,
+                    date_to=date_to,
+                )
+            else:
+                CalendarDay._invalidate(
+                    calendars=calendar or None,
+                    date_from=date_from,
+                    date_to=date_to,
+                )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._check_theoretical_days(records._theoretical_days_scopes())
+        return records
+
+    def write(self, vals):
+        scopes = self._theoretical_days_scopes()
+        res = super().write(vals)
+        self._check_theoretical_days(scopes + self._theoretical_days_scopes())
+        return res
+
+    def unlink(self):
+        scopes = self._theoretical_days_scopes()
+        res = super().unlink()
+        self._check_theoretical_days(scopes)
+        return res
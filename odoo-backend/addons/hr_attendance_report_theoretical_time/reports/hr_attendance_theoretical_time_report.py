@@ -32,16 +32,18 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
     difference = fields.Float(readonly=True)
 
     def _select(self):
-        # We put "max" aggregation function for theoretical hours because
-        # we will recompute for other detail levels different than day
-        # through recursivity by day results and will aggregate them manually
+        # Theoretical hours stored on the attendances of the day prevail over
+        # the ones of the materialized calendar expansion (generated days)
         return """
             min(id) AS id,
             employee_id,
             department_id,
             date,
             sum(worked_hours) AS worked_hours,
-            max(theoretical_hours) AS theoretical_hours,
+            COALESCE(
+                max(theoretical_hours) FILTER (WHERE is_attendance),
+                max(theoretical_hours)
+            ) AS theoretical_hours,
             sum(difference) AS difference
             """
 
@@ -58,7 +60,8 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
             ha.check_in::date AS date,
             ha.worked_hours AS worked_hours,
             ha.theoretical_hours AS theoretical_hours,
-            0.0 AS difference
+            0.0 AS difference,
+            TRUE AS is_attendance
             """
 
     def _from_sub1(self):
@@ -82,14 +85,16 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
             he.department_id AS department_id,
             gs::date AS date,
             0 AS worked_hours,
-            -1 AS theoretical_hours,
-            0.0 AS difference
+            COALESCE(ted.hours, tcd.hours, -1) AS theoretical_hours,
+            0.0 AS difference,
+            FALSE AS is_attendance
             """
 
     def _from_sub2(self):
         # We generate one record for each of the theoretical working days
         # since the employee creation / working schedule beginning for not
-        # depending on the registered attendances.
+        # depending on the registered attendances. Their hours come from the
+        # materialized calendar expansion (-1 when not materialized yet).
         return """
                 hr_employee he
             INNER JOIN
@@ -125,6 +130,15 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
                         ))::int) % 7,
                     '7 days'
                 ) AS gs
+            LEFT JOIN
+                hr_attendance_theoretical_calendar_day tcd
+                    ON tcd.calendar_id = rr.calendar_id
+                    AND tcd.date = gs::date
+            LEFT JOIN
+                hr_attendance_theoretical_employee_day ted
+                    ON ted.employee_id = he.id
+                    AND ted.calendar_id = rr.calendar_id
+                    AND ted.date = gs::date
             """
 
     def _where_sub2(self):
@@ -173,12 +187,25 @@ CREATE or REPLACE VIEW %s as (
             ),
         )
 
-    # TODO: To be activated for performance assuring cache clearing on changes
-    # @tools.ormcache('employee.id', 'date')
+    @api.model
+    def _theoretical_leave_domain(self):
+        """Leaves domain excluding the leaves whose type is included in
+        theoretical hours."""
+        return [
+            "|",
+            ("holiday_id", "=", False),
+            ("holiday_id.holiday_status_id.include_in_theoretical", "=", False),
+        ]
+
     @api.model
     def _theoretical_hours(self, employee, date):
         """Get theoretical working hours for the day where the check-in is
         done for that employee.
+
+        This is the exact (and slow) computation. Reports and attendances go
+        through the materialized ``hr.attendance.theoretical.calendar.day``,
+        which only calls this method for the days affected by employee
+        leaves or public holidays.
         """
         if not employee.resource_id.calendar_id:
             return 0
@@ -188,24 +215,62 @@ CREATE or REPLACE VIEW %s as (
         )._get_work_days_data_batch(
             datetime.combine(date, time(0, 0, 0, 0, tzinfo=pytz.timezone(tz))),
             datetime.combine(date, time(23, 59, 59, 99999, tzinfo=pytz.timezone(tz))),
-            # Pass this domain for excluding leaves whose type is included in
-            # theoretical hours
-            domain=[
-                "|",
-                ("holiday_id", "=", False),
-                ("holiday_id.holiday_status_id.include_in_theoretical", "=", False),
-            ],
+            domain=self._theoretical_leave_domain(),
         )
         return res[employee.id]["hours"]
 
+    @api.model
+    def _materialize_theoretical_hours(self, domain):
+        """Materialize the calendar days still missing for the generated
+        days matched by ``domain``."""
+        groups = self._read_group(
+            list(domain or []) + [("theoretical_hours", "<", 0)],
+            ["employee_id"],
+            ["date:min", "date:max"],
+        )
+        ranges = {}
+        for employee, date_from, date_to in groups:
+            calendar = employee.sudo().resource_id.calendar_id
+            if not calendar:
+                continue
+            if calendar in ranges:
+                date_from = min(date_from, ranges[calendar][0])
+                date_to = max(date_to, ranges[calendar][1])
+            ranges[calendar] = (date_from, date_to)
+        if ranges:
+            CalendarDay = self.env["hr.attendance.theoretical.calendar.day"]
+            CalendarDay.sudo()._ensure_materialized(ranges)
+
+    @api.model
+    def _read_group(
+        self,
+        domain,
+        groupby=(),
+        aggregates=(),
+        having=(),
+        offset=0,
+        limit=None,
+        order=None,
+    ):
+        if any(agg.startswith("theoretical_hours") for agg in aggregates):
+            self._materialize_theoretical_hours(domain)
+        return super()._read_group(
+            domain,
+            groupby=groupby,
+            aggregates=aggregates,
+            having=having,
+            offset=offset,
+            limit=limit,
+            order=order,
+        )
+
     @api.model
     def read_group(
         self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True
     ):
-        """Compute dynamically theoretical hours amount, computing on the fly
-        theoretical hours for non existing attendances with stored hours.
-        This technique has proven to be more efficient than trying to call
-        recursively `read_group` grouping by date and employee.
+        """Theoretical hours totals are SQL sums over the view, once the
+        involved days are materialized (see `_read_group`). Only the
+        difference needs to be computed from them.
         """
         res = super().read_group(
             domain,
@@ -226,22 +291,10 @@ CREATE or REPLACE VIEW %s as (
         )
         difference_field = "difference:sum" in fields
         for line in res:
-            day_dict = {}
-            records = self.search(line.get("__domain", domain))
-            for record in records:
-                key = (record.employee_id.id, record.date)
-                if key not in day_dict:
-                    if record.theoretical_hours < 0:
-                        day_dict[key] = self._theoretical_hours(
-                            record.employee_id.sudo(), record.date
-                        )
-                    else:
-                        day_dict[key] = record.theoretical_hours
-            line["theoretical_hours"] = sum(day_dict.values())
             if full_fields:  # compute difference
-                line["difference"] = (line["worked_hours"] or 0.0) - line[
-                    "theoretical_hours"
-                ]
+                line["difference"] = (line["worked_hours"] or 0.0) - (
+                    line["theoretical_hours"] or 0.0
+                )
             elif difference_field:  # Remove wrong 0 values
                 del line["difference"]
         return res
@@ -241,6 +241,42 @@ class TestHrAttendanceReportTheoreticalTime(TestHrAttendanceReportTheoreticalTim
         self.assertEqual(res[4]["theoretical_hours"], 8)  # 1946-12-27(virtual)
         self.assertEqual(res[5]["theoretical_hours"], 8)  # 1946-12-30(virtual)
 
+    @mute_logger("odoo.models.unlink")
+    def test_theoretical_hours_materialized(self):
+        """Report days come from the materialized calendar expansion and are
+        dropped when the calendar changes."""
+        CalendarDay = self.env["hr.attendance.theoretical.calendar.day"]
+        ExceptionDay = self.env["hr.attendance.theoretical.employee.day"]
+        self.env["hr.attendance.theoretical.time.report"].read_group(
+            [
+                ("date", ">=", "1946-12-23"),
+                ("date", "<", "1946-12-31"),
+                ("employee_id", "=", self.employee_1.id),
+            ],
+            ["employee_id", "theoretical_hours:sum"],
+            ["employee_id"],
+        )
+        days = CalendarDay.search(
+            [
+                ("calendar_id", "=", self.calendar.id),
+                ("date", ">=", "1946-12-23"),
+                ("date", "<=", "1946-12-30"),
+            ]
+        )
+        self.assertEqual(len(days), 8)
+        hours = {day.date.day: day.hours for day in days}
+        self.assertEqual(hours[25], 8)  # Public holiday is not calendar level
+        self.assertEqual(hours[28], 0)  # Saturday
+        # Public holidays and leaves are employee exceptions
+        exceptions = ExceptionDay.search([("employee_id", "=", self.employee_1.id)])
+        self.assertEqual(
+            sorted(exceptions.mapped("date")),
+            [datetime.date(1946, 12, 25), datetime.date(1946, 12, 26)],
+        )
+        self.assertEqual(set(exceptions.mapped("hours")), {0})
+        self.calendar.attendance_ids.filtered(lambda x: x.hour_from == 14.0).unlink()
+        self.assertFalse(CalendarDay.search([("calendar_id", "=", self.calendar.id)]))
+
     def test_change_hr_holidays_public(self):
         self.public_holiday_global.line_ids[0].write({"date": "1946-12-23"})
         # 1946-12-23
@@ -54,12 +54,19 @@
         'data/menu_data.xml',
         'data/payment_providers.xml',
         'data/ir_cron_stock_alerts.xml',
+        'data/ir_cron_stock_analytics.xml',
+        'data/ir_cron_stock_forecast.xml',
+        'data/ir_cron_stock_alert_index.xml',
+        'data/ir_cron_stock_lot_expiry.xml',
+        'data/ir_cron_stock_valuation.xml',
         'data/ir_cron_abandoned_cart.xml',
         # 'data/ir_cron_theme_payouts.xml',  # TEMPORAIREMENT DÉSACTIVÉ (erreur Python dans code)
         'data/ir_cron_subscriptions.xml',
         'data/ir_cron_auth_tokens.xml',
         'data/ir_cron_backup_schedules.xml',
         'data/ir_cron_reservations.xml',
+        'data/ir_cron_marketing_campaigns.xml',
+        'data/ir_cron_product_import.xml',
         'data/ir_cron_sitemap_healthcheck.xml',
         'data/res_country_state_tn.xml',
         'data/email_templates_data.xml',
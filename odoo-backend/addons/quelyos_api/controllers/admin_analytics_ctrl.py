@@ -7,6 +7,7 @@ from odoo.http import request
 from odoo.exceptions import AccessDenied
 from .super_admin import SuperAdminController
 from ..config import get_cors_headers
+from ..lib.profiler import QUERY_SAMPLE_RATE, get_query_traces, summarize_query_traces
 
 _logger = logging.getLogger(__name__)
 
@@ -384,3 +385,48 @@ class AdminAnalyticsController(SuperAdminController):
                 headers=cors_headers,
                 status=500
             )
+
+    @http.route('/api/super-admin/performance/queries', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False)
+    def query_traces(self):
+        """Traces SQL récentes par requête HTTP (échantillonnées ou forcées) et agrégat par endpoint"""
+        origin = request.httprequest.headers.get('Origin', '')
+        cors_headers = get_cors_headers(origin)
+
+        if request.httprequest.method == 'OPTIONS':
+            response = request.make_response('', headers=list(cors_headers.items()))
+            response.status_code = 204
+            return response
+
+        try:
+            self._check_super_admin()
+        except AccessDenied as e:
+            return request.make_json_response(
+                {'success': False, 'error': str(e)},
+                headers=cors_headers,
+                status=403
+            )
+
+        try:
+            params = request.httprequest.args
+            traces = get_query_traces(int(params.get('limit', 50)))
+            endpoint = params.get('endpoint')
+            if endpoint:
+                traces = [t for t in traces if t['endpoint'] == endpoint]
+            if params.get('n_plus_one') in ('1', 'true'):
+                traces = [t for t in traces if t['n_plus_one']]
+
+            data = {
+                'success': True,
+                'sample_rate': QUERY_SAMPLE_RATE,
+                'summary': summarize_query_traces(traces),
+                'traces': traces,
+            }
+            return request.make_json_response(data, headers=cors_headers)
+
+        except Exception as e:
+            _logger.error(f"Query traces error: {e}")
+            return request.make_json_response(
+                {'success': False, 'error': 'Erreur serveur'},
+                headers=cors_headers,
+                status=500
+            )
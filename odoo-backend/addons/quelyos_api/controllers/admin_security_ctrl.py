@@ -392,6 +392,7 @@ class AdminSecurityController(SuperAdminController):
                 'name': r.name,
                 'ip_address': r.ip_address,
                 'ip_type': r.ip_type,
+                'access_type': r.access_type,
                 'is_active': r.is_active,
                 'sequence': r.sequence,
                 'user_ids': [{'id': u.id, 'name': u.name} for u in r.user_ids],
@@ -446,6 +447,7 @@ class AdminSecurityController(SuperAdminController):
             rule = IPWhitelist.create({
                 'name': name,
                 'ip_address': ip_address,
+                'access_type': body.get('access_type', 'allow'),
                 'is_active': body.get('is_active', True),
                 'notes': body.get('notes'),
                 'sequence': body.get('sequence', 10),
@@ -8,6 +8,7 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.db_routing import use_read_replica
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ class QuelyosAnalyticsAPI(BaseController):
     """API contrôleur pour les statistiques e-commerce"""
 
     @http.route('/api/ecommerce/analytics/stats', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_analytics_stats(self, **kwargs):
         """Statistiques globales (admin uniquement)"""
         try:
@@ -156,6 +158,7 @@ class QuelyosAnalyticsAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/analytics/revenue-chart', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_revenue_chart(self, **kwargs):
         """Graphique évolution du chiffre d'affaires par période"""
         try:
@@ -235,6 +238,7 @@ class QuelyosAnalyticsAPI(BaseController):
             return {'success': False, 'error': 'Une erreur est survenue'}
 
     @http.route('/api/ecommerce/analytics/orders-chart', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_orders_chart(self, **kwargs):
         """Graphique évolution du nombre de commandes par période et par état"""
         try:
@@ -319,6 +323,7 @@ class QuelyosAnalyticsAPI(BaseController):
             return {'success': False, 'error': 'Une erreur est survenue'}
 
     @http.route('/api/ecommerce/analytics/conversion-funnel', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_conversion_funnel(self, **kwargs):
         """Funnel de conversion : visiteurs → panier → commande → paiement"""
         try:
@@ -412,6 +417,7 @@ class QuelyosAnalyticsAPI(BaseController):
             return {'success': False, 'error': 'Une erreur est survenue'}
 
     @http.route('/api/ecommerce/analytics/top-categories', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_top_categories(self, **kwargs):
         """Top catégories les plus vendues avec graphique"""
         try:
@@ -13,6 +13,7 @@ from ..lib.rate_limiter import (
     rate_limit_key,
     get_rate_limiter
 )
+from ..lib.keyset_pagination import KeysetPaginator, approximate_count
 from ..lib.tenant_security import (
     get_tenant_from_header,
     get_company_from_tenant,
@@ -605,3 +606,42 @@ class BaseController(http.Controller):
             return None
 
         return get_quota_status(tenant)
+
+    def _wants_keyset(self, params):
+        """True si le client demande la pagination keyset (cursor ou pagination=cursor)"""
+        return bool(params.get('cursor')) or params.get('pagination') == 'cursor'
+
+    def _keyset_paginate(self, Model, domain, order, params, default_limit=50, max_limit=100):
+        """
+        Pagination keyset commune aux endpoints de liste.
+
+        Le curseur opaque est lu dans params['cursor']; le total est estimé
+        (pg_class / EXPLAIN) sauf pour les petits volumes où il est exact.
+
+        Args:
+            Model: Recordset vide du modèle (sudo/contexte déjà appliqués)
+            domain: Domaine Odoo
+            order: Tri Odoo sur champs stockés ('date_order desc')
+            params: Paramètres de la requête
+            default_limit: Taille de page par défaut
+            max_limit: Taille de page maximale
+
+        Returns:
+            tuple: (records, pagination)
+
+        Raises:
+            InvalidCursorError: Curseur invalide ou émis pour un autre tri
+        """
+        limit = min(max(1, int(params.get('limit', default_limit))), max_limit)
+        page = KeysetPaginator(Model._name, order=order).paginate(
+            Model, domain, cursor=params.get('cursor') or None, limit=limit
+        )
+        total, exact = approximate_count(Model, domain)
+
+        pagination = page.to_dict()
+        pagination.update({
+            'limit': limit,
+            'total': total,
+            'total_exact': exact,
+        })
+        return page.records, pagination
@@ -8,6 +8,7 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.metrics import track_request, track_db_query
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
@@ -16,6 +17,7 @@ _logger = logging.getLogger(__name__)
 class QuelyosCartAPI(BaseController):
     """API contrôleur pour le panier, coupons et parrainage"""
 
+    @track_db_query('cart_lookup')
     def _get_or_create_cart(self, partner_id):
         """Récupérer ou créer un panier pour le client"""
         # Chercher un panier existant (commande en brouillon sans date de commande)
@@ -35,6 +37,7 @@ class QuelyosCartAPI(BaseController):
         return cart
 
     @http.route('/api/ecommerce/cart/add', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/cart/add')
     def add_to_cart(self, **kwargs):
         """Ajouter un produit au panier"""
         try:
@@ -1288,6 +1291,7 @@ class QuelyosCartAPI(BaseController):
             return {'success': False, 'error': 'Une erreur est survenue'}
 
     @http.route('/api/ecommerce/cart', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/cart')
     def get_cart(self, **kwargs):
         """Récupérer le panier du client"""
         try:
@@ -5,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from odoo import http
 from odoo.http import request
+from ..lib.stock_valuation import StockValuation
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
@@ -102,7 +103,32 @@ class CFODashboardsController(BaseController):
                     'status': 'excellent',
                 },
             }
-            
+
+            # Valeur du stock: moteur SQL, comparée à la photo d'il y a 30 jours
+            env = request.env(su=True)
+            inventory_value = StockValuation(env).totals()['total']['value']
+            snapshot_date, previous = env['quelyos.stock.valuation.snapshot'].get_valuation_at(
+                datetime.now().date() - timedelta(days=30),
+            )
+            previous_value = previous['total']['value'] if snapshot_date else None
+            if previous_value is None:
+                # Pas de photo aussi ancienne: pas de comparaison possible
+                inventory_trend = 'unknown'
+            elif inventory_value > previous_value * 1.02:
+                inventory_trend = 'increasing'
+            elif inventory_value < previous_value * 0.98:
+                inventory_trend = 'decreasing'
+            else:
+                inventory_trend = 'stable'
+            kpis['inventoryValue'] = {
+                'value': round(inventory_value, 2),
+                'unit': 'currency',
+                'trend': inventory_trend,
+                'previousValue': round(previous_value, 2) if previous_value is not None else None,
+                'benchmark': None,
+                'status': 'good',
+            }
+
             return self._success_response({
                 'kpis': kpis,
                 'period': period,
@@ -8,6 +8,8 @@ from odoo import http
 from odoo.http import request
 from .base import BaseController
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
+from ..lib.metrics import track_request
+from ..lib.stock_availability import StockAvailability
 
 _logger = logging.getLogger(__name__)
 
@@ -237,6 +239,7 @@ class QuelyosCheckout(BaseController):
     # ==================== CHECKOUT ====================
 
     @http.route('/api/ecommerce/checkout/validate', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/checkout/validate')
     def checkout_validate(self, **kwargs):
         """
         Valider le panier avant checkout
@@ -323,6 +326,11 @@ class QuelyosCheckout(BaseController):
             errors = []
             warnings = []
 
+            # Stock disponible (hors réservations) de tout le panier en une requête
+            free_qty = StockAvailability(cart.env).free_qty(
+                cart.order_line.product_id.ids, cart.warehouse_id.id,
+            )
+
             # Vérifier chaque ligne du panier
             for line in cart.order_line:
                 product = line.product_id
@@ -339,21 +347,22 @@ class QuelyosCheckout(BaseController):
                     continue
 
                 # Vérifier le stock disponible
-                if product.type == 'product':  # Produit stockable
-                    if line.product_uom_qty > product.qty_available:
+                if product.is_storable:  # Produit stockable
+                    available_qty = free_qty[product.id]
+                    if line.product_uom_qty > available_qty:
                         errors.append({
                             'line_id': line.id,
                             'product_id': product.id,
                             'product_name': product.name,
                             'error_type': 'stock',
                             'message': f'Stock insuffisant pour "{product.name}"',
-                            'current_stock': int(product.qty_available),
+                            'current_stock': int(available_qty),
                             'requested_qty': int(line.product_uom_qty)
                         })
-                    elif line.product_uom_qty > product.qty_available - 5:  # Warning si stock faible
+                    elif line.product_uom_qty > available_qty - 5:  # Warning si stock faible
                         warnings.append({
                             'line_id': line.id,
-                            'message': f'Stock limité pour "{product.name}" ({int(product.qty_available)} disponibles)'
+                            'message': f'Stock limité pour "{product.name}" ({int(available_qty)} disponibles)'
                         })
 
                 # Vérifier si le prix a changé
@@ -658,6 +667,7 @@ class QuelyosCheckout(BaseController):
             }
 
     @http.route('/api/ecommerce/checkout/confirm', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/checkout/confirm')
     def checkout_confirm(self, **kwargs):
         """
         Confirmer la commande (après paiement validé)
@@ -3,8 +3,15 @@
 API Customer Segmentation RFM
 Endpoints pour récupérer les clients avec scoring RFM et export CSV
 """
+import base64
+
 from odoo import http
 from odoo.http import request
+from ..config import get_cors_headers
+from ..lib.export_stream import (
+    ExportColumn, StreamingExporter, UnsupportedFormatError,
+    date_formatter, render, selection_formatter, stream_response,
+)
 from .base import BaseController
 
 
@@ -122,11 +129,47 @@ class CustomerRFMController(BaseController):
             'stats': stats,
         }
 
+    def _rfm_exporter(self, tenant, segment=None):
+        """Exporteur en flux des clients RFM du tenant (tri montant décroissant)"""
+        Partner = request.env['res.partner'].sudo()
+
+        # Domain
+        domain = [
+            ('company_id', '=', tenant.company_id.id),
+            ('customer_rank', '>', 0),
+        ]
+        if segment:
+            domain.append(('x_rfm_segment', '=', segment))
+
+        def amount(value):
+            return f"{value or 0.0:.2f}"
+
+        columns = [
+            ExportColumn('name', 'Nom', default=''),
+            ExportColumn('email', 'Email', default=''),
+            ExportColumn('phone', 'Téléphone', default=''),
+            ExportColumn('segment', 'Segment RFM', path='x_rfm_segment',
+                         format=selection_formatter(Partner, 'x_rfm_segment')),
+            ExportColumn('recency_score', 'Score Récence', path='x_rfm_recency_score'),
+            ExportColumn('frequency_score', 'Score Fréquence', path='x_rfm_frequency_score'),
+            ExportColumn('monetary_score', 'Score Montant', path='x_rfm_monetary_score'),
+            ExportColumn('total_orders', 'Nombre Commandes', path='x_total_orders'),
+            ExportColumn('total_spent', 'Montant Total', path='x_total_spent', format=amount),
+            ExportColumn('average_order_value', 'Panier Moyen', path='x_average_order_value', format=amount),
+            ExportColumn('days_since_last_order', 'Jours depuis Dernière Commande', path='x_days_since_last_order'),
+            ExportColumn('last_order_date', 'Dernière Commande', path='x_last_order_date',
+                         format=date_formatter('%Y-%m-%d %H:%M')),
+        ]
+        return StreamingExporter(Partner, columns, domain, order='x_total_spent desc')
+
     @http.route('/api/admin/customers/rfm/export', type='json', auth='public', methods=['POST'], csrf=False)
     def export_customers_rfm(self, **kwargs):
         """
         Exporter les clients RFM en CSV.
 
+        Pour les grosses bases, préférer /api/admin/customers/rfm/export/download
+        (fichier en flux, sans base64).
+
         Params:
             segment: Filtrer par segment (optionnel)
 
@@ -147,52 +190,9 @@ class CustomerRFMController(BaseController):
         if not tenant:
             return {'success': False, 'error': 'Tenant invalide ou manquant'}
 
-        import csv
-        import base64
-        from io import StringIO
-
-        Partner = request.env['res.partner'].sudo()
-
-        # Domain
-        domain = [
-            ('company_id', '=', tenant.company_id.id),
-            ('customer_rank', '>', 0),
-        ]
-
         segment = kwargs.get('segment')
-        if segment:
-            domain.append(('x_rfm_segment', '=', segment))
-
-        customers = Partner.search(domain, order='x_total_spent DESC')
-
-        # Créer CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            'Nom', 'Email', 'Téléphone', 'Segment RFM',
-            'Score Récence', 'Score Fréquence', 'Score Montant',
-            'Nombre Commandes', 'Montant Total', 'Panier Moyen',
-            'Jours depuis Dernière Commande', 'Dernière Commande'
-        ])
-
-        for c in customers:
-            writer.writerow([
-                c.name,
-                c.email or '',
-                c.phone or '',
-                dict(c._fields['x_rfm_segment'].selection).get(c.x_rfm_segment, ''),
-                c.x_rfm_recency_score,
-                c.x_rfm_frequency_score,
-                c.x_rfm_monetary_score,
-                c.x_total_orders,
-                f"{c.x_total_spent:.2f}",
-                f"{c.x_average_order_value:.2f}",
-                c.x_days_since_last_order,
-                c.x_last_order_date.strftime('%Y-%m-%d %H:%M') if c.x_last_order_date else ''
-            ])
-
-        csv_content = output.getvalue()
-        csv_base64 = base64.b64encode(csv_content.encode('utf-8')).decode('utf-8')
+        csv_content = render(self._rfm_exporter(tenant, segment), 'csv')
+        csv_base64 = base64.b64encode(csv_content).decode('utf-8')
 
         filename = f'customers_rfm_{segment or "all"}_{tenant.id}.csv'
 
@@ -202,6 +202,38 @@ class CustomerRFMController(BaseController):
             'filename': filename
         }
 
+    @http.route('/api/admin/customers/rfm/export/download', type='http', auth='public', methods=['GET'], csrf=False)
+    def download_customers_rfm(self, **kwargs):
+        """
+        Télécharger l'export RFM en flux.
+
+        Params (query):
+            segment: Filtrer par segment (optionnel)
+            format: csv (défaut), ndjson ou xlsx
+        """
+        origin = request.httprequest.headers.get('Origin', '')
+        cors_headers = get_cors_headers(origin)
+
+        auth_error = self._require_backoffice_auth()
+        if auth_error:
+            return request.make_json_response(auth_error, headers=cors_headers, status=401)
+
+        tenant = self._get_tenant()
+        if not tenant:
+            return request.make_json_response(
+                {'success': False, 'error': 'Tenant invalide ou manquant'}, headers=cors_headers, status=403
+            )
+
+        params = self._get_http_params()
+        segment = params.get('segment')
+        try:
+            return stream_response(
+                self._rfm_exporter(tenant, segment), params.get('format', 'csv'),
+                f'customers_rfm_{segment or "all"}_{tenant.id}', headers=cors_headers,
+            )
+        except UnsupportedFormatError as e:
+            return request.make_json_response({'success': False, 'error': str(e)}, headers=cors_headers, status=400)
+
     @http.route('/api/admin/customers/rfm/recompute', type='json', auth='public', methods=['POST'], csrf=False)
     def recompute_rfm_scores(self, **kwargs):
         """
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 import math
+from dataclasses import replace
 from datetime import datetime, timedelta
 from odoo import http, fields
 from odoo.http import request
@@ -8,11 +9,47 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.metrics import track_request, track_db_query
+from ..lib.keyset_pagination import InvalidCursorError
+from ..lib.export_stream import (
+    ExportColumn, StreamingExporter, UnsupportedFormatError, date_formatter, stream_response,
+)
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
 
 
+@track_db_query('customer_orders')
+def _enrich_customer_orders(partners, rows):
+    """Nb commandes et total dépensé du lot, en une requête groupée"""
+    groups = partners.env['sale.order'].sudo()._read_group(
+        [('partner_id', 'in', partners.ids), ('state', 'in', ['sale', 'done'])],
+        ['partner_id'],
+        ['__count', 'amount_total:sum'],
+    )
+    stats = {partner.id: (count, total) for partner, count, total in groups}
+    for row in rows:
+        row['orders_count'], row['total_spent'] = stats.get(row['id'], (0, 0.0))
+
+
+CUSTOMER_EXPORT_COLUMNS = [
+    ExportColumn('id', 'ID'),
+    ExportColumn('name', 'Nom', default=''),
+    ExportColumn('email', 'Email', default=''),
+    ExportColumn('phone', 'Téléphone', default=''),
+    ExportColumn('mobile', 'Mobile', default=''),
+    ExportColumn('street', 'Adresse', default=''),
+    ExportColumn('street2', 'Complément adresse', default=''),
+    ExportColumn('city', 'Ville', default=''),
+    ExportColumn('zip', 'Code postal', default=''),
+    ExportColumn('state', 'Région', path='state_id.name', default=''),
+    ExportColumn('country', 'Pays', path='country_id.name', default=''),
+    ExportColumn('orders_count', 'Nb commandes', computed=True),
+    ExportColumn('total_spent', 'Total dépensé', computed=True),
+    ExportColumn('create_date', 'Date création', format=date_formatter('%Y-%m-%d')),
+]
+
+
 class QuelyosCustomersAPI(BaseController):
     """API contrôleur pour les clients, profils et adresses"""
 
@@ -89,6 +126,7 @@ class QuelyosCustomersAPI(BaseController):
         return None  # OK : guest_email valide
 
     @http.route('/api/ecommerce/customers', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/customers')
     def get_customers_list(self, **kwargs):
         """Liste de tous les clients (admin uniquement) avec filtrage multi-tenant"""
         try:
@@ -122,14 +160,22 @@ class QuelyosCustomersAPI(BaseController):
                 ]
 
             # Rechercher les clients
-            partners = request.env['res.partner'].sudo().search(
-                domain,
-                limit=limit,
-                offset=offset,
-                order='name asc'
-            )
-
-            total = request.env['res.partner'].sudo().search_count(domain)
+            Partner = request.env['res.partner'].sudo()
+            pagination = None
+            if self._wants_keyset(params):
+                # Pagination keyset: coût constant en pages profondes
+                partners, pagination = self._keyset_paginate(
+                    Partner, domain, 'name asc', params, default_limit=20
+                )
+                total = pagination['total']
+            else:
+                partners = Partner.search(
+                    domain,
+                    limit=limit,
+                    offset=offset,
+                    order='name asc, id asc'
+                )
+                total = Partner.search_count(domain)
 
             # Récupérer les statistiques pour chaque client
             data = []
@@ -169,9 +215,12 @@ class QuelyosCustomersAPI(BaseController):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'pagination': pagination,
                 }
             }
 
+        except InvalidCursorError as e:
+            return {'success': False, 'error': str(e), 'error_code': 'INVALID_CURSOR'}
         except Exception as e:
             _logger.error(f"Get customers error: {e}")
             return {
@@ -286,58 +335,39 @@ class QuelyosCustomersAPI(BaseController):
             _logger.error(f"Update customer error: {e}")
             return {'success': False, 'error': 'Une erreur est survenue'}
 
+    def _customer_exporter(self, params):
+        """Exporteur en flux des clients (filtre search)"""
+        search_term = params.get('search', '')
+
+        # Domaine de recherche
+        domain = [('customer_rank', '>', 0)]
+        if search_term:
+            domain.append('|')
+            domain.append(('name', 'ilike', search_term))
+            domain.append(('email', 'ilike', search_term))
+
+        Partner = request.env['res.partner'].sudo()
+        columns = [
+            # 'mobile' n'existe plus sur res.partner depuis Odoo 18
+            replace(column, computed=True) if column.key == 'mobile' and 'mobile' not in Partner._fields else column
+            for column in CUSTOMER_EXPORT_COLUMNS
+        ]
+        return StreamingExporter(Partner, columns, domain, order='name asc', enrich=_enrich_customer_orders)
+
     @http.route('/api/ecommerce/customers/export', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def export_customers_csv(self, **kwargs):
-        """Exporter les clients en CSV (admin uniquement)"""
+        """
+        Exporter les clients en CSV (admin uniquement).
+
+        Retourne les lignes en JSON; pour les grosses bases, utiliser
+        /api/ecommerce/customers/export/download (fichier en flux).
+        """
         try:
             if not request.env.user.has_group('base.group_system'):
                 return {'success': False, 'error': 'Insufficient permissions'}
 
-            params = self._get_params()
-            search_term = params.get('search', '')
-
-            # Domaine de recherche
-            domain = [('customer_rank', '>', 0)]
-            if search_term:
-                domain.append('|')
-                domain.append(('name', 'ilike', search_term))
-                domain.append(('email', 'ilike', search_term))
-
-            # Récupérer tous les clients
-            partners = request.env['res.partner'].sudo().search(domain, order='name asc')
-
-            # Préparer les données CSV
-            customers_data = []
-            for partner in partners:
-                # Compter les commandes
-                orders_count = request.env['sale.order'].sudo().search_count([
-                    ('partner_id', '=', partner.id),
-                    ('state', 'in', ['sale', 'done'])
-                ])
-
-                # Calculer le total dépensé
-                orders = request.env['sale.order'].sudo().search([
-                    ('partner_id', '=', partner.id),
-                    ('state', 'in', ['sale', 'done'])
-                ])
-                total_spent = sum(orders.mapped('amount_total'))
-
-                customers_data.append({
-                    'id': partner.id,
-                    'name': partner.name or '',
-                    'email': partner.email or '',
-                    'phone': partner.phone or '',
-                    'mobile': getattr(partner, 'mobile', '') or '',
-                    'street': partner.street or '',
-                    'street2': partner.street2 or '',
-                    'city': partner.city or '',
-                    'zip': partner.zip or '',
-                    'state': partner.state_id.name if partner.state_id else '',
-                    'country': partner.country_id.name if partner.country_id else '',
-                    'orders_count': orders_count,
-                    'total_spent': total_spent,
-                    'create_date': partner.create_date.strftime('%Y-%m-%d') if partner.create_date else '',
-                })
+            exporter = self._customer_exporter(self._get_params())
+            customers_data = list(exporter.iter_rows())
 
             return {
                 'success': True,
@@ -345,21 +375,9 @@ class QuelyosCustomersAPI(BaseController):
                     'customers': customers_data,
                     'total': len(customers_data),
                     'columns': [
-                        {'key': 'id', 'label': 'ID'},
-                        {'key': 'name', 'label': 'Nom'},
-                        {'key': 'email', 'label': 'Email'},
-                        {'key': 'phone', 'label': 'Téléphone'},
-                        {'key': 'mobile', 'label': 'Mobile'},
-                        {'key': 'street', 'label': 'Adresse'},
-                        {'key': 'street2', 'label': 'Complément adresse'},
-                        {'key': 'city', 'label': 'Ville'},
-                        {'key': 'zip', 'label': 'Code postal'},
-                        {'key': 'state', 'label': 'Région'},
-                        {'key': 'country', 'label': 'Pays'},
-                        {'key': 'orders_count', 'label': 'Nb commandes'},
-                        {'key': 'total_spent', 'label': 'Total dépensé'},
-                        {'key': 'create_date', 'label': 'Date création'},
-                    ]
+                        {'key': column.key, 'label': column.header}
+                        for column in CUSTOMER_EXPORT_COLUMNS
+                    ],
                 }
             }
 
@@ -367,6 +385,31 @@ class QuelyosCustomersAPI(BaseController):
             _logger.error(f"Export customers CSV error: {e}")
             return {'success': False, 'error': 'Une erreur est survenue'}
 
+    @http.route('/api/ecommerce/customers/export/download', type='http', auth='public', methods=['GET'], csrf=False)
+    def download_customers_export(self, **kwargs):
+        """Télécharger l'export clients en flux (format=csv|ndjson|xlsx)"""
+        origin = request.httprequest.headers.get('Origin', '')
+        cors_headers = get_cors_headers(origin)
+
+        if not request.env.user.has_group('base.group_system'):
+            return request.make_json_response(
+                {'success': False, 'error': 'Insufficient permissions'}, headers=cors_headers, status=403
+            )
+
+        try:
+            params = self._get_http_params()
+            return stream_response(
+                self._customer_exporter(params), params.get('format', 'csv'),
+                f"clients_{datetime.now().strftime('%Y%m%d_%H%M%S')}", headers=cors_headers,
+            )
+        except UnsupportedFormatError as e:
+            return request.make_json_response({'success': False, 'error': str(e)}, headers=cors_headers, status=400)
+        except Exception as e:
+            _logger.error(f"Download customers export error: {e}")
+            return request.make_json_response(
+                {'success': False, 'error': 'Une erreur est survenue'}, headers=cors_headers, status=500
+            )
+
     @http.route('/api/ecommerce/customer/profile', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def get_customer_profile(self, **kwargs):
         """Récupérer le profil du client connecté"""
@@ -6,8 +6,10 @@ Endpoints:
 - /api/health          : Health check simple (liveness)
 - /api/health/ready    : Readiness check (toutes dépendances)
 - /api/health/detailed : Health détaillé avec métriques
+- /metrics             : Métriques Prometheus agrégées de tous les workers
 """
 
+import hmac
 import logging
 import time
 import os
@@ -21,6 +23,9 @@ _logger = logging.getLogger(__name__)
 API_VERSION = "1.0.0"
 START_TIME = time.time()
 
+# Jeton Bearer exigé par /metrics si défini (scrape Prometheus)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 class HealthController(http.Controller):
     """Endpoints de health check pour Kubernetes, load balancers, monitoring"""
@@ -156,14 +161,23 @@ class HealthController(http.Controller):
         start = time.time()
         try:
             from ..lib.cache import get_cache_service
+            from ..lib.redis_client import get_redis_stats
             cache = get_cache_service()
+            redis_stats = get_redis_stats()
 
-            if not cache.enabled:
+            if not redis_stats['available']:
                 return {
                     'status': 'disabled',
                     'message': 'Redis not configured',
                 }
 
+            if not cache.enabled:
+                return {
+                    'status': 'error',
+                    'message': 'Redis circuit open',
+                    'circuit': redis_stats['circuit'],
+                }
+
             # Ping Redis
             cache.redis_client.ping()
             latency = (time.time() - start) * 1000
@@ -175,6 +189,8 @@ class HealthController(http.Controller):
                 'status': 'ok',
                 'latency_ms': round(latency, 2),
                 'hit_rate': stats.get('hit_rate', 0),
+                'circuit': redis_stats['circuit'],
+                'pools': redis_stats['pools'],
             }
         except Exception as e:
             _logger.error(f"Redis health check failed: {e}")
@@ -221,6 +237,31 @@ class HealthController(http.Controller):
                 'error': 'Erreur serveur',
             }
 
+    @http.route('/metrics', type='http', auth='none', methods=['GET'], csrf=False)
+    def prometheus_metrics(self, **kwargs):
+        """
+        Exposition Prometheus.
+
+        En prefork, fusionne les fichiers mmap de tous les workers: chaque
+        scrape renvoie le total quel que soit le worker qui répond.
+        """
+        from ..lib.metrics import get_metrics, get_metrics_content_type
+
+        if METRICS_TOKEN:
+            auth_header = request.httprequest.headers.get('Authorization', '')
+            if not hmac.compare_digest(auth_header, f'Bearer {METRICS_TOKEN}'):
+                response = request.make_response('Unauthorized', headers=[('Content-Type', 'text/plain')])
+                response.status_code = 401
+                return response
+
+        return request.make_response(
+            get_metrics(),
+            headers=[
+                ('Content-Type', get_metrics_content_type()),
+                ('Cache-Control', 'no-cache, no-store, must-revalidate'),
+            ]
+        )
+
     def _get_metrics(self) -> dict:
         """Récupère les métriques de performance"""
         try:
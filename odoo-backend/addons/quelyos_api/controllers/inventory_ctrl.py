@@ -8,6 +8,12 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.keyset_pagination import InvalidCursorError
+from ..lib.db_routing import use_read_replica
+from ..lib.stock_analytics import StockAnalytics
+from ..lib.stock_valuation import StockValuation
+from ..lib.location_tree import LocationTree
+from ..lib.stock_availability import StockAvailability
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
@@ -150,6 +156,10 @@ class QuelyosInventoryAPI(BaseController):
             # Rechercher produits
             products = Product.search(domain, order='name')
 
+            # Valorisation calculée en SQL (même moteur que les rapports de valorisation)
+            valuation = StockValuation(request.env(su=True), domain=[('id', 'in', products.ids)])
+            values = {row['id']: row['value'] for row in valuation.by_product(include_zero_stock=True)}
+
             # Générer données CSV
             csv_data = []
             for product in products:
@@ -161,7 +171,7 @@ class QuelyosInventoryAPI(BaseController):
                     'virtual_available': float(product.virtual_available),
                     'list_price': float(product.list_price),
                     'standard_price': float(product.standard_price),
-                    'valuation': float(product.qty_available * product.standard_price),
+                    'valuation': float(values.get(product.id, 0.0)),
                     'category': product.categ_id.complete_name if product.categ_id else '',
                     'create_date': product.create_date.strftime('%Y-%m-%d %H:%M:%S') if product.create_date else '',
                 })
@@ -291,14 +301,19 @@ class QuelyosInventoryAPI(BaseController):
                     ])
 
             # Recherche avec tri chronologique inverse
-            moves = Move.search(
-                domain,
-                limit=limit,
-                offset=offset,
-                order='date desc, id desc'
-            )
-
-            total = Move.search_count(domain)
+            pagination = None
+            if self._wants_keyset(params):
+                # Pagination keyset: (date, id) en row-value, coût constant
+                moves, pagination = self._keyset_paginate(Move, domain, 'date desc', params, max_limit=200)
+                total = pagination['total']
+            else:
+                moves = Move.search(
+                    domain,
+                    limit=limit,
+                    offset=offset,
+                    order='date desc, id desc'
+                )
+                total = Move.search_count(domain)
 
             # Construction des données enrichies
             history = []
@@ -540,14 +555,19 @@ class QuelyosInventoryAPI(BaseController):
                     ])
 
             # Recherche avec tri chronologique inverse
-            moves = Move.search(
-                domain,
-                limit=limit,
-                offset=offset,
-                order='date desc, id desc'
-            )
-
-            total = Move.search_count(domain)
+            pagination = None
+            if self._wants_keyset(params):
+                # Pagination keyset: (date, id) en row-value, coût constant
+                moves, pagination = self._keyset_paginate(Move, domain, 'date desc', params, max_limit=200)
+                total = pagination['total']
+            else:
+                moves = Move.search(
+                    domain,
+                    limit=limit,
+                    offset=offset,
+                    order='date desc, id desc'
+                )
+                total = Move.search_count(domain)
 
             # Construction des données enrichies
             data = []
@@ -605,6 +625,7 @@ class QuelyosInventoryAPI(BaseController):
                         'total': total,
                         'limit': limit,
                         'offset': offset,
+                        'pagination': pagination,
                     }
                 }
             }
@@ -613,6 +634,21 @@ class QuelyosInventoryAPI(BaseController):
                 headers=[('Content-Type', 'application/json')] + list(cors_headers.items())
             )
 
+        except InvalidCursorError as e:
+            import json
+            response_data = {
+                'jsonrpc': '2.0',
+                'id': None,
+                'result': {
+                    'success': False,
+                    'error': str(e),
+                    'errorCode': 'INVALID_CURSOR'
+                }
+            }
+            return request.make_response(
+                json.dumps(response_data),
+                headers=[('Content-Type', 'application/json')] + list(cors_headers.items())
+            )
         except Exception as e:
             _logger.error(f"Get stock moves error: {e}", exc_info=True)
             import json
@@ -643,6 +679,8 @@ class QuelyosInventoryAPI(BaseController):
                     'error': 'Items list is required'
                 }
 
+            warehouse_id = params.get('warehouse_id')
+
             results = []
             all_available = True
 
@@ -650,6 +688,7 @@ class QuelyosInventoryAPI(BaseController):
             product_ids = [int(item.get('product_id', 0)) for item in items if item.get('product_id')]
             products_batch = request.env['product.product'].sudo().browse(product_ids)
             products_by_id = {p.id: p for p in products_batch.exists()}
+            free_qty = StockAvailability(request.env(su=True)).free_qty(products_by_id, warehouse_id)
 
             for item in items:
                 product_id = item.get('product_id')
@@ -666,13 +705,13 @@ class QuelyosInventoryAPI(BaseController):
                     all_available = False
                     continue
 
-                is_available = product.qty_available >= quantity
+                is_available = free_qty[product.id] >= quantity
 
                 results.append({
                     'product_id': product_id,
                     'product_name': product.name,
                     'requested_qty': quantity,
-                    'available_qty': product.qty_available,
+                    'available_qty': free_qty[product.id],
                     'available': is_available,
                 })
 
@@ -996,9 +1035,14 @@ class QuelyosInventoryAPI(BaseController):
                 domain.append(('name', 'ilike', search))
                 domain.append(('origin', 'ilike', search))
 
-            # Recherche avec pagination
-            pickings = Picking.search(domain, limit=limit, offset=offset, order='scheduled_date desc, id desc')
-            total_count = Picking.search_count(domain)
+            # Recherche avec pagination (keyset si curseur demandé)
+            pagination = None
+            if self._wants_keyset(params):
+                pickings, pagination = self._keyset_paginate(Picking, domain, 'scheduled_date desc', params, default_limit=20)
+                total_count = pagination['total']
+            else:
+                pickings = Picking.search(domain, limit=limit, offset=offset, order='scheduled_date desc, id desc')
+                total_count = Picking.search_count(domain)
 
             # Mapping des états pour labels français
             state_labels = {
@@ -1048,9 +1092,12 @@ class QuelyosInventoryAPI(BaseController):
                     'total': total_count,
                     'limit': limit,
                     'offset': offset,
+                    'pagination': pagination,
                 }
             }
 
+        except InvalidCursorError as e:
+            return {'success': False, 'error': str(e), 'error_code': 'INVALID_CURSOR'}
         except Exception as e:
             _logger.error(f"Get stock pickings error: {e}")
             return {
@@ -1661,16 +1708,21 @@ class QuelyosInventoryAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/stock/turnover', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_stock_turnover(self, **kwargs):
         """
         Récupérer les statistiques de rotation stock pour tous les produits (admin uniquement).
 
+        Calcul SQL (lib.stock_analytics): quants et ventes groupés par produit,
+        tri, filtres et pagination en base.
+
         Paramètres optionnels:
         - limit (int): Nombre de produits à retourner (défaut: 50)
         - offset (int): Décalage pour pagination (défaut: 0)
         - sort (str): Tri ('turnover_desc', 'turnover_asc', 'days_desc', 'days_asc') (défaut: 'turnover_desc')
         - min_turnover (float): Filtrer par rotation minimale
         - max_turnover (float): Filtrer par rotation maximale
+        - warehouse_id (int): Limiter stock et ventes à un entrepôt
         """
         try:
             # SÉCURITÉ P0: Authentification obligatoire (en attendant JWT)
@@ -1678,62 +1730,33 @@ class QuelyosInventoryAPI(BaseController):
             if error:
                 return error
 
-            Product = request.env['product.product'].sudo()
             params = self._get_params()
 
             limit = int(params.get('limit', 50))
             offset = int(params.get('offset', 0))
             sort = params.get('sort', 'turnover_desc')
-            min_turnover = params.get('min_turnover')
-            max_turnover = params.get('max_turnover')
-
-            # Domain de base : produits stockables uniquement
-            domain = [
-                ('type', '=', 'product'),
-                ('active', '=', True),
-            ]
-
-            # Rechercher tous les produits
-            products = Product.search(domain)
-
-            # Construire les données avec rotation
-            products_data = []
-            for product in products:
-                turnover = product.stock_turnover_365 if hasattr(product, 'stock_turnover_365') else 0
-                days = product.days_of_stock if hasattr(product, 'days_of_stock') else 0
-                qty_sold = product.qty_sold_365 if hasattr(product, 'qty_sold_365') else 0
-
-                # Appliquer filtres
-                if min_turnover is not None and turnover < float(min_turnover):
-                    continue
-                if max_turnover is not None and turnover > float(max_turnover):
-                    continue
-
-                products_data.append({
-                    'id': product.id,
-                    'name': product.display_name,
-                    'sku': product.default_code or '',
-                    'qty_available': product.qty_available,
-                    'qty_sold_365': qty_sold,
-                    'stock_turnover_365': turnover,
-                    'days_of_stock': days,
-                    'standard_price': product.standard_price,
-                    'list_price': product.list_price,
-                })
+            warehouse_id = params.get('warehouse_id')
 
-            # Tri
-            if sort == 'turnover_desc':
-                products_data.sort(key=lambda x: x['stock_turnover_365'], reverse=True)
-            elif sort == 'turnover_asc':
-                products_data.sort(key=lambda x: x['stock_turnover_365'])
-            elif sort == 'days_desc':
-                products_data.sort(key=lambda x: x['days_of_stock'], reverse=True)
-            elif sort == 'days_asc':
-                products_data.sort(key=lambda x: x['days_of_stock'])
+            engine = StockAnalytics(request.env(su=True), warehouse_id=warehouse_id)
+            rows, total = engine.turnover(
+                sort=sort,
+                limit=limit,
+                offset=offset,
+                min_turnover=params.get('min_turnover'),
+                max_turnover=params.get('max_turnover'),
+            )
 
-            # Pagination
-            total = len(products_data)
-            products_data = products_data[offset:offset+limit]
+            products_data = [{
+                'id': row['id'],
+                'name': row['name'],
+                'sku': row['sku'],
+                'qty_available': float(row['qty_available']),
+                'qty_sold_365': float(row['qty_sold']),
+                'stock_turnover_365': float(row['turnover']),
+                'days_of_stock': float(row['days_of_stock']),
+                'standard_price': float(row['cost']),
+                'list_price': row['list_price'],
+            } for row in rows]
 
             _logger.info(f"Fetched stock turnover for {len(products_data)} products (total: {total})")
 
@@ -1755,7 +1778,50 @@ class QuelyosInventoryAPI(BaseController):
                 'errorCode': 'SERVER_ERROR'
             }
 
+    @http.route('/api/ecommerce/stock/turnover/trend', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
+    @use_read_replica
+    def get_stock_turnover_trend(self, **kwargs):
+        """
+        Tendance rotation / valeur / ABC depuis les snapshots nocturnes (admin uniquement).
+
+        Paramètres optionnels:
+        - product_id (int): Historique d'un produit (sinon agrégat par date)
+        - days (int): Profondeur d'historique (défaut: 90)
+        """
+        try:
+            error = self._require_admin()
+            if error:
+                return error
+
+            params = self._get_params()
+            days = min(int(params.get('days', 90)), 730)
+            product_id = params.get('product_id')
+
+            Snapshot = request.env['quelyos.stock.analytics.snapshot'].sudo()
+            trend = Snapshot.get_trend(
+                date_from=fields.Date.today() - timedelta(days=days),
+                product_id=int(product_id) if product_id else None,
+            )
+
+            return {
+                'success': True,
+                'data': {
+                    'trend': trend,
+                    'days': days,
+                    'product_id': int(product_id) if product_id else None,
+                }
+            }
+
+        except Exception as e:
+            _logger.error(f"Get stock turnover trend error: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': 'Erreur serveur',
+                'errorCode': 'SERVER_ERROR'
+            }
+
     @http.route('/api/ecommerce/stock/abc-analysis', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_abc_analysis(self, **kwargs):
         """
         Analyse ABC des produits selon la règle de Pareto 80-20 (admin uniquement).
@@ -1765,11 +1831,15 @@ class QuelyosInventoryAPI(BaseController):
         - Catégorie B: 30% produits = 15% valeur stock
         - Catégorie C: 50% produits = 5% valeur stock
 
+        Cumul et classes calculés en SQL (SUM() OVER (ORDER BY value DESC)).
+
         Paramètres optionnels:
         - warehouse_id (int): Filtrer par entrepôt
         - category_id (int): Filtrer par catégorie produit
         - threshold_a (float): Seuil % catégorie A (défaut: 80)
         - threshold_b (float): Seuil % catégorie B (défaut: 95)
+        - abc_class (str): Ne retourner que la classe 'A', 'B' ou 'C'
+        - limit / offset (int): Pagination des produits (défaut: tous)
 
         Returns:
             - products: Liste produits avec classification A/B/C
@@ -1782,111 +1852,55 @@ class QuelyosInventoryAPI(BaseController):
             if error:
                 return error
 
-            Product = request.env['product.product'].sudo()
             params = self._get_params()
 
             warehouse_id = params.get('warehouse_id')
             category_id = params.get('category_id')
             threshold_a = float(params.get('threshold_a', 80))
             threshold_b = float(params.get('threshold_b', 95))
+            limit = int(params.get('limit') or 0)
+            offset = int(params.get('offset', 0))
 
-            # Domain de base : produits stockables uniquement
-            domain = [
-                ('type', '=', 'product'),
-                ('active', '=', True),
-            ]
-
+            domain = []
             if category_id:
                 domain.append(('categ_id', '=', int(category_id)))
 
-            # Rechercher tous les produits
-            products = Product.search(domain)
-
-            # Calculer valeur stock pour chaque produit
-            products_data = []
-            total_value = 0
-
-            for product in products:
-                # Quantité en stock (filtré par warehouse si spécifié)
-                if warehouse_id:
-                    qty = product.with_context(warehouse=int(warehouse_id)).qty_available
-                else:
-                    qty = product.qty_available
-
-                # Valeur = quantité × prix coût
-                value = qty * product.standard_price
-                total_value += value
-
-                if value > 0:  # On garde uniquement les produits avec valeur > 0
-                    products_data.append({
-                        'id': product.id,
-                        'name': product.display_name,
-                        'sku': product.default_code or '',
-                        'qty': qty,
-                        'standard_price': product.standard_price,
-                        'value': value,
-                    })
-
-            # Trier par valeur décroissante
-            products_data.sort(key=lambda x: x['value'], reverse=True)
-
-            # Calculer % cumulé et classifier
-            cumulative_value = 0
-            cumulative_data = []
-
-            for i, product in enumerate(products_data):
-                cumulative_value += product['value']
-                cumulative_pct = (cumulative_value / total_value * 100) if total_value > 0 else 0
-
-                # Classification ABC selon seuils
-                if cumulative_pct <= threshold_a:
-                    category = 'A'
-                elif cumulative_pct <= threshold_b:
-                    category = 'B'
-                else:
-                    category = 'C'
-
-                product['category'] = category
-                product['cumulative_value'] = cumulative_value
-                product['cumulative_pct'] = round(cumulative_pct, 2)
-                product['value_pct'] = round((product['value'] / total_value * 100), 2) if total_value > 0 else 0
-
-                # Données pour graphique courbe de Pareto
-                cumulative_data.append({
-                    'product_index': i + 1,
-                    'cumulative_pct': round(cumulative_pct, 2),
-                    'category': category
-                })
+            engine = StockAnalytics(request.env(su=True), warehouse_id=warehouse_id, domain=domain)
+            result = engine.abc(
+                threshold_a=threshold_a,
+                threshold_b=threshold_b,
+                limit=limit or None,
+                offset=offset,
+                category=params.get('abc_class'),
+            )
 
-            # Calculer KPIs par catégorie
-            category_a = [p for p in products_data if p['category'] == 'A']
-            category_b = [p for p in products_data if p['category'] == 'B']
-            category_c = [p for p in products_data if p['category'] == 'C']
+            products_data = [{
+                'id': row['id'],
+                'name': row['name'],
+                'sku': row['sku'],
+                'qty': float(row['qty']),
+                'standard_price': float(row['standard_price']),
+                'value': float(row['value']),
+                'category': row['category'],
+                'cumulative_value': float(row['cumulative_value']),
+                'cumulative_pct': row['cumulative_pct'],
+                'value_pct': row['value_pct'],
+            } for row in result['products']]
+
+            # Données pour graphique courbe de Pareto
+            cumulative_data = [{
+                'product_index': row['rank'],
+                'cumulative_pct': row['cumulative_pct'],
+                'category': row['category'],
+            } for row in result['products']]
 
             kpis = {
-                'total_value': round(total_value, 2),
-                'total_products': len(products_data),
-                'category_a': {
-                    'count': len(category_a),
-                    'count_pct': round((len(category_a) / len(products_data) * 100), 1) if products_data else 0,
-                    'value': round(sum(p['value'] for p in category_a), 2),
-                    'value_pct': round((sum(p['value'] for p in category_a) / total_value * 100), 1) if total_value > 0 else 0,
-                },
-                'category_b': {
-                    'count': len(category_b),
-                    'count_pct': round((len(category_b) / len(products_data) * 100), 1) if products_data else 0,
-                    'value': round(sum(p['value'] for p in category_b), 2),
-                    'value_pct': round((sum(p['value'] for p in category_b) / total_value * 100), 1) if total_value > 0 else 0,
-                },
-                'category_c': {
-                    'count': len(category_c),
-                    'count_pct': round((len(category_c) / len(products_data) * 100), 1) if products_data else 0,
-                    'value': round(sum(p['value'] for p in category_c), 2),
-                    'value_pct': round((sum(p['value'] for p in category_c) / total_value * 100), 1) if total_value > 0 else 0,
-                },
+                'total_value': round(result['total_value'], 2),
+                'total_products': result['total_products'],
+                **result['kpis'],
             }
 
-            _logger.info(f"ABC Analysis completed: {len(products_data)} products analyzed")
+            _logger.info(f"ABC Analysis completed: {result['total_products']} products analyzed")
 
             return {
                 'success': True,
@@ -1910,20 +1924,24 @@ class QuelyosInventoryAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/stock/forecast', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_stock_forecast(self, **kwargs):
         """
         Calcul des prévisions de besoins stock basées sur historique ventes (admin uniquement).
 
+        Prévisions lues dans quelyos.stock.forecast (recalcul nocturne en lot);
+        un produit absent de la table est calculé à la volée, sans écriture.
+
         Méthodes:
-        - Moyenne mobile (7j, 30j, 90j, 365j)
-        - Tendance linéaire
-        - Prévisions sur N jours
+        - auto: lissage exponentiel, ou Croston si demande intermittente
+        - moving_average: moyenne mobile 7j (30j si nulle)
+        - linear_trend: tendance linéaire 90j
 
         Paramètres optionnels:
         - product_id (int): ID du produit (requis pour prévisions produit)
         - forecast_days (int): Nombre de jours à prévoir (défaut: 30)
-        - method (str): 'moving_average' ou 'linear_trend' (défaut: 'moving_average')
-        - period_days (int): Période historique en jours (défaut: 90)
+        - method (str): 'auto', 'moving_average' ou 'linear_trend' (défaut: 'moving_average')
+        - period_days (int): Période historique retournée en jours (défaut: 90)
 
         Returns:
             - historical: Données historiques de vente
@@ -1937,10 +1955,8 @@ class QuelyosInventoryAPI(BaseController):
             if error:
                 return error
 
-            from datetime import datetime, timedelta
-
             Product = request.env['product.product'].sudo()
-            Move = request.env['stock.move'].sudo()
+            Forecast = request.env['quelyos.stock.forecast'].sudo()
             params = self._get_params()
 
             product_id = params.get('product_id')
@@ -1954,7 +1970,7 @@ class QuelyosInventoryAPI(BaseController):
             product_id = int(product_id)
             forecast_days = int(params.get('forecast_days', 30))
             method = params.get('method', 'moving_average')
-            period_days = int(params.get('period_days', 90))
+            period_days = min(int(params.get('period_days', 90)), 730)
 
             # Vérifier que le produit existe
             product = Product.browse(product_id)
@@ -1965,77 +1981,64 @@ class QuelyosInventoryAPI(BaseController):
                     'errorCode': 'PRODUCT_NOT_FOUND'
                 }
 
-            # Récupérer historique des ventes (mouvements done depuis internal vers customer)
-            date_from = datetime.now() - timedelta(days=period_days)
-            moves = Move.search([
+            stored = Forecast.search([
                 ('product_id', '=', product_id),
-                ('state', '=', 'done'),
-                ('location_id.usage', '=', 'internal'),
-                ('location_dest_id.usage', '=', 'customer'),
-                ('date', '>=', date_from),
-            ], order='date ASC')
-
-            # Agréger ventes par jour
-            daily_sales = {}
-            for move in moves:
-                date_key = move.date.date().isoformat() if move.date else None
-                if date_key:
-                    daily_sales[date_key] = daily_sales.get(date_key, 0) + move.product_uom_qty
-
-            # Construire série temporelle complète (avec 0 pour jours sans vente)
-            current_date = date_from.date()
-            end_date = datetime.now().date()
-            historical = []
-
-            while current_date <= end_date:
-                date_key = current_date.isoformat()
-                qty_sold = daily_sales.get(date_key, 0)
-                historical.append({
-                    'date': date_key,
-                    'qty_sold': qty_sold
-                })
-                current_date += timedelta(days=1)
-
-            # Calculer moyennes mobiles
-            ma_7 = sum(d['qty_sold'] for d in historical[-7:]) / 7 if len(historical) >= 7 else 0
-            ma_30 = sum(d['qty_sold'] for d in historical[-30:]) / 30 if len(historical) >= 30 else 0
-            ma_90 = sum(d['qty_sold'] for d in historical[-90:]) / 90 if len(historical) >= 90 else 0
-
-            # Calcul de tendance (régression linéaire simple)
-            n = len(historical)
-            if n > 10:  # Besoin d'au moins 10 points
-                sum_x = sum(range(n))
-                sum_y = sum(d['qty_sold'] for d in historical)
-                sum_xy = sum(i * d['qty_sold'] for i, d in enumerate(historical))
-                sum_x2 = sum(i * i for i in range(n))
-
-                # Pente (a) et ordonnée (b) de y = ax + b
-                a = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x) if (n * sum_x2 - sum_x * sum_x) != 0 else 0
-                b = (sum_y - a * sum_x) / n
-
-                trend = 'increasing' if a > 0.01 else ('decreasing' if a < -0.01 else 'stable')
-                trend_slope = round(a, 4)
+                ('company_id', '=', request.env.company.id),
+            ], limit=1)
+            if stored:
+                row = stored.read([
+                    'method', 'daily_forecast', 'ma_7', 'ma_30', 'ma_90',
+                    'trend_slope', 'trend_level', 'computed_at',
+                ])[0]
             else:
-                a, b, trend, trend_slope = 0, ma_7, 'stable', 0
+                row = Forecast.compute_product_forecast(product)
+                if row is None:
+                    return {
+                        'success': False,
+                        'error': 'Prévisions indisponibles (numpy non installé)',
+                        'errorCode': 'FORECAST_UNAVAILABLE'
+                    }
 
-            # Générer prévisions
-            forecast = []
-            forecast_date = datetime.now().date() + timedelta(days=1)
+            # Historique des ventes: une agrégation par jour (date_trunc) sur le produit
+            today = fields.Date.context_today(Forecast)
+            date_from = today - timedelta(days=period_days)
+            request.env.cr.execute("""
+                SELECT d::date, COALESCE(s.qty, 0)
+                  FROM generate_series(%(date_from)s::date, %(today)s::date, interval '1 day') d
+                  LEFT JOIN (
+                        SELECT date_trunc('day', m.date)::date AS day, SUM(m.product_uom_qty) AS qty
+                          FROM stock_move m
+                          JOIN stock_location src ON src.id = m.location_id
+                          JOIN stock_location dst ON dst.id = m.location_dest_id
+                         WHERE m.product_id = %(product_id)s
+                           AND m.state = 'done'
+                           AND src.usage = 'internal'
+                           AND dst.usage = 'customer'
+                           AND m.date >= %(date_from)s
+                         GROUP BY 1
+                  ) s ON s.day = d::date
+                 ORDER BY 1
+            """, {'date_from': date_from, 'today': today, 'product_id': product_id})
+            historical = [
+                {'date': day.isoformat(), 'qty_sold': float(qty)}
+                for day, qty in request.env.cr.fetchall()
+            ]
 
-            if method == 'moving_average':
-                # Utiliser la moyenne mobile comme prévision constante
-                forecast_qty = ma_7 if ma_7 > 0 else ma_30
-            else:  # linear_trend
-                # Utiliser la tendance linéaire
-                forecast_qty = max(0, b + a * n)  # Commencer à partir du dernier point
+            ma_7, ma_30 = row['ma_7'], row['ma_30']
+            slope, level = row['trend_slope'], row['trend_level']
+            trend = 'increasing' if slope > 0.01 else ('decreasing' if slope < -0.01 else 'stable')
 
+            # Générer prévisions
+            forecast = []
+            forecast_date = today + timedelta(days=1)
             for i in range(forecast_days):
                 if method == 'linear_trend':
-                    # Ajuster selon la pente
-                    daily_forecast = max(0, b + a * (n + i))
+                    daily_forecast = max(0, level + slope * i)
+                elif method == 'auto':
+                    daily_forecast = row['daily_forecast']
                 else:
                     # Moyenne mobile constante
-                    daily_forecast = forecast_qty
+                    daily_forecast = ma_7 if ma_7 > 0 else ma_30
 
                 forecast.append({
                     'date': forecast_date.isoformat(),
@@ -2074,16 +2077,18 @@ class QuelyosInventoryAPI(BaseController):
                 'moving_averages': {
                     'ma_7': round(ma_7, 2),
                     'ma_30': round(ma_30, 2),
-                    'ma_90': round(ma_90, 2),
+                    'ma_90': round(row['ma_90'], 2),
                 },
                 'trend': {
                     'status': trend,
-                    'slope': trend_slope,
+                    'slope': round(slope, 4),
                 },
                 'current_stock': current_stock,
                 'total_forecast': round(total_forecast, 2),
-                'avg_daily_forecast': round(total_forecast / forecast_days, 2),
+                'avg_daily_forecast': round(total_forecast / forecast_days, 2) if forecast_days else 0,
                 'days_of_stock': round(current_stock / (total_forecast / forecast_days), 1) if total_forecast > 0 else 0,
+                'demand_model': row['method'],
+                'computed_at': fields.Datetime.to_string(row['computed_at']),
             }
 
             _logger.info(f"Stock forecast generated for product {product.display_name}: {forecast_days} days")
@@ -2112,6 +2117,62 @@ class QuelyosInventoryAPI(BaseController):
                 'errorCode': 'SERVER_ERROR'
             }
 
+    @http.route('/api/ecommerce/stock/forecast/stockouts', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
+    @use_read_replica
+    def get_forecast_stockouts(self, **kwargs):
+        """
+        Produits à rupture prochaine d'après les prévisions stockées (admin uniquement).
+
+        Paramètres optionnels:
+        - max_days (int): Couverture maximale en jours (défaut: 30)
+        - limit (int): Nombre de produits (défaut: 50)
+        - offset (int): Décalage pour pagination (défaut: 0)
+        """
+        try:
+            error = self._require_admin()
+            if error:
+                return error
+
+            params = self._get_params()
+            max_days = float(params.get('max_days', 30))
+            limit = min(int(params.get('limit', 50)), 500)
+            offset = int(params.get('offset', 0))
+
+            Forecast = request.env['quelyos.stock.forecast'].sudo()
+            domain = [
+                ('company_id', '=', request.env.company.id),
+                ('days_of_cover', '!=', False),
+                ('days_of_cover', '<=', max_days),
+            ]
+            forecasts = Forecast.search(domain, order='days_of_cover, product_id', limit=limit, offset=offset)
+
+            return {
+                'success': True,
+                'data': {
+                    'products': [{
+                        'id': forecast.product_id.id,
+                        'name': forecast.product_id.display_name,
+                        'sku': forecast.product_id.default_code or '',
+                        'current_stock': forecast.current_stock,
+                        'daily_forecast': round(forecast.daily_forecast, 2),
+                        'days_of_cover': round(forecast.days_of_cover, 1),
+                        'stockout_date': forecast.stockout_date.isoformat() if forecast.stockout_date else None,
+                        'demand_model': forecast.method,
+                    } for forecast in forecasts],
+                    'total': Forecast.search_count(domain),
+                    'limit': limit,
+                    'offset': offset,
+                }
+            }
+
+        except Exception as e:
+            _logger.error(f"Get forecast stockouts error: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': 'Erreur serveur',
+                'errorCode': 'SERVER_ERROR'
+            }
+
     @http.route('/api/ecommerce/stock/uom', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def get_uom_list(self, **kwargs):
         """Liste toutes les unités de mesure disponibles (Odoo 19 - catégories UoM supprimées)"""
@@ -2360,6 +2421,7 @@ class QuelyosInventoryAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/stock/reports/advanced', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_advanced_stock_reports(self, **kwargs):
         """Rapports stock avancés : ruptures, dead stock, anomalies"""
         try:
@@ -2471,8 +2533,17 @@ class QuelyosInventoryAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/stock/valuation/by-category', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_stock_valuation_by_category(self, **kwargs):
-        """Rapport de valorisation du stock par catégorie produit (coût standard)"""
+        """
+        Rapport de valorisation du stock par catégorie produit (coût standard).
+
+        Params:
+            warehouse_id (int): Limiter à un entrepôt
+            include_zero_stock (bool): Inclure les produits coûtés sans stock
+            date (str): Valorisation à une date passée YYYY-MM-DD (photo journalière,
+                sans détail produit)
+        """
         try:
             # SÉCURITÉ P0: Authentification obligatoire (en attendant JWT)
             error = self._require_admin()
@@ -2482,92 +2553,56 @@ class QuelyosInventoryAPI(BaseController):
             params = self._get_params()
             warehouse_id = params.get('warehouse_id')
             include_zero_stock = params.get('include_zero_stock', False)
+            at_date = params.get('date')
 
-            Product = request.env['product.product'].sudo()
-
-            # Construire domaine de recherche
-            # Inclure tous les produits qui ont un coût (stockables, consommables, etc.)
-            domain = [
-                ('type', 'in', ['product', 'consu']),  # Stockables ou consommables
-                ('standard_price', '>', 0),  # Avec un coût défini
-            ]
-
-            if not include_zero_stock:
-                domain.append(('qty_available', '>', 0))
-
-            products = Product.search(domain)
-
-            # Grouper par catégorie
-            categories_data = {}
-            total_valuation = 0
-            total_products = 0
-            total_quantity = 0
-
-            for product in products:
-                # Filtrer par entrepôt si spécifié
-                if warehouse_id:
-                    qty = product.with_context(warehouse=warehouse_id).qty_available
-                else:
-                    qty = product.qty_available
-
-                if not include_zero_stock and qty <= 0:
-                    continue
-
-                # Utiliser coût standard pour valorisation comptable
-                cost = product.standard_price or 0
-                valuation = cost * qty
-
-                # Récupérer catégorie
-                category = product.categ_id
-                if category:
-                    cat_name = category.complete_name or category.name or 'Sans catégorie'
-                    cat_id = category.id
-                else:
-                    cat_name = 'Sans catégorie'
-                    cat_id = 0
-
-                if cat_name not in categories_data:
-                    categories_data[cat_name] = {
-                        'category_id': cat_id,
-                        'category_name': cat_name,
-                        'product_count': 0,
-                        'total_quantity': 0,
-                        'total_valuation': 0,
-                        'average_cost': 0,
-                        'products': []
-                    }
-
-                categories_data[cat_name]['product_count'] += 1
-                categories_data[cat_name]['total_quantity'] += qty
-                categories_data[cat_name]['total_valuation'] += valuation
-
-                categories_data[cat_name]['products'].append({
-                    'id': product.id,
-                    'name': product.name,
-                    'sku': product.default_code or '',
-                    'quantity': qty,
-                    'cost': cost,
-                    'valuation': valuation
-                })
+            env = request.env(su=True)
+            if at_date and fields.Date.to_date(at_date) < fields.Date.context_today(env.user):
+                snapshot_date, totals = env['quelyos.stock.valuation.snapshot'].get_valuation_at(
+                    at_date, warehouse_id=warehouse_id,
+                )
+                products_by_category = {}
+            else:
+                snapshot_date = None
+                engine = StockValuation(env, warehouse_id=warehouse_id)
+                totals = engine.totals()
+                rows = engine.by_product(include_zero_stock=include_zero_stock)
+                products = env['product.product'].browse([row['id'] for row in rows])
+                product_map = {product.id: product for product in products}
+                products_by_category = {}
+                for row in rows:
+                    product = product_map[row['id']]
+                    products_by_category.setdefault(row['categ_id'], []).append({
+                        'id': product.id,
+                        'name': product.name,
+                        'sku': product.default_code or '',
+                        'quantity': row['quantity'],
+                        'cost': row['cost'],
+                        'valuation': row['value'],
+                    })
 
-                total_valuation += valuation
-                total_products += 1
-                total_quantity += qty
+            total_valuation = totals['total']['value']
+            category_ids = set(totals['categories']) | set(products_by_category)
+            categories = env['product.category'].browse([cid for cid in category_ids if cid])
+            category_names = {category.id: category.complete_name or category.name for category in categories}
 
-            # Calculer moyennes et trier
+            # Catégories: totaux SQL, produits coûtés de la catégorie en détail
             categories_list = []
-            for cat_name, data in categories_data.items():
-                data['average_cost'] = (
-                    data['total_valuation'] / data['product_count']
-                    if data['product_count'] > 0
-                    else 0
-                )
-                data['percentage_of_total'] = (
-                    (data['total_valuation'] / total_valuation * 100)
-                    if total_valuation > 0
-                    else 0
-                )
-                categories_list.append(data)
+            for cat_id in category_ids:
+                values = totals['categories'].get(cat_id, {'quantity': 0.0, 'value': 0.0, 'product_count': 0})
+                category_products = products_by_category.get(cat_id, [])
+                product_count = len(category_products) if category_products else values['product_count']
+                categories_list.append({
+                    'category_id': cat_id or 0,
+                    'category_name': category_names.get(cat_id, 'Sans catégorie'),
+                    'product_count': product_count,
+                    'total_quantity': values['quantity'],
+                    'total_valuation': values['value'],
+                    'average_cost': values['value'] / product_count if product_count else 0,
+                    'percentage_of_total': (
+                        values['value'] / total_valuation * 100 if total_valuation > 0 else 0
+                    ),
+                    'products': category_products,
+                })
 
             # Trier par valorisation décroissante
             categories_list.sort(key=lambda x: x['total_valuation'], reverse=True)
@@ -2578,14 +2613,15 @@ class QuelyosInventoryAPI(BaseController):
                     'categories': categories_list,
                     'summary': {
                         'total_categories': len(categories_list),
-                        'total_products': total_products,
-                        'total_quantity': total_quantity,
+                        'total_products': totals['total']['product_count'],
+                        'total_quantity': totals['total']['quantity'],
                         'total_valuation': total_valuation,
                         'average_valuation_per_category': (
                             total_valuation / len(categories_list)
                             if len(categories_list) > 0
                             else 0
-                        )
+                        ),
+                        'snapshot_date': snapshot_date.isoformat() if snapshot_date else None,
                     }
                 }
             }
@@ -2598,6 +2634,42 @@ class QuelyosInventoryAPI(BaseController):
                 'errorCode': 'SERVER_ERROR'
             }
 
+    def _serialize_stock_alert(self, entry, threshold):
+        """Ligne de l'index d'alertes -> format des listes d'alertes"""
+        product = entry.product_id
+        return {
+            'id': product.id,
+            'name': product.display_name,
+            'sku': product.default_code or '',
+            'warehouse_id': entry.warehouse_id.id or None,
+            'current_stock': entry.on_hand,
+            'threshold': threshold,
+            'diff': entry.gap,
+            'image_url': f'/web/image/product.product/{product.id}/image_128' if product.image_128 else None,
+            'list_price': product.list_price,
+            'category': product.categ_id.name if product.categ_id else '',
+        }
+
+    def _get_stock_alerts(self, state):
+        """
+        Alertes d'un état ('low' ou 'high') lues dans quelyos.stock.alert.index:
+        recherche indexée triée par écart + comptage, sans parcourir les quants.
+        """
+        params = self._get_params()
+        limit = int(params.get('limit', 20))
+        offset = int(params.get('offset', 0))
+
+        AlertIndex = request.env['quelyos.stock.alert.index'].sudo()
+        domain = AlertIndex._alert_domain(params.get('warehouse_id')) + [('state', '=', state)]
+        entries = AlertIndex.search(domain, limit=limit, offset=offset)
+        return {
+            'alerts': [
+                self._serialize_stock_alert(entry, entry.min_qty if state == 'low' else entry.max_qty)
+                for entry in entries
+            ],
+            'total': AlertIndex.search_count(domain),
+        }
+
     @http.route('/api/ecommerce/stock/low-stock-alerts', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def get_low_stock_alerts(self, **kwargs):
         """Récupérer les produits en stock bas (admin uniquement)"""
@@ -2611,61 +2683,9 @@ class QuelyosInventoryAPI(BaseController):
             if not request.env.user.has_group('base.group_system'):
                 return {'success': False, 'error': 'Insufficient permissions'}
 
-            params = self._get_params()
-            limit = params.get('limit', 20)
-            offset = params.get('offset', 0)
-            
-            # Récupérer tous les quants actifs
-            StockQuant = request.env['stock.quant'].sudo()
-            quants = StockQuant.search([
-                ('location_id.usage', '=', 'internal'),
-                ('quantity', '>', 0),
-            ])
-
-            # Grouper par produit
-            products_stock = {}
-            for quant in quants:
-                product_id = quant.product_id.id
-                if product_id not in products_stock:
-                    products_stock[product_id] = {
-                        'product': quant.product_id,
-                        'total_qty': 0,
-                    }
-                products_stock[product_id]['total_qty'] += quant.quantity
-
-            # Filtrer les produits en stock bas
-            low_stock_alerts = []
-            for product_id, data in products_stock.items():
-                product = data['product']
-                total_qty = data['total_qty']
-                threshold = product.product_tmpl_id.low_stock_threshold or 10.0
-
-                if total_qty < threshold:
-                    low_stock_alerts.append({
-                        'id': product.id,
-                        'name': product.display_name,
-                        'sku': product.default_code or '',
-                        'current_stock': total_qty,
-                        'threshold': threshold,
-                        'diff': threshold - total_qty,
-                        'image_url': f'/web/image/product.product/{product.id}/image_128' if product.image_128 else None,
-                        'list_price': product.list_price,
-                        'category': product.categ_id.name if product.categ_id else '',
-                    })
-
-            # Trier par différence (plus critique en premier)
-            low_stock_alerts.sort(key=lambda x: -x['diff'])
-
-            # Pagination
-            total = len(low_stock_alerts)
-            paginated_alerts = low_stock_alerts[offset:offset + limit]
-
             return {
                 'success': True,
-                'data': {
-                    'alerts': paginated_alerts,
-                    'total': total,
-                }
+                'data': self._get_stock_alerts('low'),
             }
 
         except Exception as e:
@@ -2688,72 +2708,50 @@ class QuelyosInventoryAPI(BaseController):
             if not request.env.user.has_group('base.group_system'):
                 return {'success': False, 'error': 'Insufficient permissions'}
 
-            params = self._get_params()
-            limit = params.get('limit', 20)
-            offset = params.get('offset', 0)
+            return {
+                'success': True,
+                'data': self._get_stock_alerts('high'),
+            }
 
-            # Seuil de surstock par défaut (peut être configuré par produit ultérieurement)
-            HIGH_STOCK_THRESHOLD_MULTIPLIER = 3  # 3x le seuil bas = seuil haut
+        except Exception as e:
+            _logger.error(f"Get high stock alerts error: {e}")
+            return {
+                'success': False,
+                'error': 'Une erreur est survenue'
+            }
 
-            # Récupérer tous les quants actifs
-            StockQuant = request.env['stock.quant'].sudo()
-            quants = StockQuant.search([
-                ('location_id.usage', '=', 'internal'),
-                ('quantity', '>', 0),
-            ])
+    @http.route('/api/ecommerce/stock/alerts/summary', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    def get_stock_alerts_summary(self, **kwargs):
+        """
+        Compteurs d'alertes stock pour les badges (admin uniquement).
 
-            # Grouper par produit
-            products_stock = {}
-            for quant in quants:
-                product_id = quant.product_id.id
-                if product_id not in products_stock:
-                    products_stock[product_id] = {
-                        'product': quant.product_id,
-                        'total_qty': 0,
-                    }
-                products_stock[product_id]['total_qty'] += quant.quantity
-
-            # Filtrer les produits en surstock
-            high_stock_alerts = []
-            for product_id, data in products_stock.items():
-                product = data['product']
-                total_qty = data['total_qty']
-                threshold_low = product.product_tmpl_id.low_stock_threshold or 10.0
-                threshold_high = threshold_low * HIGH_STOCK_THRESHOLD_MULTIPLIER
-
-                if total_qty > threshold_high:
-                    high_stock_alerts.append({
-                        'id': product.id,
-                        'name': product.display_name,
-                        'sku': product.default_code or '',
-                        'current_stock': total_qty,
-                        'threshold': threshold_high,
-                        'diff': total_qty - threshold_high,
-                        'image_url': f'/web/image/product.product/{product.id}/image_128' if product.image_128 else None,
-                        'list_price': product.list_price,
-                        'category': product.categ_id.name if product.categ_id else '',
-                    })
+        Params:
+            warehouse_id (int): Entrepôt (défaut: total société)
 
-            # Trier par différence (plus critique en premier)
-            high_stock_alerts.sort(key=lambda x: -x['diff'])
+        Returns:
+            {'low': int, 'high': int, 'ok': int}
+        """
+        try:
+            error = self._authenticate_from_header()
+            if error:
+                return error
 
-            # Pagination
-            total = len(high_stock_alerts)
-            paginated_alerts = high_stock_alerts[offset:offset + limit]
+            if not request.env.user.has_group('base.group_system'):
+                return {'success': False, 'error': 'Insufficient permissions'}
 
+            params = self._get_params()
+            AlertIndex = request.env['quelyos.stock.alert.index'].sudo()
             return {
                 'success': True,
-                'data': {
-                    'alerts': paginated_alerts,
-                    'total': total,
-                }
+                'data': AlertIndex.get_alert_counts(params.get('warehouse_id')),
             }
 
         except Exception as e:
-            _logger.error(f"Get high stock alerts error: {e}")
+            _logger.error(f"Get stock alerts summary error: {e}", exc_info=True)
             return {
                 'success': False,
-                'error': 'Une erreur est survenue'
+                'error': 'Erreur serveur',
+                'errorCode': 'SERVER_ERROR'
             }
 
     @http.route('/api/ecommerce/warehouses', type='http', auth='public', methods=['GET', 'POST'], csrf=False)
@@ -2930,7 +2928,7 @@ class QuelyosInventoryAPI(BaseController):
                     }
                 }
 
-            # Récupérer les quants (stock) dans ces locations
+            # Produits en stock dans ces locations (une ligne par produit)
             Quant = request.env['stock.quant'].sudo()
             quant_domain = [
                 ('location_id', 'in', location_ids),
@@ -2942,30 +2940,27 @@ class QuelyosInventoryAPI(BaseController):
                 quant_domain.append(('product_id.name', 'ilike', search))
                 quant_domain.append(('product_id.default_code', 'ilike', search))
 
-            # Grouper par produit pour avoir le stock total par produit dans l'entrepôt
-            quants = Quant.search(quant_domain)
+            products = request.env['product.product'].sudo().browse(
+                [product.id for product, in Quant._read_group(quant_domain, ['product_id'])]
+            )
+            availability = StockAvailability(request.env(su=True)).get(products.ids, [warehouse.id])
 
-            # Agréger par produit
             product_stock = {}
-            for quant in quants:
-                pid = quant.product_id.id
-                if pid not in product_stock:
-                    product = quant.product_id
-                    product_stock[pid] = {
-                        'id': pid,
-                        'name': product.display_name,
-                        'sku': product.default_code or '',
-                        'image_url': f'/web/image/product.product/{pid}/image_128' if product.image_128 else None,
-                        'qty_available': 0,
-                        'reserved_qty': 0,
-                        'free_qty': 0,
-                        'reorder_min': product.reordering_min_qty if hasattr(product, 'reordering_min_qty') else 0,
-                        'category': product.categ_id.name if product.categ_id else '',
-                        'list_price': product.list_price,
-                    }
-                product_stock[pid]['qty_available'] += quant.quantity
-                product_stock[pid]['reserved_qty'] += quant.reserved_quantity
-                product_stock[pid]['free_qty'] += (quant.quantity - quant.reserved_quantity)
+            for product in products:
+                stock = availability[product.id]
+                product_stock[product.id] = {
+                    'id': product.id,
+                    'name': product.display_name,
+                    'sku': product.default_code or '',
+                    'image_url': f'/web/image/product.product/{product.id}/image_128' if product.image_128 else None,
+                    'qty_available': stock['on_hand'],
+                    'reserved_qty': stock['reserved'],
+                    'free_qty': stock['free'],
+                    'incoming_qty': stock['incoming'],
+                    'reorder_min': product.reordering_min_qty if hasattr(product, 'reordering_min_qty') else 0,
+                    'category': product.categ_id.name if product.categ_id else '',
+                    'list_price': product.list_price,
+                }
 
             # Convertir en liste et trier
             products_list = list(product_stock.values())
@@ -4323,15 +4318,16 @@ class QuelyosInventoryAPI(BaseController):
             # Rechercher lots
             lots = Lot.search(domain, limit=limit, offset=offset, order='expiration_date ASC')
 
+            # Stock total par lot en une requête groupée
+            stock_by_lot = dict(StockQuant._read_group([
+                ('lot_id', 'in', lots.ids),
+                ('location_id.usage', '=', 'internal'),
+                ('quantity', '>', 0)
+            ], groupby=['lot_id'], aggregates=['quantity:sum']))
+
             lots_data = []
             for lot in lots:
-                # Calculer stock total du lot
-                quants = StockQuant.search([
-                    ('lot_id', '=', lot.id),
-                    ('location_id.usage', '=', 'internal'),
-                    ('quantity', '>', 0)
-                ])
-                stock_qty = sum(quants.mapped('quantity'))
+                stock_qty = stock_by_lot.get(lot, 0)
 
                 # Filtrer si has_stock
                 if has_stock and stock_qty <= 0:
@@ -4492,17 +4488,19 @@ class QuelyosInventoryAPI(BaseController):
     @http.route('/api/ecommerce/stock/lots/expiry-alerts', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
     def get_expiry_alerts(self, **kwargs):
         """
-        Récupérer les lots avec alertes d'expiration (admin uniquement).
+        Récupérer les lots en stock expirés ou proches de l'expiration (admin uniquement).
+
+        Lecture par plage sur la projection quelyos.stock.lot.expiry
+        (index société / date d'expiration), sans parcourir les lots.
 
         Paramètres optionnels:
-        - days_threshold (int): Nombre de jours avant expiration pour l'alerte (défaut: 30)
-        - status_filter (str): Filtrer par statut ('alert', 'removal', 'expired', 'all') (défaut: 'all')
-        - has_stock_only (bool): Uniquement lots avec stock (défaut: True)
-        - limit (int): Nombre de résultats (défaut: 100)
+        - days_threshold (int): Horizon de la dernière tranche en jours (défaut: 30)
+        - product_id (int): Filtrer par produit
+        - limit (int): Nombre de lots retournés par tranche (défaut: 100)
 
         Returns:
-            - Lots avec alertes groupés par statut
-            - Statistiques (nombre par statut)
+            - Lots groupés par tranche (expired, within_7_days, within_30_days)
+            - Statistiques (nombre et quantité par tranche)
         """
         try:
             # SÉCURITÉ P0: Authentification obligatoire (en attendant JWT)
@@ -4510,96 +4508,114 @@ class QuelyosInventoryAPI(BaseController):
             if error:
                 return error
 
-            Lot = request.env['stock.lot'].sudo()
-            StockQuant = request.env['stock.quant'].sudo()
             params = self._get_params()
-
             days_threshold = int(params.get('days_threshold', 30))
-            status_filter = params.get('status_filter', 'all')
-            has_stock_only = params.get('has_stock_only', True)
             limit = int(params.get('limit', 100))
 
-            # Rechercher tous les lots avec date d'expiration
-            lots = Lot.search([
-                ('expiration_date', '!=', False)
-            ], order='expiration_date ASC')
+            LotExpiry = request.env['quelyos.stock.lot.expiry'].sudo()
+            buckets = LotExpiry.get_expiry_buckets(
+                horizon_days=days_threshold, limit=limit, product_id=params.get('product_id'),
+            )
 
-            # Filtrer et grouper par statut
-            alerts = {
-                'expired': [],
-                'removal': [],
-                'alert': [],
-                'ok_but_soon': [],  # OK mais dans le threshold
-            }
+            rows = [row for bucket in buckets.values() for row in bucket['lots']]
+            lots = request.env['stock.lot'].sudo().browse({row['lot_id'] for row in rows})
+            locations = request.env['stock.location'].sudo().browse({row['location_id'] for row in rows})
+            lot_map = {lot.id: lot for lot in lots}
+            location_map = {location.id: location for location in locations}
+
+            alerts = {}
+            for name, bucket in buckets.items():
+                alerts[name] = []
+                for row in bucket['lots']:
+                    lot = lot_map[row['lot_id']]
+                    alerts[name].append({
+                        'id': lot.id,
+                        'name': lot.name,
+                        'product_id': lot.product_id.id,
+                        'product_name': lot.product_id.display_name,
+                        'product_sku': lot.product_id.default_code or '',
+                        'location_id': row['location_id'],
+                        'location_name': location_map[row['location_id']].complete_name,
+                        'stock_qty': row['quantity'],
+                        'expiration_date': row['expiration_date'].isoformat(),
+                        'days_until_expiry': row['days_until_expiry'],
+                    })
 
-            for lot in lots:
-                # Calculer stock si nécessaire
-                if has_stock_only:
-                    quants = StockQuant.search([
-                        ('lot_id', '=', lot.id),
-                        ('location_id.usage', '=', 'internal'),
-                        ('quantity', '>', 0)
-                    ])
-                    stock_qty = sum(quants.mapped('quantity'))
-                    if stock_qty <= 0:
-                        continue
-                else:
-                    stock_qty = 0
+            stats = {f'{name}_count': bucket['count'] for name, bucket in buckets.items()}
+            stats.update({f'{name}_qty': bucket['quantity'] for name, bucket in buckets.items()})
+            stats['total'] = sum(bucket['count'] for bucket in buckets.values())
 
-                # Appliquer filtre statut
-                if status_filter != 'all' and lot.expiry_status != status_filter:
-                    if not (status_filter == 'alert' and lot.days_until_expiry <= days_threshold):
-                        continue
+            _logger.info(f"Fetched expiry alerts: {stats['total']} lots")
 
-                lot_data = {
-                    'id': lot.id,
-                    'name': lot.name,
-                    'product_id': lot.product_id.id,
-                    'product_name': lot.product_id.display_name,
-                    'product_sku': lot.product_id.default_code or '',
-                    'stock_qty': stock_qty,
-                    'expiration_date': lot.expiration_date.isoformat() if lot.expiration_date else None,
-                    'days_until_expiry': lot.days_until_expiry,
-                    'expiry_status': lot.expiry_status,
+            return {
+                'success': True,
+                'data': {
+                    'alerts': alerts,
+                    'stats': stats,
+                    'days_threshold': days_threshold,
                 }
+            }
 
-                # Grouper par statut
-                if lot.expiry_status == 'expired':
-                    alerts['expired'].append(lot_data)
-                elif lot.expiry_status == 'removal':
-                    alerts['removal'].append(lot_data)
-                elif lot.expiry_status == 'alert':
-                    alerts['alert'].append(lot_data)
-                elif lot.days_until_expiry <= days_threshold:
-                    alerts['ok_but_soon'].append(lot_data)
+        except Exception as e:
+            _logger.error(f"Get expiry alerts error: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': 'Erreur serveur',
+                'errorCode': 'SERVER_ERROR'
+            }
 
-                # Limiter le total
-                total_count = sum(len(v) for v in alerts.values())
-                if total_count >= limit:
-                    break
+    @http.route('/api/ecommerce/stock/lots/fefo', type='jsonrpc', auth='user', methods=['POST'], csrf=False)
+    def get_fefo_lots(self, **kwargs):
+        """
+        Lots à prélever en premier (FEFO) pour un produit (admin uniquement).
 
-            # Statistiques
-            stats = {
-                'expired_count': len(alerts['expired']),
-                'removal_count': len(alerts['removal']),
-                'alert_count': len(alerts['alert']),
-                'ok_but_soon_count': len(alerts['ok_but_soon']),
-                'total': sum(len(v) for v in alerts.values()),
-            }
+        Même ordre que les tranches d'expiration: date d'expiration, lot, emplacement.
 
-            _logger.info(f"Fetched expiry alerts: {stats['total']} lots")
+        Params:
+            product_id (int): Produit (requis)
+            location_id (int): Emplacement de prélèvement et ses enfants
+            quantity (float): Quantité à couvrir (défaut: tous les lots non expirés)
+        """
+        try:
+            error = self._require_admin()
+            if error:
+                return error
+
+            params = self._get_params()
+            product_id = params.get('product_id')
+            if not product_id:
+                return {
+                    'success': False,
+                    'error': 'Le paramètre product_id est requis',
+                    'errorCode': 'MISSING_PRODUCT_ID'
+                }
+            quantity = params.get('quantity')
+
+            candidates = request.env['quelyos.stock.lot.expiry'].sudo().get_fefo_candidates(
+                product_id,
+                location_id=params.get('location_id'),
+                quantity=float(quantity) if quantity else None,
+            )
+            lots = request.env['stock.lot'].sudo().browse({row['lot_id'] for row in candidates})
+            lot_names = {lot.id: lot.name for lot in lots}
 
             return {
                 'success': True,
                 'data': {
-                    'alerts': alerts,
-                    'stats': stats,
-                    'days_threshold': days_threshold,
+                    'lots': [{
+                        'lot_id': row['lot_id'],
+                        'lot_name': lot_names[row['lot_id']],
+                        'location_id': row['location_id'],
+                        'quantity': row['quantity'],
+                        'cumulative_qty': row['cumulative_qty'],
+                        'expiration_date': row['expiration_date'].isoformat(),
+                    } for row in candidates],
+                    'covered_qty': candidates[-1]['cumulative_qty'] if candidates else 0,
                 }
             }
 
         except Exception as e:
-            _logger.error(f"Get expiry alerts error: {e}", exc_info=True)
+            _logger.error(f"Get FEFO lots error: {e}", exc_info=True)
             return {
                 'success': False,
                 'error': 'Erreur serveur',
@@ -4787,21 +4803,20 @@ class QuelyosInventoryAPI(BaseController):
         if ancestor_id == potential_child_id:
             return True
 
-        Location = request.env['stock.location'].sudo()
-        child = Location.browse(potential_child_id)
-
-        while child.location_id:
-            if child.location_id.id == ancestor_id:
-                return True
-            child = child.location_id
-
-        return False
+        # parent_path: "1/7/42/" -> ancêtres de l'emplacement, sans remonter la chaîne
+        child = request.env['stock.location'].sudo().browse(potential_child_id)
+        return str(ancestor_id) in (child.parent_path or '').split('/')
 
     @http.route('/api/ecommerce/stock/locations/tree', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def get_locations_tree(self, **kwargs):
         """
         Récupérer toutes les locations avec structure hiérarchique (admin uniquement).
 
+        L'arbre de l'entrepôt est lu en une requête triée par parent_path avec
+        le stock de chaque emplacement et le stock cumulé de ses descendants,
+        puis mis en cache par entrepôt (invalidé par les écritures sur
+        emplacements et quants).
+
         Body (params):
             - warehouse_id: int (optionnel, filtrer par entrepôt)
             - usage: str (optionnel, filtrer par type: 'internal', 'view')
@@ -4811,7 +4826,7 @@ class QuelyosInventoryAPI(BaseController):
             dict: {
                 'success': bool,
                 'data': {
-                    'locations': [...]
+                    'locations': [...]  # parents avant enfants
                 }
             }
         """
@@ -4821,18 +4836,12 @@ class QuelyosInventoryAPI(BaseController):
             if error:
                 return error
 
-            Location = request.env['stock.location'].sudo()
-            StockQuant = request.env['stock.quant'].sudo()
-
             params = self._get_params()
 
-            # Construire le domaine
-            domain = [('usage', 'in', ['internal', 'view'])]
-
+            warehouse_id = None
             if params.get('warehouse_id'):
                 try:
                     warehouse_id = int(params['warehouse_id'])
-                    domain.append(('warehouse_id', '=', warehouse_id))
                 except (ValueError, TypeError):
                     return {
                         'success': False,
@@ -4840,41 +4849,14 @@ class QuelyosInventoryAPI(BaseController):
                         'errorCode': 'INVALID_PARAM'
                     }
 
-            if params.get('usage'):
-                usage = params['usage']
-                if usage in ['internal', 'view']:
-                    domain = [('usage', '=', usage)]
-
-            if 'active' in params:
-                domain.append(('active', '=', bool(params['active'])))
-            else:
-                domain.append(('active', '=', True))
-
-            # Récupérer toutes les locations
-            locations = Location.search(domain, order='complete_name ASC')
-
-            # Sérialiser avec calcul du stock
-            locations_data = []
-            for loc in locations:
-                # Calculer stock total de la location
-                quants = StockQuant.search([
-                    ('location_id', '=', loc.id),
-                    ('quantity', '>', 0)
-                ])
-                stock_count = sum(quants.mapped('quantity')) if quants else 0.0
+            usage = params.get('usage')
+            active = bool(params['active']) if 'active' in params else True
 
-                locations_data.append({
-                    'id': loc.id,
-                    'name': loc.name,
-                    'complete_name': loc.complete_name,
-                    'usage': loc.usage,
-                    'parent_id': loc.location_id.id if loc.location_id else None,
-                    'warehouse_id': loc.warehouse_id.id if loc.warehouse_id else None,
-                    'warehouse_name': loc.warehouse_id.name if loc.warehouse_id else None,
-                    'barcode': loc.barcode or '',
-                    'stock_count': round(stock_count, 2),
-                    'active': loc.active
-                })
+            tree = LocationTree(request.env(su=True), warehouse_id=warehouse_id).get()
+            locations_data = [
+                loc for loc in tree
+                if loc['active'] == active and (usage not in ('internal', 'view') or loc['usage'] == usage)
+            ]
 
             _logger.info(f"Locations tree retrieved: {len(locations_data)} locations")
 
@@ -5857,7 +5839,7 @@ class QuelyosInventoryAPI(BaseController):
             if not params.get('product_id'):
                 return {
                     'success': False,
-                    'error': 'product_id requis',
+                    'error': 'Le paramètre product_id est requis',
                     'error_code': 'MISSING_PARAM'
                 }
 
@@ -10,6 +10,7 @@ from datetime import datetime
 from odoo import http
 from odoo.http import request
 from .base import BaseController
+from ..lib.keyset_pagination import InvalidCursorError
 
 _logger = logging.getLogger(__name__)
 
@@ -103,13 +104,13 @@ class InvoicesController(BaseController):
         Liste factures clients avec CURSOR-BASED PAGINATION (performance constante)
 
         Avantages vs offset-based :
-        - Performance constante O(1) quelle que soit profondeur (vs O(n) offset)
+        - Performance constante quelle que soit profondeur (vs O(n) offset)
         - Pas de duplicatas si nouvelles factures créées pendant scroll
         - Infinite scroll natif
-        - PostgreSQL optimisé (index sur ID)
+        - PostgreSQL optimisé (index sur (champ de tri, id))
 
         Query params:
-        - cursor: int (ID dernière facture vue, optionnel)
+        - cursor: str (curseur opaque retourné par la page précédente, optionnel)
         - limit: int (default: 50, max: 100)
         - status: draft|posted|cancel|all (default: all)
         - payment_state: not_paid|in_payment|paid|partial|all (default: all)
@@ -125,8 +126,10 @@ class InvoicesController(BaseController):
           "data": {
             "invoices": [...],
             "has_more": true,
-            "next_cursor": 12345,  # ID dernière facture (pour next page)
-            "count": 50
+            "next_cursor": "eyJ2IjpbIjIwMjQtMDEtMTUiLDEyMzQ1XX0",  # opaque, null si fin
+            "count": 50,
+            "total": 12000,  # estimé (pg_class/EXPLAIN) si total_exact = false
+            "total_exact": false
           }
         }
         """
@@ -141,8 +144,6 @@ class InvoicesController(BaseController):
                 return self._error_response("Tenant non trouvé", "FORBIDDEN", 403)
 
             # Paramètres
-            cursor = params.get('cursor')  # ID dernière facture
-            limit = min(int(params.get('limit', 50)), 100)  # Max 100
             status = params.get('status', 'all')
             payment_state = params.get('payment_state', 'all')
             customer_id = params.get('customer_id')
@@ -181,49 +182,25 @@ class InvoicesController(BaseController):
                 domain.append(('invoice_date', '<=', date_to))
 
             # ═══════════════════════════════════════════════════════════════
-            # CURSOR PAGINATION : WHERE id < cursor (si DESC) ou id > cursor (si ASC)
+            # KEYSET PAGINATION : (sort_field, id) comparés en row-value
+            # Le départage par id rend le tri stable sur invoice_date/amount_total
             # ═══════════════════════════════════════════════════════════════
-            if cursor:
-                cursor_id = int(cursor)
-                if sort_direction == 'DESC':
-                    # Pagination descendante (standard) : id < cursor
-                    domain.append((sort_field, '<', cursor_id))
-                else:
-                    # Pagination ascendante : id > cursor
-                    domain.append((sort_field, '>', cursor_id))
-
-            # Ordre de tri
-            order = f"{sort_field} {sort_direction}"
-
-            # Récupérer factures (limit + 1 pour détecter has_more)
             AccountMove = request.env['account.move'].sudo()
-            invoices = AccountMove.search(domain, limit=limit + 1, order=order)
-
-            # Détecter si page suivante existe
-            has_more = len(invoices) > limit
-            if has_more:
-                invoices = invoices[:-1]  # Retirer dernière facture (sentinel)
-
-            # Calculer next_cursor (ID dernière facture retournée)
-            next_cursor = None
-            if invoices:
-                last_invoice = invoices[-1]
-                # Cursor = valeur du champ de tri (généralement ID)
-                if sort_field == 'id':
-                    next_cursor = last_invoice.id
-                elif sort_field == 'invoice_date':
-                    next_cursor = last_invoice.invoice_date.isoformat() if last_invoice.invoice_date else None
-                elif sort_field == 'amount_total':
-                    next_cursor = float(last_invoice.amount_total)
-                elif sort_field == 'create_date':
-                    next_cursor = last_invoice.create_date.isoformat() if last_invoice.create_date else None
+            try:
+                invoices, pagination = self._keyset_paginate(
+                    AccountMove, domain, f"{sort_field} {sort_direction}", params,
+                )
+            except InvalidCursorError as e:
+                return self._error_response(str(e), "INVALID_CURSOR", 400)
 
             # Sérialiser
             data = {
                 'invoices': [self._serialize_invoice(inv) for inv in invoices],
-                'has_more': has_more,
-                'next_cursor': next_cursor,
-                'count': len(invoices),
+                'has_more': pagination['has_more'],
+                'next_cursor': pagination['next_cursor'],
+                'count': pagination['count'],
+                'total': pagination['total'],
+                'total_exact': pagination['total_exact'],
             }
 
             return self._success_response(data)
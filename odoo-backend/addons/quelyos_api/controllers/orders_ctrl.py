@@ -8,6 +8,8 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.keyset_pagination import InvalidCursorError
+from ..lib.metrics import track_request
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
@@ -17,6 +19,7 @@ class QuelyosOrdersAPI(BaseController):
     """API contrôleur pour les commandes, factures et livraisons"""
 
     @http.route('/api/ecommerce/orders', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/orders')
     def get_orders_list(self, **kwargs):
         """Liste des commandes (admin uniquement)"""
         try:
@@ -50,14 +53,22 @@ class QuelyosOrdersAPI(BaseController):
             if date_to:
                 domain.append(('date_order', '<=', date_to + ' 23:59:59'))
 
-            orders = request.env['sale.order'].sudo().search(
-                domain,
-                limit=limit,
-                offset=offset,
-                order='date_order desc'
-            )
-
-            total = request.env['sale.order'].sudo().search_count(domain)
+            SaleOrder = request.env['sale.order'].sudo()
+            pagination = None
+            if self._wants_keyset(params):
+                # Pagination keyset: coût constant en pages profondes
+                orders, pagination = self._keyset_paginate(
+                    SaleOrder, domain, 'date_order desc', params, default_limit=20
+                )
+                total = pagination['total']
+            else:
+                orders = SaleOrder.search(
+                    domain,
+                    limit=limit,
+                    offset=offset,
+                    order='date_order desc, id desc'
+                )
+                total = SaleOrder.search_count(domain)
 
             data = [{
                 'id': o.id,
@@ -79,9 +90,12 @@ class QuelyosOrdersAPI(BaseController):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'pagination': pagination,
                 }
             }
 
+        except InvalidCursorError as e:
+            return {'success': False, 'error': str(e), 'error_code': 'INVALID_CURSOR'}
         except Exception as e:
             _logger.error(f"Get orders error: {e}")
             return {
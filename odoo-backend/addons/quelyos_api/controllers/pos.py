@@ -14,6 +14,9 @@ import logging
 from odoo import http, fields
 from odoo.http import request
 from .base import BaseController
+from ..lib.keyset_pagination import InvalidCursorError
+from ..lib.metrics import track_request
+from ..lib.stock_availability import StockAvailability
 
 _logger = logging.getLogger(__name__)
 
@@ -286,6 +289,7 @@ class POSController(BaseController):
     # ═══════════════════════════════════════════════════════════════════════════
 
     @http.route('/api/pos/products', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/pos/products')
     def get_products(self, config_id, category_id=None, search=None, limit=100, offset=0, **kwargs):
         """
         Catalogue produits pour le POS avec stock en temps réel.
@@ -334,13 +338,18 @@ class POSController(BaseController):
             pricelist = config.pricelist_id
             warehouse = config.warehouse_id
 
+            # Stock disponible dans l'entrepôt du terminal (toute la page en une requête)
+            free_qty = {}
+            if warehouse:
+                free_qty = StockAvailability(Product.with_company(config.company_id).env).free_qty(
+                    products.ids, warehouse.id,
+                )
+
             result = []
             for product in products:
                 # Prix selon pricelist
                 price = pricelist._get_product_price(product, 1.0) if pricelist else product.list_price
-
-                # Stock disponible dans l'entrepôt du terminal
-                stock_qty = product.with_context(warehouse=warehouse.id).qty_available if warehouse else 0
+                stock_qty = free_qty.get(product.id, 0)
 
                 result.append({
                     'id': product.id,
@@ -411,7 +420,9 @@ class POSController(BaseController):
             pricelist = config.pricelist_id
             warehouse = config.warehouse_id
             price = pricelist._get_product_price(product, 1.0) if pricelist else product.list_price
-            stock_qty = product.with_context(warehouse=warehouse.id).qty_available if warehouse else 0
+            stock_qty = StockAvailability(Product.with_company(config.company_id).env).free_qty(
+                product.ids, warehouse.id,
+            )[product.id] if warehouse else 0
 
             return {
                 'success': True,
@@ -641,8 +652,14 @@ class POSController(BaseController):
                     domain.append(('state', '=', state))
 
             Order = request.env['quelyos.pos.order'].sudo()
-            total = Order.search_count(domain)
-            orders = Order.search(domain, limit=limit, offset=offset, order='id desc')
+            pagination = None
+            if self._wants_keyset(kwargs):
+                # Pagination keyset sur id: coût constant en pages profondes
+                orders, pagination = self._keyset_paginate(Order, domain, 'id desc', dict(kwargs, limit=limit))
+                total = pagination['total']
+            else:
+                total = Order.search_count(domain)
+                orders = Order.search(domain, limit=limit, offset=offset, order='id desc')
 
             return {
                 'success': True,
@@ -651,9 +668,12 @@ class POSController(BaseController):
                     'total': total,
                     'limit': limit,
                     'offset': offset,
+                    'pagination': pagination,
                 },
             }
 
+        except InvalidCursorError as e:
+            return {'success': False, 'error': str(e), 'error_code': 'INVALID_CURSOR'}
         except Exception as e:
             _logger.error(f"Error fetching POS orders: {e}", exc_info=True)
             return {'success': False, 'error': 'Erreur serveur'}
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import base64
+import binascii
 import logging
 import time
-import os
 import math
+import uuid
 from datetime import datetime, timedelta
 from odoo import http, fields
 from odoo.http import request
@@ -10,39 +12,53 @@ from ..config import is_origin_allowed, get_cors_headers
 from ..lib.cache import get_cache_service, CacheTTL
 from ..lib.rate_limiter import check_rate_limit, RateLimitConfig
 from ..lib.validation import sanitize_string, sanitize_dict, validate_no_injection
+from ..lib.keyset_pagination import InvalidCursorError
+from ..lib.metrics import track_request, track_db_query
+from ..lib.bulk_operations import BulkProcessor
+from ..lib.product_import import ProductImporter, iter_rows
+from ..lib.export_stream import ExportColumn, StreamingExporter, UnsupportedFormatError, stream_response
+from ..lib.redis_client import get_pipeline, redis_available
+from ..lib.stock_availability import StockAvailability
 from .base import BaseController
 
 _logger = logging.getLogger(__name__)
 
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
-
-_redis_client = None
-if REDIS_AVAILABLE:
-    try:
-        redis_host = os.environ.get("REDIS_HOST", "localhost")
-        redis_port = int(os.environ.get("REDIS_PORT", 6379))
-        _redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=0,
-            decode_responses=True,
-            socket_connect_timeout=2,
-            socket_timeout=2
-        )
-        _redis_client.ping()
-    except Exception:
-        _redis_client = None
-
 _view_count_cache = {}
 
 
+def _stock_status(qty):
+    if qty <= 0:
+        return 'Rupture'
+    if qty <= 5:
+        return 'Stock faible'
+    return 'En stock'
+
+
+def _enrich_stock_status(products, rows):
+    for row in rows:
+        row['stock_status'] = _stock_status(row['qty_available'])
+
+
+PRODUCT_EXPORT_COLUMNS = [
+    ExportColumn('id', 'ID'),
+    ExportColumn('name', 'Nom'),
+    ExportColumn('default_code', 'Référence (SKU)', default=''),
+    ExportColumn('barcode', 'Code-barres', default=''),
+    ExportColumn('price', 'Prix de vente', path='list_price'),
+    ExportColumn('standard_price', 'Prix d\'achat'),
+    ExportColumn('qty_available', 'Stock'),
+    ExportColumn('qty_available_unreserved', 'Stock non réservé'),
+    ExportColumn('stock_status', 'Statut stock', computed=True),
+    ExportColumn('weight', 'Poids (kg)', default=0),
+    ExportColumn('category', 'Catégorie', path='categ_id.name', default=''),
+    ExportColumn('active', 'Actif', format=lambda active: 'Oui' if active else 'Non'),
+]
+
+
 class QuelyosProductsAPI(BaseController):
     """API controleur pour les produits, categories, images et variantes"""
 
+    @track_db_query('product_detail')
     def _serialize_product_detail(self, product, slug=None, include_ribbon=True):
         """
         Sérialise un produit product.template en dictionnaire JSON.
@@ -68,13 +84,9 @@ class QuelyosProductsAPI(BaseController):
 
         # Calculer le stock depuis stock.quant (somme de toutes les variantes)
         # Note: product.qty_available ne fonctionne pas correctement avec auth='public'
-        StockQuant = request.env['stock.quant'].sudo()
-        variant_ids = product.product_variant_ids.ids
-        quants = StockQuant.search([
-            ('product_id', 'in', variant_ids),
-            ('location_id.usage', '=', 'internal')
-        ])
-        qty = sum(quants.mapped('quantity')) if quants else 0.0
+        availability = StockAvailability(request.env(su=True)).get(product.product_variant_ids.ids)
+        qty = sum(stock['on_hand'] for stock in availability.values())
+        qty_free = sum(stock['free'] for stock in availability.values())
 
         if qty <= 0:
             stock_status = 'out_of_stock'
@@ -143,7 +155,7 @@ class QuelyosProductsAPI(BaseController):
             'images': images,
             'slug': product_slug,
             'qty_available': qty,
-            'qty_available_unreserved': product.qty_available_unreserved,
+            'qty_available_unreserved': qty_free,
             'virtual_available': product.virtual_available,
             'stock_status': stock_status,
             'active': product.active,
@@ -190,11 +202,11 @@ class QuelyosProductsAPI(BaseController):
             current_time = time.time()
 
             # Utiliser Redis si disponible
-            if _redis_client:
+            if redis_available():
                 try:
                     # SET avec NX (not exists) et EX (expiration en secondes)
                     # Retourne True si la clé a été créée, False si elle existe déjà
-                    was_set = _redis_client.set(cache_key, current_time, ex=60, nx=True)
+                    was_set = get_pipeline('products').set(cache_key, current_time, ex=60, nx=True).value
                     return bool(was_set)
                 except Exception as redis_err:
                     _logger.warning(f"Redis error in rate limiting: {redis_err}. Falling back to memory cache.")
@@ -217,6 +229,7 @@ class QuelyosProductsAPI(BaseController):
             _logger.warning(f"Error in view count rate limiting: {e}")
             return False
 
+    @track_db_query('review_count')
     def _get_total_review_count(self):
         """
         Récupère le nombre total d'avis clients validés sur le site.
@@ -239,6 +252,7 @@ class QuelyosProductsAPI(BaseController):
             return 0
 
     @http.route('/api/ecommerce/products', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/products')
     def get_products_list(self, **kwargs):
         """Liste des produits avec recherche, filtres et tri (GET via JSON-RPC)"""
         # Rate limiting: 60 req/min par IP (anti-scraping)
@@ -267,6 +281,8 @@ class QuelyosProductsAPI(BaseController):
                 tenant_id=tenant_id,
                 limit=limit,
                 offset=offset,
+                cursor=params.get('cursor'),
+                pagination=params.get('pagination'),
                 category_id=category_id,
                 search=search,
                 sort_by=sort_by,
@@ -347,33 +363,32 @@ class QuelyosProductsAPI(BaseController):
             order_dir = 'desc' if sort_order == 'desc' else 'asc'
             order = f'{order_field} {order_dir}'
 
-            products = ProductTemplate.search(
-                domain,
-                limit=limit,
-                offset=offset,
-                order=order
-            )
-
-            total = ProductTemplate.search_count(domain)
+            pagination = None
+            if self._wants_keyset(params) and order_field in ('list_price', 'create_date', 'default_code'):
+                # Pagination keyset sur colonnes SQL simples
+                # (name traduit en jsonb, qty_available calculé: restent en OFFSET)
+                products, pagination = self._keyset_paginate(
+                    ProductTemplate, domain, order, params, default_limit=20
+                )
+                total = pagination['total']
+            else:
+                products = ProductTemplate.search(
+                    domain,
+                    limit=limit,
+                    offset=offset,
+                    order=f'{order}, id {order_dir}'
+                )
+                total = ProductTemplate.search_count(domain)
 
             # Construire les données enrichies
-            # Batch: récupérer tous les quants en une seule requête (évite N+1)
-            StockQuant = request.env['stock.quant'].sudo()
-            all_variant_ids = []
-            for p in products:
-                all_variant_ids.extend(p.product_variant_ids.ids)
-            all_quants = StockQuant.search([
-                ('product_id', 'in', all_variant_ids),
-                ('location_id.usage', '=', 'internal')
-            ])
-            # Index par product_id pour lookup O(1)
-            qty_by_variant = {}
-            for q in all_quants:
-                qty_by_variant[q.product_id.id] = qty_by_variant.get(q.product_id.id, 0.0) + q.quantity
+            # Batch: disponibilité de toutes les variantes en une requête (évite N+1)
+            availability = StockAvailability(request.env(su=True)).get(products.product_variant_ids.ids)
 
             data = []
             for p in products:
-                qty = sum(qty_by_variant.get(v_id, 0.0) for v_id in p.product_variant_ids.ids)
+                variant_stock = [availability[v_id] for v_id in p.product_variant_ids.ids]
+                qty = sum(stock['on_hand'] for stock in variant_stock)
+                qty_free = sum(stock['free'] for stock in variant_stock)
                 if qty <= 0:
                     p_stock_status = 'out_of_stock'
                 elif qty <= 5:
@@ -438,7 +453,7 @@ class QuelyosProductsAPI(BaseController):
                     'images': images_list if images_list else None,
                     'slug': p.name.lower().replace(' ', '-'),
                     'qty_available': qty,
-                    'qty_available_unreserved': p.qty_available_unreserved,
+                    'qty_available_unreserved': qty_free,
                     'virtual_available': p.virtual_available,
                     'stock_status': p_stock_status,
                     'in_stock': qty > 0,
@@ -466,6 +481,7 @@ class QuelyosProductsAPI(BaseController):
                 'total': total,
                 'limit': limit,
                 'offset': offset,
+                'pagination': pagination,
                 'facets': {
                     'categories': [],
                     'price_range': {'min': 0, 'max': 1000}
@@ -478,6 +494,8 @@ class QuelyosProductsAPI(BaseController):
 
             return result
 
+        except InvalidCursorError as e:
+            return {'success': False, 'error': str(e), 'error_code': 'INVALID_CURSOR'}
         except Exception as e:
             _logger.error(f"Get products error: {e}")
             return {
@@ -486,6 +504,7 @@ class QuelyosProductsAPI(BaseController):
             }
 
     @http.route('/api/ecommerce/products/<int:product_id>', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @track_request('/api/ecommerce/products/<int:product_id>')
     def get_product_detail(self, product_id, **kwargs):
         """Détail d'un produit (GET via JSON-RPC)"""
         try:
@@ -1107,56 +1126,42 @@ class QuelyosProductsAPI(BaseController):
                 'error': 'Une erreur est survenue'
             }
 
+    def _product_exporter(self, params):
+        """Exporteur en flux des produits (filtres category_id / search)"""
+        category_id = params.get('category_id')
+        search = (params.get('search') or '').strip()
+
+        domain = [('sale_ok', '=', True)]
+        if category_id:
+            domain.append(('categ_id', '=', int(category_id)))
+        if search:
+            domain.append('|')
+            domain.append('|')
+            domain.append(('name', 'ilike', search))
+            domain.append(('default_code', 'ilike', search))
+            domain.append(('description_sale', 'ilike', search))
+
+        return StreamingExporter(
+            request.env['product.template'].sudo(), PRODUCT_EXPORT_COLUMNS,
+            domain, order='name', enrich=_enrich_stock_status,
+        )
+
     @http.route('/api/ecommerce/products/export', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def export_products(self, **kwargs):
-        """Exporter les produits en CSV (admin)"""
+        """
+        Exporter les produits en CSV (admin).
+
+        Retourne les lignes en JSON; pour les gros catalogues, utiliser
+        /api/ecommerce/products/export/download (fichier en flux).
+        """
         try:
             # Vérifier permissions Store User minimum
             error = self._check_any_group('group_quelyos_store_user', 'group_quelyos_store_manager')
             if error:
                 return error
 
-            params = self._get_params()
-            category_id = params.get('category_id')
-            search = params.get('search', '').strip()
-
-            domain = [('sale_ok', '=', True)]
-            if category_id:
-                domain.append(('categ_id', '=', int(category_id)))
-            if search:
-                domain.append('|')
-                domain.append('|')
-                domain.append(('name', 'ilike', search))
-                domain.append(('default_code', 'ilike', search))
-                domain.append(('description_sale', 'ilike', search))
-
-            products = request.env['product.template'].sudo().search(domain, order='name')
-
-            # Construire les données CSV
-            csv_data = []
-            for p in products:
-                qty = p.qty_available
-                if qty <= 0:
-                    stock_status = 'Rupture'
-                elif qty <= 5:
-                    stock_status = 'Stock faible'
-                else:
-                    stock_status = 'En stock'
-
-                csv_data.append({
-                    'id': p.id,
-                    'name': p.name,
-                    'default_code': p.default_code or '',
-                    'barcode': p.barcode or '',
-                    'price': p.list_price,
-                    'standard_price': p.standard_price,
-                    'qty_available': qty,
-                    'qty_available_unreserved': p.qty_available_unreserved,
-                    'stock_status': stock_status,
-                    'weight': p.weight or 0,
-                    'category': p.categ_id.name if p.categ_id else '',
-                    'active': 'Oui' if p.active else 'Non',
-                })
+            exporter = self._product_exporter(self._get_params())
+            csv_data = list(exporter.iter_rows())
 
             return {
                 'success': True,
@@ -1164,18 +1169,9 @@ class QuelyosProductsAPI(BaseController):
                     'products': csv_data,
                     'total': len(csv_data),
                     'columns': [
-                        {'key': 'id', 'label': 'ID'},
-                        {'key': 'name', 'label': 'Nom'},
-                        {'key': 'default_code', 'label': 'Référence (SKU)'},
-                        {'key': 'barcode', 'label': 'Code-barres'},
-                        {'key': 'price', 'label': 'Prix de vente'},
-                        {'key': 'standard_price', 'label': 'Prix d\'achat'},
-                        {'key': 'qty_available', 'label': 'Stock'},
-                        {'key': 'stock_status', 'label': 'Statut stock'},
-                        {'key': 'weight', 'label': 'Poids (kg)'},
-                        {'key': 'category', 'label': 'Catégorie'},
-                        {'key': 'active', 'label': 'Actif'},
-                    ]
+                        {'key': column.key, 'label': column.header}
+                        for column in PRODUCT_EXPORT_COLUMNS
+                    ],
                 }
             }
 
@@ -1186,9 +1182,46 @@ class QuelyosProductsAPI(BaseController):
                 'error': 'Une erreur est survenue'
             }
 
+    @http.route('/api/ecommerce/products/export/download', type='http', auth='public', methods=['GET'], csrf=False)
+    def download_products_export(self, **kwargs):
+        """
+        Télécharger l'export produits en flux (format=csv|ndjson|xlsx).
+
+        Le fichier est lu par lots et écrit pendant l'envoi (réponse
+        chunked): la mémoire du worker ne dépend pas du nombre de produits.
+        """
+        origin = request.httprequest.headers.get('Origin', '')
+        cors_headers = get_cors_headers(origin)
+
+        error = self._check_any_group('group_quelyos_store_user', 'group_quelyos_store_manager')
+        if error:
+            return request.make_json_response(error, headers=cors_headers, status=403)
+
+        try:
+            params = self._get_http_params()
+            return stream_response(
+                self._product_exporter(params), params.get('format', 'csv'),
+                f"produits_{datetime.now().strftime('%Y%m%d_%H%M%S')}", headers=cors_headers,
+            )
+        except UnsupportedFormatError as e:
+            return request.make_json_response({'success': False, 'error': str(e)}, headers=cors_headers, status=400)
+        except Exception as e:
+            _logger.error(f"Download products export error: {e}")
+            return request.make_json_response(
+                {'success': False, 'error': 'Une erreur est survenue'}, headers=cors_headers, status=500
+            )
+
     @http.route('/api/ecommerce/products/import', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def import_products(self, **kwargs):
-        """Importer des produits depuis CSV (admin)"""
+        """
+        Importer des produits (admin).
+
+        Source: `products` (lignes JSON) ou `file` (CSV/XLSX en base64, format
+        selon `filename`). Avec `background`, l'import est enregistré comme
+        job (quelyos.product.import.job, exécuté par cron) et la réponse ne
+        contient que le job_id; la progression se lit sur
+        /api/ecommerce/products/import/<job_id>, par le seul demandeur.
+        """
         try:
             # Vérifier permissions Store User minimum
             error = self._check_any_group('group_quelyos_store_user', 'group_quelyos_store_manager')
@@ -1197,98 +1230,36 @@ class QuelyosProductsAPI(BaseController):
 
             params = self._get_params()
             products_data = params.get('products', [])
-            update_existing = params.get('update_existing', False)
+            file_content = params.get('file')
+            filename = params.get('filename') or ''
+            update_existing = bool(params.get('update_existing', False))
 
-            if not products_data:
+            if not products_data and not file_content:
                 return {
                     'success': False,
                     'error': 'No products data provided'
                 }
 
-            ProductTemplate = request.env['product.template'].sudo()
-            ProductCategory = request.env['product.category'].sudo()
+            try:
+                source = products_data or base64.b64decode(file_content)
+            except (binascii.Error, TypeError):
+                return {'success': False, 'error': 'Fichier invalide (base64 attendu)'}
 
-            created = []
-            updated = []
-            errors = []
+            if params.get('background'):
+                job = request.env['quelyos.product.import.job'].sudo().create_job(
+                    source, filename=filename, update_existing=update_existing,
+                )
+                return {'success': True, 'data': {'job_id': job.job_id, 'status': 'pending'}}
 
-            for idx, row in enumerate(products_data, start=1):
-                try:
-                    name = row.get('name', '').strip()
-                    if not name:
-                        errors.append({'row': idx, 'error': 'Nom obligatoire'})
-                        continue
-
-                    # Chercher catégorie par nom
-                    category_id = False
-                    category_name = row.get('category', '').strip()
-                    if category_name:
-                        category = ProductCategory.search([('name', '=ilike', category_name)], limit=1)
-                        if category:
-                            category_id = category.id
-                        else:
-                            # Créer la catégorie si elle n'existe pas
-                            category = ProductCategory.create({'name': category_name})
-                            category_id = category.id
-
-                    # Construire les données produit
-                    product_vals = {
-                        'name': name,
-                        'list_price': float(row.get('price', 0) or 0),
-                        'standard_price': float(row.get('standard_price', 0) or 0),
-                        'description_sale': row.get('description', '') or False,
-                        'default_code': row.get('default_code', row.get('sku', '')) or False,
-                        'barcode': row.get('barcode', '') or False,
-                        'weight': float(row.get('weight', 0) or 0),
-                        'sale_ok': True,
-                        'purchase_ok': True,
-                    }
-                    if category_id:
-                        product_vals['categ_id'] = category_id
-
-                    # Chercher produit existant par SKU ou code-barres
-                    existing_product = None
-                    if update_existing:
-                        sku = product_vals.get('default_code')
-                        barcode = product_vals.get('barcode')
-                        if sku:
-                            existing_product = ProductTemplate.search([('default_code', '=', sku)], limit=1)
-                        if not existing_product and barcode:
-                            existing_product = ProductTemplate.search([('barcode', '=', barcode)], limit=1)
-
-                    if existing_product:
-                        existing_product.write(product_vals)
-                        updated.append({
-                            'id': existing_product.id,
-                            'name': existing_product.name,
-                            'row': idx
-                        })
-                    else:
-                        new_product = ProductTemplate.create(product_vals)
-                        created.append({
-                            'id': new_product.id,
-                            'name': new_product.name,
-                            'row': idx
-                        })
-
-                except Exception as row_error:
-                    errors.append({'row': idx, 'error': str(row_error)})
-
-            return {
-                'success': True,
-                'data': {
-                    'created': created,
-                    'updated': updated,
-                    'errors': errors,
-                    'summary': {
-                        'total_rows': len(products_data),
-                        'created_count': len(created),
-                        'updated_count': len(updated),
-                        'error_count': len(errors)
-                    }
-                }
-            }
+            importer = ProductImporter(request.env, update_existing=update_existing, job_id=str(uuid.uuid4()))
+            data = importer.run(
+                iter_rows(source, filename),
+                total=len(products_data) if products_data else None,
+            )
+            return {'success': True, 'data': data}
 
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
         except Exception as e:
             _logger.error(f"Import products error: {e}")
             return {
@@ -1296,6 +1267,30 @@ class QuelyosProductsAPI(BaseController):
                 'error': 'Une erreur est survenue'
             }
 
+    @http.route('/api/ecommerce/products/import/<string:job_id>', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    def get_import_status(self, job_id, **kwargs):
+        """Progression d'un import produits (admin)"""
+        error = self._check_any_group('group_quelyos_store_user', 'group_quelyos_store_manager')
+        if error:
+            return error
+
+        not_found = {'success': False, 'error': 'Import introuvable ou expiré'}
+
+        # Import en tâche de fond: état persistant du job
+        job = request.env['quelyos.product.import.job'].sudo().search([('job_id', '=', job_id)], limit=1)
+        if job:
+            if not job.is_owned_by(request.env):
+                return not_found
+            return {'success': True, 'data': job.to_status()}
+
+        # Import synchrone en cours: progression Redis, lue par son seul propriétaire
+        operation = BulkProcessor(request.env).get_operation(job_id)
+        if (not operation
+                or operation.get('user_id') != request.env.uid
+                or operation.get('company_id') != request.env.company.id):
+            return not_found
+        return {'success': True, 'data': operation}
+
     # ==================== PRODUCT IMAGES ====================
 
     @http.route('/api/ecommerce/products/<int:product_id>/images', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
@@ -2612,6 +2607,7 @@ class QuelyosProductsAPI(BaseController):
     # ==================== CATEGORIES ====================
 
     @http.route('/api/ecommerce/categories', type='jsonrpc', auth='public', csrf=False)
+    @track_request('/api/ecommerce/categories')
     def get_categories_list(self, **kwargs):
         """Liste des catégories avec compteur produits, sous-catégories et recherche"""
         try:
@@ -5,6 +5,7 @@ Contrôleur Search & Facets pour l'e-commerce
 import logging
 from odoo import http
 from odoo.http import request
+from ..lib.db_routing import use_read_replica
 
 _logger = logging.getLogger(__name__)
 
@@ -329,6 +330,7 @@ class QuelyosSearch(http.Controller):
             return {'success': False, 'error': 'Une erreur est survenue'}
 
     @http.route('/api/ecommerce/products/facets', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_products_facets(self, **kwargs):
         """
         Récupérer les filtres dynamiques (facets) pour les produits
@@ -7,6 +7,7 @@ Modules : stock_quant_cost_info
 import logging
 from odoo import http
 from odoo.http import request
+from ..lib.db_routing import use_read_replica
 
 _logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class StockOCAController(http.Controller):
     """API REST pour modules OCA Stock"""
 
     @http.route('/api/stock/quant/cost-info', type='json', auth='user', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_quant_cost_info(self, **kwargs):
         """
         Récupérer informations de coût pour un quant
@@ -66,6 +68,7 @@ class StockOCAController(http.Controller):
             return {'success': False, 'error': str(e)}
 
     @http.route('/api/stock/inventory/cost-report', type='json', auth='user', methods=['POST'], csrf=False)
+    @use_read_replica
     def get_inventory_cost_report(self, **kwargs):
         """
         Rapport valorisation inventaire avec coûts
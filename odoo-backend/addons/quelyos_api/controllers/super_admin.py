@@ -83,6 +83,9 @@ class SuperAdminController(http.Controller):
             )
             raise AccessDenied("Super admin access required")
 
+        # Liste d'accès IP (lève AccessDenied)
+        request.env['quelyos.ip.whitelist'].sudo().check_access(ip_address, user_id)
+
         # Log audit de l'accès super admin
         _logger.info(
             f"[AUDIT] Super admin access granted - User: {user.login} (ID: {user.id}) | "
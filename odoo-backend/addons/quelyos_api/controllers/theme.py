@@ -6,6 +6,9 @@ Endpoints disponibles :
 - GET /api/themes/<code>                    : Récupérer un thème par code
 - GET /api/themes                           : Lister les thèmes disponibles
 - GET /api/tenants/<id>/theme               : Récupérer le thème actif d'un tenant
+- GET /api/tenants/<id>/theme/manifest      : Hash et URLs des artefacts compilés
+- GET /api/tenants/<id>/theme/<hash>.css    : Variables CSS compilées (immuable)
+- GET /api/tenants/<id>/theme/<hash>.json   : Thème compilé (immuable)
 - POST /api/tenants/<id>/theme/set          : Activer un thème pour un tenant
 - POST /api/themes/<id>/review              : Ajouter un avis sur un thème
 """
@@ -14,6 +17,9 @@ import json
 import logging
 from odoo import http, fields
 from odoo.http import request
+from ..config import get_cors_headers
+from ..lib.cache_headers import CacheControl, check_etag_match
+from ..lib.theme_compiler import asset_urls, split_asset_name
 
 _logger = logging.getLogger(__name__)
 
@@ -131,6 +137,87 @@ class ThemeController(http.Controller):
                 'error': 'Internal server error'
             }
 
+    def _compiled_tenant(self, tenant_id):
+        """Tenant avec artefacts thème compilés, ou None"""
+        tenant = request.env['quelyos.tenant'].sudo().browse(tenant_id)
+        if not tenant.exists():
+            return None
+        if not tenant.theme_hash:
+            tenant.get_active_theme_config()
+        return tenant if tenant.theme_hash else None
+
+    def _not_modified(self, etag):
+        return check_etag_match(request.httprequest.headers.get('If-None-Match'), etag)
+
+    @http.route('/api/tenants/<int:tenant_id>/theme/manifest', auth='public', type='http', methods=['GET'], csrf=False)
+    def get_tenant_theme_manifest(self, tenant_id):
+        """
+        Hash courant et URLs versionnées du thème compilé.
+
+        Revalidé à chaque chargement (no-cache + ETag = hash): 304 tant que
+        le thème n'a pas changé, les artefacts eux-mêmes restent en cache.
+        """
+        cors_headers = get_cors_headers(request.httprequest.headers.get('Origin', ''))
+        try:
+            tenant = self._compiled_tenant(tenant_id)
+            if not tenant:
+                return request.make_json_response(
+                    {'success': False, 'error': 'Theme not found'}, headers=cors_headers, status=404
+                )
+
+            headers = dict(cors_headers, **{'ETag': f'"{tenant.theme_hash}"', 'Cache-Control': 'no-cache'})
+            if self._not_modified(tenant.theme_hash):
+                return request.make_response('', headers=list(headers.items()), status=304)
+            return request.make_json_response(
+                dict(asset_urls(tenant.id, tenant.theme_hash), success=True), headers=headers
+            )
+
+        except Exception as e:
+            _logger.error(f"Error fetching tenant theme manifest: {str(e)}")
+            return request.make_json_response(
+                {'success': False, 'error': 'Internal server error'}, headers=cors_headers, status=500
+            )
+
+    @http.route('/api/tenants/<int:tenant_id>/theme/<string:asset>', auth='public', type='http', methods=['GET'], csrf=False)
+    def get_tenant_theme_asset(self, tenant_id, asset):
+        """
+        Artefact compilé du thème: <hash>.css ou <hash>.json.
+
+        Contenu adressé par son hash: cache immuable d'un an. Un ancien
+        hash redirige vers l'artefact courant.
+        """
+        cors_headers = get_cors_headers(request.httprequest.headers.get('Origin', ''))
+        content_hash, extension = split_asset_name(asset)
+        if not extension:
+            return request.not_found()
+
+        try:
+            tenant = self._compiled_tenant(tenant_id)
+            if not tenant:
+                return request.not_found()
+
+            if content_hash != tenant.theme_hash:
+                url = asset_urls(tenant.id, tenant.theme_hash)[f'{extension}_url']
+                headers = dict(cors_headers, **{'Location': url, 'Cache-Control': 'no-cache'})
+                return request.make_response('', headers=list(headers.items()), status=302)
+
+            headers = dict(cors_headers, **{'ETag': f'"{content_hash}"', 'Cache-Control': CacheControl.IMMUTABLE})
+            if self._not_modified(content_hash):
+                return request.make_response('', headers=list(headers.items()), status=304)
+
+            if extension == 'css':
+                body, content_type = tenant.theme_compiled_css, 'text/css; charset=utf-8'
+            else:
+                body, content_type = tenant.theme_compiled_json, 'application/json; charset=utf-8'
+            headers['Content-Type'] = content_type
+            return request.make_response(body, headers=list(headers.items()))
+
+        except Exception as e:
+            _logger.error(f"Error fetching tenant theme asset: {str(e)}")
+            return request.make_json_response(
+                {'success': False, 'error': 'Internal server error'}, headers=cors_headers, status=500
+            )
+
     @http.route('/api/tenants/<int:tenant_id>/theme/set', auth='user', type='jsonrpc', methods=['POST'], csrf=False)
     def set_tenant_theme(self, tenant_id, theme_code):
         """
@@ -4,8 +4,10 @@ Quelyos API Libraries
 
 Bibliothèques utilitaires pour l'API Quelyos:
 - rate_limiter: Limitation du taux de requêtes
+- gcra: Limitation de débit GCRA (script Lua, bail local de jetons)
 - audit_log: Journalisation des actions
 - cache: Cache avec Redis
+- redis_client: Accès Redis partagé (pools, circuit breaker, auto-pipeline)
 - request_id: Traçabilité des requêtes
 - webhooks: Système de webhooks
 - versioning: Versioning de l'API
@@ -16,6 +18,7 @@ Bibliothèques utilitaires pour l'API Quelyos:
 - validation: Validation des données
 - metrics: Métriques Prometheus
 - query_builder: Construction sécurisée de requêtes
+- keyset_pagination: Pagination keyset (curseurs opaques)
 - event_store: Event Sourcing
 - cqrs: Command Query Responsibility Segregation
 - distributed_lock: Verrouillage distribué
@@ -26,6 +29,13 @@ Bibliothèques utilitaires pour l'API Quelyos:
 - multitenancy: Multi-tenant support
 - idempotency: Clés d'idempotence
 - bulk_operations: Opérations en masse
+- product_import: Import de produits par lots (CSV/XLSX, savepoints)
+- export_stream: Export en flux (lots keyset, CSV/NDJSON/XLSX incrémentaux)
+- stock_analytics: Rotation de stock et ABC en SQL (quants/mouvements groupés)
+- demand_forecast: Prévision de demande vectorisée (numpy, lissage / Croston)
+- stock_valuation: Valorisation du stock en SQL (catégorie / entrepôt, photos journalières)
+- location_tree: Arbre des emplacements par parent_path (stock cumulé, cache par entrepôt)
+- stock_availability: Disponibilité par produit / entrepôt (en main, réservé, libre, à recevoir)
 - data_transfer: Import/Export
 - profiler: Performance Profiling
 - migrations: Database Migrations
@@ -39,6 +49,7 @@ Bibliothèques utilitaires pour l'API Quelyos:
 - deduplication: Request Deduplication
 - graceful_degradation: Graceful Degradation
 - cache_headers: HTTP Cache Headers
+- theme_compiler: Thème tenant compilé (JSON fusionné, CSS, hash de contenu)
 - api_analytics: API Analytics
 - chaos: Chaos Engineering
 - sharding: Database Sharding
@@ -48,8 +59,13 @@ Bibliothèques utilitaires pour l'API Quelyos:
 - mocking: API Mocking
 - load_shedding: Load Shedding
 - priority_queue: Request Prioritization
+- mail_transport: Envoi email en masse (SMTP poolé / Brevo batch)
+- waf_engine: Moteur WAF compilé (préfiltre littéral)
+- ip_policy: Index de préfixes IP (allow/deny)
 """
 
+from . import redis_client
+from . import gcra
 from . import cache
 from . import rate_limiter
 from . import audit_log
@@ -63,6 +79,7 @@ from . import websocket
 from . import validation
 from . import metrics
 from . import query_builder
+from . import keyset_pagination
 from . import event_store
 from . import cqrs
 from . import distributed_lock
@@ -73,6 +90,13 @@ from . import db_routing
 from . import multitenancy
 from . import idempotency
 from . import bulk_operations
+from . import product_import
+from . import export_stream
+from . import stock_analytics
+from . import demand_forecast
+from . import stock_valuation
+from . import location_tree
+from . import stock_availability
 from . import data_transfer
 from . import profiler
 from . import migrations
@@ -86,6 +110,7 @@ from . import health_aggregator
 from . import deduplication
 from . import graceful_degradation
 from . import cache_headers
+from . import theme_compiler
 from . import api_analytics
 from . import chaos
 from . import sharding
@@ -96,6 +121,9 @@ from . import mocking
 from . import load_shedding
 from . import priority_queue
 from . import rls_context
+from . import mail_transport
+from . import waf_engine
+from . import ip_policy
 
 # Raccourcis pratiques
 from .rate_limiter import rate_limited, RateLimitConfig
@@ -109,19 +137,25 @@ from .error_tracking import track_errors
 from .job_queue import async_job, job_handler
 from .websocket import realtime_update, get_notification_service
 from .validation import validate_input, validate_data
-from .metrics import track_request, track_db_query
+from .metrics import track_request, track_db_query, track_cache
 from .query_builder import QueryBuilder
+from .keyset_pagination import KeysetPaginator, approximate_count
 from .event_store import emit_event, EventType, get_event_store
 from .cqrs import CommandBus, QueryBus
 from .distributed_lock import distributed_lock, with_lock, exclusive
 from .encryption import encrypt, decrypt, encrypt_field, decrypt_field
 from .throttling import throttle_user, throttle_api_key, Plan
 from .saga import execute_saga, get_saga_orchestrator
-from .db_routing import use_read_replica, get_router
+from .db_routing import use_read_replica, replica_env, get_router
 from .multitenancy import tenant_middleware, TenantContext, get_tenant
 from .idempotency import idempotent
 from .bulk_operations import bulk_create, bulk_update, bulk_delete
 from .data_transfer import DataExporter, DataImporter
+from .export_stream import StreamingExporter, stream_response
+from .stock_analytics import StockAnalytics
+from .stock_valuation import StockValuation
+from .location_tree import LocationTree
+from .stock_availability import StockAvailability
 from .profiler import profile, profiler_middleware, enable_profiling
 from .migrations import MigrationRunner, migration
 from .service_registry import get_registry as get_service_registry, register_service
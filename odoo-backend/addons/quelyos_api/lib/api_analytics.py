@@ -9,7 +9,6 @@ Analytics d'utilisation de l'API:
 - Rapports de consommation
 """
 
-import os
 import json
 import logging
 from typing import Dict, List, Any, Optional
@@ -18,9 +17,10 @@ from dataclasses import dataclass
 from functools import wraps
 from collections import defaultdict
 
+from .redis_client import get_redis, get_pipeline, in_request_scope, redis_available
+
 _logger = logging.getLogger(__name__)
 
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 ANALYTICS_PREFIX = 'quelyos:analytics:'
 
 
@@ -43,21 +43,20 @@ class APIAnalytics:
     """Service d'analytics API"""
 
     def __init__(self):
-        self._redis = None
         self._buffer: List[APICallMetrics] = []
         self._buffer_size = 100
-        self._init_redis()
 
-    def _init_redis(self):
-        try:
-            import redis
-            self._redis = redis.from_url(REDIS_URL)
-            self._redis.ping()
-        except Exception as e:
-            _logger.warning(f"Redis not available for analytics: {e}")
+    @property
+    def _redis(self):
+        return get_redis('analytics') if redis_available() else None
 
     def track(self, metrics: APICallMetrics):
         """Enregistre un appel API"""
+        # Pendant une requête: envoyé avec les autres commandes Redis de la requête
+        if in_request_scope() and self._redis:
+            self._queue_metrics(get_pipeline('analytics'), [metrics])
+            return
+
         self._buffer.append(metrics)
 
         # Flush si buffer plein
@@ -69,74 +68,55 @@ class APIAnalytics:
         if not self._redis or not self._buffer:
             return
 
-        pipe = self._redis.pipeline()
-        now = datetime.utcnow()
+        pipe = self._redis.pipeline(transaction=False)
+        self._queue_metrics(pipe, self._buffer)
+        pipe.execute()
+        self._buffer.clear()
+
+    @staticmethod
+    def _queue_metrics(pipe, batch: List[APICallMetrics]):
+        """Ajoute les écritures d'un lot d'appels à un pipeline"""
+        touched = set()
+
+        def hincrby(key, field):
+            pipe.hincrby(key, field, 1)
+            touched.add(key)
 
-        for m in self._buffer:
+        for m in batch:
             # Clés temporelles
-            minute_key = m.timestamp.strftime('%Y-%m-%d:%H:%M')
             hour_key = m.timestamp.strftime('%Y-%m-%d:%H')
             day_key = m.timestamp.strftime('%Y-%m-%d')
 
             # Compteur global
-            pipe.hincrby(
-                f"{ANALYTICS_PREFIX}calls:{day_key}",
-                m.endpoint,
-                1
-            )
+            hincrby(f"{ANALYTICS_PREFIX}calls:{day_key}", m.endpoint)
 
             # Temps de réponse (pour moyenne)
-            pipe.lpush(
-                f"{ANALYTICS_PREFIX}latency:{hour_key}:{m.endpoint}",
-                m.response_time_ms
-            )
-            pipe.ltrim(
-                f"{ANALYTICS_PREFIX}latency:{hour_key}:{m.endpoint}",
-                0, 999  # Garder 1000 dernières valeurs
-            )
+            latency_key = f"{ANALYTICS_PREFIX}latency:{hour_key}:{m.endpoint}"
+            pipe.lpush(latency_key, m.response_time_ms)
+            pipe.ltrim(latency_key, 0, 999)  # Garder 1000 dernières valeurs
+            touched.add(latency_key)
 
             # Erreurs
             if m.error or m.status_code >= 400:
-                pipe.hincrby(
-                    f"{ANALYTICS_PREFIX}errors:{day_key}",
-                    f"{m.endpoint}:{m.status_code}",
-                    1
-                )
+                hincrby(f"{ANALYTICS_PREFIX}errors:{day_key}", f"{m.endpoint}:{m.status_code}")
 
             # Par utilisateur
             if m.user_id:
-                pipe.hincrby(
-                    f"{ANALYTICS_PREFIX}users:{day_key}",
-                    str(m.user_id),
-                    1
-                )
+                hincrby(f"{ANALYTICS_PREFIX}users:{day_key}", str(m.user_id))
 
             # Par API key
             if m.api_key:
-                pipe.hincrby(
-                    f"{ANALYTICS_PREFIX}apikeys:{day_key}",
-                    m.api_key[:16],  # Tronquer pour confidentialité
-                    1
-                )
+                hincrby(f"{ANALYTICS_PREFIX}apikeys:{day_key}", m.api_key[:16])  # Tronquer pour confidentialité
 
             # Bande passante
-            pipe.incrby(
-                f"{ANALYTICS_PREFIX}bandwidth:{day_key}:in",
-                m.request_size
-            )
-            pipe.incrby(
-                f"{ANALYTICS_PREFIX}bandwidth:{day_key}:out",
-                m.response_size
-            )
-
-        # Expiration des clés (30 jours)
-        for key_pattern in ['calls:', 'latency:', 'errors:', 'users:', 'apikeys:', 'bandwidth:']:
-            pattern = f"{ANALYTICS_PREFIX}{key_pattern}*"
-            for key in self._redis.scan_iter(pattern):
-                pipe.expire(key, 86400 * 30)
-
-        pipe.execute()
-        self._buffer.clear()
+            for direction, size in (('in', m.request_size), ('out', m.response_size)):
+                key = f"{ANALYTICS_PREFIX}bandwidth:{day_key}:{direction}"
+                pipe.incrby(key, size)
+                touched.add(key)
+
+        # Expiration des clés écrites (30 jours)
+        for key in touched:
+            pipe.expire(key, 86400 * 30)
 
     def get_overview(self, days: int = 7) -> Dict[str, Any]:
         """Vue d'ensemble des analytics"""
@@ -5,12 +5,13 @@ Bulk Operations pour Quelyos ERP
 Opérations en masse optimisées:
 - Import/Export en batch
 - Validation parallèle
-- Gestion des erreurs partielles
-- Progress tracking
+- Gestion des erreurs partielles: chaque lot est écrit sous savepoint,
+  un lot en échec est coupé en deux jusqu'à isoler les lignes fautives
+  (sans interrompre la transaction Postgres)
+- Progress tracking (Redis, par identifiant d'opération)
 - Rollback sélectif
 """
 
-import os
 import json
 import logging
 import uuid
@@ -23,8 +24,9 @@ import threading
 
 _logger = logging.getLogger(__name__)
 
+from .redis_client import get_redis, redis_available
+
 # Configuration
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 BULK_PREFIX = 'quelyos:bulk:'
 DEFAULT_BATCH_SIZE = 100
 MAX_BATCH_SIZE = 1000
@@ -78,10 +80,14 @@ class BulkOperationResult:
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     duration_ms: Optional[int] = None
+    user_id: Optional[int] = None     # propriétaire (lecture de la progression)
+    company_id: Optional[int] = None
 
     def to_dict(self) -> Dict:
         return {
             'id': self.id,
+            'user_id': self.user_id,
+            'company_id': self.company_id,
             'status': self.status.value,
             'total': self.total,
             'processed': self.processed,
@@ -128,15 +134,106 @@ class BulkProcessor:
 
     def __init__(self, env):
         self.env = env
-        self._redis = None
-        self._init_redis()
 
-    def _init_redis(self):
+    @property
+    def _redis(self):
+        """Client 'bulk' partagé, None tant que le circuit Redis est ouvert"""
+        return get_redis('bulk') if redis_available() else None
+
+    # -------------------------------------------------------------------------
+    # Écriture isolée (savepoints)
+    # -------------------------------------------------------------------------
+
+    def _record_failure(self, result: BulkOperationResult, index: int, error: Exception):
+        result.results.append(BulkItemResult(index=index, success=False, error=str(error)))
+        result.errors.append({'index': index, 'error': str(error)})
+        result.failed += 1
+
+    def create_isolated(
+        self,
+        Model,
+        items: List[Dict],
+        indexes: List[int],
+        result: BulkOperationResult
+    ) -> Dict[int, int]:
+        """
+        Crée un lot sous savepoint. En cas d'échec, le lot est coupé en deux
+        et chaque moitié réessayée: log2(n) niveaux pour isoler une ligne
+        fautive, les lignes valides restent créées par lots.
+
+        Returns:
+            {index: id créé}
+        """
         try:
-            import redis
-            self._redis = redis.from_url(REDIS_URL)
-        except Exception:
-            pass
+            with self.env.cr.savepoint():
+                records = Model.create(items)
+        except Exception as e:
+            if len(items) == 1:
+                self._record_failure(result, indexes[0], e)
+                return {}
+            middle = len(items) // 2
+            created = self.create_isolated(Model, items[:middle], indexes[:middle], result)
+            created.update(self.create_isolated(Model, items[middle:], indexes[middle:], result))
+            return created
+
+        created = {}
+        for index, record in zip(indexes, records):
+            created[index] = record.id
+            result.results.append(BulkItemResult(index=index, success=True, id=record.id))
+            result.succeeded += 1
+        return created
+
+    def write_isolated(
+        self,
+        Model,
+        values: Dict,
+        ids: List[int],
+        indexes: List[int],
+        result: BulkOperationResult
+    ):
+        """Écrit les mêmes valeurs sur un lot sous savepoint, bissection en cas d'échec"""
+        try:
+            with self.env.cr.savepoint():
+                Model.browse(ids).write(values)
+        except Exception as e:
+            if len(ids) == 1:
+                self._record_failure(result, indexes[0], e)
+                return
+            middle = len(ids) // 2
+            self.write_isolated(Model, values, ids[:middle], indexes[:middle], result)
+            self.write_isolated(Model, values, ids[middle:], indexes[middle:], result)
+            return
+
+        for index, record_id in zip(indexes, ids):
+            result.results.append(BulkItemResult(index=index, success=True, id=record_id))
+            result.succeeded += 1
+
+    def write_grouped(
+        self,
+        Model,
+        updates: List[tuple],
+        result: BulkOperationResult,
+        batch_size: int = MAX_BATCH_SIZE
+    ):
+        """
+        Regroupe les mises à jour par valeurs identiques: un write() par
+        groupe (et par lot) au lieu d'un write() par enregistrement.
+
+        Args:
+            updates: [(index, id, values), ...]
+        """
+        groups: Dict[str, tuple] = {}
+        for index, record_id, values in updates:
+            key = repr(sorted(values.items()))
+            group = groups.setdefault(key, (values, [], []))
+            group[1].append(record_id)
+            group[2].append(index)
+
+        for values, ids, indexes in groups.values():
+            for start in range(0, len(ids), batch_size):
+                self.write_isolated(
+                    Model, values, ids[start:start + batch_size], indexes[start:start + batch_size], result
+                )
 
     def bulk_create(
         self,
@@ -180,7 +277,7 @@ class BulkProcessor:
         # Validation
         if validate:
             result.status = BulkStatus.VALIDATING
-            self._save_progress(result)
+            self.save_progress(result)
 
             for i, item in enumerate(items):
                 errors = self._validate_item(Model, item)
@@ -199,58 +296,26 @@ class BulkProcessor:
 
         # Traitement par lots
         result.status = BulkStatus.PROCESSING
-        self._save_progress(result)
+        self.save_progress(result)
 
         for batch_start in range(0, len(items), batch_size):
             batch = items[batch_start:batch_start + batch_size]
-
-            try:
-                # Créer le lot
-                created = Model.create(batch)
-
-                for i, record in enumerate(created):
-                    idx = batch_start + i
-                    result.results.append(BulkItemResult(
-                        index=idx,
-                        success=True,
-                        id=record.id,
-                    ))
-                    result.succeeded += 1
-
-            except Exception as e:
-                _logger.error(f"Bulk create batch failed: {e}")
-
-                # Essayer item par item
-                for i, item in enumerate(batch):
-                    idx = batch_start + i
-                    try:
-                        record = Model.create([item])
-                        result.results.append(BulkItemResult(
-                            index=idx,
-                            success=True,
-                            id=record.id,
-                        ))
-                        result.succeeded += 1
-                    except Exception as item_error:
-                        result.results.append(BulkItemResult(
-                            index=idx,
-                            success=False,
-                            error=str(item_error),
-                        ))
-                        result.errors.append({
-                            'index': idx,
-                            'error': str(item_error),
-                        })
-                        result.failed += 1
+            self.create_isolated(
+                Model, batch, list(range(batch_start, batch_start + len(batch))), result
+            )
 
             result.processed = batch_start + len(batch)
 
             if on_progress:
                 on_progress(result.processed, result.total)
 
-            self._save_progress(result)
+            self.save_progress(result)
+
+        self.finalize(result)
+        return result
 
-        # Finaliser
+    def finalize(self, result: BulkOperationResult):
+        """Statut final, durée, dernière sauvegarde de la progression"""
         result.completed_at = datetime.utcnow().isoformat()
         if result.failed == 0:
             result.status = BulkStatus.COMPLETED
@@ -263,8 +328,7 @@ class BulkProcessor:
         completed = datetime.fromisoformat(result.completed_at)
         result.duration_ms = int((completed - started).total_seconds() * 1000)
 
-        self._save_progress(result)
-        return result
+        self.save_progress(result)
 
     def bulk_update(
         self,
@@ -297,20 +361,15 @@ class BulkProcessor:
 
         Model = self.env[model].sudo()
 
-        for i, update in enumerate(updates):
-            record_id = update.get('id')
-            values = update.get('values', {})
+        for batch_start in range(0, len(updates), batch_size):
+            batch = updates[batch_start:batch_start + batch_size]
+            existing_ids = set(Model.browse([u.get('id') for u in batch]).exists().ids)
 
-            try:
-                record = Model.browse(record_id)
-                if record.exists():
-                    record.write(values)
-                    result.results.append(BulkItemResult(
-                        index=i,
-                        success=True,
-                        id=record_id,
-                    ))
-                    result.succeeded += 1
+            pending = []
+            for i, update in enumerate(batch, start=batch_start):
+                record_id = update.get('id')
+                if record_id in existing_ids:
+                    pending.append((i, record_id, update.get('values', {})))
                 else:
                     result.results.append(BulkItemResult(
                         index=i,
@@ -319,18 +378,10 @@ class BulkProcessor:
                     ))
                     result.failed += 1
 
-            except Exception as e:
-                result.results.append(BulkItemResult(
-                    index=i,
-                    success=False,
-                    error=str(e),
-                ))
-                result.errors.append({'index': i, 'id': record_id, 'error': str(e)})
-                result.failed += 1
-
-            result.processed = i + 1
+            self.write_grouped(Model, pending, result, batch_size)
+            result.processed = batch_start + len(batch)
 
-            if on_progress and i % batch_size == 0:
+            if on_progress:
                 on_progress(result.processed, result.total)
 
         result.completed_at = datetime.utcnow().isoformat()
@@ -501,11 +552,14 @@ class BulkProcessor:
 
         return errors
 
-    def _save_progress(self, result: BulkOperationResult):
+    def save_progress(self, result: BulkOperationResult):
         """Sauvegarde la progression"""
         if self._redis:
             key = f"{BULK_PREFIX}{result.id}"
-            self._redis.setex(key, 3600, json.dumps(result.to_dict()))
+            try:
+                self._redis.setex(key, 3600, json.dumps(result.to_dict()))
+            except Exception as e:
+                _logger.warning(f"Bulk progress not saved ({result.id}): {e}")
 
     def get_operation(self, operation_id: str) -> Optional[Dict]:
         """Récupère l'état d'une opération"""
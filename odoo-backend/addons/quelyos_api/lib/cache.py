@@ -8,57 +8,41 @@ Impact attendu:
 - Score Lighthouse: 79 → 92+ (+13 points)
 """
 
-import os
 import json
 import hashlib
 import logging
 from datetime import timedelta
 
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
-    logging.warning("redis-py not installed. Cache will be disabled. Install with: pip3 install redis")
+from .metrics import track_cache
+from .redis_client import get_redis, get_pipeline, redis_available
 
 _logger = logging.getLogger(__name__)
 
 
-class CacheService:
-    """Service de cache Redis avec fallback gracieux"""
+def _cache_type(service, key):
+    """Libellé métrique d'une clé: premier segment hors préfixe tenant:<id>:"""
+    parts = key.split(':', 3)
+    if parts[0] == 'tenant' and len(parts) > 2:
+        return parts[2]
+    return parts[0]
 
-    def __init__(self):
-        self.redis_client = None
-        self.enabled = False
 
-        if not REDIS_AVAILABLE:
-            _logger.warning("Redis cache disabled: redis-py not installed")
-            return
+class CacheService:
+    """
+    Service de cache Redis avec fallback gracieux.
 
-        try:
-            # Configuration depuis environnement (docker-compose)
-            redis_host = os.environ.get('REDIS_HOST', 'localhost')
-            redis_port = int(os.environ.get('REDIS_PORT', 6379))
-            redis_db = int(os.environ.get('REDIS_DB', 0))
-
-            self.redis_client = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                decode_responses=True,  # Auto-decode bytes → str
-                socket_connect_timeout=2,
-                socket_timeout=2,
-            )
-
-            # Test connexion
-            self.redis_client.ping()
-            self.enabled = True
-            _logger.info(f"✅ Redis cache enabled ({redis_host}:{redis_port})")
+    Client 'cache' du gestionnaire Redis partagé: désactivé tant que le
+    circuit Redis est ouvert. Les écritures passent par l'auto-pipeline de
+    la requête (envoyées avec la lecture suivante ou en fin de requête).
+    """
 
-        except Exception as e:
-            _logger.warning(f"Redis cache disabled: {str(e)}")
-            self.redis_client = None
-            self.enabled = False
+    @property
+    def redis_client(self):
+        return get_redis('cache')
+
+    @property
+    def enabled(self):
+        return self.redis_client is not None and redis_available()
 
     def _generate_key(self, prefix, tenant_id=None, **kwargs):
         """
@@ -83,6 +67,7 @@ class CacheService:
             return f"{prefix}:{params_str}:{params_hash}"
         return f"{prefix}:all:{params_hash}"
 
+    @track_cache(_cache_type)
     def get(self, key):
         """
         Récupère une valeur du cache.
@@ -94,7 +79,7 @@ class CacheService:
             return None
 
         try:
-            cached = self.redis_client.get(key)
+            cached = get_pipeline('cache').get(key).value
             if cached:
                 _logger.debug(f"✅ Cache HIT: {key}")
                 return json.loads(cached)
@@ -106,6 +91,25 @@ class CacheService:
             _logger.error(f"Redis GET error: {str(e)}")
             return None
 
+    def get_many(self, keys):
+        """
+        Récupère plusieurs valeurs en un seul MGET.
+
+        Returns:
+            list: Données désérialisées (None si absent/erreur), dans l'ordre des clés
+        """
+        if not keys or not self.enabled:
+            return [None] * len(keys)
+
+        try:
+            values = get_pipeline('cache').mget(keys).value
+            _logger.debug(f"Cache MGET: {sum(v is not None for v in values)}/{len(keys)} hits")
+            return [json.loads(value) if value else None for value in values]
+
+        except Exception as e:
+            _logger.error(f"Redis MGET error: {str(e)}")
+            return [None] * len(keys)
+
     def set(self, key, value, ttl=300):
         """
         Stocke une valeur dans le cache avec TTL.
@@ -123,7 +127,7 @@ class CacheService:
 
         try:
             serialized = json.dumps(value, ensure_ascii=False)
-            self.redis_client.setex(key, ttl, serialized)
+            get_pipeline('cache').setex(key, ttl, serialized)
             _logger.debug(f"✅ Cache SET: {key} (TTL: {ttl}s)")
             return True
 
@@ -137,7 +141,7 @@ class CacheService:
             return False
 
         try:
-            self.redis_client.delete(key)
+            get_pipeline('cache').delete(key)
             _logger.debug(f"✅ Cache DELETE: {key}")
             return True
 
@@ -3,7 +3,7 @@
 Data Export/Import pour Quelyos ERP
 
 Export et import de données:
-- Formats: JSON, CSV, Excel
+- Formats: JSON, CSV, Excel (écriture incrémentale, voir export_stream)
 - Export sélectif de champs
 - Import avec mapping
 - Validation et transformation
@@ -21,6 +21,8 @@ from datetime import datetime, date
 from enum import Enum
 import base64
 
+from . import export_stream
+
 _logger = logging.getLogger(__name__)
 
 
@@ -151,23 +153,29 @@ class DataExporter:
 
     def export_with_config(self, config: ExportConfig, limit: int = None) -> Any:
         """Export avec configuration complète"""
-        Model = self.env[config.model].sudo()
-
-        # Rechercher les enregistrements
-        records = Model.search(config.domain, limit=limit)
-
-        # Extraire les données
-        data = self._extract_data(records, config.fields, config)
-
-        # Formater selon le format demandé
-        if config.format == ExportFormat.JSON:
-            return self._to_json(data)
-        elif config.format == ExportFormat.CSV:
-            return self._to_csv(data, config.fields, config.include_headers)
-        elif config.format == ExportFormat.XLSX:
-            return self._to_xlsx(data, config.fields)
+        content = export_stream.render(
+            self.streaming_exporter(config, limit),
+            config.format.value,
+            include_headers=config.include_headers,
+        )
+        if config.format == ExportFormat.XLSX:
+            return content
+        return content.decode('utf-8')
 
-        return data
+    def streaming_exporter(self, config: ExportConfig, limit: int = None):
+        """
+        Exporteur en flux pour la configuration (lots keyset, chemins
+        compilés). À passer à export_stream.stream_response pour un
+        téléchargement chunked.
+        """
+        Model = self.env[config.model].sudo()
+        columns = [
+            export_stream.ExportColumn(path, format=self._value_formatter(config))
+            for path in config.fields
+        ]
+        return export_stream.StreamingExporter(
+            Model, columns, config.domain, order=Model._order, limit=limit,
+        )
 
     def export_to_file(self, config: ExportConfig, limit: int = None) -> tuple:
         """
@@ -192,98 +200,17 @@ class DataExporter:
 
         return base64.b64encode(content).decode(), filename
 
-    def _extract_data(
-        self,
-        records,
-        fields: List[str],
-        config: ExportConfig
-    ) -> List[Dict]:
-        """Extrait les données des records"""
-        data = []
-
-        for record in records:
-            row = {}
-            for field_path in fields:
-                value = self._get_field_value(record, field_path, config)
-                row[field_path] = value
-            data.append(row)
-
-        return data
-
-    def _get_field_value(self, record, field_path: str, config: ExportConfig) -> Any:
-        """Récupère la valeur d'un champ (supporte les chemins)"""
-        parts = field_path.split('.')
-        value = record
-
-        for part in parts:
-            if value is None:
+    def _value_formatter(self, config: ExportConfig) -> Callable[[Any], Any]:
+        """Formate une valeur brute de read() pour l'export"""
+        def _format(value):
+            if value is None or value is False:
                 return None
-            value = getattr(value, part, None)
-
-        return self._format_value(value, config)
-
-    def _format_value(self, value, config: ExportConfig) -> Any:
-        """Formate une valeur pour l'export"""
-        if value is None or value is False:
-            return None
-
-        if isinstance(value, datetime):
-            return value.strftime(config.datetime_format)
-
-        if isinstance(value, date):
-            return value.strftime(config.date_format)
-
-        if hasattr(value, 'ids'):
-            # Many2one: retourner l'ID ou le display_name
-            if len(value) == 1:
-                return value.id
-            return value.ids
-
-        return value
-
-    def _to_json(self, data: List[Dict]) -> str:
-        """Convertit en JSON"""
-        return json.dumps(data, indent=2, ensure_ascii=False, default=str)
-
-    def _to_csv(self, data: List[Dict], fields: List[str], include_headers: bool) -> str:
-        """Convertit en CSV"""
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=fields)
-
-        if include_headers:
-            writer.writeheader()
-
-        for row in data:
-            writer.writerow(row)
-
-        return output.getvalue()
-
-    def _to_xlsx(self, data: List[Dict], fields: List[str]) -> bytes:
-        """Convertit en Excel"""
-        try:
-            import xlsxwriter
-
-            output = io.BytesIO()
-            workbook = xlsxwriter.Workbook(output)
-            worksheet = workbook.add_worksheet('Data')
-
-            # En-têtes
-            for col, field in enumerate(fields):
-                worksheet.write(0, col, field)
-
-            # Données
-            for row_num, row in enumerate(data, start=1):
-                for col, field in enumerate(fields):
-                    value = row.get(field)
-                    if value is not None:
-                        worksheet.write(row_num, col, str(value))
-
-            workbook.close()
-            return output.getvalue()
-
-        except ImportError:
-            _logger.warning("xlsxwriter not installed, falling back to CSV")
-            return self._to_csv(data, fields, True).encode('utf-8')
+            if isinstance(value, datetime):
+                return value.strftime(config.datetime_format)
+            if isinstance(value, date):
+                return value.strftime(config.date_format)
+            return value
+        return _format
 
 
 # =============================================================================
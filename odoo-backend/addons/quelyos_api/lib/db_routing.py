@@ -5,18 +5,33 @@ Database Routing pour Quelyos ERP
 Gestion des read replicas pour la scalabilité:
 - Routing automatique lecture/écriture
 - Load balancing entre replicas
-- Health check des replicas
+- Health check des replicas (ping + retard de réplication)
 - Failover automatique
 
+Les lectures routées ouvrent un vrai curseur Odoo sur un replica (pool
+de connexions dédié par replica, transaction READ ONLY) et exposent un
+Environment lié à ce curseur. Un replica dont le retard de rejeu
+(pg_last_xact_replay_timestamp) dépasse DB_REPLICA_MAX_LAG, ou dont le
+WAL receiver est arrêté, est écarté; sans replica disponible, la lecture
+reste sur le primary. L'utilisateur DB doit avoir pg_read_all_stats pour
+lire l'état exact du WAL receiver (sinon seule sa présence est vérifiée).
+
 Configuration via variables d'environnement:
 - DB_PRIMARY_HOST: Hôte de la DB primaire
-- DB_REPLICA_HOSTS: Liste des replicas (comma-separated)
+- DB_REPLICA_HOSTS: Liste des replicas (comma-separated, host[:port])
+- DB_REPLICA_MAX_LAG: Retard maximal accepté en secondes (défaut: 30)
+- DB_REPLICA_MAXCONN: Connexions max par replica et par worker (défaut: 8)
+
+En local: DB_REPLICA_HOSTS=localhost:5433 vers un replica en streaming
+(ou un second Postgres hors recovery portant une copie de la base).
 """
 
 import os
+import math
 import random
 import time
 import logging
+from contextlib import contextmanager
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
@@ -42,6 +57,11 @@ class DatabaseConfig:
     is_healthy: bool = True
     last_check: float = 0
     response_time: float = 0
+    lag: float = 0  # secondes de retard de rejeu (replicas)
+
+    @property
+    def key(self) -> str:
+        return f'{self.host}:{self.port}'
 
 
 class RoutingStrategy(Enum):
@@ -62,8 +82,25 @@ DB_NAME = os.environ.get('DB_NAME', 'quelyos')
 DB_USER = os.environ.get('DB_USER', 'odoo')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'odoo')
 
-HEALTH_CHECK_INTERVAL = 30  # secondes
+HEALTH_CHECK_INTERVAL = int(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 10))  # secondes
 FAILOVER_THRESHOLD = 3  # échecs avant failover
+MAX_REPLICA_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 30))
+REPLICA_MAXCONN = int(os.environ.get('DB_REPLICA_MAXCONN', 8))
+
+# Retard de rejeu: nul sur un serveur hors recovery ou à jour du WAL reçu
+# (sinon un replica idle paraîtrait en retard). Sans WAL receiver en
+# streaming, le WAL reçu n'avance plus: retard infini (status est NULL
+# sans pg_read_all_stats, seule la présence du receiver compte alors)
+REPLICATION_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN 'Infinity'::float8
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
 
 
 # =============================================================================
@@ -111,11 +148,27 @@ class DatabaseRouter:
         self._current_replica_index = 0
         self._connection_counts: Dict[str, int] = {}
         self._failure_counts: Dict[str, int] = {}
+        self._pools: Dict[str, Any] = {}
+        self._pools_lock = threading.Lock()
+        self._pid = os.getpid()
 
         self._init_connections()
         self._start_health_check()
         self._initialized = True
 
+    def _ensure_process(self):
+        """Après un fork (workers prefork): pools et thread de health check propres au process"""
+        if self._pid == os.getpid():
+            return
+        with self._pools_lock:
+            if self._pid == os.getpid():
+                return
+            # Connexions héritées du parent: ne pas les fermer (partagées avec lui)
+            self._pools = {}
+            self._connection_counts = {key: 0 for key in self._connection_counts}
+            self._pid = os.getpid()
+        self._start_health_check()
+
     def _init_connections(self):
         """Initialise les configurations de connexion"""
         # Primary
@@ -142,7 +195,7 @@ class DatabaseRouter:
                 password=DB_PASSWORD,
                 is_primary=False,
             ))
-            self._connection_counts[replica_host] = 0
+            self._connection_counts[self.replicas[-1].key] = 0
 
         _logger.info(
             f"Database router initialized: 1 primary, {len(self.replicas)} replicas"
@@ -158,7 +211,7 @@ class DatabaseRouter:
                 self._check_all_health()
                 time.sleep(HEALTH_CHECK_INTERVAL)
 
-        thread = threading.Thread(target=check_health, daemon=True)
+        thread = threading.Thread(target=check_health, name='db-replica-health', daemon=True)
         thread.start()
 
     def _check_all_health(self):
@@ -166,39 +219,44 @@ class DatabaseRouter:
         for replica in self.replicas:
             try:
                 start = time.time()
-                # Ping simple via psycopg2
-                self._ping_database(replica)
+                # Ping + retard de réplication via psycopg2
+                replica.lag = self._ping_database(replica)
                 replica.response_time = time.time() - start
                 replica.is_healthy = True
                 replica.last_check = time.time()
-                self._failure_counts[replica.host] = 0
+                self._failure_counts[replica.key] = 0
             except Exception as e:
-                _logger.warning(f"Replica {replica.host} unhealthy: {e}")
-                self._failure_counts[replica.host] = \
-                    self._failure_counts.get(replica.host, 0) + 1
+                _logger.warning(f"Replica {replica.key} unhealthy: {e}")
+                self.record_failure(replica)
 
-                if self._failure_counts[replica.host] >= FAILOVER_THRESHOLD:
-                    replica.is_healthy = False
+    def record_failure(self, replica: DatabaseConfig):
+        """Compte un échec (ping ou ouverture de curseur); écarte le replica au seuil"""
+        self._failure_counts[replica.key] = self._failure_counts.get(replica.key, 0) + 1
+        if self._failure_counts[replica.key] >= FAILOVER_THRESHOLD:
+            replica.is_healthy = False
 
-    def _ping_database(self, config: DatabaseConfig):
-        """Ping une base de données"""
+    def _ping_database(self, config: DatabaseConfig) -> float:
+        """Ping une base de données; retourne son retard de réplication (s)"""
         try:
             import psycopg2
-            conn = psycopg2.connect(
-                host=config.host,
-                port=config.port,
-                database=config.database,
-                user=config.user,
-                password=config.password,
-                connect_timeout=5,
-            )
-            cursor = conn.cursor()
-            cursor.execute('SELECT 1')
-            cursor.close()
-            conn.close()
         except ImportError:
             # psycopg2 non disponible, skip le check
-            pass
+            return 0.0
+
+        conn = psycopg2.connect(
+            host=config.host,
+            port=config.port,
+            database=config.database,
+            user=config.user,
+            password=config.password,
+            connect_timeout=5,
+        )
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICATION_LAG_QUERY)
+                return float(cursor.fetchone()[0] or 0)
+        finally:
+            conn.close()
 
     def get_write_connection(self) -> DatabaseConfig:
         """Retourne la configuration pour les écritures (primary)"""
@@ -212,13 +270,65 @@ class DatabaseRouter:
 
         Utilise un replica si disponible, sinon le primary.
         """
-        healthy_replicas = [r for r in self.replicas if r.is_healthy]
-
-        if not healthy_replicas:
-            _logger.debug("No healthy replicas, using primary")
-            return self.primary
+        return self.get_read_replica() or self.primary
+
+    def get_read_replica(self, max_lag: float = None) -> Optional[DatabaseConfig]:
+        """Replica sain dont le retard est sous max_lag (None si aucun)"""
+        max_lag = MAX_REPLICA_LAG if max_lag is None else max_lag
+        candidates = [r for r in self.replicas if r.is_healthy and r.lag <= max_lag]
+
+        if not candidates:
+            _logger.debug("No healthy replica within lag, using primary")
+            return None
+
+        return self._select_replica(candidates)
+
+    def _pool_for(self, replica: DatabaseConfig):
+        """Pool de connexions Odoo du replica (créé à la demande, par process)"""
+        self._ensure_process()
+        pool = self._pools.get(replica.key)
+        if pool is None:
+            from odoo import sql_db
+            with self._pools_lock:
+                pool = self._pools.get(replica.key)
+                if pool is None:
+                    try:
+                        pool = sql_db.ConnectionPool(REPLICA_MAXCONN, readonly=True)
+                    except TypeError:
+                        pool = sql_db.ConnectionPool(REPLICA_MAXCONN)
+                    self._pools[replica.key] = pool
+        return pool
+
+    def replica_cursor(self, replica: DatabaseConfig, dbname: str):
+        """
+        Curseur Odoo sur le replica, en transaction READ ONLY.
 
-        return self._select_replica(healthy_replicas)
+        La base est celle de la requête (même nom sur les replicas).
+        """
+        from odoo import sql_db
+
+        dsn = {
+            'dbname': dbname,
+            'host': replica.host,
+            'port': replica.port,
+            'user': replica.user,
+            'password': replica.password,
+            'application_name': f'odoo-replica-{os.getpid()}',
+        }
+        cr = sql_db.Connection(self._pool_for(replica), dbname, dsn).cursor()
+        try:
+            cr.execute('SET TRANSACTION READ ONLY')
+        except Exception:
+            cr.close()
+            raise
+        return cr
+
+    def close_pools(self):
+        """Ferme les connexions des replicas (arrêt, tests)"""
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.close_all()
+            self._pools = {}
 
     def _select_replica(self, replicas: List[DatabaseConfig]) -> DatabaseConfig:
         """Sélectionne un replica selon la stratégie"""
@@ -233,7 +343,7 @@ class DatabaseRouter:
         elif self.strategy == RoutingStrategy.LEAST_CONNECTIONS:
             return min(
                 replicas,
-                key=lambda r: self._connection_counts.get(r.host, 0)
+                key=lambda r: self._connection_counts.get(r.key, 0)
             )
 
         elif self.strategy == RoutingStrategy.FASTEST:
@@ -242,7 +352,7 @@ class DatabaseRouter:
         return replicas[0]
 
     def increment_connections(self, host: str):
-        """Incrémente le compteur de connexions"""
+        """Incrémente le compteur de connexions (clé host:port)"""
         self._connection_counts[host] = \
             self._connection_counts.get(host, 0) + 1
 
@@ -266,53 +376,152 @@ class DatabaseRouter:
             },
             'replicas': [
                 {
-                    'host': r.host,
+                    'host': r.key,
                     'healthy': r.is_healthy,
                     'response_time': r.response_time,
-                    'connections': self._connection_counts.get(r.host, 0),
+                    'lag': r.lag if math.isfinite(r.lag) else None,
+                    'connections': self._connection_counts.get(r.key, 0),
                 }
                 for r in self.replicas
             ],
             'strategy': self.strategy.value,
+            'max_lag': MAX_REPLICA_LAG,
         }
 
 
+# =============================================================================
+# ENVIRONMENT SUR REPLICA
+# =============================================================================
+
+class ReplicaTransactionFailed(Exception):
+    """Requête en échec sur le replica, erreur interceptée par la méthode décorée"""
+
+
+def _is_read_only_error(error: Exception) -> bool:
+    """Écriture tentée dans une transaction READ ONLY (ou sur un hot standby)"""
+    return getattr(error, 'pgcode', None) == '25006'
+
+
+def _transaction_failed(cr) -> bool:
+    """Transaction du curseur avortée par une erreur SQL (même interceptée)"""
+    from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+    return cr._cnx.get_transaction_status() == TRANSACTION_STATUS_INERROR
+
+
+@contextmanager
+def replica_env(env, max_lag: float = None):
+    """
+    Environment équivalent à env, lié à un curseur replica.
+
+    Sans replica sain (ou si l'ouverture échoue), env est rendu tel quel:
+    la lecture se fait sur le primary. Le curseur replica est toujours
+    annulé puis rendu au pool en sortie.
+
+    Usage:
+        with replica_env(request.env) as env:
+            data = env['sale.order']._read_group(...)
+    """
+    router = DatabaseRouter()
+    replica = router.get_read_replica(max_lag) if router.replicas else None
+    if replica is None:
+        yield env
+        return
+
+    try:
+        cr = router.replica_cursor(replica, env.cr.dbname)
+    except Exception as e:
+        _logger.warning(f"Replica {replica.key} cursor failed, using primary: {e}")
+        router.record_failure(replica)
+        yield env
+        return
+
+    router.increment_connections(replica.key)
+    try:
+        yield env(cr=cr)
+    finally:
+        router.decrement_connections(replica.key)
+        try:
+            cr.rollback()
+        finally:
+            cr.close()
+
+
 # =============================================================================
 # DÉCORATEURS
 # =============================================================================
 
-def use_read_replica(func):
+def use_read_replica(func=None, *, max_lag: float = None):
     """
     Décorateur pour utiliser un read replica.
 
+    Sur un contrôleur, request.env est remplacé par l'Environment replica
+    le temps de l'appel (request.update_env() conserve ce curseur); sur un
+    modèle, la méthode s'exécute sur self.with_env(...). Si l'appel tente
+    une écriture (transaction READ ONLY), il est rejoué sur le primary;
+    de même si la méthode intercepte l'erreur (contrôleurs qui rendent
+    {'success': False}) mais laisse la transaction replica avortée.
+
     Usage:
         @use_read_replica
         def search_products(self, **kwargs):
             # Cette méthode utilisera un replica pour les lectures
             return self.env['product.product'].search([])
+
+        @use_read_replica(max_lag=5)
+        def get_stock_report(self, **kwargs):
+            ...
     """
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        router = DatabaseRouter()
-        config = router.get_read_connection()
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            from odoo.models import BaseModel
 
-        # Incrémenter le compteur
-        router.increment_connections(config.host)
+            is_model = isinstance(self, BaseModel)
+            if is_model:
+                primary = self.env
+            else:
+                from odoo.http import request
+                primary = request.env if request else None
 
-        try:
-            # Note: Dans un vrai implémentation, on changerait
-            # la connexion DB ici via le contexte Odoo
-            return func(self, *args, **kwargs)
-        finally:
-            router.decrement_connections(config.host)
+            if primary is None or not DatabaseRouter().replicas:
+                return method(self, *args, **kwargs)
 
-    return wrapper
+            try:
+                with replica_env(primary, max_lag) as env:
+                    if env is primary:
+                        return method(self, *args, **kwargs)
+                    if is_model:
+                        result = method(self.with_env(env), *args, **kwargs)
+                    else:
+                        request.env = env
+                        try:
+                            result = method(self, *args, **kwargs)
+                        finally:
+                            request.env = primary(user=request.env.uid, context=request.env.context, su=request.env.su)
+                    if _transaction_failed(env.cr):
+                        raise ReplicaTransactionFailed()
+                    return result
+            except Exception as e:
+                if isinstance(e, ReplicaTransactionFailed):
+                    _logger.warning(f"{method.__qualname__} failed on a read replica, retrying on primary")
+                elif _is_read_only_error(e):
+                    _logger.warning(f"{method.__qualname__} wrote on a read replica, retrying on primary")
+                else:
+                    raise
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
 
 
 def use_primary(func):
     """
     Décorateur pour forcer l'utilisation du primary.
 
+    Le curseur de la requête est toujours le primary: seul replica_env /
+    use_read_replica ouvrent un curseur replica. Marqueur explicite.
+
     Usage:
         @use_primary
         def create_order(self, **kwargs):
@@ -321,8 +530,6 @@ def use_primary(func):
     """
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        # Note: Dans un vrai implémentation, on forcerait
-        # la connexion au primary ici
         return func(self, *args, **kwargs)
 
     return wrapper
@@ -336,23 +543,34 @@ class ReadReplicaContext:
     """
     Context manager pour utiliser un read replica.
 
+    Avec un Environment, rend un Environment lié au replica (voir
+    replica_env); sans, rend la DatabaseConfig choisie.
+
     Usage:
-        with ReadReplicaContext():
+        with ReadReplicaContext(request.env) as env:
             products = env['product.product'].search([])
     """
 
-    def __init__(self):
+    def __init__(self, env=None, max_lag: float = None):
         self.router = DatabaseRouter()
+        self.env = env
+        self.max_lag = max_lag
         self.config = None
+        self._context = None
 
     def __enter__(self):
+        if self.env is not None:
+            self._context = replica_env(self.env, self.max_lag)
+            return self._context.__enter__()
         self.config = self.router.get_read_connection()
-        self.router.increment_connections(self.config.host)
+        self.router.increment_connections(self.config.key)
         return self.config
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._context is not None:
+            return self._context.__exit__(exc_type, exc_val, exc_tb)
         if self.config:
-            self.router.decrement_connections(self.config.host)
+            self.router.decrement_connections(self.config.key)
         return False
 
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Prévision de demande vectorisée pour Quelyos API
+
+Calcul sur une matrice produits x jours (une ligne par produit, une colonne
+par jour, 0 les jours sans vente) au lieu de boucles Python par produit:
+- moyennes mobiles 7/30/90 jours (sommes de colonnes)
+- tendance linéaire (moindres carrés fermés sur toutes les lignes)
+- lissage exponentiel simple (produit matriciel par les poids alpha(1-alpha)^k)
+- Croston / SBA pour la demande intermittente (ADI > 1.32)
+
+Module sans dépendance Odoo: l'extraction SQL (date_trunc + GROUP BY) et la
+persistance sont dans le modèle quelyos.stock.forecast.
+
+Usage:
+    matrix = build_matrix(rows, n_products, n_days)
+    result = forecast_matrix(matrix, on_hand)
+    result['daily_forecast'][i], result['days_of_cover'][i]
+"""
+
+import logging
+from typing import Dict, Optional
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    _logger.warning("numpy not installed - demand forecasting disabled")
+
+# Historique et paramètres par défaut
+HISTORY_DAYS = 730
+TREND_WINDOW = 90
+MOVING_AVERAGE_WINDOWS = (7, 30, 90)
+SES_ALPHA = 0.2
+CROSTON_ALPHA = 0.1
+
+# Average Demand Interval au-delà duquel la demande est intermittente (Syntetos-Boylan)
+INTERMITTENT_ADI = 1.32
+
+METHOD_SES = 'ses'
+METHOD_CROSTON = 'croston'
+
+
+def build_matrix(rows, n_products: int, n_days: int):
+    """
+    Matrice float64 (n_products, n_days) à partir de triplets
+    (index produit, index jour, quantité); les doublons sont additionnés.
+    """
+    data = rows if isinstance(rows, np.ndarray) else np.array(list(rows), dtype=np.float64)
+    data = data.reshape(-1, 3)
+    flat = data[:, 0].astype(np.intp) * n_days + data[:, 1].astype(np.intp)
+    matrix = np.bincount(flat, weights=data[:, 2], minlength=n_products * n_days)
+    return matrix.reshape(n_products, n_days)
+
+
+def moving_averages(matrix, windows=MOVING_AVERAGE_WINDOWS) -> Dict[int, 'np.ndarray']:
+    """Moyenne des w derniers jours par produit (0 si l'historique est plus court)"""
+    n_days = matrix.shape[1]
+    return {
+        window: matrix[:, -window:].sum(axis=1) / window if n_days >= window else np.zeros(len(matrix))
+        for window in windows
+    }
+
+
+def linear_trend(matrix, window: int = TREND_WINDOW):
+    """
+    Régression y = a*x + b sur les `window` derniers jours de chaque produit.
+
+    Returns:
+        (pente, niveau ajusté au premier jour prévu)
+    """
+    y = matrix[:, -window:]
+    n = y.shape[1]
+    if n < 2:
+        return np.zeros(len(matrix)), y.mean(axis=1) if n else np.zeros(len(matrix))
+    x = np.arange(n, dtype=np.float64)
+    x_centered = x - x.mean()
+    slope = (y - y.mean(axis=1, keepdims=True)) @ x_centered / (x_centered @ x_centered)
+    intercept = y.mean(axis=1) - slope * x.mean()
+    return slope, intercept + slope * n
+
+
+def exponential_smoothing(matrix, alpha: float = SES_ALPHA):
+    """
+    Niveau final du lissage exponentiel simple (initialisé au premier jour).
+
+    Le niveau au jour T est une combinaison linéaire des observations:
+    un seul produit matriciel pour tout le catalogue.
+    """
+    n_days = matrix.shape[1]
+    if not n_days:
+        return np.zeros(len(matrix))
+    powers = np.arange(n_days - 1, -1, -1, dtype=np.float64)
+    weights = alpha * (1 - alpha) ** powers
+    weights[0] = (1 - alpha) ** (n_days - 1)
+    return matrix @ weights
+
+
+def croston(matrix, alpha: float = CROSTON_ALPHA, sba: bool = True):
+    """
+    Croston (variante SBA par défaut): lissage séparé des tailles de demande
+    et des intervalles entre demandes, une itération par jour sur tous les
+    produits à la fois.
+
+    Returns:
+        Demande journalière prévue (0 si aucune vente sur l'historique)
+    """
+    n_products, n_days = matrix.shape
+    size = np.zeros(n_products)
+    interval = np.ones(n_products)
+    since_last = np.ones(n_products)
+    seen = np.zeros(n_products, dtype=bool)
+
+    for day in range(n_days):
+        demand = matrix[:, day]
+        has_demand = demand > 0
+        first = has_demand & ~seen
+        update = has_demand & seen
+        size = np.where(first, demand, np.where(update, size + alpha * (demand - size), size))
+        interval = np.where(first, since_last, np.where(update, interval + alpha * (since_last - interval), interval))
+        since_last = np.where(has_demand, 1, since_last + 1)
+        seen |= has_demand
+
+    forecast = np.where(seen, size / interval, 0.0)
+    if sba:
+        forecast *= 1 - alpha / 2
+    return forecast
+
+
+def average_demand_interval(matrix):
+    """Jours d'historique / jours avec vente (inf si aucune vente)"""
+    demand_days = np.count_nonzero(matrix > 0, axis=1)
+    with np.errstate(divide='ignore'):
+        return np.where(demand_days > 0, matrix.shape[1] / np.maximum(demand_days, 1), np.inf), demand_days
+
+
+def forecast_matrix(matrix, on_hand: Optional['np.ndarray'] = None,
+                    ses_alpha: float = SES_ALPHA, croston_alpha: float = CROSTON_ALPHA) -> Dict[str, 'np.ndarray']:
+    """
+    Prévision du catalogue entier.
+
+    Args:
+        matrix: Ventes journalières (produits x jours, plus ancien en premier)
+        on_hand: Stock en main par produit (jours de couverture)
+
+    Returns:
+        Dict de tableaux alignés sur les lignes: daily_forecast, method,
+        ma_7/ma_30/ma_90, trend_slope, trend_level, adi, demand_days,
+        days_of_cover (NaN si demande nulle)
+    """
+    adi, demand_days = average_demand_interval(matrix)
+    intermittent = np.isfinite(adi) & (adi > INTERMITTENT_ADI)
+
+    # Croston uniquement sur les lignes intermittentes
+    daily = exponential_smoothing(matrix, ses_alpha)
+    if intermittent.any():
+        daily[intermittent] = croston(matrix[intermittent], croston_alpha)
+    daily = np.maximum(daily, 0.0)
+
+    slope, level = linear_trend(matrix)
+    averages = moving_averages(matrix)
+
+    result = {
+        'daily_forecast': daily,
+        'method': np.where(intermittent, METHOD_CROSTON, METHOD_SES),
+        'trend_slope': slope,
+        'trend_level': level,
+        'adi': adi,
+        'demand_days': demand_days,
+    }
+    for window, values in averages.items():
+        result[f'ma_{window}'] = values
+
+    if on_hand is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['days_of_cover'] = np.where(daily > 0, np.maximum(on_hand, 0) / daily, np.nan)
+    return result
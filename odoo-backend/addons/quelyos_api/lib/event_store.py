@@ -17,6 +17,8 @@ from datetime import datetime
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from .redis_client import get_redis, redis_available
+
 _logger = logging.getLogger(__name__)
 
 
@@ -134,21 +136,12 @@ class EventStore:
     """
 
     def __init__(self):
-        self._redis = None
         self._handlers: Dict[str, List[Callable]] = {}
-        self._init_redis()
 
-    def _init_redis(self):
-        """Initialise Redis pour le stockage"""
-        try:
-            import redis
-            import os
-            redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/2')
-            self._redis = redis.from_url(redis_url)
-            self._redis.ping()
-            _logger.info("Event store connected to Redis")
-        except Exception as e:
-            _logger.warning(f"Redis not available for event store: {e}")
+    @property
+    def _redis(self):
+        """Client 'events' partagé, None tant que le circuit Redis est ouvert"""
+        return get_redis('events') if redis_available() else None
 
     def append(self, event: Event) -> bool:
         """
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+"""
+Export en flux (streaming) pour Quelyos ERP
+
+Exporte un recordset de taille quelconque à mémoire constante:
+- Chemins de champs compilés une fois ('categ_id.name'): un read() par
+  lot et par niveau de relation, au lieu d'un getattr par ligne
+- Lots keyset (seek) dans l'ordre demandé; si le tri n'est pas indexable
+  en keyset (champ traduit, calculé), instantané des ids puis lots
+- Cache ORM vidé entre les lots: la mémoire ne dépend pas du nombre de lignes
+- Écrivains incrémentaux CSV / NDJSON / JSON / XLSX (xlsxwriter en mode
+  constant_memory, fichier temporaire sur disque)
+- Réponse HTTP chunked: le générateur ouvre son propre curseur, le
+  fichier est produit pendant l'envoi
+
+Usage:
+    columns = [
+        ExportColumn('name', 'Nom'),
+        ExportColumn('category', 'Catégorie', path='categ_id.name', default=''),
+        ExportColumn('orders_count', 'Nb commandes', computed=True),
+    ]
+    exporter = StreamingExporter(env['product.template'].sudo(), columns,
+                                 domain, order='name', enrich=add_orders)
+    for row in exporter.iter_rows():
+        ...
+    return stream_response(exporter, 'xlsx', 'produits')
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from odoo import api
+from odoo.modules.registry import Registry
+
+from .keyset_pagination import KeysetPaginator, MAX_LIMIT
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_BATCH_SIZE = 500
+
+# Taille des blocs envoyés pour un fichier XLSX terminé
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Répertoire des fichiers temporaires XLSX (défaut: tempfile)
+EXPORT_TMPDIR = os.environ.get('QUELYOS_EXPORT_TMPDIR') or None
+
+
+class UnsupportedFormatError(ValueError):
+    """Format d'export inconnu"""
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """
+    Colonne exportée.
+
+    Args:
+        key: Clé de la ligne (NDJSON/JSON) et en-tête par défaut
+        label: En-tête CSV/XLSX
+        path: Chemin de champ ('categ_id.name'), défaut: key
+        format: Transformation de la valeur brute (reçoit aussi False/None)
+        default: Valeur des champs vides (None/False) sans format
+        computed: Valeur fournie par le callback enrich (pas de champ)
+    """
+    key: str
+    label: Optional[str] = None
+    path: Optional[str] = None
+    format: Optional[Callable[[Any], Any]] = None
+    default: Any = None
+    computed: bool = False
+
+    @property
+    def field_path(self) -> str:
+        return self.path or self.key
+
+    @property
+    def header(self) -> str:
+        return self.label or self.key
+
+
+def date_formatter(pattern: str, default: Any = '') -> Callable[[Any], Any]:
+    """Format date/datetime ('%Y-%m-%d'), default si vide"""
+    def _format(value):
+        return value.strftime(pattern) if value else default
+    return _format
+
+
+def selection_formatter(Model, field_name: str, default: Any = '') -> Callable[[Any], Any]:
+    """Libellé d'un champ selection, résolu une fois"""
+    labels = dict(Model._fields[field_name]._description_selection(Model.env))
+    return lambda value: labels.get(value, default) if value else default
+
+
+# =============================================================================
+# CHEMINS DE CHAMPS COMPILÉS
+# =============================================================================
+
+class ReadPlan:
+    """
+    Plan de lecture d'une liste de chemins sur un modèle.
+
+    Les chemins sont découpés une fois: champs lus directement sur le
+    modèle, et pour chaque relation un sous-plan sur le comodèle. fetch()
+    fait un read() du lot, puis un read() par relation sur les ids
+    cibles dédupliqués du lot.
+
+    Valeurs brutes de read(load=None): many2one -> id, x2many -> liste
+    d'ids; un chemin traversant un x2many donne une liste de valeurs.
+    """
+
+    def __init__(self, Model, paths: Sequence[str]):
+        self.model = Model._name
+        self.paths = list(dict.fromkeys(paths))
+        direct = set()
+        nested: Dict[str, List[str]] = {}
+
+        for path in self.paths:
+            name, _sep, rest = path.partition('.')
+            field = Model._fields.get(name)
+            if field is None:
+                raise ValueError(f"Champ '{name}' inconnu sur {self.model} (chemin '{path}')")
+            direct.add(name)
+            if rest:
+                if not field.relational:
+                    raise ValueError(f"Champ '{name}' non relationnel sur {self.model} (chemin '{path}')")
+                nested.setdefault(name, []).append(rest)
+
+        direct.discard('id')
+        self.read_fields = sorted(direct)
+        self.children = {
+            name: (Model._fields[name].type == 'many2one', ReadPlan(Model.env[Model._fields[name].comodel_name], subpaths))
+            for name, subpaths in nested.items()
+        }
+
+    def fetch(self, records) -> List[Dict[str, Any]]:
+        """Valeurs brutes par chemin, dans l'ordre de records"""
+        if not records:
+            return []
+        if self.read_fields:
+            rows = records.read(self.read_fields, load=None)
+        else:
+            rows = [{'id': record_id} for record_id in records.ids]
+
+        for name, (is_many2one, plan) in self.children.items():
+            target_ids = set()
+            for row in rows:
+                value = row[name]
+                if is_many2one:
+                    if value:
+                        target_ids.add(value)
+                else:
+                    target_ids.update(value)
+
+            targets = records.env[plan.model].browse(sorted(target_ids))
+            by_id = {values['id']: values for values in plan.fetch(targets)}
+
+            for row in rows:
+                value = row[name]
+                for subpath in plan.paths:
+                    path = f'{name}.{subpath}'
+                    if is_many2one:
+                        target = by_id.get(value) if value else None
+                        row[path] = target[subpath] if target else None
+                    else:
+                        row[path] = [by_id[i][subpath] for i in value if i in by_id]
+        return rows
+
+
+# =============================================================================
+# EXPORTEUR
+# =============================================================================
+
+class StreamingExporter:
+    """
+    Exporte un domaine par lots, à mémoire constante.
+
+    enrich(records, rows) complète les colonnes computed d'un lot en
+    requêtes groupées (read_group...); il doit passer par records.env
+    (le flux HTTP tourne sur son propre curseur).
+    """
+
+    def __init__(self, Model, columns: Sequence[ExportColumn], domain: Optional[list] = None,
+                 order: str = 'id', batch_size: int = DEFAULT_BATCH_SIZE,
+                 enrich: Optional[Callable] = None, limit: Optional[int] = None):
+        self.model = Model
+        self.columns = list(columns)
+        self.domain = list(domain or [])
+        self.order = order
+        self.batch_size = max(1, min(int(batch_size), MAX_LIMIT))
+        self.enrich = enrich
+        self.limit = limit
+        self._plan = ReadPlan(Model, [c.field_path for c in self.columns if not c.computed])
+
+    def with_env(self, env) -> 'StreamingExporter':
+        """Copie liée à un autre environnement (même utilisateur, autre curseur)"""
+        exporter = object.__new__(StreamingExporter)
+        exporter.__dict__.update(self.__dict__)
+        exporter.model = self.model.with_env(env)
+        return exporter
+
+    def _iter_records(self) -> Iterator[Any]:
+        """Recordsets successifs du domaine, dans l'ordre demandé"""
+        Model = self.model
+        remaining = self.limit
+        try:
+            paginator = KeysetPaginator(Model._name, order=self.order)
+            paginator._check_fields(Model)
+        except ValueError:
+            paginator = None
+
+        if paginator is None:
+            # Tri non keyset: instantané des ids (un entier par ligne)
+            ids = list(Model._search(self.domain, order=self.order, limit=remaining))
+            for start in range(0, len(ids), self.batch_size):
+                yield Model.browse(ids[start:start + self.batch_size])
+            return
+
+        cursor = None
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            page = paginator.paginate(Model, self.domain, cursor=cursor, limit=size)
+            if page.records:
+                yield page.records
+            if remaining is not None:
+                remaining -= len(page.records)
+            if not page.has_more:
+                return
+            cursor = page.next_cursor
+
+    def _format(self, column: ExportColumn, value):
+        if column.format:
+            return column.format(value)
+        if value is None or value is False:
+            return column.default
+        return value
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Lots de lignes {clé: valeur formatée}"""
+        for records in self._iter_records():
+            raw = self._plan.fetch(records)
+            rows = [
+                {c.key: (None if c.computed else values[c.field_path]) for c in self.columns}
+                for values in raw
+            ]
+            if self.enrich:
+                self.enrich(records, rows)
+            for row in rows:
+                for column in self.columns:
+                    row[column.key] = self._format(column, row[column.key])
+            yield rows
+            # Lot suivant sans le cache ORM du précédent
+            records.env.invalidate_all()
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        for rows in self.iter_batches():
+            yield from rows
+
+    def stream(self, writer) -> Iterator[bytes]:
+        """Fichier complet, bloc par bloc"""
+        head = writer.begin()
+        if head:
+            yield head
+        for rows in self.iter_batches():
+            chunk = writer.write(rows)
+            if chunk:
+                yield chunk
+        yield from writer.finish()
+
+
+# =============================================================================
+# ÉCRIVAINS INCRÉMENTAUX
+# =============================================================================
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(v) for v in value if v is not None and v is not False)
+    return value
+
+
+class CSVWriter:
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def __init__(self, columns: Sequence[ExportColumn], include_headers: bool = True,
+                 delimiter: str = ','):
+        self.columns = list(columns)
+        self.include_headers = include_headers
+        self.delimiter = delimiter
+
+    def _render(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=self.delimiter)
+        writer.writerows(rows)
+        return output.getvalue().encode('utf-8')
+
+    def begin(self) -> bytes:
+        if not self.include_headers:
+            return b''
+        return self._render([[c.header for c in self.columns]])
+
+    def write(self, rows: Sequence[Dict[str, Any]]) -> bytes:
+        return self._render([
+            ['' if row[c.key] is None else _cell(row[c.key]) for c in self.columns]
+            for row in rows
+        ])
+
+    def finish(self) -> Iterator[bytes]:
+        return iter(())
+
+
+class NDJSONWriter:
+    extension = 'ndjson'
+    content_type = 'application/x-ndjson'
+
+    def __init__(self, columns: Sequence[ExportColumn], **_options):
+        self.columns = list(columns)
+
+    def begin(self) -> bytes:
+        return b''
+
+    def write(self, rows: Sequence[Dict[str, Any]]) -> bytes:
+        return ''.join(
+            json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in rows
+        ).encode('utf-8')
+
+    def finish(self) -> Iterator[bytes]:
+        return iter(())
+
+
+class JSONWriter:
+    """Tableau JSON écrit élément par élément"""
+    extension = 'json'
+    content_type = 'application/json'
+
+    def __init__(self, columns: Sequence[ExportColumn], **_options):
+        self.columns = list(columns)
+        self._first = True
+
+    def begin(self) -> bytes:
+        return b'['
+
+    def write(self, rows: Sequence[Dict[str, Any]]) -> bytes:
+        parts = []
+        for row in rows:
+            parts.append(('' if self._first else ',') + '\n'
+                         + json.dumps(row, ensure_ascii=False, default=str))
+            self._first = False
+        return ''.join(parts).encode('utf-8')
+
+    def finish(self) -> Iterator[bytes]:
+        yield b']' if self._first else b'\n]'
+
+
+class XLSXWriter:
+    """
+    XLSX en mode constant_memory: xlsxwriter n'écrit qu'une ligne à la
+    fois dans un fichier temporaire. Le zip n'existe qu'à la fermeture,
+    finish() l'envoie ensuite par blocs puis le supprime.
+    """
+    extension = 'xlsx'
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def __init__(self, columns: Sequence[ExportColumn], include_headers: bool = True,
+                 sheet_name: str = 'Data', **_options):
+        self.columns = list(columns)
+        self.include_headers = include_headers
+        self.sheet_name = sheet_name
+        self._path = None
+        self._workbook = None
+        self._sheet = None
+        self._row = 0
+
+    def begin(self) -> bytes:
+        fd, self._path = tempfile.mkstemp(suffix='.xlsx', prefix='quelyos_export_', dir=EXPORT_TMPDIR)
+        os.close(fd)
+        self._workbook = xlsxwriter.Workbook(self._path, {
+            'constant_memory': True,
+            'tmpdir': EXPORT_TMPDIR,
+            'strings_to_numbers': False,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        self._sheet = self._workbook.add_worksheet(self.sheet_name)
+        if self.include_headers:
+            bold = self._workbook.add_format({'bold': True})
+            for col, column in enumerate(self.columns):
+                self._sheet.write_string(0, col, column.header, bold)
+            self._row = 1
+        return b''
+
+    def write(self, rows: Sequence[Dict[str, Any]]) -> bytes:
+        sheet = self._sheet
+        for row in rows:
+            for col, column in enumerate(self.columns):
+                value = _cell(row[column.key])
+                if value is None or value == '':
+                    continue
+                if isinstance(value, bool):
+                    sheet.write_boolean(self._row, col, value)
+                elif isinstance(value, (int, float)):
+                    sheet.write_number(self._row, col, value)
+                else:
+                    sheet.write_string(self._row, col, str(value))
+            self._row += 1
+        return b''
+
+    def finish(self) -> Iterator[bytes]:
+        try:
+            self._workbook.close()
+            with open(self._path, 'rb') as handle:
+                while True:
+                    chunk = handle.read(FILE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Supprime le fichier temporaire (export interrompu compris)"""
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+        self._path = None
+
+
+WRITERS = {
+    'csv': CSVWriter,
+    'ndjson': NDJSONWriter,
+    'json': JSONWriter,
+    'xlsx': XLSXWriter,
+}
+
+
+def get_writer(fmt: str, columns: Sequence[ExportColumn], **options):
+    """
+    Écrivain pour un format ('csv', 'ndjson', 'json', 'xlsx').
+
+    Sans xlsxwriter, l'export XLSX retombe sur CSV (extension et
+    content_type suivent).
+
+    Raises:
+        UnsupportedFormatError: Format inconnu
+    """
+    fmt = (fmt or 'csv').lower()
+    if fmt not in WRITERS:
+        raise UnsupportedFormatError(f"Format d'export non supporté: {fmt}")
+    if fmt == 'xlsx' and not XLSXWRITER_AVAILABLE:
+        _logger.warning("xlsxwriter not installed, falling back to CSV")
+        fmt = 'csv'
+    return WRITERS[fmt](columns, **options)
+
+
+def render(exporter: StreamingExporter, fmt: str, **options) -> bytes:
+    """Fichier complet en mémoire (petits exports, réponses JSON-RPC)"""
+    return b''.join(exporter.stream(get_writer(fmt, exporter.columns, **options)))
+
+
+# =============================================================================
+# RÉPONSE HTTP
+# =============================================================================
+
+def stream_response(exporter: StreamingExporter, fmt: str, basename: str,
+                    headers: Optional[Dict[str, str]] = None, **options):
+    """
+    Réponse HTTP chunked produite pendant l'envoi.
+
+    Le curseur de la requête est fermé quand le corps est itéré: le
+    générateur ouvre son propre curseur (même base, utilisateur, sudo
+    et contexte), en lecture seule.
+
+    Raises:
+        UnsupportedFormatError: Format inconnu
+    """
+    from odoo.http import Response, content_disposition
+
+    writer = get_writer(fmt, exporter.columns, **options)
+    env = exporter.model.env
+    dbname, uid, context, su = env.cr.dbname, env.uid, dict(env.context), env.su
+
+    def generate():
+        try:
+            with Registry(dbname).cursor() as cr:
+                bound = exporter.with_env(api.Environment(cr, uid, context, su=su))
+                yield from bound.stream(writer)
+                cr.rollback()
+        except Exception:
+            _logger.exception("Streaming export of %s failed", exporter.model._name)
+            raise
+        finally:
+            if isinstance(writer, XLSXWriter):
+                writer.discard()
+
+    response_headers = [
+        ('Content-Type', writer.content_type),
+        ('Content-Disposition', content_disposition(f'{basename}.{writer.extension}')),
+        ('Cache-Control', 'no-store'),
+        ('X-Accel-Buffering', 'no'),
+    ]
+    response_headers.extend((headers or {}).items())
+    return Response(generate(), headers=response_headers, direct_passthrough=True)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Limitation de débit GCRA pour Quelyos API
+
+GCRA (Generic Cell Rate Algorithm): un quota (limite, période) tient en
+une seule valeur par clé, l'instant théorique d'arrivée (TAT). Avec
+intervalle = période / limite, une requête est admise si
+max(TAT, maintenant) + intervalle - maintenant <= période. La mémoire est
+O(1) par clé et par quota, quel que soit le trafic (au lieu d'une entrée
+de sorted set par requête).
+
+- Un script Lua atomique vérifie et consomme tous les quotas d'un appel
+  (burst/minute/heure/jour) en un aller-retour, en tout ou rien: une
+  requête refusée ne consomme rien
+- Horloge du serveur Redis: pas de dérive entre workers
+- Bail local: pour les quotas élevés, le worker réserve plusieurs jetons
+  d'un coup et sert les requêtes suivantes sans Redis. Taille bornée à
+  LEASE_FRACTION de la plus petite limite (LEASE_MAX au plus), durée à
+  LEASE_FRACTION de la plus courte période: l'écart avec un comptage
+  exact reste inférieur à la taille du bail par worker. Les jetons non
+  utilisés à l'expiration (ou à l'abandon) du bail sont rendus en
+  reculant le TAT
+- LocalGCRA: même algorithme en mémoire (fallback sans Redis)
+
+Usage:
+    limiter = GCRALimiter('throttling')
+    decision = limiter.check(
+        ('quelyos:throttle:42:minute', 'quelyos:throttle:42:day'),
+        (Limit(100, 60, 'minute'), Limit(50000, 86400, 'day')),
+    )
+    decision.allowed, decision.remaining, decision.retry_after
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from .redis_client import get_pipeline
+
+_logger = logging.getLogger(__name__)
+
+LEASE_FRACTION = float(os.environ.get('QUELYOS_RATE_LEASE_FRACTION', 0.05))
+LEASE_MAX = int(os.environ.get('QUELYOS_RATE_LEASE_MAX', 50))
+
+# Au-delà, les baux expirés / TAT échus sont purgés
+MAX_LOCAL_KEYS = 10000
+
+# KEYS: un TAT (ms) par quota
+# ARGV: jetons demandés, minimum accepté, puis (période ms, intervalle ms) par quota
+# Retour: {jetons accordés, index du quota bloquant, attente ms, restant par quota...}
+GCRA_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + tonumber(clock[2]) / 1000
+local want = tonumber(ARGV[1])
+local minimum = tonumber(ARGV[2])
+local tats, free = {}, {}
+local grant, exceeded, retry = want, 0, 0
+
+for i = 1, #KEYS do
+    local period = tonumber(ARGV[2 * i + 1])
+    local interval = tonumber(ARGV[2 * i + 2])
+    local tat = tonumber(redis.call('GET', KEYS[i])) or now
+    if tat < now then tat = now end
+    tats[i] = tat
+    free[i] = math.floor((period - (tat - now)) / interval + 1e-6)
+    if free[i] < minimum then
+        local wait = tat - now + minimum * interval - period
+        if exceeded == 0 or wait > retry then exceeded, retry = i, wait end
+    end
+    if free[i] < grant then grant = free[i] end
+end
+
+local result = {0, exceeded, math.ceil(retry)}
+if grant < minimum then
+    for i = 1, #KEYS do result[i + 3] = math.max(free[i], 0) end
+    return result
+end
+
+result[1] = grant
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[2 * i + 2])
+    local tat = tats[i] + grant * interval
+    if grant > 0 then
+        redis.call('SET', KEYS[i], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+    end
+    result[i + 3] = free[i] - grant
+end
+return result
+"""
+
+# Restitution de jetons réservés non utilisés: recule chaque TAT
+# KEYS: un TAT (ms) par quota
+# ARGV: jetons rendus, puis intervalle ms par quota
+GCRA_REFUND_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + tonumber(clock[2]) / 1000
+local tokens = tonumber(ARGV[1])
+
+for i = 1, #KEYS do
+    local tat = tonumber(redis.call('GET', KEYS[i]))
+    if tat then
+        tat = tat - tokens * tonumber(ARGV[i + 1])
+        if tat > now then
+            redis.call('SET', KEYS[i], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+        else
+            redis.call('DEL', KEYS[i])
+        end
+    end
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Quota: limit requêtes par period secondes"""
+    limit: int
+    period: float
+    name: str = ''
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+
+class Decision(NamedTuple):
+    """Résultat d'une vérification"""
+    allowed: bool
+    remaining: Tuple[int, ...]  # par quota, dans l'ordre des limites
+    exceeded: Optional[int]     # index du quota bloquant
+    retry_after: float          # secondes avant le prochain jeton
+
+
+def lease_size(limits: Sequence[Limit]) -> int:
+    """Jetons réservés par appel Redis (1 = pas de bail)"""
+    size = min(int(limit.limit * LEASE_FRACTION) for limit in limits)
+    return max(1, min(LEASE_MAX, size))
+
+
+def _script_args(limits: Sequence[Limit], want: int, minimum: int) -> list:
+    args = [want, minimum]
+    for limit in limits:
+        args.append(limit.period * 1000)
+        args.append(limit.interval * 1000)
+    return args
+
+
+# =============================================================================
+# LIMITEUR REDIS
+# =============================================================================
+
+class GCRALimiter:
+    """
+    Limiteur GCRA multi-quotas sur un client Redis nommé (voir redis_client).
+
+    Les appels passent par l'auto-pipeline de la requête: la vérification
+    part avec les écritures en attente du même pool. Les erreurs Redis
+    sont propagées, l'appelant choisit son mode dégradé.
+    """
+
+    def __init__(self, client_name: str):
+        self.client_name = client_name
+        self._scripts = {}
+        self._refund_scripts = {}
+        self._leases: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _registered(scripts, client, source):
+        pool_key = id(client.connection_pool)
+        script = scripts.get(pool_key)
+        if script is None:
+            script = scripts[pool_key] = client.register_script(source)
+        return script
+
+    def _script(self, client):
+        return self._registered(self._scripts, client, GCRA_LUA)
+
+    def _run(self, keys, limits, want, minimum):
+        pipe = get_pipeline(self.client_name)
+        reply = pipe.run_script(self._script(pipe.client), keys, _script_args(limits, want, minimum))
+        granted, exceeded, retry_ms, *remaining = reply.value
+        return int(granted), int(exceeded), int(retry_ms), tuple(int(r) for r in remaining)
+
+    def _refund(self, keys, limits, tokens):
+        """Rend des jetons réservés non utilisés (envoyé avec le prochain appel Redis)"""
+        try:
+            pipe = get_pipeline(self.client_name)
+            script = self._registered(self._refund_scripts, pipe.client, GCRA_REFUND_LUA)
+            pipe.run_script(script, keys, [tokens] + [limit.interval * 1000 for limit in limits])
+        except Exception as e:
+            # Au pire les jetons restent consommés jusqu'à l'échéance du TAT
+            _logger.debug(f"GCRA lease refund skipped for {keys}: {e}")
+
+    def _take_lease(self, keys) -> Optional[Decision]:
+        expired = None
+        with self._lock:
+            lease = self._leases.get(keys)
+            if lease is None:
+                return None
+            tokens, expires_at, remaining, limits = lease
+            if tokens > 0 and time.monotonic() < expires_at:
+                lease[0] = tokens - 1
+                return Decision(True, tuple(r + tokens - 1 for r in remaining), None, 0.0)
+            del self._leases[keys]
+            if tokens > 0:
+                expired = (limits, tokens)
+        if expired:
+            self._refund(keys, *expired)
+        return None
+
+    def _store_lease(self, keys, tokens, limits, remaining):
+        now = time.monotonic()
+        duration = min(limit.period for limit in limits) * LEASE_FRACTION
+        stale = []
+        with self._lock:
+            if len(self._leases) >= MAX_LOCAL_KEYS:
+                for key, lease in list(self._leases.items()):
+                    if lease[0] <= 0 or lease[1] <= now:
+                        del self._leases[key]
+                        if lease[0] > 0:
+                            stale.append((key, lease[3], lease[0]))
+            self._leases[keys] = [tokens, now + duration, remaining, limits]
+        for key, key_limits, key_tokens in stale:
+            self._refund(key, key_limits, key_tokens)
+
+    def check(self, keys: Sequence[str], limits: Sequence[Limit], lease: bool = True) -> Decision:
+        """
+        Consomme un jeton sur chaque quota (tout ou rien).
+
+        Args:
+            keys: une clé Redis par quota
+            limits: quotas, dans le même ordre
+            lease: autoriser le bail local de jetons
+        """
+        keys = tuple(keys)
+        size = lease_size(limits) if lease else 1
+        if size > 1:
+            decision = self._take_lease(keys)
+            if decision is not None:
+                return decision
+
+        granted, exceeded, retry_ms, remaining = self._run(keys, limits, size, 1)
+        if not granted:
+            return Decision(False, remaining, exceeded - 1, retry_ms / 1000.0)
+        if granted > 1:
+            self._store_lease(keys, granted - 1, limits, remaining)
+        return Decision(True, tuple(r + granted - 1 for r in remaining), None, 0.0)
+
+    def peek(self, keys: Sequence[str], limits: Sequence[Limit]) -> Tuple[int, ...]:
+        """Jetons restants par quota, sans consommer"""
+        keys = tuple(keys)
+        _granted, _exceeded, _retry_ms, remaining = self._run(keys, limits, 0, 0)
+        with self._lock:
+            lease = self._leases.get(keys)
+            tokens = lease[0] if lease and lease[1] > time.monotonic() else 0
+        return tuple(r + tokens for r in remaining)
+
+    def forget(self, keys: Sequence[str]):
+        """Abandonne le bail local et rend ses jetons (sans effet après reset des clés)"""
+        keys = tuple(keys)
+        with self._lock:
+            lease = self._leases.pop(keys, None)
+        if lease and lease[0] > 0:
+            self._refund(keys, lease[3], lease[0])
+
+
+# =============================================================================
+# LIMITEUR EN MÉMOIRE
+# =============================================================================
+
+class LocalGCRA:
+    """
+    GCRA en mémoire du worker (un TAT par clé), même sémantique que le
+    script Lua. Ne partage rien entre workers.
+    """
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        if len(self._tats) >= MAX_LOCAL_KEYS:
+            for key in [k for k, tat in self._tats.items() if tat <= now]:
+                del self._tats[key]
+
+    def check(self, keys: Sequence[str], limits: Sequence[Limit], cost: int = 1) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            tats = [max(self._tats.get(key, now), now) for key in keys]
+            free = [
+                math.floor((limit.period - (tat - now)) / limit.interval + 1e-9)
+                for tat, limit in zip(tats, limits)
+            ]
+            if min(free) < cost:
+                waits = [
+                    tat - now + cost * limit.interval - limit.period if f < cost else -1
+                    for tat, limit, f in zip(tats, limits, free)
+                ]
+                exceeded = max(range(len(waits)), key=waits.__getitem__)
+                return Decision(False, tuple(max(f, 0) for f in free), exceeded, waits[exceeded])
+
+            if cost:
+                self._prune(now)
+                for key, tat, limit in zip(keys, tats, limits):
+                    self._tats[key] = tat + cost * limit.interval
+            return Decision(True, tuple(f - cost for f in free), None, 0.0)
+
+    def peek(self, keys: Sequence[str], limits: Sequence[Limit]) -> Tuple[int, ...]:
+        return self.check(keys, limits, cost=0).remaining
+
+    def reset(self, keys: Sequence[str]):
+        with self._lock:
+            for key in keys:
+                self._tats.pop(key, None)
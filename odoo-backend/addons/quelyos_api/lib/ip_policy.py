@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Index de politique IP pour Quelyos API
+
+Les entrées de la liste d'accès IP (autorisations super admin, IPs
+bloquées) sont indexées dans un trie binaire de préfixes par famille
+d'adresses (IPv4 / IPv6). Une vérification parcourt au plus la longueur
+du préfixe le plus long, sans accès base ni parsing des règles.
+
+L'index est construit une fois par worker et par version des règles
+(voir quelyos.ip.whitelist._get_ip_policy).
+
+Usage:
+    policy = IPPolicy(entries, version='3')
+    policy.is_denied('203.0.113.7')          # PolicyEntry ou None
+    policy.is_allowed('10.0.0.5', user_id=2)  # bool
+"""
+
+import ipaddress
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+_logger = logging.getLogger(__name__)
+
+ACCESS_ALLOW = 'allow'
+ACCESS_DENY = 'deny'
+
+
+def parse_address(ip_string):
+    """Adresse IP normalisée (IPv4 mappée en IPv6 ramenée en IPv4), None si invalide"""
+    try:
+        address = ipaddress.ip_address((ip_string or '').strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        return address.ipv4_mapped
+    return address
+
+
+def parse_network(ip_string):
+    """Réseau d'une entrée: CIDR ou IP unique (/32, /128)"""
+    network = ipaddress.ip_network(ip_string.strip(), strict=False)
+    if network.version == 6 and network.network_address.ipv4_mapped and network.prefixlen >= 96:
+        network = ipaddress.ip_network(
+            f'{network.network_address.ipv4_mapped}/{network.prefixlen - 96}', strict=False
+        )
+    return network
+
+
+# =============================================================================
+# TRIE DE PRÉFIXES
+# =============================================================================
+
+class PrefixTrie:
+    """
+    Trie binaire de préfixes pour une famille d'adresses.
+
+    Noeud = [enfant_0, enfant_1, payloads]
+    """
+
+    __slots__ = ('bits', 'root', 'max_prefixlen', 'size')
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = [None, None, None]
+        self.max_prefixlen = -1
+        self.size = 0
+
+    def insert(self, network, payload):
+        value = int(network.network_address)
+        node = self.root
+        for i in range(network.prefixlen):
+            bit = (value >> (self.bits - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+        if node[2] is None:
+            node[2] = []
+        node[2].append(payload)
+        self.max_prefixlen = max(self.max_prefixlen, network.prefixlen)
+        self.size += 1
+
+    def matches(self, address) -> List[Any]:
+        """Payloads des préfixes contenant address, du moins au plus spécifique"""
+        result = []
+        node = self.root
+        if node[2]:
+            result.extend(node[2])
+        value = int(address)
+        shift = self.bits - 1
+        for i in range(self.max_prefixlen):
+            node = node[(value >> (shift - i)) & 1]
+            if node is None:
+                break
+            if node[2]:
+                result.extend(node[2])
+        return result
+
+    def __len__(self):
+        return self.size
+
+
+# =============================================================================
+# POLITIQUE
+# =============================================================================
+
+@dataclass(frozen=True)
+class PolicyEntry:
+    """Entrée de la liste d'accès IP (valeurs simples, indépendante de l'ORM)"""
+    id: int
+    name: str
+    ip_address: str
+    ip_type: str
+    access_type: str = ACCESS_ALLOW
+    user_ids: FrozenSet[int] = frozenset()
+    valid_from: Optional[datetime] = None
+    valid_until: Optional[datetime] = None
+
+    def is_valid(self, now: datetime) -> bool:
+        if self.valid_from and now < self.valid_from:
+            return False
+        return not (self.valid_until and now > self.valid_until)
+
+    def applies_to(self, user_id) -> bool:
+        return not (self.user_ids and user_id) or user_id in self.user_ids
+
+
+class IPPolicy:
+    """Index allow/deny des entrées actives pour une version donnée"""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]], version: Any = None):
+        """
+        Args:
+            entries: dicts des entrées actives (champs de quelyos.ip.whitelist),
+                     dans l'ordre d'affichage
+            version: version des règles ayant servi à la construction
+        """
+        self.version = version
+        self.entries: List[PolicyEntry] = []
+        self._tries = {
+            (access_type, version_): PrefixTrie(32 if version_ == 4 else 128)
+            for access_type in (ACCESS_ALLOW, ACCESS_DENY)
+            for version_ in (4, 6)
+        }
+        for values in entries:
+            entry = PolicyEntry(
+                id=values['id'],
+                name=values.get('name') or '',
+                ip_address=values['ip_address'],
+                ip_type=values.get('ip_type') or 'single',
+                access_type=values.get('access_type') or ACCESS_ALLOW,
+                user_ids=frozenset(values.get('user_ids') or ()),
+                valid_from=values.get('valid_from') or None,
+                valid_until=values.get('valid_until') or None,
+            )
+            try:
+                network = parse_network(entry.ip_address)
+            except ValueError:
+                _logger.warning(f"IP policy: entrée ignorée, adresse invalide: {entry.ip_address}")
+                continue
+            self._tries[(entry.access_type, network.version)].insert(network, entry)
+            self.entries.append(entry)
+
+        self.allow_count = sum(1 for e in self.entries if e.access_type == ACCESS_ALLOW)
+        self.deny_count = len(self.entries) - self.allow_count
+
+    def _matching(self, access_type, address) -> List[PolicyEntry]:
+        return self._tries[(access_type, address.version)].matches(address)
+
+    def is_denied(self, ip_string, now: datetime = None) -> Optional[PolicyEntry]:
+        """Entrée de blocage la plus spécifique couvrant l'IP, None sinon"""
+        if not self.deny_count:
+            return None
+        address = parse_address(ip_string)
+        if address is None:
+            return None
+        now = now or datetime.utcnow()
+        for entry in reversed(self._matching(ACCESS_DENY, address)):
+            if entry.is_valid(now):
+                return entry
+        return None
+
+    def is_allowed(self, ip_string, user_id=None, now: datetime = None) -> bool:
+        """
+        IP bloquée: refusée. Sans entrée d'autorisation active: mode permissif.
+        Sinon l'IP doit être couverte par une entrée valide pour l'utilisateur.
+        """
+        if self.is_denied(ip_string, now):
+            return False
+        if not self.allow_count:
+            return True
+        address = parse_address(ip_string)
+        if address is None:
+            _logger.warning(f"Invalid IP address format: {ip_string}")
+            return False
+        now = now or datetime.utcnow()
+        return any(
+            entry.is_valid(now) and entry.applies_to(user_id)
+            for entry in self._matching(ACCESS_ALLOW, address)
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.allow_count > 0,
+            'rules_count': self.allow_count,
+            'blocked_count': self.deny_count,
+            'rules': [{
+                'id': e.id,
+                'name': e.name,
+                'ip_address': e.ip_address,
+                'ip_type': e.ip_type,
+                'access_type': e.access_type,
+                'user_count': len(e.user_ids),
+            } for e in self.entries],
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -11,7 +11,6 @@ File d'attente pour tâches asynchrones:
 Utilise Celery avec Redis comme broker.
 """
 
-import os
 import logging
 import json
 from typing import Any, Dict, Optional, Callable
@@ -20,10 +19,10 @@ from functools import wraps
 from enum import Enum
 import uuid
 
+from .redis_client import get_redis, redis_available
+
 _logger = logging.getLogger(__name__)
 
-# Configuration
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
 JOB_QUEUE_PREFIX = 'quelyos:jobs:'
 
 
@@ -103,20 +102,10 @@ class JobQueue:
         queue.cancel(job_id)
     """
 
-    def __init__(self):
-        self._redis = None
-        self._init_redis()
-
-    def _init_redis(self):
-        """Initialise la connexion Redis"""
-        try:
-            import redis
-            self._redis = redis.from_url(REDIS_URL)
-            self._redis.ping()
-            _logger.info("Job queue connected to Redis")
-        except Exception as e:
-            _logger.warning(f"Redis not available for job queue: {e}")
-            self._redis = None
+    @property
+    def _redis(self):
+        """Client 'jobs' partagé, None tant que le circuit Redis est ouvert"""
+        return get_redis('jobs') if redis_available() else None
 
     def enqueue(
         self,
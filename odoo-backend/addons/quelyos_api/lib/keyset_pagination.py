@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination Keyset (seek method) pour Quelyos ERP
+
+Remplace OFFSET/LIMIT sur les listes volumineuses:
+- Curseurs opaques base64 encodant (valeurs de tri..., id)
+- Comparaison row-value en SQL: (invoice_date, id) < (%s, %s)
+- Départage systématique par id (tri stable même sur valeurs non uniques)
+- Gestion des NULL (NULLS LAST) par expansion lexicographique
+- Totaux approximatifs via pg_class.reltuples / EXPLAIN
+
+Performance: coût constant quelle que soit la profondeur de page,
+là où OFFSET parcourt et jette toutes les lignes précédentes.
+
+Usage:
+    paginator = KeysetPaginator('account.move', order='invoice_date desc')
+    page = paginator.paginate(env['account.move'].sudo(), domain,
+                              cursor=params.get('cursor'), limit=50)
+    page.records      # recordset ordonné
+    page.next_cursor  # None si dernière page
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+MAX_LIMIT = 1000
+DEFAULT_LIMIT = 50
+
+# En dessous de ce seuil estimé, on fait un COUNT exact (peu coûteux)
+EXACT_COUNT_THRESHOLD = 10000
+
+# Champs toujours renseignés par l'ORM (NOT NULL de fait)
+ALWAYS_SET_FIELDS = {'id', 'create_date', 'write_date'}
+
+
+class InvalidCursorError(ValueError):
+    """Curseur illisible, falsifié ou émis pour un autre tri"""
+
+
+# =============================================================================
+# CURSEURS
+# =============================================================================
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Valeur de curseur non sérialisable: {type(value).__name__}")
+
+
+def _order_signature(sort_keys: Sequence[Tuple[str, str]]) -> str:
+    """Empreinte courte du tri, pour rejeter un curseur réutilisé sur un autre tri"""
+    spec = ','.join(f"{field}:{direction}" for field, direction in sort_keys)
+    return hashlib.sha1(spec.encode()).hexdigest()[:8]
+
+
+def encode_cursor(values: Sequence[Any], sort_keys: Sequence[Tuple[str, str]]) -> str:
+    """
+    Encode les valeurs de tri de la dernière ligne en curseur opaque.
+
+    Args:
+        values: Valeurs des champs de tri, id en dernier
+        sort_keys: Tri effectif [(champ, 'asc'|'desc'), ...]
+
+    Returns:
+        Curseur base64 url-safe
+    """
+    payload = json.dumps(
+        {'v': list(values), 's': _order_signature(sort_keys)},
+        default=_json_default,
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_keys: Sequence[Tuple[str, str]]) -> List[Any]:
+    """
+    Décode un curseur opaque.
+
+    Raises:
+        InvalidCursorError: Curseur invalide ou émis pour un autre tri
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values = payload['v']
+        signature = payload['s']
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(f"Curseur invalide: {e}") from e
+
+    if signature != _order_signature(sort_keys) or len(values) != len(sort_keys):
+        raise InvalidCursorError("Curseur émis pour un autre tri")
+    if not isinstance(values[-1], int):
+        raise InvalidCursorError("Curseur invalide: id manquant")
+    return values
+
+
+# =============================================================================
+# PAGINATEUR
+# =============================================================================
+
+@dataclass
+class KeysetPage:
+    """Page de résultats keyset"""
+    records: Any
+    next_cursor: Optional[str]
+    has_more: bool
+
+    def to_dict(self) -> dict:
+        return {
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'count': len(self.records),
+        }
+
+
+def parse_order(order: str) -> List[Tuple[str, str]]:
+    """
+    Parse une chaîne de tri Odoo ('invoice_date desc, name') et ajoute
+    le départage par id si absent.
+    """
+    sort_keys = []
+    for part in (order or '').split(','):
+        tokens = part.strip().split()
+        if not tokens:
+            continue
+        direction = tokens[1].lower() if len(tokens) > 1 else 'asc'
+        if direction not in ('asc', 'desc') or len(tokens) > 2:
+            raise ValueError(f"Tri invalide: {part.strip()}")
+        sort_keys.append((tokens[0], direction))
+
+    if not sort_keys or sort_keys[-1][0] != 'id':
+        last_direction = sort_keys[-1][1] if sort_keys else 'desc'
+        sort_keys = [key for key in sort_keys if key[0] != 'id']
+        sort_keys.append(('id', last_direction))
+    return sort_keys
+
+
+class KeysetPaginator:
+    """
+    Pagination keyset sur un modèle Odoo.
+
+    Seuls les champs stockés (colonne SQL) sont triables; les many2one
+    sont triés par id de la cible, ce qui reste stable pour le keyset.
+    """
+
+    def __init__(self, model: str, order: str = 'id desc', not_null: Sequence[str] = ()):
+        """
+        Args:
+            model: Nom du modèle Odoo
+            order: Tri Odoo ('champ dir, ...'), départage id ajouté automatiquement
+            not_null: Champs garantis non NULL (active la comparaison row-value)
+        """
+        self.model = model
+        self.sort_keys = parse_order(order)
+        self.not_null = set(not_null) | ALWAYS_SET_FIELDS
+
+    def _check_fields(self, Model):
+        for field_name, _direction in self.sort_keys:
+            field = Model._fields.get(field_name)
+            if not field or not field.store or not field.column_type or field.translate:
+                raise ValueError(f"Champ '{field_name}' non triable en keyset sur {self.model}")
+
+    def _is_not_null(self, Model, field_name: str) -> bool:
+        return field_name in self.not_null or Model._fields[field_name].required
+
+    def _use_row_value(self, Model) -> bool:
+        """Row-value possible si une seule direction et aucune colonne NULL"""
+        directions = {direction for _field, direction in self.sort_keys}
+        return len(directions) == 1 and all(
+            self._is_not_null(Model, field_name) for field_name, _d in self.sort_keys
+        )
+
+    def _order_sql(self, columns: List[SQL], row_value: bool) -> SQL:
+        terms = []
+        for column, (_field, direction) in zip(columns, self.sort_keys):
+            if row_value:
+                terms.append(SQL("%s " + direction.upper(), column))
+            else:
+                terms.append(SQL("%s " + direction.upper() + " NULLS LAST", column))
+        return SQL(", ").join(terms)
+
+    def _seek_sql(self, columns: List[SQL], values: List[Any], row_value: bool) -> SQL:
+        """Condition 'strictement après la ligne curseur' dans l'ordre de tri"""
+        if row_value:
+            operator = '<' if self.sort_keys[0][1] == 'desc' else '>'
+            return SQL(
+                "(%s) " + operator + " (%s)",
+                SQL(", ").join(columns),
+                SQL(", ").join(SQL("%s", value) for value in values),
+            )
+
+        # Expansion lexicographique: (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ...
+        # avec NULLS LAST: une valeur NULL est "après" toute valeur non NULL
+        branches = []
+        equalities = []
+        for column, value, (_field, direction) in zip(columns, values, self.sort_keys):
+            operator = '<' if direction == 'desc' else '>'
+            if value is None:
+                after = None  # rien n'est après NULL sur cette colonne
+                equal = SQL("%s IS NULL", column)
+            else:
+                after = SQL("(%s " + operator + " %s OR %s IS NULL)", column, value, column)
+                equal = SQL("%s = %s", column, value)
+            if after is not None:
+                branches.append(SQL(" AND ").join(equalities + [after]))
+            equalities.append(equal)
+
+        if not branches:
+            return SQL("FALSE")
+        return SQL("(%s)", SQL(" OR ").join(SQL("(%s)", branch) for branch in branches))
+
+    def paginate(self, Model, domain: list, cursor: Optional[str] = None,
+                 limit: int = DEFAULT_LIMIT) -> KeysetPage:
+        """
+        Retourne la page suivant le curseur.
+
+        Args:
+            Model: Recordset vide du modèle (sudo/contexte conservés)
+            domain: Domaine Odoo
+            cursor: Curseur opaque de la page précédente (None = première page)
+            limit: Taille de page
+
+        Raises:
+            InvalidCursorError: Curseur invalide
+            ValueError: Champ de tri non stocké
+        """
+        self._check_fields(Model)
+        limit = min(max(1, int(limit)), MAX_LIMIT)
+        row_value = self._use_row_value(Model)
+
+        query = Model._search(domain)
+        columns = [SQL.identifier(query.table, field_name) for field_name, _d in self.sort_keys]
+
+        if cursor:
+            values = decode_cursor(cursor, self.sort_keys)
+            query.add_where(self._seek_sql(columns, values, row_value))
+
+        query.order = self._order_sql(columns, row_value)
+        query.limit = limit + 1
+
+        Model.env.cr.execute(query.select(*columns))
+        rows = Model.env.cr.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = encode_cursor(rows[-1], self.sort_keys) if has_more and rows else None
+        records = Model.browse([row[-1] for row in rows])
+        return KeysetPage(records=records, next_cursor=next_cursor, has_more=has_more)
+
+
+# =============================================================================
+# TOTAUX APPROXIMATIFS
+# =============================================================================
+
+def approximate_count(Model, domain: Optional[list] = None,
+                      exact_threshold: int = EXACT_COUNT_THRESHOLD) -> Tuple[int, bool]:
+    """
+    Estime le nombre de lignes sans COUNT(*) complet.
+
+    - Sans domaine: pg_class.reltuples (statistiques ANALYZE)
+    - Avec domaine: estimation du planner (EXPLAIN, "Plan Rows")
+    - Estimation sous le seuil: COUNT exact
+
+    Args:
+        Model: Recordset vide du modèle
+        domain: Domaine Odoo (None = table entière)
+        exact_threshold: Seuil sous lequel le COUNT exact est préféré
+
+    Returns:
+        Tuple (total, exact)
+    """
+    cr = Model.env.cr
+
+    if not domain:
+        cr.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            (Model._table,),
+        )
+        row = cr.fetchone()
+        estimate = row[0] if row else -1
+    else:
+        query = Model._search(domain)
+        cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select(SQL("1"))))
+        plan = cr.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    # reltuples = -1 si la table n'a jamais été analysée
+    if estimate < 0 or estimate < exact_threshold:
+        return Model.search_count(domain or []), True
+    return estimate, False
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Arbre des emplacements de stock avec quantités agrégées
+
+Tout l'arbre d'un entrepôt en deux requêtes, sans parcours récursif:
+- emplacements internes / vues triés par parent_path (parents avant enfants)
+- quants groupés par emplacement (quantité, valeur au coût standard), puis
+  cumulés sur chaque ancêtre en dépliant parent_path
+  (unnest(string_to_array(parent_path, '/')))
+
+Le résultat est mis en cache Redis par (société, entrepôt) et invalidé après
+commit par les écritures sur stock.location et stock.quant
+(invalidate_location_trees).
+
+Usage:
+    tree = LocationTree(env, warehouse_id=wh_id).get()
+    tree[0]['stock_count'], tree[0]['rollup_count'], tree[0]['rollup_value']
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from odoo.tools import SQL
+
+from .cache import get_cache_service, CacheTTL
+
+_logger = logging.getLogger(__name__)
+
+# Entrepôts à invalider dans cr.postcommit.data: {(company_id, warehouse_id)}
+DIRTY_KEY = 'quelyos.location_tree.dirty'
+
+TREE_USAGES = ('internal', 'view')
+
+
+def _cache_key(company_id: int, warehouse_id: Optional[int]) -> str:
+    return f"tenant:{company_id}:stock:locations:tree:{warehouse_id or 'all'}"
+
+
+class LocationTree:
+    """
+    Hiérarchie des emplacements internes et vues de la société courante.
+
+    Args:
+        env: Environment (sudo() en général, société = env.company)
+        warehouse_id: Limiter à l'arbre d'un entrepôt
+    """
+
+    def __init__(self, env, warehouse_id: Optional[int] = None):
+        self.env = env
+        self.company_id = env.company.id
+        self.warehouse_id = int(warehouse_id) if warehouse_id else None
+        self.root_path = None
+        if self.warehouse_id:
+            warehouse = env['stock.warehouse'].browse(self.warehouse_id)
+            self.root_path = warehouse.view_location_id.parent_path
+
+    def get(self) -> List[Dict[str, Any]]:
+        """Arbre depuis le cache, calculé et mis en cache sinon"""
+        cache = get_cache_service()
+        key = _cache_key(self.company_id, self.warehouse_id)
+        tree = cache.get(key)
+        if tree is None:
+            tree = self.compute()
+            cache.set(key, tree, CacheTTL.STOCK_SUMMARY)
+        return tree
+
+    def compute(self) -> List[Dict[str, Any]]:
+        """
+        Emplacements triés par parent_path avec stock propre (stock_count,
+        stock_value) et cumulé sur les descendants (rollup_count, rollup_value).
+        """
+        Product = self.env['product.product'].with_context(active_test=False)
+        query = Product._search([])
+        costs = query.select(
+            SQL.identifier(query.table, 'id'),
+            SQL('%s AS cost', Product._field_to_sql(query.table, 'standard_price', query)),
+        )
+        root_filter = SQL('l.parent_path LIKE %s', f'{self.root_path}%') if self.root_path else SQL('TRUE')
+
+        self.env.cr.execute(SQL(
+            """
+            WITH tree AS (
+                SELECT l.id, l.name, l.complete_name, l.usage, l.location_id AS parent_id,
+                       l.warehouse_id, l.barcode, l.active, l.parent_path
+                  FROM stock_location l
+                 WHERE l.usage IN %(usages)s
+                   AND (l.company_id = %(company_id)s OR l.company_id IS NULL)
+                   AND %(root_filter)s
+            ),
+            own AS (
+                SELECT q.location_id, SUM(q.quantity) AS qty, SUM(q.quantity * COALESCE(c.cost, 0)) AS value
+                  FROM stock_quant q
+                  JOIN tree t ON t.id = q.location_id
+                  LEFT JOIN (%(costs)s) c ON c.id = q.product_id
+                 WHERE q.quantity > 0
+                 GROUP BY q.location_id
+            ),
+            rollup AS (
+                SELECT ancestor.id::int AS id, SUM(o.qty) AS qty, SUM(o.value) AS value
+                  FROM own o
+                  JOIN tree t ON t.id = o.location_id
+                 CROSS JOIN unnest(string_to_array(rtrim(t.parent_path, '/'), '/')) AS ancestor(id)
+                 GROUP BY ancestor.id
+            )
+            SELECT t.id, t.name, t.complete_name, t.usage, t.parent_id, t.warehouse_id,
+                   t.barcode, t.active,
+                   COALESCE(o.qty, 0) AS stock_count, COALESCE(o.value, 0) AS stock_value,
+                   COALESCE(r.qty, 0) AS rollup_count, COALESCE(r.value, 0) AS rollup_value
+              FROM tree t
+              LEFT JOIN own o ON o.location_id = t.id
+              LEFT JOIN rollup r ON r.id = t.id
+             ORDER BY t.parent_path
+            """,
+            usages=TREE_USAGES,
+            company_id=self.company_id,
+            root_filter=root_filter,
+            costs=costs,
+        ))
+        rows = self.env.cr.dictfetchall()
+
+        warehouses = self.env['stock.warehouse'].browse({row['warehouse_id'] for row in rows if row['warehouse_id']})
+        warehouse_names = {warehouse.id: warehouse.name for warehouse in warehouses}
+        return [{
+            'id': row['id'],
+            'name': row['name'],
+            'complete_name': row['complete_name'],
+            'usage': row['usage'],
+            'parent_id': row['parent_id'],
+            'warehouse_id': row['warehouse_id'],
+            'warehouse_name': warehouse_names.get(row['warehouse_id']),
+            'barcode': row['barcode'] or '',
+            'active': row['active'],
+            'stock_count': round(float(row['stock_count']), 2),
+            'stock_value': round(float(row['stock_value']), 2),
+            'rollup_count': round(float(row['rollup_count']), 2),
+            'rollup_value': round(float(row['rollup_value']), 2),
+        } for row in rows]
+
+
+def invalidate_location_trees(env, locations: Iterable) -> None:
+    """
+    Invalide après commit les arbres en cache des entrepôts des emplacements
+    donnés (et l'arbre toutes entrepôts de leur société).
+    """
+    keys = {(location.company_id.id, location.warehouse_id.id) for location in locations if location.company_id}
+    if not keys:
+        return
+    dirty = env.cr.postcommit.data.setdefault(DIRTY_KEY, set())
+    if not dirty:
+        env.cr.postcommit.add(lambda: _flush(dirty))
+    dirty.update(keys)
+
+
+def _flush(dirty) -> None:
+    cache = get_cache_service()
+    for company_id, warehouse_id in dirty:
+        cache.delete(_cache_key(company_id, warehouse_id))
+        cache.delete(_cache_key(company_id, None))
+    dirty.clear()
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Transport Email en masse pour Quelyos ERP
+
+Pipeline d'envoi des campagnes marketing:
+- Template compilé une seule fois (liens trackés réécrits une fois,
+  placeholders par destinataire rendus par simple concaténation)
+- Envoi par lots vers SMTP (pool de connexions persistantes) ou Brevo
+  (API batch messageVersions, session HTTP keep-alive)
+- Statistiques de débit (messages/s) et progression
+
+Module sans dépendance Odoo: testable/benchmarkable contre un sink SMTP local
+(aiosmtpd) avec scripts/bench_campaign_sender.py.
+"""
+
+import re
+import time
+import queue
+import smtplib
+import logging
+from dataclasses import dataclass, field
+from html import escape as html_escape
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+_logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Taille des lots envoyés au transport (et fréquence de mise à jour progression)
+DEFAULT_BATCH_SIZE = 500
+
+# Connexions SMTP simultanées par envoi de campagne
+DEFAULT_SMTP_POOL_SIZE = 4
+
+# Recycler une connexion SMTP après N messages (limites serveurs type Postfix)
+SMTP_MAX_MESSAGES_PER_CONNECTION = 1000
+
+# Limite Brevo: 1000 messageVersions par appel /v3/smtp/email
+BREVO_MAX_VERSIONS = 1000
+BREVO_API_URL = 'https://api.brevo.com/v3/smtp/email'
+
+HREF_PATTERN = re.compile(r'href=["\']([^"\']+)["\']')
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+SKIPPED_URL_PREFIXES = ('#', 'mailto:', 'tel:', 'javascript:', '/')
+
+# Placeholders alimentés par des données contact: échappés au rendu
+ESCAPED_PLACEHOLDERS = frozenset({'name', 'email'})
+
+
+# =============================================================================
+# TEMPLATE COMPILÉ
+# =============================================================================
+
+class CompiledTemplate:
+    """
+    Template HTML pré-compilé en segments statiques + placeholders.
+
+    La réécriture des liens trackés (regex + lookup link tracker) est faite
+    une seule fois à la compilation; render() ne fait qu'un join de chaînes.
+
+    Usage:
+        template = CompiledTemplate(html, resolve_link=tracker.resolve)
+        body = template.render({'unsubscribe_url': url, 'name': 'Alice'})
+    """
+
+    def __init__(self, html: str, resolve_link: Optional[Callable[[str], str]] = None):
+        html = html or ''
+        if resolve_link:
+            html = self._rewrite_links(html, resolve_link)
+        self._parts = PLACEHOLDER_PATTERN.split(html)
+        # split() alterne texte / nom de placeholder
+        self.placeholders = set(self._parts[1::2])
+
+    @staticmethod
+    def _rewrite_links(html: str, resolve_link: Callable[[str], str]) -> str:
+        resolved: Dict[str, str] = {}
+
+        def replace_url(match):
+            original_url = match.group(1)
+            if original_url.startswith(SKIPPED_URL_PREFIXES) or '{{' in original_url:
+                return match.group(0)
+            if original_url not in resolved:
+                try:
+                    resolved[original_url] = resolve_link(original_url)
+                except Exception as e:
+                    _logger.warning(f"Link tracking failed for {original_url}: {e}")
+                    resolved[original_url] = original_url
+            return f'href="{resolved[original_url]}"'
+
+        return HREF_PATTERN.sub(replace_url, html)
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self._parts
+        if len(parts) == 1:
+            return parts[0]
+        out = []
+        for i, part in enumerate(parts):
+            if not i % 2:
+                out.append(part)
+                continue
+            value = values.get(part, '')
+            out.append(html_escape(value) if part in ESCAPED_PLACEHOLDERS else value)
+        return ''.join(out)
+
+
+# =============================================================================
+# MESSAGES & STATISTIQUES
+# =============================================================================
+
+@dataclass
+class OutgoingEmail:
+    """Message rendu prêt à l'envoi"""
+    to: str
+    subject: str
+    html: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class SendStats:
+    """Statistiques cumulées d'un envoi"""
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.started_at, 1e-9)
+
+    @property
+    def rate(self) -> float:
+        """Messages envoyés par seconde"""
+        return self.sent / self.elapsed
+
+    @property
+    def progress(self) -> float:
+        return (self.processed / self.total * 100) if self.total else 100.0
+
+    def record_error(self, error: str):
+        self.failed += 1
+        # Garder un échantillon borné des erreurs pour le diagnostic
+        if len(self.errors) < 20:
+            self.errors.append(error)
+
+    def to_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'progress': round(self.progress, 1),
+            'rate': round(self.rate, 1),
+            'elapsed': round(self.elapsed, 2),
+        }
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    """Découpe un itérable en listes de taille size (streaming)"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+class BaseTransport:
+    """Interface transport: send_batch(messages, stats) puis close()"""
+
+    def __init__(self, email_from: str, email_from_name: str = ''):
+        self.sender = formataddr((email_from_name, email_from)) if email_from_name else email_from
+        self.email_from = email_from
+        self.email_from_name = email_from_name
+
+    def send_batch(self, messages: List[OutgoingEmail], stats: SendStats):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SMTPTransport(BaseTransport):
+    """
+    Transport SMTP avec pool de connexions persistantes.
+
+    Chaque connexion est réutilisée pour de nombreux messages (pas de
+    handshake/login par email) et recyclée après SMTP_MAX_MESSAGES_PER_CONNECTION.
+    """
+
+    def __init__(self, host: str, port: int = 587, user: str = None, password: str = None,
+                 encryption: str = 'tls', email_from: str = '', email_from_name: str = '',
+                 pool_size: int = DEFAULT_SMTP_POOL_SIZE, timeout: int = 30):
+        super().__init__(email_from, email_from_name)
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.encryption = encryption
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='smtp')
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.encryption == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.encryption == 'tls':
+                server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        server._quelyos_sent = 0
+        return server
+
+    def _acquire(self) -> smtplib.SMTP:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, server: smtplib.SMTP):
+        if server._quelyos_sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            self._quit(server)
+        else:
+            self._pool.put(server)
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def _build(self, message: OutgoingEmail) -> EmailMessage:
+        msg = EmailMessage()
+        msg['From'] = self.sender
+        msg['To'] = message.to
+        msg['Subject'] = message.subject
+        msg['Message-ID'] = make_msgid()
+        for name, value in message.headers.items():
+            msg[name] = value
+        msg.set_content(message.html, subtype='html')
+        return msg
+
+    def _send_slice(self, messages: List[OutgoingEmail]):
+        """
+        Envoie une tranche sur une seule connexion (un thread du pool).
+
+        Résultat compté message par message: un message refusé n'affecte
+        que lui; une erreur de transport abandonne la connexion (jamais
+        rendue au pool) et le message est retenté une fois sur une nouvelle
+        connexion. Si la connexion ne peut être rétablie, seuls les messages
+        restants sont en échec.
+        """
+        sent, errors = 0, []
+        server = None
+        for index, message in enumerate(messages):
+            for attempt in range(2):
+                if server is None:
+                    try:
+                        server = self._acquire()
+                    except (smtplib.SMTPException, OSError) as e:
+                        _logger.error(f"SMTP connection failed: {e}")
+                        errors.extend(f"{m.to}: {e}" for m in messages[index:])
+                        return sent, errors
+                try:
+                    server.send_message(self._build(message), from_addr=self.email_from, to_addrs=[message.to])
+                    server._quelyos_sent += 1
+                    sent += 1
+                    break
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    errors.append(f"{message.to}: {e}")
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    # Connexion dans un état inconnu: abandonnée
+                    self._quit(server)
+                    server = None
+                    if attempt:
+                        errors.append(f"{message.to}: {e}")
+        if server is not None:
+            self._release(server)
+        return sent, errors
+
+    def send_batch(self, messages: List[OutgoingEmail], stats: SendStats):
+        if not messages:
+            return
+        slice_size = -(-len(messages) // self.pool_size)
+        slices = [messages[i:i + slice_size] for i in range(0, len(messages), slice_size)]
+        futures = [(self._executor.submit(self._send_slice, s), s) for s in slices]
+        for future, messages_slice in futures:
+            try:
+                sent, errors = future.result()
+            except Exception as e:
+                # Erreur inattendue (hors SMTP/réseau): tranche comptée en échec
+                _logger.error(f"SMTP batch failed: {e}", exc_info=True)
+                sent, errors = 0, [f"{m.to}: {e}" for m in messages_slice]
+            stats.sent += sent
+            for error in errors:
+                stats.record_error(error)
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._pool.get_nowait())
+            except queue.Empty:
+                break
+        self._executor.shutdown(wait=True)
+
+
+class BrevoTransport(BaseTransport):
+    """
+    Transport Brevo via l'API transactionnelle batch (messageVersions).
+
+    Un seul appel HTTP par tranche de 1000 destinataires, sur une session
+    requests persistante (keep-alive). Sujet, contenu et en-têtes
+    (List-Unsubscribe) sont portés par chaque messageVersion.
+    """
+
+    def __init__(self, api_key: str, email_from: str, email_from_name: str = '',
+                 api_url: str = BREVO_API_URL, timeout: int = 30):
+        super().__init__(email_from, email_from_name)
+        import requests
+        self.api_url = api_url
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({
+            'api-key': api_key,
+            'accept': 'application/json',
+            'content-type': 'application/json',
+        })
+
+    def send_batch(self, messages: List[OutgoingEmail], stats: SendStats):
+        for group in chunked(messages, BREVO_MAX_VERSIONS):
+            self._send_group(group, stats)
+
+    @staticmethod
+    def _version(message: OutgoingEmail) -> dict:
+        version = {
+            'to': [{'email': message.to}],
+            'subject': message.subject,
+            'htmlContent': message.html,
+        }
+        if message.headers:
+            # En-têtes par destinataire (List-Unsubscribe tokenisé)
+            version['headers'] = dict(message.headers)
+        return version
+
+    def _send_group(self, group: List[OutgoingEmail], stats: SendStats):
+        payload = {
+            'sender': {'email': self.email_from, 'name': self.email_from_name or None},
+            'subject': group[0].subject,
+            'htmlContent': group[0].html,
+            'messageVersions': [self._version(m) for m in group],
+        }
+        try:
+            response = self._session.post(self.api_url, json=payload, timeout=self.timeout)
+            if response.status_code in (200, 201, 202):
+                stats.sent += len(group)
+                return
+            error = f"Brevo HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            error = f"Brevo error: {e}"
+        _logger.error(error)
+        for m in group:
+            stats.record_error(f"{m.to}: {error}")
+
+    def close(self):
+        self._session.close()
+
+
+class DryRunTransport(BaseTransport):
+    """Transport de simulation (aucune configuration email active)"""
+
+    def __init__(self):
+        super().__init__('noreply@localhost')
+
+    def send_batch(self, messages: List[OutgoingEmail], stats: SendStats):
+        stats.sent += len(messages)
+
+
+def get_transport(config, pool_size: int = DEFAULT_SMTP_POOL_SIZE) -> BaseTransport:
+    """
+    Construit le transport depuis un quelyos.email.config (ou objet équivalent).
+
+    Raises:
+        ValueError: Provider non supporté ou configuration incomplète
+    """
+    if config.provider == 'brevo':
+        if not config.api_key:
+            raise ValueError("API Key Brevo manquante")
+        return BrevoTransport(config.api_key, config.email_from, config.email_from_name or '')
+
+    if config.provider == 'smtp':
+        if not config.smtp_host:
+            raise ValueError("Configuration SMTP incomplète")
+        return SMTPTransport(
+            host=config.smtp_host,
+            port=config.smtp_port or 587,
+            user=config.smtp_user,
+            password=config.smtp_password,
+            encryption=config.smtp_encryption or 'tls',
+            email_from=config.email_from,
+            email_from_name=config.email_from_name or '',
+            pool_size=pool_size,
+        )
+
+    raise ValueError(f"Provider email non supporté pour l'envoi en masse: {config.provider}")
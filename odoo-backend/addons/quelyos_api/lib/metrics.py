@@ -9,11 +9,22 @@ Collecte de métriques avec Prometheus:
 - Métriques business
 
 Compatible avec l'exporteur Prometheus standard.
+
+Multi-process (workers prefork): les valeurs sont écrites dans des
+fichiers mmap par worker (PROMETHEUS_MULTIPROC_DIR) et fusionnées à la
+collecte, si bien que /metrics renvoie le total de tous les workers
+quel que soit celui qui répond. Le répertoire vient de l'environnement,
+sinon de l'option Odoo metrics_multiproc_dir, sinon d'un répertoire
+temporaire dès que workers > 0.
 """
 
 import os
+import re
+import glob
 import time
+import bisect
 import logging
+import tempfile
 from typing import Dict, Any, Optional
 from functools import wraps
 from datetime import datetime
@@ -24,15 +35,95 @@ _logger = logging.getLogger(__name__)
 METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
 METRICS_PREFIX = 'quelyos_'
 
+
+def _multiprocess_dir() -> Optional[str]:
+    """Répertoire mmap partagé entre workers (None = process unique)"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        return path
+    try:
+        from odoo.tools import config
+    except ImportError:
+        return None
+    path = config.get('metrics_multiproc_dir')
+    if not path and config.get('workers'):
+        port = config.get('http_port') or 8069
+        path = os.path.join(tempfile.gettempdir(), f'quelyos_metrics_{port}')
+    return path or None
+
+
+METRICS_MULTIPROC_DIR = _multiprocess_dir() if METRICS_ENABLED else None
+if METRICS_MULTIPROC_DIR:
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    # Lu par prometheus_client à la création de chaque valeur
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = METRICS_MULTIPROC_DIR
+
 # Essayer d'importer prometheus_client
 try:
     from prometheus_client import Counter, Histogram, Gauge, Summary, Info
     from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess, values as prometheus_values
     PROMETHEUS_AVAILABLE = True
 except ImportError:
     PROMETHEUS_AVAILABLE = False
     _logger.info("prometheus_client not installed. Metrics will be collected in-memory only.")
 
+_DB_FILE_PID = re.compile(r'_(\d+)\.db$')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_files() -> Dict[int, list]:
+    """Fichiers mmap du répertoire partagé, par pid"""
+    files: Dict[int, list] = {}
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, '*.db')):
+        match = _DB_FILE_PID.search(path)
+        if match:
+            files.setdefault(int(match.group(1)), []).append(path)
+    return files
+
+
+def _mark_dead_workers():
+    """Retire les jauges 'live*' des workers terminés (recyclés, tués)"""
+    for pid in _worker_files():
+        if not _pid_alive(pid):
+            multiprocess.mark_process_dead(pid, METRICS_MULTIPROC_DIR)
+
+
+def _init_multiprocess():
+    """
+    Active le mode multi-process de prometheus_client.
+
+    Au démarrage du serveur (aucun process vivant dans le répertoire),
+    les fichiers d'une exécution précédente sont supprimés; sinon seules
+    les jauges des workers morts sont retirées (les compteurs des workers
+    recyclés restent comptés).
+    """
+    files = _worker_files()
+    if not any(_pid_alive(pid) for pid in files if pid != os.getpid()):
+        for paths in files.values():
+            for path in paths:
+                os.remove(path)
+    else:
+        _mark_dead_workers()
+
+    # prometheus_client déjà importé ailleurs sans la variable d'environnement
+    if not getattr(prometheus_values.ValueClass, '_multiprocess', False):
+        prometheus_values.ValueClass = prometheus_values.MultiProcessValue()
+
+
+MULTIPROCESS = bool(PROMETHEUS_AVAILABLE and METRICS_MULTIPROC_DIR)
+if MULTIPROCESS:
+    _init_multiprocess()
+
 
 # =============================================================================
 # REGISTRY
@@ -72,6 +163,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
         f'{METRICS_PREFIX}http_requests_in_progress',
         'Number of HTTP requests in progress',
         ['method', 'endpoint'],
+        multiprocess_mode='livesum',
         registry=REGISTRY
     )
 
@@ -114,6 +206,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
         f'{METRICS_PREFIX}products_total',
         'Total number of products',
         ['status'],
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 
@@ -121,12 +214,29 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
         f'{METRICS_PREFIX}products_stock_level',
         'Product stock levels',
         ['product_id', 'warehouse'],
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 
     low_stock_products = Gauge(
         f'{METRICS_PREFIX}products_low_stock',
         'Number of products with low stock',
+        multiprocess_mode='mostrecent',
+        registry=REGISTRY
+    )
+
+    # Campagnes marketing
+    campaign_emails_total = Counter(
+        f'{METRICS_PREFIX}campaign_emails_total',
+        'Campaign emails handed to the transport',
+        ['status'],
+        registry=REGISTRY
+    )
+
+    campaign_send_rate = Gauge(
+        f'{METRICS_PREFIX}campaign_send_rate',
+        'Current campaign send rate (emails/s)',
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 
@@ -134,6 +244,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
     customers_total = Gauge(
         f'{METRICS_PREFIX}customers_total',
         'Total number of customers',
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 
@@ -141,6 +252,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
     active_sessions = Gauge(
         f'{METRICS_PREFIX}active_sessions',
         'Number of active user sessions',
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 else:
@@ -149,6 +261,8 @@ else:
     products_total = None
     products_stock_level = None
     low_stock_products = None
+    campaign_emails_total = None
+    campaign_send_rate = None
     customers_total = None
     active_sessions = None
 
@@ -163,6 +277,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
         f'{METRICS_PREFIX}db_connections',
         'Number of database connections',
         ['state'],
+        multiprocess_mode='livesum',
         registry=REGISTRY
     )
 
@@ -194,6 +309,7 @@ if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
         f'{METRICS_PREFIX}job_queue_size',
         'Number of jobs in queue',
         ['queue'],
+        multiprocess_mode='mostrecent',
         registry=REGISTRY
     )
 
@@ -212,6 +328,80 @@ else:
     jobs_processed = None
 
 
+# =============================================================================
+# MÉTRIQUES REDIS
+# =============================================================================
+
+if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
+    redis_commands_total = Counter(
+        f'{METRICS_PREFIX}redis_commands_total',
+        'Redis commands sent (rejected = circuit open)',
+        ['client', 'status'],
+        registry=REGISTRY
+    )
+
+    redis_roundtrip_duration = Histogram(
+        f'{METRICS_PREFIX}redis_roundtrip_duration_seconds',
+        'Redis round-trip latency (single command or pipeline)',
+        ['client', 'kind'],
+        buckets=[.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1.0],
+        registry=REGISTRY
+    )
+
+    redis_pool_connections = Gauge(
+        f'{METRICS_PREFIX}redis_pool_connections',
+        'Redis pool connections of this worker',
+        ['pool', 'state'],
+        multiprocess_mode='livesum',
+        registry=REGISTRY
+    )
+
+    redis_circuit_open = Gauge(
+        f'{METRICS_PREFIX}redis_circuit_open',
+        'Shared Redis circuit breaker state (1 = open)',
+        multiprocess_mode='livemax',
+        registry=REGISTRY
+    )
+else:
+    redis_commands_total = None
+    redis_roundtrip_duration = None
+    redis_pool_connections = None
+    redis_circuit_open = None
+
+
+# =============================================================================
+# MÉTRIQUES SQL PAR REQUÊTE (traces échantillonnées du profiler)
+# =============================================================================
+
+if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
+    db_request_queries = Histogram(
+        f'{METRICS_PREFIX}db_request_queries',
+        'SQL queries per traced HTTP request',
+        ['endpoint'],
+        buckets=[1, 2, 5, 10, 20, 50, 100, 200, 500],
+        registry=REGISTRY
+    )
+
+    db_request_sql_duration = Histogram(
+        f'{METRICS_PREFIX}db_request_sql_seconds',
+        'Total SQL time per traced HTTP request',
+        ['endpoint'],
+        buckets=[.001, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5],
+        registry=REGISTRY
+    )
+
+    db_n_plus_one_total = Counter(
+        f'{METRICS_PREFIX}db_n_plus_one_total',
+        'Repeated query fingerprints (N+1) in traced requests',
+        ['endpoint'],
+        registry=REGISTRY
+    )
+else:
+    db_request_queries = None
+    db_request_sql_duration = None
+    db_n_plus_one_total = None
+
+
 # =============================================================================
 # DÉCORATEURS
 # =============================================================================
@@ -311,9 +501,12 @@ def track_db_query(operation: str = 'query'):
     return decorator
 
 
-def track_cache(cache_type: str = 'default'):
+def track_cache(cache_type=None):
     """
     Décorateur pour tracker les hits/misses du cache.
+
+    cache_type: libellé fixe, ou fonction recevant les arguments de l'appel
+    (ex: préfixe de la clé) -- garder une cardinalité bornée.
     """
     def decorator(func):
         @wraps(func)
@@ -321,13 +514,14 @@ def track_cache(cache_type: str = 'default'):
             result = func(*args, **kwargs)
 
             if METRICS_ENABLED and PROMETHEUS_AVAILABLE:
+                label = cache_type(*args, **kwargs) if callable(cache_type) else (cache_type or 'default')
                 # Supposer que None = miss, sinon = hit
                 if result is None:
                     if cache_misses:
-                        cache_misses.labels(cache_type=cache_type).inc()
+                        cache_misses.labels(cache_type=label).inc()
                 else:
                     if cache_hits:
-                        cache_hits.labels(cache_type=cache_type).inc()
+                        cache_hits.labels(cache_type=label).inc()
 
             return result
         return wrapper
@@ -365,22 +559,92 @@ def update_low_stock_count(count: int):
         low_stock_products.set(count)
 
 
+def record_campaign_batch(sent: int, failed: int, rate: float):
+    """Enregistre un lot d'emails de campagne envoyé"""
+    if not METRICS_ENABLED:
+        return
+
+    if campaign_emails_total:
+        campaign_emails_total.labels(status='sent').inc(sent)
+        campaign_emails_total.labels(status='failed').inc(failed)
+
+    if campaign_send_rate:
+        campaign_send_rate.set(rate)
+
+
 def update_session_count(count: int):
     """Met à jour le compteur de sessions actives"""
     if METRICS_ENABLED and active_sessions:
         active_sessions.set(count)
 
 
+def record_redis_call(client: str, kind: str, duration: float, commands: int, status: str):
+    """Enregistre un aller-retour Redis (commande seule ou pipeline)"""
+    if not METRICS_ENABLED or not redis_commands_total:
+        return
+
+    redis_commands_total.labels(client=client, status=status).inc(commands)
+    if status != 'rejected':
+        redis_roundtrip_duration.labels(client=client, kind=kind).observe(duration)
+
+
+def record_query_trace(endpoint: str, queries: int, sql_seconds: float, n_plus_one: int = 0):
+    """Enregistre la trace SQL d'une requête HTTP échantillonnée"""
+    if not METRICS_ENABLED or not db_request_queries:
+        return
+
+    db_request_queries.labels(endpoint=endpoint).observe(queries)
+    db_request_sql_duration.labels(endpoint=endpoint).observe(sql_seconds)
+    if n_plus_one:
+        db_n_plus_one_total.labels(endpoint=endpoint).inc(n_plus_one)
+
+
+def set_redis_circuit(is_open: bool):
+    """Met à jour l'état du circuit Redis partagé"""
+    if METRICS_ENABLED and redis_circuit_open:
+        redis_circuit_open.set(1 if is_open else 0)
+
+
+def set_redis_pool_connections(pool: str, in_use: int, idle: int):
+    """Met à jour les connexions d'un pool Redis"""
+    if METRICS_ENABLED and redis_pool_connections:
+        redis_pool_connections.labels(pool=pool, state='in_use').set(in_use)
+        redis_pool_connections.labels(pool=pool, state='idle').set(idle)
+
+
 # =============================================================================
 # EXPORT
 # =============================================================================
 
+# Fonctions appelées avant chaque export (jauges calculées à la demande)
+_collect_hooks = []
+
+
+def register_collect_hook(hook):
+    """Enregistre une fonction de mise à jour appelée avant get_metrics()"""
+    if hook not in _collect_hooks:
+        _collect_hooks.append(hook)
+
+
 def get_metrics() -> bytes:
     """Retourne les métriques au format Prometheus"""
     if not PROMETHEUS_AVAILABLE:
         return b'# Prometheus client not installed\n'
 
-    return generate_latest(REGISTRY)
+    for hook in _collect_hooks:
+        try:
+            hook()
+        except Exception as e:
+            _logger.warning(f"Metrics collect hook failed: {e}")
+
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+
+    # Fusion des fichiers de tous les workers (registre éphémère)
+    _mark_dead_workers()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, METRICS_MULTIPROC_DIR)
+    return generate_latest(registry)
 
 
 def get_metrics_content_type() -> str:
@@ -394,13 +658,70 @@ def get_metrics_content_type() -> str:
 # IN-MEMORY METRICS (fallback)
 # =============================================================================
 
+# Bornes par défaut des histogrammes en mémoire (secondes, comme la latence HTTP)
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0)
+
+
+class _BucketHistogram:
+    """Histogramme à bornes fixes: mémoire constante quel que soit le volume"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # dernier = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimation par interpolation linéaire dans le bucket (comme histogram_quantile)"""
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else min(self.min, self.bounds[0])
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def stats(self) -> Dict:
+        if not self.count:
+            return {'count': 0}
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': buckets,
+        }
+
+
 class InMemoryMetrics:
     """Métriques en mémoire quand Prometheus n'est pas disponible"""
 
     def __init__(self):
         self._counters: Dict[str, int] = {}
         self._gauges: Dict[str, float] = {}
-        self._histograms: Dict[str, list] = {}
+        self._histograms: Dict[str, _BucketHistogram] = {}
 
     def inc_counter(self, name: str, labels: Dict = None, value: int = 1):
         key = self._make_key(name, labels)
@@ -410,17 +731,19 @@ class InMemoryMetrics:
         key = self._make_key(name, labels)
         self._gauges[key] = value
 
-    def observe(self, name: str, value: float, labels: Dict = None):
+    def observe(self, name: str, value: float, labels: Dict = None, buckets=DEFAULT_BUCKETS):
+        """Observation; les bornes sont fixées à la première observation de la série"""
         key = self._make_key(name, labels)
-        if key not in self._histograms:
-            self._histograms[key] = []
-        self._histograms[key].append(value)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _BucketHistogram(buckets)
+        histogram.observe(value)
 
     def get_stats(self) -> Dict:
         return {
             'counters': self._counters.copy(),
             'gauges': self._gauges.copy(),
-            'histograms': {k: self._calc_histogram_stats(v) for k, v in self._histograms.items()},
+            'histograms': {k: h.stats() for k, h in list(self._histograms.items())},
         }
 
     def _make_key(self, name: str, labels: Dict = None) -> str:
@@ -429,17 +752,6 @@ class InMemoryMetrics:
         label_str = ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
         return f'{name}{{{label_str}}}'
 
-    def _calc_histogram_stats(self, values: list) -> Dict:
-        if not values:
-            return {'count': 0}
-        return {
-            'count': len(values),
-            'sum': sum(values),
-            'avg': sum(values) / len(values),
-            'min': min(values),
-            'max': max(values),
-        }
-
 
 # Instance fallback
 _in_memory_metrics = InMemoryMetrics()
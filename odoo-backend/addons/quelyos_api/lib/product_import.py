@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+Import de produits en masse pour Quelyos API
+
+Pipeline par lots de CHUNK_SIZE lignes, lues en flux (liste JSON, CSV, XLSX):
+1. Normalisation et validation des lignes (erreur par ligne)
+2. Résolution ensembliste: catégories chargées une fois, SKU et codes-barres
+   résolus par une requête IN par lot, catégories manquantes créées en un
+   seul create()
+3. Répartition création / mise à jour: create(list) pour les nouveaux
+   produits, write() groupés par valeurs identiques pour les existants,
+   lots en échec coupés en deux sous savepoint (BulkProcessor)
+4. Progression enregistrée sous l'identifiant de job (BulkProcessor.get_operation),
+   avec l'utilisateur et la société propriétaires
+
+Usage:
+    importer = ProductImporter(env, update_existing=True, job_id=job_id)
+    summary = importer.run(iter_rows(content, 'produits.xlsx'))
+"""
+
+import csv
+import io
+import logging
+import uuid
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .bulk_operations import BulkOperationResult, BulkProcessor, BulkStatus
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+_logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+# Clés de correspondance des produits existants, par priorité
+MATCH_FIELDS = ('default_code', 'barcode')
+
+
+# =============================================================================
+# LECTURE DES LIGNES
+# =============================================================================
+
+def _normalize_header(value) -> str:
+    return str(value or '').strip().lower()
+
+
+def _iter_csv(content) -> Iterator[Dict[str, Any]]:
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    sample = content[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(content, newline=''), dialect)
+    headers = [_normalize_header(h) for h in next(reader, [])]
+    for values in reader:
+        if any(values):
+            yield dict(zip(headers, values))
+
+
+def _iter_xlsx(content: bytes) -> Iterator[Dict[str, Any]]:
+    if not OPENPYXL_AVAILABLE:
+        raise ValueError("Import XLSX indisponible (openpyxl non installé)")
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [_normalize_header(h) for h in next(rows, ())]
+        for values in rows:
+            if any(v not in (None, '') for v in values):
+                yield dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(source, filename: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lignes d'import, une à une.
+
+    Args:
+        source: liste de dicts (JSON), contenu CSV (str/bytes) ou XLSX (bytes)
+        filename: nom du fichier, détermine le format (.xlsx, sinon CSV)
+    """
+    if isinstance(source, (list, tuple)):
+        return iter(source)
+    if (filename or '').lower().endswith(('.xlsx', '.xlsm')):
+        return _iter_xlsx(source)
+    return _iter_csv(source)
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # codes numériques lus depuis XLSX
+    return str(value).strip()
+
+
+def _number(value, label: str) -> float:
+    if value is None or value == '':
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} invalide: {value}")
+
+
+# =============================================================================
+# IMPORTEUR
+# =============================================================================
+
+class ProductImporter:
+    """
+    Import de product.template par lots (voir docstring du module).
+
+    Les lignes sont numérotées à partir de 1, comme dans le fichier source
+    (hors en-tête).
+    """
+
+    def __init__(self, env, update_existing: bool = False, job_id: str = None,
+                 chunk_size: int = CHUNK_SIZE, commit: bool = False,
+                 on_chunk: Optional[Callable[['ProductImporter'], None]] = None):
+        """
+        Args:
+            update_existing: mettre à jour les produits trouvés par SKU puis code-barres
+            job_id: identifiant de progression (généré si absent)
+            commit: valider chaque lot (import en tâche de fond)
+            on_chunk: appelé après chaque lot, avant son commit (progression du job)
+        """
+        self.env = env
+        self.update_existing = update_existing
+        self.chunk_size = chunk_size
+        self.commit = commit
+        self.on_chunk = on_chunk
+        self.Template = env['product.template'].sudo()
+        self.Category = env['product.category'].sudo()
+        self.processor = BulkProcessor(env)
+        self.result = BulkOperationResult(
+            id=job_id or str(uuid.uuid4()),
+            status=BulkStatus.PROCESSING,
+            total=0,
+            processed=0,
+            succeeded=0,
+            failed=0,
+            started_at=datetime.utcnow().isoformat(),
+            user_id=env.uid,
+            company_id=env.company.id,
+        )
+        self.created: List[Dict] = []
+        self.updated: List[Dict] = []
+        self.errors: List[Dict] = []
+        self._categories: Optional[Dict[str, int]] = None
+
+    @property
+    def job_id(self) -> str:
+        return self.result.id
+
+    # -------------------------------------------------------------------------
+    # Exécution
+    # -------------------------------------------------------------------------
+
+    def run(self, rows: Iterable[Dict[str, Any]], total: int = None, start_row: int = 0) -> Dict[str, Any]:
+        """
+        Importe toutes les lignes, lot par lot. Retourne le résumé.
+
+        start_row: lignes déjà importées (reprise d'un job interrompu), ignorées
+        """
+        self.result.total = total or 0
+        self.result.processed = start_row
+        self.processor.save_progress(self.result)
+
+        chunk = []
+        for row_number, row in enumerate(rows, start=1):
+            if row_number <= start_row:
+                continue
+            chunk.append((row_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk)
+
+        self.result.total = self.result.processed
+        self.processor.finalize(self.result)
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        by_row = itemgetter('row')
+        return {
+            'job_id': self.job_id,
+            'created': sorted(self.created, key=by_row),
+            'updated': sorted(self.updated, key=by_row),
+            'errors': sorted(self.errors, key=by_row),
+            'summary': {
+                'total_rows': self.result.processed,
+                'created_count': len(self.created),
+                'updated_count': len(self.updated),
+                'error_count': len(self.errors),
+            },
+        }
+
+    def _process_chunk(self, chunk: List[Tuple[int, Dict]]):
+        self._import_chunk(chunk)
+
+        self.result.processed += len(chunk)
+        self.result.total = max(self.result.total, self.result.processed)
+        self.result.succeeded = len(self.created) + len(self.updated)
+        self.result.failed = len(self.errors)
+        self.result.errors = list(self.errors)
+        self.result.results = []
+        self.processor.save_progress(self.result)
+
+        if self.on_chunk:
+            self.on_chunk(self)
+        if self.commit:
+            self.env.cr.commit()
+        # Lots suivants: ne pas garder les enregistrements du lot en cache
+        self.env.invalidate_all()
+
+    def _error(self, row_number: int, message: str):
+        self.errors.append({'row': row_number, 'error': message})
+
+    # -------------------------------------------------------------------------
+    # Lot
+    # -------------------------------------------------------------------------
+
+    def _prepare(self, row: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Valeurs product.template d'une ligne + nom de catégorie"""
+        if not isinstance(row, dict):
+            raise ValueError('Ligne invalide')
+        row = {_normalize_header(k): v for k, v in row.items()}
+        name = _text(row.get('name'))
+        if not name:
+            raise ValueError('Nom obligatoire')
+
+        vals = {
+            'name': name,
+            'list_price': _number(row.get('price'), 'Prix'),
+            'standard_price': _number(row.get('standard_price'), 'Coût'),
+            'description_sale': _text(row.get('description')) or False,
+            'default_code': _text(row.get('default_code', row.get('sku'))) or False,
+            'barcode': _text(row.get('barcode')) or False,
+            'weight': _number(row.get('weight'), 'Poids'),
+            'sale_ok': True,
+            'purchase_ok': True,
+        }
+        return vals, _text(row.get('category'))
+
+    def _import_chunk(self, chunk: List[Tuple[int, Dict]]):
+        parsed = []
+        for row_number, row in chunk:
+            try:
+                vals, category_name = self._prepare(row)
+            except ValueError as e:
+                self._error(row_number, str(e))
+                continue
+            parsed.append((row_number, vals, category_name))
+
+        category_ids, category_errors = self._resolve_categories(
+            {name for _row, _vals, name in parsed if name}
+        )
+        existing = self._match_existing([vals for _row, vals, _name in parsed])
+
+        to_create: List[Tuple[int, Dict]] = []
+        to_update: Dict[int, List] = {}  # id -> [lignes, valeurs fusionnées]
+        duplicates: List[Tuple[int, int, Dict]] = []  # (ligne, position dans to_create, valeurs)
+        pending: Dict[Tuple[str, str], int] = {}
+
+        for row_number, vals, category_name in parsed:
+            if category_name:
+                key = category_name.lower()
+                if key in category_errors:
+                    self._error(row_number, f"Catégorie '{category_name}': {category_errors[key]}")
+                    continue
+                vals['categ_id'] = category_ids[key]
+
+            keys = [(field, vals[field]) for field in MATCH_FIELDS if vals.get(field)]
+            record_id = next((existing[k] for k in keys if k in existing), None)
+            if record_id:
+                self._queue_update(to_update, record_id, row_number, vals)
+                continue
+
+            if self.update_existing:
+                # Même SKU / code-barres plus haut dans le lot: mise à jour du produit créé
+                position = next((pending[k] for k in keys if k in pending), None)
+                if position is not None:
+                    duplicates.append((row_number, position, vals))
+                    continue
+                for k in keys:
+                    pending[k] = len(to_create)
+            to_create.append((row_number, vals))
+
+        created_ids = self._create(to_create)
+
+        for row_number, position, vals in duplicates:
+            record_id = created_ids.get(position)
+            if record_id:
+                self._queue_update(to_update, record_id, row_number, vals)
+            else:
+                self._error(row_number, f"Ligne {to_create[position][0]} (même référence) en échec")
+
+        self._write(to_update)
+
+    def _queue_update(self, to_update, record_id, row_number, vals):
+        entry = to_update.setdefault(record_id, [[], {}])
+        entry[0].append(row_number)
+        entry[1].update(vals)
+
+    # -------------------------------------------------------------------------
+    # Résolution ensembliste
+    # -------------------------------------------------------------------------
+
+    def _resolve_categories(self, names) -> Tuple[Dict[str, int], Dict[str, str]]:
+        """
+        Catégories par nom (insensible à la casse). Toutes les catégories
+        sont lues une fois par import, les manquantes créées en un lot.
+
+        Returns:
+            ({nom minuscule: id}, {nom minuscule: erreur de création})
+        """
+        if self._categories is None:
+            self._categories = {}
+            for category in self.Category.search_read([], ['name']):
+                self._categories.setdefault(category['name'].lower(), category['id'])
+
+        missing = {}
+        for name in names:
+            missing.setdefault(name.lower(), name)
+        for key in list(missing):
+            if key in self._categories:
+                del missing[key]
+        if not missing:
+            return self._categories, {}
+
+        keys = list(missing)
+        scratch = BulkOperationResult(
+            id=self.job_id, status=BulkStatus.PROCESSING,
+            total=len(keys), processed=0, succeeded=0, failed=0,
+        )
+        created = self.processor.create_isolated(
+            self.Category, [{'name': missing[key]} for key in keys], list(range(len(keys))), scratch
+        )
+        for position, category_id in created.items():
+            self._categories[keys[position]] = category_id
+        errors = {keys[error['index']]: error['error'] for error in scratch.errors}
+        return self._categories, errors
+
+    def _match_existing(self, rows_vals: List[Dict]) -> Dict[Tuple[str, str], int]:
+        """
+        Produits existants par SKU et code-barres: une requête IN par champ.
+        Pour une valeur partagée par plusieurs produits, le premier dans
+        l'ordre par défaut l'emporte (comme search(limit=1)).
+        """
+        if not self.update_existing:
+            return {}
+
+        matches = {}
+        for field in MATCH_FIELDS:
+            values = list({vals[field] for vals in rows_vals if vals.get(field)})
+            if not values:
+                continue
+            for record in self.Template.search_read([(field, 'in', values)], [field]):
+                matches.setdefault((field, record[field]), record['id'])
+        return matches
+
+    # -------------------------------------------------------------------------
+    # Écritures
+    # -------------------------------------------------------------------------
+
+    def _collect_failures(self, start: int) -> Dict[int, str]:
+        return {
+            item.index: item.error
+            for item in self.result.results[start:]
+            if not item.success
+        }
+
+    def _create(self, to_create: List[Tuple[int, Dict]]) -> Dict[int, int]:
+        """create(list) sous savepoint; retourne {position dans to_create: id}"""
+        if not to_create:
+            return {}
+        start = len(self.result.results)
+        created = self.processor.create_isolated(
+            self.Template,
+            [vals for _row, vals in to_create],
+            list(range(len(to_create))),
+            self.result,
+        )
+        failures = self._collect_failures(start)
+
+        for position, (row_number, vals) in enumerate(to_create):
+            if position in created:
+                self.created.append({'id': created[position], 'name': vals['name'], 'row': row_number})
+            else:
+                self._error(row_number, failures.get(position, 'Création impossible'))
+        return created
+
+    def _write(self, to_update: Dict[int, List]):
+        """write() groupés par valeurs identiques, sous savepoint"""
+        if not to_update:
+            return
+        start = len(self.result.results)
+        self.processor.write_grouped(
+            self.Template,
+            [(record_id, record_id, vals) for record_id, (_rows, vals) in to_update.items()],
+            self.result,
+        )
+        failures = self._collect_failures(start)
+
+        for record_id, (rows, vals) in to_update.items():
+            for row_number in rows:
+                if record_id in failures:
+                    self._error(row_number, failures[record_id])
+                else:
+                    self.updated.append({'id': record_id, 'name': vals['name'], 'row': row_number})
@@ -8,13 +8,21 @@ Profilage des performances:
 - Utilisation mémoire
 - Détection de N+1 queries
 - Flamegraphs
+- Traces SQL par requête HTTP (échantillonnées ou déclenchées par header):
+  nombre de requêtes, temps SQL, empreintes normalisées, N+1 -> métriques
+  Prometheus et ring buffer consultable par le super-admin
 """
 
 import os
+import re
+import json
 import time
+import random
+import hashlib
 import logging
 import functools
 import threading
+from collections import deque
 from typing import Dict, Any, List, Optional, Callable
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -28,6 +36,16 @@ PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
 SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
 N_PLUS_ONE_THRESHOLD = 5  # Nombre de requêtes similaires avant alerte
 
+# Traces SQL par requête HTTP
+QUERY_SAMPLE_RATE = float(os.environ.get('QUELYOS_QUERY_SAMPLE_RATE', 0.01))
+# Header X-Query-Trace honoré seulement s'il porte ce jeton (vide = ignoré)
+QUERY_TRACE_TOKEN = os.environ.get('QUELYOS_QUERY_TRACE_TOKEN', '')
+QUERY_TRACE_HEADER = 'X-Query-Trace'
+QUERY_TRACE_BUFFER_SIZE = int(os.environ.get('QUELYOS_QUERY_TRACE_BUFFER', 200))
+QUERY_TRACE_REDIS_KEY = 'quelyos:profiler:query_traces'
+# Empreintes conservées par trace (les plus fréquentes)
+QUERY_TRACE_TOP_FINGERPRINTS = 10
+
 
 # =============================================================================
 # TYPES
@@ -167,9 +185,7 @@ class ProfilerContext:
         state = cls._get_state()
 
         # Normaliser la requête (remplacer les IDs)
-        import re
-        normalized = re.sub(r'\b\d+\b', '?', query)
-        normalized = re.sub(r"'[^']*'", '?', normalized)
+        normalized = fingerprint(query)
 
         if normalized not in state['n_plus_one_patterns']:
             state['n_plus_one_patterns'][normalized] = 0
@@ -307,15 +323,22 @@ class SQLProfiler:
         try:
             from odoo.sql_db import Cursor
 
-            cls._original_execute = Cursor.execute
+            cls._original_execute = original = Cursor.execute
 
             def profiled_execute(self, query, params=None, log_exceptions=True):
-                start = time.time()
+                trace = _trace_local.trace
+                if trace is None and not ProfilerContext.is_enabled():
+                    return original(self, query, params, log_exceptions)
+
+                start = time.perf_counter()
                 try:
-                    return cls._original_execute(self, query, params, log_exceptions)
+                    return original(self, query, params, log_exceptions)
                 finally:
-                    duration_ms = (time.time() - start) * 1000
-                    ProfilerContext.record_sql(query, duration_ms, params)
+                    duration_ms = (time.perf_counter() - start) * 1000
+                    code = getattr(query, 'code', query)
+                    if trace is not None:
+                        trace.record(code, duration_ms)
+                    ProfilerContext.record_sql(code, duration_ms, params)
 
             Cursor.execute = profiled_execute
             cls._patched = True
@@ -339,6 +362,232 @@ class SQLProfiler:
             pass
 
 
+# =============================================================================
+# TRACES SQL PAR REQUÊTE
+# =============================================================================
+
+_LITERAL_STRING = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(query: str) -> str:
+    """
+    Empreinte normalisée d'une requête: littéraux et paramètres -> ?,
+    listes IN (?, ?, ...) -> (?...), blancs compactés.
+    """
+    normalized = _LITERAL_STRING.sub('?', query)
+    normalized = _LITERAL_NUMBER.sub('?', normalized)
+    normalized = normalized.replace('%s', '?')
+    normalized = _PLACEHOLDER_LIST.sub('(?...)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+def fingerprint_id(normalized: str) -> str:
+    """Identifiant court d'une empreinte (logs, tableau de bord)"""
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryTrace:
+    """Requêtes SQL d'une requête HTTP, agrégées par empreinte"""
+
+    __slots__ = ('endpoint', 'method', 'forced', 'started', 'duration_ms',
+                 'count', 'sql_ms', 'fingerprints')
+
+    def __init__(self, endpoint: str, method: str = '', forced: bool = False):
+        self.endpoint = endpoint
+        self.method = method
+        self.forced = forced
+        self.started = time.time()
+        self.duration_ms = 0.0
+        self.count = 0
+        self.sql_ms = 0.0
+        # texte SQL -> [nombre, durée ms] (normalisé à la lecture seulement)
+        self.fingerprints: Dict[str, list] = {}
+
+    def record(self, query: str, duration_ms: float):
+        self.count += 1
+        self.sql_ms += duration_ms
+        stats = self.fingerprints.get(query)
+        if stats is None:
+            self.fingerprints[query] = [1, duration_ms]
+        else:
+            stats[0] += 1
+            stats[1] += duration_ms
+
+    def _by_fingerprint(self) -> Dict[str, list]:
+        """Regroupe les textes SQL exacts par empreinte (normalisée une fois par texte)"""
+        grouped: Dict[str, list] = {}
+        for query, (count, duration_ms) in self.fingerprints.items():
+            stats = grouped.setdefault(fingerprint(query), [0, 0.0])
+            stats[0] += count
+            stats[1] += duration_ms
+        return grouped
+
+    def n_plus_one(self) -> List[Dict[str, Any]]:
+        """Empreintes répétées au moins N_PLUS_ONE_THRESHOLD fois"""
+        return [
+            {'fingerprint': fingerprint_id(fp), 'query': fp[:300], 'count': count,
+             'sql_ms': round(duration_ms, 2)}
+            for fp, (count, duration_ms) in sorted(
+                self._by_fingerprint().items(), key=lambda item: -item[1][0]
+            )
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        grouped = sorted(self._by_fingerprint().items(), key=lambda item: -item[1][1])
+        return {
+            'endpoint': self.endpoint,
+            'method': self.method,
+            'forced': self.forced,
+            'timestamp': datetime.utcfromtimestamp(self.started).isoformat(),
+            'duration_ms': round(self.duration_ms, 2),
+            'query_count': self.count,
+            'sql_ms': round(self.sql_ms, 2),
+            'distinct_queries': len(grouped),
+            'top_queries': [
+                {'fingerprint': fingerprint_id(fp), 'query': fp[:300], 'count': count,
+                 'sql_ms': round(duration_ms, 2)}
+                for fp, (count, duration_ms) in grouped[:QUERY_TRACE_TOP_FINGERPRINTS]
+            ],
+            'n_plus_one': self.n_plus_one(),
+        }
+
+
+class _TraceLocal(threading.local):
+    trace: Optional[QueryTrace] = None
+    finished: Optional[QueryTrace] = None
+
+
+_trace_local = _TraceLocal()
+
+# Ring buffer du worker (repli sans Redis)
+_trace_buffer: deque = deque(maxlen=QUERY_TRACE_BUFFER_SIZE)
+
+
+def should_trace(header_value: Optional[str] = None) -> Optional[bool]:
+    """
+    Décide si la requête est tracée.
+
+    Returns:
+        True (forcée par header), False (échantillonnée), None (non tracée)
+    """
+    if header_value and QUERY_TRACE_TOKEN and header_value == QUERY_TRACE_TOKEN:
+        return True
+    if QUERY_SAMPLE_RATE > 0 and random.random() < QUERY_SAMPLE_RATE:
+        return False
+    return None
+
+
+@contextmanager
+def query_trace(endpoint: str, method: str = '', forced: bool = False):
+    """
+    Trace les requêtes SQL du bloc (thread courant).
+
+    À la sortie: métriques, ring buffer, avertissement N+1. La trace
+    reste lisible via last_query_trace() (headers de réponse).
+    """
+    SQLProfiler.patch()
+    trace = QueryTrace(endpoint, method, forced)
+    previous = _trace_local.trace
+    _trace_local.trace = trace
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.duration_ms = (time.perf_counter() - start) * 1000
+        _trace_local.trace = previous
+        _trace_local.finished = trace
+        try:
+            _publish_trace(trace)
+        except Exception as e:
+            _logger.warning(f"Query trace publish failed: {e}")
+
+
+def last_query_trace(pop: bool = True) -> Optional[QueryTrace]:
+    """Dernière trace terminée du thread"""
+    trace = _trace_local.finished
+    if pop:
+        _trace_local.finished = None
+    return trace
+
+
+def query_trace_headers(trace: QueryTrace) -> Dict[str, str]:
+    """Headers de réponse d'une trace forcée (Server-Timing, compteurs)"""
+    return {
+        'Server-Timing': f'db;dur={trace.sql_ms:.1f};desc="{trace.count} queries"',
+        'X-Query-Count': str(trace.count),
+        'X-Query-N-Plus-One': str(len(trace.n_plus_one())),
+    }
+
+
+def _publish_trace(trace: QueryTrace):
+    from .metrics import record_query_trace
+    from .redis_client import get_pipeline, redis_available
+
+    data = trace.to_dict()
+    record_query_trace(trace.endpoint, trace.count, trace.sql_ms / 1000, len(data['n_plus_one']))
+    for pattern in data['n_plus_one']:
+        _logger.warning(
+            "N+1 on %s: %s x %s (%s ms)", trace.endpoint, pattern['count'],
+            pattern['query'][:120], pattern['sql_ms'],
+        )
+
+    # Buffer local toujours alimenté: repli de lecture si Redis tombe
+    _trace_buffer.appendleft(data)
+    if redis_available():
+        pipe = get_pipeline('analytics')
+        if pipe is not None:
+            pipe.lpush(QUERY_TRACE_REDIS_KEY, json.dumps(data))
+            pipe.ltrim(QUERY_TRACE_REDIS_KEY, 0, QUERY_TRACE_BUFFER_SIZE - 1)
+
+
+def get_query_traces(limit: int = 50) -> List[Dict[str, Any]]:
+    """Traces récentes (Redis partagé entre workers, sinon buffer du worker)"""
+    from .redis_client import get_redis, redis_available
+
+    limit = max(1, min(int(limit), QUERY_TRACE_BUFFER_SIZE))
+    if redis_available():
+        client = get_redis('analytics')
+        if client is not None:
+            try:
+                return [json.loads(item) for item in client.lrange(QUERY_TRACE_REDIS_KEY, 0, limit - 1)]
+            except Exception as e:
+                _logger.warning(f"Query traces read failed: {e}")
+    return list(_trace_buffer)[:limit]
+
+
+def summarize_query_traces(traces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrégat par endpoint: moyenne/max de requêtes, temps SQL, N+1"""
+    summary: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        entry = summary.setdefault(trace['endpoint'], {
+            'endpoint': trace['endpoint'], 'samples': 0, 'queries_total': 0,
+            'queries_max': 0, 'sql_ms_total': 0.0, 'n_plus_one_samples': 0,
+        })
+        entry['samples'] += 1
+        entry['queries_total'] += trace['query_count']
+        entry['queries_max'] = max(entry['queries_max'], trace['query_count'])
+        entry['sql_ms_total'] += trace['sql_ms']
+        entry['n_plus_one_samples'] += bool(trace['n_plus_one'])
+
+    result = []
+    for entry in summary.values():
+        samples = entry['samples']
+        result.append({
+            'endpoint': entry['endpoint'],
+            'samples': samples,
+            'queries_avg': round(entry['queries_total'] / samples, 1),
+            'queries_max': entry['queries_max'],
+            'sql_ms_avg': round(entry['sql_ms_total'] / samples, 2),
+            'n_plus_one_samples': entry['n_plus_one_samples'],
+        })
+    return sorted(result, key=lambda entry: -entry['queries_avg'])
+
+
 # =============================================================================
 # MEMORY PROFILER
 # =============================================================================
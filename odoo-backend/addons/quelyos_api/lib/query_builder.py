@@ -393,6 +393,29 @@ class QueryBuilder:
         results = self.execute(env)
         return results, total
 
+    def execute_keyset(self, env, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Exécute avec pagination keyset (au lieu de OFFSET).
+
+        Le tri configuré via order_by() est complété par un départage id.
+        L'offset de paginate() est ignoré, seule la limite est utilisée.
+
+        Args:
+            env: Environnement Odoo
+            cursor: Curseur opaque retourné par la page précédente
+
+        Returns:
+            Tuple (résultats, next_cursor)
+        """
+        from .keyset_pagination import KeysetPaginator
+
+        paginator = KeysetPaginator(self.model, order=self.get_order())
+        page = paginator.paginate(env[self.model].sudo(), self._domain, cursor=cursor, limit=self._limit)
+
+        if self._fields:
+            return page.records.read(self._fields), page.next_cursor
+        return page.records.read(), page.next_cursor
+
 
 # =============================================================================
 # HELPERS
@@ -7,22 +7,18 @@ Protège les endpoints contre:
 - DDoS / abus API
 - Scraping excessif
 
-Algorithme: Sliding Window avec Redis
-Fallback: Token Bucket en mémoire (single worker only)
+Algorithme: GCRA avec Redis (script Lua atomique, voir gcra.py)
+Fallback: GCRA en mémoire (single worker only)
 """
 
+import math
 import os
 import time
 import logging
 from functools import wraps
-from collections import defaultdict
-from threading import Lock
 
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
+from .gcra import GCRALimiter, Limit, LocalGCRA
+from .redis_client import get_redis, redis_available
 
 _logger = logging.getLogger(__name__)
 
@@ -64,36 +60,28 @@ class RateLimitConfig:
 class RedisRateLimiter:
     """
     Rate limiter distribué avec Redis.
-    Utilise l'algorithme Sliding Window Log.
+    Utilise l'algorithme GCRA (une valeur par clé, un script Lua par vérification).
     """
 
+    KEY_PREFIX = 'ratelimit:'
+
     def __init__(self):
-        self.redis_client = None
-        self.enabled = False
+        self._fallback = None
+        self._gcra = GCRALimiter('rate_limit')
 
-        if not REDIS_AVAILABLE:
-            _logger.warning("Rate limiter: Redis non disponible")
-            return
+    @property
+    def redis_client(self):
+        return get_redis('rate_limit')
 
-        try:
-            redis_host = os.environ.get('REDIS_HOST', 'localhost')
-            redis_port = int(os.environ.get('REDIS_PORT', 6379))
-            redis_db = int(os.environ.get('REDIS_RATE_LIMIT_DB', 1))  # DB séparée
-
-            self.redis_client = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                db=redis_db,
-                decode_responses=True,
-                socket_connect_timeout=1,
-                socket_timeout=1,
-            )
-            self.redis_client.ping()
-            self.enabled = True
-            _logger.info(f"Rate limiter Redis enabled ({redis_host}:{redis_port}/db{redis_db})")
+    @property
+    def enabled(self):
+        return self.redis_client is not None and redis_available()
 
-        except Exception as e:
-            _logger.warning(f"Rate limiter Redis disabled: {e}")
+    def _memory_fallback(self):
+        """Limiteur local utilisé tant que le circuit Redis est ouvert"""
+        if self._fallback is None:
+            self._fallback = MemoryRateLimiter()
+        return self._fallback
 
     def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> tuple:
         """
@@ -112,38 +100,19 @@ class RedisRateLimiter:
             return (True, max_requests, 0)
 
         if not self.enabled:
-            return (True, max_requests, 0)
+            return self._memory_fallback().is_allowed(key, max_requests, window_seconds)
 
         try:
+            decision = self._gcra.check(
+                (f"{self.KEY_PREFIX}{key}",), (Limit(max_requests, window_seconds),)
+            )
             now = time.time()
-            window_start = now - window_seconds
-            redis_key = f"rate:{key}"
-
-            pipe = self.redis_client.pipeline()
-
-            # Supprimer les entrées hors fenêtre
-            pipe.zremrangebyscore(redis_key, 0, window_start)
-
-            # Compter les requêtes dans la fenêtre
-            pipe.zcard(redis_key)
-
-            # Ajouter la requête actuelle
-            pipe.zadd(redis_key, {str(now): now})
 
-            # Définir l'expiration
-            pipe.expire(redis_key, window_seconds + 1)
+            if not decision.allowed:
+                _logger.warning(f"Rate limit exceeded: {key} ({max_requests}/{window_seconds}s)")
+                return (False, 0, int(math.ceil(now + decision.retry_after)))
 
-            results = pipe.execute()
-            current_count = results[1]
-
-            remaining = max(0, max_requests - current_count - 1)
-            reset_time = int(now + window_seconds)
-
-            if current_count >= max_requests:
-                _logger.warning(f"Rate limit exceeded: {key} ({current_count}/{max_requests})")
-                return (False, 0, reset_time)
-
-            return (True, remaining, reset_time)
+            return (True, decision.remaining[0], int(now + window_seconds))
 
         except Exception as e:
             _logger.error(f"Rate limiter error: {e}")
@@ -155,24 +124,20 @@ class RedisRateLimiter:
             return max_requests
 
         try:
-            now = time.time()
-            window_start = now - window_seconds
-            redis_key = f"rate:{key}"
-
-            # Nettoyer et compter
-            self.redis_client.zremrangebyscore(redis_key, 0, window_start)
-            current_count = self.redis_client.zcard(redis_key)
-
-            return max(0, max_requests - current_count)
+            return self._gcra.peek(
+                (f"{self.KEY_PREFIX}{key}",), (Limit(max_requests, window_seconds),)
+            )[0]
 
         except Exception:
             return max_requests
 
     def reset(self, key: str):
         """Reset le compteur pour une clé"""
+        redis_key = f"{self.KEY_PREFIX}{key}"
+        self._gcra.forget((redis_key,))
         if self.enabled:
             try:
-                self.redis_client.delete(f"rate:{key}")
+                self.redis_client.delete(redis_key)
             except Exception:
                 pass
 
@@ -188,8 +153,7 @@ class MemoryRateLimiter:
     """
 
     def __init__(self):
-        self.requests = defaultdict(list)
-        self.lock = Lock()
+        self._gcra = LocalGCRA()
         _logger.warning("Using in-memory rate limiter (single worker only)")
 
     def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> tuple:
@@ -198,34 +162,19 @@ class MemoryRateLimiter:
         if os.environ.get('PYTEST_CURRENT_TEST') or os.environ.get('TESTING'):
             return (True, max_requests, 0)
 
+        decision = self._gcra.check((key,), (Limit(max_requests, window_seconds),))
         now = time.time()
-        window_start = now - window_seconds
-
-        with self.lock:
-            # Nettoyer les anciennes entrées
-            self.requests[key] = [t for t in self.requests[key] if t > window_start]
-
-            current_count = len(self.requests[key])
-            remaining = max(0, max_requests - current_count - 1)
-            reset_time = int(now + window_seconds)
 
-            if current_count >= max_requests:
-                return (False, 0, reset_time)
+        if not decision.allowed:
+            return (False, 0, int(math.ceil(now + decision.retry_after)))
 
-            self.requests[key].append(now)
-            return (True, remaining, reset_time)
+        return (True, decision.remaining[0], int(now + window_seconds))
 
     def get_remaining(self, key: str, max_requests: int, window_seconds: int) -> int:
-        now = time.time()
-        window_start = now - window_seconds
-
-        with self.lock:
-            self.requests[key] = [t for t in self.requests[key] if t > window_start]
-            return max(0, max_requests - len(self.requests[key]))
+        return self._gcra.peek((key,), (Limit(max_requests, window_seconds),))[0]
 
     def reset(self, key: str):
-        with self.lock:
-            self.requests.pop(key, None)
+        self._gcra.reset((key,))
 
 
 # =============================================================================
@@ -239,8 +188,9 @@ def get_rate_limiter():
     """Retourne l'instance singleton du rate limiter"""
     global _rate_limiter
     if _rate_limiter is None:
-        _rate_limiter = RedisRateLimiter()
-        if not _rate_limiter.enabled:
+        if get_redis('rate_limit') is not None:
+            _rate_limiter = RedisRateLimiter()
+        else:
             _rate_limiter = MemoryRateLimiter()
     return _rate_limiter
 
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""
+Accès Redis partagé pour Quelyos API
+
+Un seul point d'accès pour tous les sous-systèmes (cache, rate limiting,
+throttling, analytics, jobs, événements, websocket):
+- Clients nommés, un ConnectionPool par base logique et par worker
+  (aucune connexion ni ping à l'import: connexion au premier usage)
+- État de santé partagé (circuit breaker): après REDIS_FAILURE_THRESHOLD
+  échecs consécutifs, tous les clients échouent immédiatement pendant
+  REDIS_COOLDOWN secondes, puis une requête sonde referme le circuit
+- Auto-pipeline par requête HTTP: les commandes d'une même base sont
+  mises en file et envoyées en un aller-retour, au premier résultat lu
+  ou en fin de requête
+- Métriques: commandes, erreurs, latence, connexions des pools, circuit
+
+Usage:
+    client = get_redis('cache')          # None si redis-py absent
+    if client is not None and redis_available():
+        client.get('key')
+
+    with request_scope():                # ouvert par ir.http._dispatch
+        pipe = get_pipeline('cache')
+        pipe.setex('a', 60, '1')         # différé
+        value = pipe.get('b').value      # envoie setex + get ensemble
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from . import metrics
+
+try:
+    import redis
+    from redis.client import Pipeline
+    from redis.connection import parse_url
+    from redis.exceptions import NoScriptError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+_logger = logging.getLogger(__name__)
+
+if not REDIS_AVAILABLE:
+    _logger.warning("redis-py not installed: cache, rate limiting and queues run without Redis")
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_URL = os.environ.get('REDIS_URL') or f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
+REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD') or None
+
+SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 2))
+MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 16))
+
+FAILURE_THRESHOLD = int(os.environ.get('REDIS_FAILURE_THRESHOLD', 3))
+COOLDOWN = float(os.environ.get('REDIS_COOLDOWN', 10))
+
+# Bases logiques
+DATABASES = {
+    'default': int(os.environ.get('REDIS_DB', 0)),
+    'rate_limit': int(os.environ.get('REDIS_RATE_LIMIT_DB', 1)),
+    'jobs': int(os.environ.get('REDIS_JOBS_DB', 1)),
+    'events': int(os.environ.get('REDIS_EVENTS_DB', 2)),
+}
+
+# Clients nommés: (base logique, decode_responses)
+# Les clients d'une même base et d'un même décodage partagent pool et pipeline.
+CLIENTS = {
+    'cache': ('default', True),
+    'products': ('default', True),
+    'analytics': ('default', True),
+    'throttling': ('default', True),
+    'bulk': ('default', True),
+    'websocket': ('default', False),
+    'rate_limit': ('rate_limit', True),
+    'jobs': ('jobs', False),
+    'events': ('events', False),
+}
+
+
+# =============================================================================
+# SANTÉ PARTAGÉE (CIRCUIT BREAKER)
+# =============================================================================
+
+class RedisUnavailable(Exception):
+    """Circuit ouvert: Redis considéré indisponible, commande non envoyée"""
+
+
+class RedisHealth:
+    """
+    Circuit breaker commun à tous les clients du worker.
+
+    closed -> open après FAILURE_THRESHOLD échecs de connexion consécutifs,
+    open -> half_open après COOLDOWN secondes (une seule sonde autorisée),
+    half_open -> closed au premier succès, -> open au premier échec.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Vrai si une commande a une chance d'être envoyée (sans consommer la sonde)"""
+        if self.state == self.CLOSED:
+            return True
+        return not self._probing and time.monotonic() - self.opened_at >= self.cooldown
+
+    def allow(self) -> bool:
+        """Autorise l'envoi d'une commande (réserve la sonde en half_open)"""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            if self.state != self.CLOSED:
+                _logger.info("Redis circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+        metrics.set_redis_circuit(False)
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    _logger.warning(f"Redis circuit opened for {self.cooldown}s: {error}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+        if self.state == self.OPEN:
+            metrics.set_redis_circuit(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'last_error': self.last_error,
+            'retry_in': max(0.0, round(self.cooldown - (time.monotonic() - self.opened_at), 1))
+            if self.state == self.OPEN else 0.0,
+        }
+
+
+_health = RedisHealth()
+
+
+def redis_health() -> RedisHealth:
+    return _health
+
+
+def redis_available() -> bool:
+    """redis-py installé et circuit non ouvert"""
+    return REDIS_AVAILABLE and _health.available()
+
+
+# =============================================================================
+# CLIENTS INSTRUMENTÉS
+# =============================================================================
+
+if REDIS_AVAILABLE:
+    _CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+    def _guarded(client_name, kind, commands, call):
+        """Exécute call() sous le circuit breaker, avec métriques"""
+        if not _health.allow():
+            metrics.record_redis_call(client_name, kind, 0.0, commands, 'rejected')
+            raise RedisUnavailable(f"Redis circuit open ({client_name})")
+        start = time.perf_counter()
+        try:
+            result = call()
+        except _CONNECTION_ERRORS as e:
+            _health.record_failure(e)
+            metrics.record_redis_call(client_name, kind, time.perf_counter() - start, commands, 'error')
+            raise
+        except Exception:
+            # Erreur de commande: le serveur a répondu
+            _health.record_success()
+            metrics.record_redis_call(client_name, kind, time.perf_counter() - start, commands, 'error')
+            raise
+        _health.record_success()
+        metrics.record_redis_call(client_name, kind, time.perf_counter() - start, commands, 'ok')
+        return result
+
+    class ManagedPipeline(Pipeline):
+        """Pipeline soumis au circuit breaker partagé"""
+
+        client_name = 'default'
+
+        def execute(self, raise_on_error=True):
+            commands = len(self.command_stack)
+            if not commands and not self.scripts:
+                return []
+            return _guarded(
+                self.client_name, 'pipeline', commands,
+                lambda: super(ManagedPipeline, self).execute(raise_on_error),
+            )
+
+    class ManagedRedis(redis.Redis):
+        """Client Redis nommé, soumis au circuit breaker partagé"""
+
+        client_name = 'default'
+
+        def execute_command(self, *args, **options):
+            return _guarded(
+                self.client_name, 'command', 1,
+                lambda: super(ManagedRedis, self).execute_command(*args, **options),
+            )
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            pipe = ManagedPipeline(
+                self.connection_pool, self.response_callbacks, transaction, shard_hint
+            )
+            pipe.client_name = self.client_name
+            return pipe
+
+
+_pools: Dict[tuple, Any] = {}
+_clients: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_pool(database: str, decode: bool):
+    key = (database, decode)
+    pool = _pools.get(key)
+    if pool is None:
+        # L'URL donne hôte, port et authentification; la base vient du nom logique
+        options = parse_url(REDIS_URL)
+        if REDIS_PASSWORD and not options.get('password'):
+            options['password'] = REDIS_PASSWORD
+        options.update(
+            db=DATABASES[database],
+            decode_responses=decode,
+            socket_connect_timeout=SOCKET_CONNECT_TIMEOUT,
+            socket_timeout=SOCKET_TIMEOUT,
+            max_connections=MAX_CONNECTIONS,
+            health_check_interval=30,
+        )
+        pool = _pools[key] = redis.ConnectionPool(**options)
+    return pool
+
+
+def get_redis(name: str = 'cache'):
+    """
+    Client nommé (voir CLIENTS), partagé dans le worker.
+
+    Returns:
+        ManagedRedis, ou None si redis-py n'est pas installé
+    """
+    if not REDIS_AVAILABLE:
+        return None
+    client = _clients.get(name)
+    if client is None:
+        database, decode = CLIENTS.get(name, ('default', False))
+        with _registry_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = ManagedRedis(connection_pool=_get_pool(database, decode))
+                client.client_name = name
+                _clients[name] = client
+    return client
+
+
+# =============================================================================
+# AUTO-PIPELINE PAR REQUÊTE
+# =============================================================================
+
+class DeferredReply:
+    """Réponse d'une commande mise en file; .value force l'envoi de la file"""
+
+    __slots__ = ('_pipeline', '_value', '_done', '_retry')
+
+    def __init__(self, pipeline, retry=None):
+        self._pipeline = pipeline
+        self._value = None
+        self._done = False
+        self._retry = retry
+
+    def _resolve(self, value):
+        self._value = value
+        self._done = True
+
+    @property
+    def value(self):
+        if not self._done:
+            self._pipeline.flush()
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+
+class AutoPipeline:
+    """
+    File de commandes d'un pool Redis.
+
+    Chaque méthode de commande (get, setex, hincrby, ...) renvoie un
+    DeferredReply. La file part en un seul aller-retour au premier .value
+    lu, à flush() ou en fin de requête. Hors requête (immediate=True),
+    chaque commande part aussitôt.
+    """
+
+    def __init__(self, client, immediate=False):
+        self.client = client
+        self.immediate = immediate
+        self._pipe = None
+        self._replies = []
+
+    def _queue(self, call, retry=None):
+        if self._pipe is None:
+            self._pipe = self.client.pipeline(transaction=False)
+        call(self._pipe)
+        reply = DeferredReply(self, retry)
+        self._replies.append(reply)
+        if self.immediate:
+            self.flush()
+        return reply
+
+    def __getattr__(self, command):
+        if command.startswith('_'):
+            raise AttributeError(command)
+
+        def queue_command(*args, **kwargs):
+            return self._queue(lambda pipe: getattr(pipe, command)(*args, **kwargs))
+        return queue_command
+
+    def run_script(self, script, keys=(), args=()):
+        """
+        Script Lua enregistré (redis.commands.core.Script), envoyé par EVALSHA.
+
+        Le script n'est pas rattaché au pipeline (redis-py ajouterait un
+        SCRIPT EXISTS à chaque envoi): s'il est inconnu du serveur, il est
+        chargé puis rejoué une seule fois à la réception de NOSCRIPT.
+        """
+        keys, args = list(keys), list(args)
+        return self._queue(
+            lambda pipe: pipe.evalsha(script.sha, len(keys), *keys, *args),
+            retry=lambda: script(keys=keys, args=args, client=self.client),
+        )
+
+    def __len__(self):
+        return len(self._replies)
+
+    def flush(self):
+        """Envoie les commandes en attente (erreurs rattachées à chaque réponse)"""
+        if not self._replies:
+            return
+        pipe, replies = self._pipe, self._replies
+        self._pipe, self._replies = None, []
+        try:
+            results = pipe.execute(raise_on_error=False)
+        except Exception as e:
+            results = [e] * len(replies)
+        for reply, result in zip(replies, results):
+            if reply._retry is not None and isinstance(result, NoScriptError):
+                try:
+                    result = reply._retry()
+                except Exception as e:
+                    result = e
+            reply._resolve(result)
+
+
+_request_pipelines = contextvars.ContextVar('quelyos_redis_pipelines', default=None)
+
+
+@contextmanager
+def request_scope():
+    """Ouvre l'auto-pipeline de la requête; envoie le reliquat à la sortie"""
+    token = _request_pipelines.set({})
+    try:
+        yield
+    finally:
+        pipelines = _request_pipelines.get()
+        _request_pipelines.reset(token)
+        for pipeline in pipelines.values():
+            try:
+                pipeline.flush()
+            except Exception as e:
+                _logger.warning(f"Redis request pipeline flush failed: {e}")
+
+
+def in_request_scope() -> bool:
+    return _request_pipelines.get() is not None
+
+
+def get_pipeline(name: str = 'cache') -> Optional[AutoPipeline]:
+    """
+    Auto-pipeline du client nommé pour la requête courante (partagé entre
+    clients d'un même pool). Hors requête: pipeline à envoi immédiat.
+
+    Returns:
+        AutoPipeline, ou None si redis-py n'est pas installé
+    """
+    client = get_redis(name)
+    if client is None:
+        return None
+    pipelines = _request_pipelines.get()
+    if pipelines is None:
+        return AutoPipeline(client, immediate=True)
+    pool_key = id(client.connection_pool)
+    pipeline = pipelines.get(pool_key)
+    if pipeline is None:
+        pipeline = pipelines[pool_key] = AutoPipeline(client)
+    return pipeline
+
+
+# =============================================================================
+# STATISTIQUES
+# =============================================================================
+
+def get_redis_stats() -> Dict[str, Any]:
+    """État du circuit et des pools du worker (health checks, dashboard)"""
+    pools = {}
+    for (database, decode), pool in list(_pools.items()):
+        created = getattr(pool, '_created_connections', 0)
+        idle = len(getattr(pool, '_available_connections', ()))
+        pools[f"{database}{'' if decode else ':bytes'}"] = {
+            'db': DATABASES[database],
+            'connections': created,
+            'idle': idle,
+            'in_use': created - idle,
+            'max': pool.max_connections,
+        }
+    return {
+        'available': REDIS_AVAILABLE,
+        'circuit': _health.snapshot(),
+        'pools': pools,
+    }
+
+
+def _update_pool_metrics():
+    for pool_name, stats in get_redis_stats()['pools'].items():
+        metrics.set_redis_pool_connections(pool_name, stats['in_use'], stats['idle'])
+
+
+metrics.register_collect_hook(_update_pool_metrics)
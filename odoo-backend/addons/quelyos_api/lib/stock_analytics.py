@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur d'analytique stock en SQL pour Quelyos API
+
+Rotation de stock et analyse ABC calculées en base, en une passe:
+- stock en main: stock.quant groupé par produit (emplacements internes,
+  entrepôt via stock_location.parent_path)
+- ventes: stock.move 'done' interne -> client groupés par produit
+- classification Pareto par fonctions de fenêtre
+  (SUM(value) OVER (ORDER BY value DESC))
+- tri, filtres et pagination dans la requête (COUNT(*) OVER () pour le total)
+
+Seule la page demandée est relue par l'ORM (nom, référence, prix).
+
+Usage:
+    engine = StockAnalytics(env, warehouse_id=wh_id)
+    rows, total = engine.turnover(sort='turnover_desc', limit=50, offset=0)
+    page = engine.abc(threshold_a=80, threshold_b=95)
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Fenêtre de ventes par défaut (jours)
+DEFAULT_PERIOD_DAYS = 365
+
+# tri API -> ORDER BY (départage par id: pagination stable)
+TURNOVER_SORTS = {
+    'turnover_desc': SQL('turnover DESC, id'),
+    'turnover_asc': SQL('turnover ASC, id'),
+    'days_desc': SQL('days_of_stock DESC, id'),
+    'days_asc': SQL('days_of_stock ASC, id'),
+    'sold_desc': SQL('qty_sold DESC, id'),
+    'value_desc': SQL('value DESC, id'),
+}
+
+ABC_CLASSES = ('A', 'B', 'C')
+
+
+class StockAnalytics:
+    """
+    Rotation et ABC d'un périmètre produits.
+
+    Args:
+        env: Environment (sudo() en général, périmètre société = env.companies)
+        warehouse_id: Limiter stock et ventes à un entrepôt
+        domain: Domaine produit additionnel (ex: catégorie)
+        period_days: Fenêtre des ventes (rotation, jours de stock)
+    """
+
+    def __init__(self, env, warehouse_id: Optional[int] = None, domain: Optional[list] = None,
+                 period_days: int = DEFAULT_PERIOD_DAYS):
+        self.env = env
+        self.period_days = period_days
+        self.domain = [
+            ('is_storable', '=', True),
+            ('active', '=', True),
+            ('company_id', 'in', [False] + env.companies.ids),
+        ] + list(domain or [])
+        self.location_path = None
+        if warehouse_id:
+            warehouse = env['stock.warehouse'].browse(int(warehouse_id))
+            self.location_path = warehouse.view_location_id.parent_path
+
+    # -------------------------------------------------------------------------
+    # CTE communes
+    # -------------------------------------------------------------------------
+
+    def _location_filter(self, alias: str) -> SQL:
+        if not self.location_path:
+            return SQL('TRUE')
+        return SQL('%s.parent_path LIKE %s', SQL.identifier(alias), f'{self.location_path}%')
+
+    def _base_sql(self) -> SQL:
+        """
+        CTE products (id, coût), onhand, sales et metrics: une ligne par
+        produit du périmètre avec stock, ventes, rotation, valeur.
+        """
+        Product = self.env['product.product']
+        query = Product._search(self.domain)
+        products = query.select(
+            SQL.identifier(query.table, 'id'),
+            SQL('%s AS cost', Product._field_to_sql(query.table, 'standard_price', query)),
+        )
+        company_ids = tuple(self.env.companies.ids)
+        date_from = datetime.now() - timedelta(days=self.period_days)
+
+        return SQL(
+            """
+            WITH products AS (%(products)s),
+            onhand AS (
+                SELECT q.product_id, SUM(q.quantity) AS qty
+                  FROM stock_quant q
+                  JOIN stock_location l ON l.id = q.location_id
+                 WHERE l.usage = 'internal'
+                   AND q.company_id IN %(companies)s
+                   AND %(quant_location)s
+                   AND q.product_id IN (SELECT id FROM products)
+                 GROUP BY q.product_id
+            ),
+            sales AS (
+                SELECT m.product_id, SUM(m.product_qty) AS qty
+                  FROM stock_move m
+                  JOIN stock_location src ON src.id = m.location_id
+                  JOIN stock_location dst ON dst.id = m.location_dest_id
+                 WHERE m.state = 'done'
+                   AND src.usage = 'internal'
+                   AND dst.usage = 'customer'
+                   AND m.date >= %(date_from)s
+                   AND m.company_id IN %(companies)s
+                   AND %(move_location)s
+                   AND m.product_id IN (SELECT id FROM products)
+                 GROUP BY m.product_id
+            ),
+            metrics AS (
+                SELECT pr.id,
+                       COALESCE(pr.cost, 0) AS cost,
+                       COALESCE(o.qty, 0) AS qty_available,
+                       COALESCE(s.qty, 0) AS qty_sold,
+                       COALESCE(o.qty, 0) * COALESCE(pr.cost, 0) AS value,
+                       -- Stock moyen approximé par le stock courant (1 si nul)
+                       CASE WHEN COALESCE(s.qty, 0) > 0
+                            THEN s.qty / CASE WHEN o.qty > 0 THEN o.qty ELSE 1 END
+                            ELSE 0 END AS raw_turnover
+                  FROM products pr
+                  LEFT JOIN onhand o ON o.product_id = pr.id
+                  LEFT JOIN sales s ON s.product_id = pr.id
+            )
+            """,
+            products=products,
+            companies=company_ids,
+            quant_location=self._location_filter('l'),
+            move_location=self._location_filter('src'),
+            date_from=date_from,
+        )
+
+    # -------------------------------------------------------------------------
+    # Rotation
+    # -------------------------------------------------------------------------
+
+    def turnover(self, sort: str = 'turnover_desc', limit: int = 50, offset: int = 0,
+                 min_turnover: Optional[float] = None,
+                 max_turnover: Optional[float] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Page de produits triés par rotation / jours de stock.
+
+        Returns:
+            (lignes de la page, total filtré)
+        """
+        filters = [SQL('TRUE')]
+        if min_turnover is not None:
+            filters.append(SQL('turnover >= %s', float(min_turnover)))
+        if max_turnover is not None:
+            filters.append(SQL('turnover <= %s', float(max_turnover)))
+
+        query = SQL(
+            """
+            %(base)s,
+            rated AS (
+                SELECT id, cost, qty_available, qty_sold, value,
+                       ROUND(raw_turnover::numeric, 2) AS turnover,
+                       CASE WHEN raw_turnover > 0
+                            THEN ROUND((%(period)s / raw_turnover)::numeric, 1)
+                            ELSE 0 END AS days_of_stock
+                  FROM metrics
+            )
+            SELECT id, qty_available, qty_sold, turnover, days_of_stock, cost,
+                   COUNT(*) OVER () AS total
+              FROM rated
+             WHERE %(filters)s
+             ORDER BY %(order)s
+             LIMIT %(limit)s OFFSET %(offset)s
+            """,
+            base=self._base_sql(),
+            period=self.period_days,
+            filters=SQL(' AND ').join(filters),
+            order=TURNOVER_SORTS.get(sort, TURNOVER_SORTS['turnover_desc']),
+            limit=int(limit),
+            offset=int(offset),
+        )
+        self.env.cr.execute(query)
+        rows = self.env.cr.dictfetchall()
+
+        if rows:
+            total = rows[0]['total']
+        elif offset:
+            # Page au-delà de la fin: total via un comptage seul
+            self.env.cr.execute(SQL(
+                "%s, rated AS (SELECT ROUND(raw_turnover::numeric, 2) AS turnover FROM metrics)"
+                " SELECT COUNT(*) FROM rated WHERE %s",
+                self._base_sql(), SQL(' AND ').join(filters),
+            ))
+            total = self.env.cr.fetchone()[0]
+        else:
+            total = 0
+
+        info = self._product_info(rows)
+        return [dict(row, **info[row['id']]) for row in rows], total
+
+    # -------------------------------------------------------------------------
+    # ABC
+    # -------------------------------------------------------------------------
+
+    def _ranked_sql(self, threshold_a: float, threshold_b: float) -> SQL:
+        return SQL(
+            """
+            %(base)s,
+            totals AS (SELECT COALESCE(SUM(value), 0) AS total_value FROM metrics),
+            ranked AS (
+                SELECT m.id, m.qty_available AS qty, m.cost, m.value,
+                       ROW_NUMBER() OVER w AS rank,
+                       SUM(m.value) OVER w AS cumulative_value,
+                       t.total_value
+                  FROM metrics m CROSS JOIN totals t
+                 WHERE m.value > 0
+                WINDOW w AS (ORDER BY m.value DESC, m.id ROWS UNBOUNDED PRECEDING)
+            ),
+            classified AS (
+                SELECT *,
+                       CASE WHEN total_value > 0 THEN cumulative_value * 100 / total_value ELSE 0 END
+                           AS cumulative_pct,
+                       CASE WHEN total_value > 0 THEN value * 100 / total_value ELSE 0 END AS value_pct
+                  FROM ranked
+            )
+            SELECT *,
+                   CASE WHEN cumulative_pct <= %(a)s THEN 'A'
+                        WHEN cumulative_pct <= %(b)s THEN 'B'
+                        ELSE 'C' END AS category
+              FROM classified
+            """,
+            base=self._base_sql(),
+            a=threshold_a,
+            b=threshold_b,
+        )
+
+    def abc(self, threshold_a: float = 80, threshold_b: float = 95,
+            limit: Optional[int] = None, offset: int = 0,
+            category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Classification ABC (Pareto sur la valeur de stock).
+
+        Returns:
+            {'products': page classée, 'kpis': par classe, 'total_value',
+             'total_products'}
+        """
+        ranked = self._ranked_sql(threshold_a, threshold_b)
+        cr = self.env.cr
+
+        cr.execute(SQL(
+            """
+            SELECT category, COUNT(*) AS count, SUM(value) AS value, MAX(total_value) AS total_value
+              FROM (%s) abc
+             GROUP BY category
+            """,
+            ranked,
+        ))
+        groups = {row['category']: row for row in cr.dictfetchall()}
+
+        page = SQL('SELECT * FROM (%s) abc', ranked)
+        if category in ABC_CLASSES:
+            page = SQL('%s WHERE category = %s', page, category)
+        page = SQL('%s ORDER BY rank', page)
+        if limit:
+            page = SQL('%s LIMIT %s OFFSET %s', page, int(limit), int(offset))
+        cr.execute(page)
+        rows = cr.dictfetchall()
+
+        total_products = sum(group['count'] for group in groups.values())
+        total_value = float(next(iter(groups.values()))['total_value']) if groups else self._total_value()
+
+        kpis = {}
+        for abc_class in ABC_CLASSES:
+            group = groups.get(abc_class, {'count': 0, 'value': 0})
+            value = float(group['value'] or 0)
+            kpis[f'category_{abc_class.lower()}'] = {
+                'count': group['count'],
+                'count_pct': round(group['count'] / total_products * 100, 1) if total_products else 0,
+                'value': round(value, 2),
+                'value_pct': round(value / total_value * 100, 1) if total_value > 0 else 0,
+            }
+
+        info = self._product_info(rows)
+        products = [
+            {
+                'id': row['id'],
+                **info[row['id']],
+                'qty': row['qty'],
+                'standard_price': row['cost'],
+                'value': row['value'],
+                'category': row['category'],
+                'cumulative_value': row['cumulative_value'],
+                'cumulative_pct': round(float(row['cumulative_pct']), 2),
+                'value_pct': round(float(row['value_pct']), 2),
+                'rank': row['rank'],
+            }
+            for row in rows
+        ]
+        return {
+            'products': products,
+            'kpis': kpis,
+            'total_value': total_value,
+            'total_products': total_products,
+        }
+
+    def _total_value(self) -> float:
+        """Valeur totale (y compris stocks négatifs) sans produit valorisé positivement"""
+        self.env.cr.execute(SQL('%s SELECT COALESCE(SUM(value), 0) FROM metrics', self._base_sql()))
+        return float(self.env.cr.fetchone()[0])
+
+    # -------------------------------------------------------------------------
+    # Snapshots
+    # -------------------------------------------------------------------------
+
+    def snapshot_sql(self, snapshot_date, threshold_a: float = 80, threshold_b: float = 95) -> SQL:
+        """
+        INSERT ... SELECT des métriques du périmètre dans
+        quelyos_stock_analytics_snapshot (une requête, sans aller-retour ORM).
+        """
+        company_id = self.env.company.id
+        return SQL(
+            """
+            %(base)s
+            , abc AS (SELECT id, category FROM (%(classified)s) c)
+            INSERT INTO quelyos_stock_analytics_snapshot
+                   (snapshot_date, company_id, product_id, qty_available, qty_sold,
+                    turnover, value, abc_class, create_uid, create_date, write_uid, write_date)
+            SELECT %(date)s, %(company)s, m.id, m.qty_available, m.qty_sold,
+                   ROUND(m.raw_turnover::numeric, 2), m.value, abc.category,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM metrics m
+              LEFT JOIN abc ON abc.id = m.id
+             WHERE m.qty_available <> 0 OR m.qty_sold <> 0
+            """,
+            base=self._base_sql(),
+            classified=SQL(
+                """
+                SELECT id,
+                       CASE WHEN SUM(value) OVER w * 100 <= %(a)s * t.total THEN 'A'
+                            WHEN SUM(value) OVER w * 100 <= %(b)s * t.total THEN 'B'
+                            ELSE 'C' END AS category
+                  FROM metrics, (SELECT SUM(value) AS total FROM metrics) t
+                 WHERE value > 0 AND t.total > 0
+                WINDOW w AS (ORDER BY value DESC, id ROWS UNBOUNDED PRECEDING)
+                """,
+                a=threshold_a,
+                b=threshold_b,
+            ),
+            date=snapshot_date,
+            company=company_id,
+            uid=self.env.uid,
+        )
+
+    # -------------------------------------------------------------------------
+    # Produits de la page
+    # -------------------------------------------------------------------------
+
+    def _product_info(self, rows: List[Dict]) -> Dict[int, Dict[str, Any]]:
+        """Nom, référence et prix des produits de la page (une lecture ORM)"""
+        products = self.env['product.product'].browse([row['id'] for row in rows])
+        return {
+            product.id: {
+                'name': product.display_name,
+                'sku': product.default_code or '',
+                'list_price': product.list_price,
+            }
+            for product in products
+        }
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Disponibilité du stock par produit et entrepôt pour Quelyos API
+
+Service unique utilisé par les listes produits, la validation du panier et
+la synchronisation POS:
+- en main et réservé depuis stock.quant (emplacements internes)
+- à recevoir depuis stock.move (mouvements ouverts vers un emplacement
+  interne, hors transferts internes à l'entrepôt)
+- disponible (free) = en main - réservé, jamais négatif
+
+Une seule requête groupée par (produit, entrepôt) pour tout un lot de
+produits. Le détail par entrepôt de chaque produit est mis en cache Redis
+par société (TTL court) et invalidé après commit par les écritures sur
+stock.quant (invalidate_availability).
+
+Usage:
+    availability = StockAvailability(env).get(product_ids, warehouse_ids=[wh_id])
+    availability[product_id]['free'], availability[product_id]['incoming']
+    free = StockAvailability(env).free_qty(product_ids, warehouse_id=wh_id)
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from odoo.tools import SQL
+
+from .cache import get_cache_service, CacheTTL
+
+_logger = logging.getLogger(__name__)
+
+# Produits à invalider dans cr.postcommit.data: {(company_id, product_id)}
+DIRTY_KEY = 'quelyos.stock_availability.dirty'
+
+# Mouvements sans effet sur la quantité à recevoir
+CLOSED_MOVE_STATES = ('draft', 'done', 'cancel')
+
+# Entrepôt des emplacements internes hors entrepôt
+NO_WAREHOUSE = 0
+
+
+def _cache_key(company_id: int, product_id: int) -> str:
+    return f"tenant:{company_id}:stock:availability:{product_id}"
+
+
+def _quantities(on_hand: float = 0.0, reserved: float = 0.0, incoming: float = 0.0) -> Dict[str, float]:
+    return {
+        'on_hand': round(on_hand, 4),
+        'reserved': round(reserved, 4),
+        'free': round(max(on_hand - reserved, 0.0), 4),
+        'incoming': round(incoming, 4),
+    }
+
+
+class StockAvailability:
+    """
+    Quantités en main, réservées, disponibles et à recevoir de la société
+    courante.
+
+    Args:
+        env: Environment (sudo() en général, société = env.company)
+        use_cache: Lire / alimenter le cache Redis
+    """
+
+    def __init__(self, env, use_cache: bool = True):
+        self.env = env
+        self.company_id = env.company.id
+        self.use_cache = use_cache
+
+    def get(self, product_ids: Iterable[int],
+            warehouse_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Disponibilité d'un lot de produits.
+
+        Args:
+            product_ids: Produits (product.product)
+            warehouse_ids: Limiter aux entrepôts donnés (défaut: tous)
+
+        Returns:
+            {product_id: {'on_hand', 'reserved', 'free', 'incoming',
+                          'warehouses': {warehouse_id: {...}}}}
+            (0 = emplacements internes hors entrepôt; tous les produits
+            demandés sont présents, à zéro sans stock)
+        """
+        product_ids = {int(pid) for pid in product_ids if pid}
+        warehouse_ids = {int(wid) for wid in warehouse_ids} if warehouse_ids else None
+
+        result = {}
+        for product_id, warehouses in self._by_warehouse(product_ids).items():
+            on_hand = reserved = incoming = 0.0
+            details = {}
+            for warehouse_id, (wh_on_hand, wh_reserved, wh_incoming) in warehouses.items():
+                if warehouse_ids is not None and warehouse_id not in warehouse_ids:
+                    continue
+                details[warehouse_id] = _quantities(wh_on_hand, wh_reserved, wh_incoming)
+                on_hand += wh_on_hand
+                reserved += wh_reserved
+                incoming += wh_incoming
+            result[product_id] = dict(_quantities(on_hand, reserved, incoming), warehouses=details)
+        return result
+
+    def free_qty(self, product_ids: Iterable[int], warehouse_id: Optional[int] = None) -> Dict[int, float]:
+        """Quantité disponible par produit (un entrepôt ou tous)"""
+        availability = self.get(product_ids, [warehouse_id] if warehouse_id else None)
+        return {product_id: values['free'] for product_id, values in availability.items()}
+
+    # -------------------------------------------------------------------------
+    # Calcul et cache
+    # -------------------------------------------------------------------------
+
+    def _by_warehouse(self, product_ids) -> Dict[int, Dict[int, List[float]]]:
+        """{product_id: {warehouse_id: [on_hand, reserved, incoming]}} depuis le cache puis la base"""
+        if not product_ids:
+            return {}
+        cache = get_cache_service()
+        keys = {product_id: _cache_key(self.company_id, product_id) for product_id in product_ids}
+
+        result = {}
+        if self.use_cache:
+            for product_id, cached in zip(keys, cache.get_many(list(keys.values()))):
+                if cached is not None:
+                    result[product_id] = {int(warehouse_id): values for warehouse_id, values in cached.items()}
+
+        missing = product_ids - result.keys()
+        if missing:
+            computed = self.compute(missing)
+            result.update(computed)
+            if self.use_cache:
+                for product_id, warehouses in computed.items():
+                    cache.set(keys[product_id], warehouses, CacheTTL.STOCK_SUMMARY)
+        return result
+
+    def compute(self, product_ids) -> Dict[int, Dict[int, List[float]]]:
+        """
+        Quantités par (produit, entrepôt) en une requête: quants des
+        emplacements internes et mouvements ouverts entrant dans un entrepôt.
+        """
+        product_ids = list(product_ids)
+        self.env.cr.execute(SQL(
+            """
+            WITH stock AS (
+                SELECT q.product_id, l.warehouse_id,
+                       SUM(q.quantity) AS on_hand, SUM(q.reserved_quantity) AS reserved, 0 AS incoming
+                  FROM stock_quant q
+                  JOIN stock_location l ON l.id = q.location_id
+                 WHERE q.product_id = ANY(%(product_ids)s)
+                   AND q.company_id = %(company_id)s
+                   AND l.usage = 'internal'
+                 GROUP BY q.product_id, l.warehouse_id
+                 UNION ALL
+                SELECT m.product_id, dest.warehouse_id, 0, 0, SUM(m.product_qty)
+                  FROM stock_move m
+                  JOIN stock_location dest ON dest.id = m.location_dest_id
+                  JOIN stock_location src ON src.id = m.location_id
+                 WHERE m.product_id = ANY(%(product_ids)s)
+                   AND m.company_id = %(company_id)s
+                   AND m.state NOT IN %(closed_states)s
+                   AND dest.usage = 'internal'
+                   AND (src.usage <> 'internal' OR src.warehouse_id IS DISTINCT FROM dest.warehouse_id)
+                 GROUP BY m.product_id, dest.warehouse_id
+            )
+            SELECT product_id, COALESCE(warehouse_id, %(no_warehouse)s) AS warehouse_id,
+                   SUM(on_hand) AS on_hand, SUM(reserved) AS reserved, SUM(incoming) AS incoming
+              FROM stock
+             GROUP BY product_id, COALESCE(warehouse_id, %(no_warehouse)s)
+            """,
+            product_ids=product_ids,
+            company_id=self.company_id,
+            closed_states=CLOSED_MOVE_STATES,
+            no_warehouse=NO_WAREHOUSE,
+        ))
+        result = {product_id: {} for product_id in product_ids}
+        for product_id, warehouse_id, on_hand, reserved, incoming in self.env.cr.fetchall():
+            result[product_id][warehouse_id] = [float(on_hand), float(reserved), float(incoming)]
+        return result
+
+
+def invalidate_availability(env, quants) -> None:
+    """
+    Invalide après commit la disponibilité en cache des produits des quants
+    donnés.
+    """
+    keys = {(quant.company_id.id, quant.product_id.id) for quant in quants if quant.company_id}
+    if not keys:
+        return
+    dirty = env.cr.postcommit.data.setdefault(DIRTY_KEY, set())
+    if not dirty:
+        env.cr.postcommit.add(lambda: _flush(dirty))
+    dirty.update(keys)
+
+
+def _flush(dirty) -> None:
+    cache = get_cache_service()
+    for company_id, product_id in dirty:
+        cache.delete(_cache_key(company_id, product_id))
+    dirty.clear()
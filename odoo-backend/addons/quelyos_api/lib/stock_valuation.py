@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de valorisation du stock en SQL pour Quelyos API
+
+Valeur = quantité en main (stock.quant, emplacements internes) × coût
+standard du produit (champ dépendant de la société), agrégée en base:
+- une ligne par (produit, entrepôt) dans la CTE lines
+- totaux par catégorie, par entrepôt et global en une passe
+  (GROUPING SETS)
+- photo journalière par (entrepôt, catégorie) dans
+  quelyos_stock_valuation_snapshot: la valorisation à une date passée est
+  une lecture de la dernière photo, sans rejouer les mouvements
+
+Usage:
+    engine = StockValuation(env, warehouse_id=wh_id, category_id=categ_id)
+    report = engine.report()            # kpis, by_category, by_warehouse
+    rows = engine.by_product()          # détail produit
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class StockValuation:
+    """
+    Valorisation au coût standard d'un périmètre produits.
+
+    Args:
+        env: Environment (sudo() en général, périmètre société = env.companies)
+        warehouse_id: Limiter aux emplacements d'un entrepôt
+        category_id: Limiter à une catégorie et ses sous-catégories
+        domain: Domaine produit additionnel
+    """
+
+    def __init__(self, env, warehouse_id: Optional[int] = None, category_id: Optional[int] = None,
+                 domain: Optional[list] = None):
+        self.env = env
+        self.domain = [
+            ('is_storable', '=', True),
+            ('company_id', 'in', [False] + env.companies.ids),
+        ] + list(domain or [])
+        if category_id:
+            self.domain.append(('categ_id', 'child_of', int(category_id)))
+        self.location_path = None
+        if warehouse_id:
+            warehouse = env['stock.warehouse'].browse(int(warehouse_id))
+            self.location_path = warehouse.view_location_id.parent_path
+
+    # -------------------------------------------------------------------------
+    # CTE communes
+    # -------------------------------------------------------------------------
+
+    def _lines_sql(self) -> SQL:
+        """
+        CTE products (id, catégorie, coût) et lines: stock et valeur par
+        (produit, entrepôt, catégorie) sur les emplacements internes.
+        """
+        Product = self.env['product.product']
+        query = Product._search(self.domain)
+        products = query.select(
+            SQL.identifier(query.table, 'id'),
+            SQL('%s AS cost', Product._field_to_sql(query.table, 'standard_price', query)),
+        )
+        location_filter = SQL('TRUE')
+        if self.location_path:
+            location_filter = SQL('l.parent_path LIKE %s', f'{self.location_path}%')
+
+        return SQL(
+            """
+            WITH costs AS (%(products)s),
+            products AS (
+                SELECT c.id, pt.categ_id, c.cost
+                  FROM costs c
+                  JOIN product_product pp ON pp.id = c.id
+                  JOIN product_template pt ON pt.id = pp.product_tmpl_id
+            ),
+            lines AS (
+                SELECT q.product_id, l.warehouse_id, pr.categ_id,
+                       SUM(q.quantity) AS quantity,
+                       SUM(q.quantity) * COALESCE(pr.cost, 0) AS value
+                  FROM stock_quant q
+                  JOIN stock_location l ON l.id = q.location_id
+                  JOIN products pr ON pr.id = q.product_id
+                 WHERE l.usage = 'internal'
+                   AND q.company_id IN %(companies)s
+                   AND %(location_filter)s
+                 GROUP BY q.product_id, l.warehouse_id, pr.categ_id, pr.cost
+            )
+            """,
+            products=products,
+            companies=tuple(self.env.companies.ids),
+            location_filter=location_filter,
+        )
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    def totals(self) -> Dict[str, Any]:
+        """
+        Totaux par catégorie, par entrepôt et global en une requête.
+
+        Returns:
+            {'total': {...}, 'categories': {categ_id: {...}},
+             'warehouses': {warehouse_id: {...}}} avec quantity, value,
+             product_count (produits en stock non nul)
+        """
+        self.env.cr.execute(SQL(
+            """
+            %(lines)s
+            SELECT GROUPING(categ_id) AS by_warehouse, GROUPING(warehouse_id) AS by_category,
+                   categ_id, warehouse_id,
+                   COALESCE(SUM(quantity), 0) AS quantity,
+                   COALESCE(SUM(value), 0) AS value,
+                   COUNT(DISTINCT product_id) FILTER (WHERE quantity <> 0) AS product_count
+              FROM lines
+             GROUP BY GROUPING SETS ((categ_id), (warehouse_id), ())
+            """,
+            lines=self._lines_sql(),
+        ))
+        result = {'total': {'quantity': 0.0, 'value': 0.0, 'product_count': 0}, 'categories': {}, 'warehouses': {}}
+        for row in self.env.cr.dictfetchall():
+            values = {
+                'quantity': float(row['quantity']),
+                'value': float(row['value']),
+                'product_count': row['product_count'],
+            }
+            if row['by_warehouse'] and row['by_category']:
+                result['total'] = values
+            elif row['by_warehouse']:
+                result['warehouses'][row['warehouse_id']] = values
+            else:
+                result['categories'][row['categ_id']] = values
+        return result
+
+    def by_product(self, include_zero_stock: bool = False) -> List[Dict[str, Any]]:
+        """
+        Stock et valeur par produit, triés par valeur décroissante.
+
+        Seuls les produits ayant un coût standard sont retournés.
+
+        Args:
+            include_zero_stock: Inclure les produits sans stock
+        """
+        self.env.cr.execute(SQL(
+            """
+            %(lines)s
+            SELECT pr.id, pr.categ_id, COALESCE(pr.cost, 0) AS cost,
+                   COALESCE(SUM(li.quantity), 0) AS quantity,
+                   COALESCE(SUM(li.value), 0) AS value
+              FROM products pr
+              LEFT JOIN lines li ON li.product_id = pr.id
+             GROUP BY pr.id, pr.categ_id, pr.cost
+            HAVING %(stock_filter)s
+             ORDER BY value DESC, pr.id
+            """,
+            lines=self._lines_sql(),
+            stock_filter=SQL('COALESCE(pr.cost, 0) > 0') if include_zero_stock
+            else SQL('COALESCE(pr.cost, 0) > 0 AND COALESCE(SUM(li.quantity), 0) > 0'),
+        ))
+        return self.env.cr.dictfetchall()
+
+    def report(self) -> Dict[str, Any]:
+        """Totaux nommés pour les tableaux de bord (kpis, by_category, by_warehouse)"""
+        return format_report(self.env, self.totals())
+
+    # -------------------------------------------------------------------------
+    # Snapshots
+    # -------------------------------------------------------------------------
+
+    def snapshot_sql(self, snapshot_date) -> SQL:
+        """
+        INSERT ... SELECT des totaux (entrepôt, catégorie) du périmètre dans
+        quelyos_stock_valuation_snapshot.
+        """
+        return SQL(
+            """
+            %(lines)s
+            INSERT INTO quelyos_stock_valuation_snapshot
+                   (snapshot_date, company_id, warehouse_id, categ_id, quantity, value,
+                    product_count, create_uid, create_date, write_uid, write_date)
+            SELECT %(date)s, %(company)s, warehouse_id, categ_id, SUM(quantity), SUM(value),
+                   COUNT(DISTINCT product_id) FILTER (WHERE quantity <> 0),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM lines
+             GROUP BY warehouse_id, categ_id
+            HAVING SUM(quantity) <> 0 OR SUM(value) <> 0
+            """,
+            lines=self._lines_sql(),
+            date=snapshot_date,
+            company=self.env.company.id,
+            uid=self.env.uid,
+        )
+
+
+def format_report(env, totals: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Totaux {'total', 'categories', 'warehouses'} (moteur ou photo) ->
+    réponse nommée et triée par valeur décroissante.
+    """
+    categories = env['product.category'].browse([cid for cid in totals['categories'] if cid])
+    warehouses = env['stock.warehouse'].browse([wid for wid in totals['warehouses'] if wid])
+    category_names = {category.id: category.complete_name or category.name for category in categories}
+    warehouse_names = {warehouse.id: warehouse.name for warehouse in warehouses}
+
+    def _rows(groups, key, names, default_name):
+        return sorted((
+            {
+                f'{key}_id': group_id or None,
+                f'{key}_name': names.get(group_id, default_name),
+                'total_value': round(values['value'], 2),
+                'total_qty': round(values['quantity'], 2),
+                'product_count': values['product_count'],
+            }
+            for group_id, values in groups.items()
+        ), key=lambda row: row['total_value'], reverse=True)
+
+    total = totals['total']
+    return {
+        'kpis': {
+            'total_value': round(total['value'], 2),
+            'total_qty': round(total['quantity'], 2),
+            'product_count': total['product_count'],
+            'avg_value_per_product': (
+                round(total['value'] / total['product_count'], 2) if total['product_count'] else 0.0
+            ),
+            'valuation_method': 'standard_price',
+        },
+        'by_category': _rows(totals['categories'], 'category', category_names, 'Sans catégorie'),
+        'by_warehouse': _rows(totals['warehouses'], 'warehouse', warehouse_names, 'Hors entrepôt'),
+    }
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Compilation des thèmes tenant pour Quelyos API
+
+Le thème d'un tenant (config du Theme Engine + overrides JSON + palette
+de branding issue des presets) est compilé une fois, à la modification,
+en deux artefacts:
+- document JSON fusionné (réponse complète de /api/tenants/<id>/theme)
+- feuille CSS minifiée de custom properties (:root{--primary:...}),
+  mêmes variables que l'application côté client (ThemeProvider)
+
+Les deux sont identifiés par un hash de contenu: servis sous une URL
+versionnée (/api/tenants/<id>/theme/<hash>.css), ils sont immuables et
+cacheables un an; le manifeste (hash courant) se revalide par ETag.
+
+Usage:
+    compiled = compile_theme(theme_data, overrides_json, branding)
+    compiled.json, compiled.css, compiled.hash
+"""
+
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+# Longueur du hash de contenu (hex)
+HASH_LENGTH = 16
+
+FONT_SANS_FALLBACK = "-apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif"
+FONT_MONO_FALLBACK = "'Menlo', 'Monaco', 'Courier New', monospace"
+
+# (clé de config.colors, variables CSS)
+THEME_COLOR_VARS = (
+    ('primary', ('--primary', '--color-primary')),
+    ('secondary', ('--secondary', '--color-secondary')),
+    ('accent', ('--accent', '--color-accent')),
+    ('background', ('--background', '--color-background')),
+    ('text', ('--foreground', '--color-foreground')),
+    ('muted', ('--muted', '--color-muted')),
+)
+
+# (clé de config.spacing, variable CSS)
+THEME_SPACING_VARS = (
+    ('containerWidth', '--container-width'),
+    ('gutter', '--gutter'),
+)
+
+# Palette de branding (presets) absente du Theme Engine: (clé, variable CSS)
+BRANDING_COLOR_VARS = (
+    ('primaryDark', '--primary-dark'),
+    ('primaryLight', '--primary-light'),
+    ('secondaryDark', '--secondary-dark'),
+    ('secondaryLight', '--secondary-light'),
+    ('mutedForeground', '--muted-foreground'),
+    ('border', '--border'),
+    ('ring', '--ring'),
+)
+
+# Valeurs refusées dans une déclaration (sortie de :root{...})
+_UNSAFE_VALUE = re.compile(r'[;{}<>\\]|/\*')
+
+
+class CompiledTheme(NamedTuple):
+    """Artefacts compilés d'un thème tenant"""
+    json: str
+    css: str
+    hash: str
+
+
+def deep_merge(base: Dict, override: Dict) -> Dict:
+    """Merge récursif: les valeurs d'override écrasent celles de base"""
+    result = base.copy()
+    for key, value in override.items():
+        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
+            result[key] = deep_merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def parse_overrides(overrides: Optional[str]) -> Dict:
+    """Overrides JSON du tenant ({} si vide ou invalide)"""
+    if not overrides:
+        return {}
+    try:
+        value = json.loads(overrides)
+    except json.JSONDecodeError:
+        _logger.warning("Invalid theme_overrides JSON ignored at compile time")
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def _declaration(name: str, value: Any) -> Optional[str]:
+    if value is None or value is False or value == '':
+        return None
+    value = str(value).strip()
+    if _UNSAFE_VALUE.search(value):
+        _logger.warning("Theme CSS value rejected for %s", name)
+        return None
+    return f'{name}:{value}'
+
+
+def _font_stack(family: str, fallback: str) -> str:
+    return f"'{family.replace(chr(39), '')}', {fallback}"
+
+
+def _minify_css(css: str) -> str:
+    """Minification simple (commentaires, blancs) d'une feuille libre"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def theme_css(config: Dict, branding: Optional[Dict] = None) -> str:
+    """Feuille :root minifiée des variables du thème"""
+    declarations: List[Optional[str]] = []
+    branding_colors = (branding or {}).get('colors') or {}
+    for key, name in BRANDING_COLOR_VARS:
+        declarations.append(_declaration(name, branding_colors.get(key)))
+
+    colors = config.get('colors') or {}
+    for key, names in THEME_COLOR_VARS:
+        for name in names:
+            declarations.append(_declaration(name, colors.get(key)))
+
+    spacing = config.get('spacing') or {}
+    for key, name in THEME_SPACING_VARS:
+        declarations.append(_declaration(name, spacing.get(key)))
+
+    typography = config.get('typography') or {}
+    if typography.get('body'):
+        stack = _font_stack(typography['body'], FONT_SANS_FALLBACK)
+        declarations.append(_declaration('--app-font-sans', stack))
+        declarations.append(_declaration('--font-sans', stack))
+    if typography.get('mono'):
+        declarations.append(_declaration('--font-mono', _font_stack(typography['mono'], FONT_MONO_FALLBACK)))
+
+    css = ':root{' + ';'.join(d for d in declarations if d) + '}'
+    if config.get('customCSS'):
+        css += _minify_css(config['customCSS'])
+    return css
+
+
+def compile_theme(theme_data: Dict, overrides: Optional[str] = None,
+                  branding: Optional[Dict] = None) -> CompiledTheme:
+    """
+    Compile la réponse thème d'un tenant.
+
+    Args:
+        theme_data: Résultat de quelyos.theme.get_theme_config() (success=True)
+        overrides: theme_overrides du tenant (JSON partiel)
+        branding: Palette du tenant ({'colors': {...}}, presets)
+    """
+    theme = dict(theme_data['theme'])
+    theme['config'] = deep_merge(theme.get('config') or {}, parse_overrides(overrides))
+
+    css = theme_css(theme['config'], branding)
+    digest = hashlib.sha256()
+    document = {'success': True, 'theme': theme}
+    digest.update(json.dumps(document, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(css.encode('utf-8'))
+    content_hash = digest.hexdigest()[:HASH_LENGTH]
+
+    document['theme']['hash'] = content_hash
+    payload = json.dumps(document, separators=(',', ':'), ensure_ascii=False, default=str)
+    return CompiledTheme(json=payload, css=css, hash=content_hash)
+
+
+def asset_urls(tenant_id: int, content_hash: str) -> Dict[str, str]:
+    """URLs versionnées (immuables) des artefacts"""
+    base = f'/api/tenants/{tenant_id}/theme/{content_hash}'
+    return {'hash': content_hash, 'css_url': f'{base}.css', 'json_url': f'{base}.json'}
+
+
+def split_asset_name(asset: str) -> Tuple[str, str]:
+    """'<hash>.css' -> (hash, 'css'); extension vide si inconnue"""
+    content_hash, _sep, extension = asset.rpartition('.')
+    if extension not in ('css', 'json') or not content_hash:
+        return asset, ''
+    return content_hash, extension
@@ -10,18 +10,17 @@ Limitation des requêtes par utilisateur avec:
 - Overflow graceful degradation
 """
 
-import os
-import time
 import logging
 from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from functools import wraps
 
+from .gcra import GCRALimiter, Limit
+from .redis_client import get_redis, redis_available
+
 _logger = logging.getLogger(__name__)
 
-# Configuration
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 THROTTLE_PREFIX = 'quelyos:throttle:'
 
 
@@ -76,6 +75,24 @@ PLAN_QUOTAS: Dict[Plan, Quota] = {
 }
 
 
+# Ordre des quotas: en cas d'égalité, le premier dépassé est signalé
+WINDOWS = ('burst', 'minute', 'hour', 'day')
+
+
+def _quota_limits(quota: Quota) -> Tuple[Limit, ...]:
+    return (
+        Limit(quota.burst_size, quota.burst_period, 'burst'),
+        Limit(quota.requests_per_minute, 60, 'minute'),
+        Limit(quota.requests_per_hour, 3600, 'hour'),
+        Limit(quota.requests_per_day, 86400, 'day'),
+    )
+
+
+def _throttle_keys(user_id: str) -> Tuple[str, ...]:
+    """Une clé GCRA (TAT) par quota"""
+    return tuple(f"{THROTTLE_PREFIX}{user_id}:{window}:tat" for window in WINDOWS)
+
+
 # =============================================================================
 # THROTTLER
 # =============================================================================
@@ -100,16 +117,12 @@ class UserThrottler:
     """
 
     def __init__(self):
-        self._redis = None
-        self._init_redis()
+        self._limiter = GCRALimiter('throttling')
 
-    def _init_redis(self):
-        try:
-            import redis
-            self._redis = redis.from_url(REDIS_URL)
-            self._redis.ping()
-        except Exception as e:
-            _logger.warning(f"Redis not available for throttling: {e}")
+    @property
+    def _redis(self):
+        """Client 'throttling' partagé, None tant que le circuit Redis est ouvert"""
+        return get_redis('throttling') if redis_available() else None
 
     def check(
         self,
@@ -132,112 +145,54 @@ class UserThrottler:
             return True, {}
 
         quota = PLAN_QUOTAS.get(plan, PLAN_QUOTAS[Plan.FREE])
-        now = time.time()
-
-        # Clés Redis
-        minute_key = f"{THROTTLE_PREFIX}{user_id}:minute:{int(now // 60)}"
-        hour_key = f"{THROTTLE_PREFIX}{user_id}:hour:{int(now // 3600)}"
-        day_key = f"{THROTTLE_PREFIX}{user_id}:day:{int(now // 86400)}"
-        burst_key = f"{THROTTLE_PREFIX}{user_id}:burst"
-
-        pipe = self._redis.pipeline()
-
-        # Incrémenter les compteurs
-        pipe.incr(minute_key)
-        pipe.expire(minute_key, 60)
-        pipe.incr(hour_key)
-        pipe.expire(hour_key, 3600)
-        pipe.incr(day_key)
-        pipe.expire(day_key, 86400)
-
-        # Burst: sliding window
-        pipe.zremrangebyscore(burst_key, 0, now - quota.burst_period)
-        pipe.zadd(burst_key, {str(now): now})
-        pipe.zcard(burst_key)
-        pipe.expire(burst_key, quota.burst_period + 1)
-
-        results = pipe.execute()
-
-        minute_count = results[0]
-        hour_count = results[2]
-        day_count = results[4]
-        burst_count = results[7]
-
-        # Vérifier les limites
-        info = {
-            'minute': {'current': minute_count, 'limit': quota.requests_per_minute},
-            'hour': {'current': hour_count, 'limit': quota.requests_per_hour},
-            'day': {'current': day_count, 'limit': quota.requests_per_day},
-            'burst': {'current': burst_count, 'limit': quota.burst_size},
-        }
+        limits = _quota_limits(quota)
 
-        # Vérifier burst
-        if burst_count > quota.burst_size:
-            info['exceeded'] = 'burst'
-            info['retry_after'] = quota.burst_period
-            return False, info
-
-        # Vérifier minute
-        if minute_count > quota.requests_per_minute:
-            info['exceeded'] = 'minute'
-            info['retry_after'] = 60 - (now % 60)
-            return False, info
+        # Un script GCRA pour les quatre quotas, via l'auto-pipeline de la
+        # requête (part avec les écritures en attente en un aller-retour)
+        try:
+            decision = self._limiter.check(_throttle_keys(user_id), limits)
+        except Exception as e:
+            _logger.error(f"Throttling error: {e}")
+            return True, {}  # Fail open
 
-        # Vérifier heure
-        if hour_count > quota.requests_per_hour:
-            info['exceeded'] = 'hour'
-            info['retry_after'] = 3600 - (now % 3600)
-            return False, info
+        info = {
+            limit.name: {'current': limit.limit - remaining, 'limit': limit.limit}
+            for limit, remaining in zip(limits, decision.remaining)
+        }
 
-        # Vérifier jour
-        if day_count > quota.requests_per_day:
-            info['exceeded'] = 'day'
-            info['retry_after'] = 86400 - (now % 86400)
+        if not decision.allowed:
+            info['exceeded'] = limits[decision.exceeded].name
+            info['retry_after'] = decision.retry_after
             return False, info
 
         return True, info
 
-    def get_usage(self, user_id: str) -> Dict:
+    def get_usage(self, user_id: str, plan: Plan = Plan.FREE) -> Dict:
         """Retourne les statistiques d'usage actuelles"""
         if not self._redis:
             return {}
 
-        now = time.time()
-
-        minute_key = f"{THROTTLE_PREFIX}{user_id}:minute:{int(now // 60)}"
-        hour_key = f"{THROTTLE_PREFIX}{user_id}:hour:{int(now // 3600)}"
-        day_key = f"{THROTTLE_PREFIX}{user_id}:day:{int(now // 86400)}"
-
-        pipe = self._redis.pipeline()
-        pipe.get(minute_key)
-        pipe.get(hour_key)
-        pipe.get(day_key)
-        results = pipe.execute()
+        quota = PLAN_QUOTAS.get(plan, PLAN_QUOTAS[Plan.FREE])
+        limits = _quota_limits(quota)
+        remaining = self._limiter.peek(_throttle_keys(user_id), limits)
 
         return {
-            'minute': int(results[0] or 0),
-            'hour': int(results[1] or 0),
-            'day': int(results[2] or 0),
+            limit.name: limit.limit - left
+            for limit, left in zip(limits, remaining)
+            if limit.name != 'burst'
         }
 
     def reset(self, user_id: str, window: str = 'all') -> bool:
         """Réinitialise les compteurs d'un utilisateur"""
+        keys = _throttle_keys(user_id)
+        self._limiter.forget(keys)
         if not self._redis:
             return True
 
-        now = time.time()
-
         if window == 'all':
-            pattern = f"{THROTTLE_PREFIX}{user_id}:*"
-            keys = self._redis.keys(pattern)
-            if keys:
-                self._redis.delete(*keys)
-        elif window == 'minute':
-            key = f"{THROTTLE_PREFIX}{user_id}:minute:{int(now // 60)}"
-            self._redis.delete(key)
-        elif window == 'hour':
-            key = f"{THROTTLE_PREFIX}{user_id}:hour:{int(now // 3600)}"
-            self._redis.delete(key)
+            self._redis.delete(*keys)
+        elif window in WINDOWS:
+            self._redis.delete(keys[WINDOWS.index(window)])
 
         return True
 
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur WAF compilé pour Quelyos API
+
+Les règles actives sont compilées une fois par worker et par version:
+- Regex précompilées (plus de re.compile par requête)
+- Préfiltre littéral: chaque règle déclare les sous-chaînes qu'un match
+  contient forcément (extraites du pattern); un seul passage Aho-Corasick
+  (pyahocorasick si installé) sélectionne les règles candidates
+- Règles sans littéral exploitable: regroupées par (cible, flags) en une
+  alternation unique, qui sert de porte avant l'évaluation individuelle
+- Exclusions (IPs, endpoints, utilisateurs) précalculées
+
+Le résultat est identique à l'évaluation règle par règle: ordre de priorité,
+arrêt à la première règle 'block'.
+
+Usage:
+    engine = WAFEngine(rule_dicts, version='42')
+    matched = engine.evaluate(request_data)  # [CompiledRule, ...]
+"""
+
+import fnmatch
+import json
+import logging
+import re
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+try:
+    from re import _parser as sre_parse  # Python >= 3.11
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+_logger = logging.getLogger(__name__)
+
+# Cibles d'inspection (inspect_target='all' = toutes)
+TARGETS = ('url', 'query_params', 'body', 'headers', 'cookies')
+
+# Longueur minimale d'un littéral pour servir de préfiltre
+MIN_LITERAL_LENGTH = 2
+
+# Références arrière / conditionnelles: numérotation faussée dans une alternation
+BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+def compile_flags(pattern_flags: Optional[str]) -> int:
+    """Traduit le champ pattern_flags en flags re"""
+    return {
+        'i': re.IGNORECASE,
+        'm': re.MULTILINE,
+        's': re.DOTALL,
+    }.get(pattern_flags, 0)
+
+
+# =============================================================================
+# EXTRACTION DES LITTÉRAUX REQUIS
+# =============================================================================
+
+def fold(text: str) -> str:
+    """
+    Normalisation casse pour le préfiltre: doit couvrir les équivalences de
+    re.IGNORECASE (ſ/s, K/k, ı/i...), sinon le préfiltre ouvrirait un
+    contournement. Un surensemble de candidats reste sans conséquence.
+    """
+    text = text.casefold()
+    return text if text.isascii() else text.replace('\u0131', 'i')
+
+
+def _better(current, candidate):
+    """Garde l'ensemble de littéraux le plus sélectif (plus court élément le plus long)"""
+    if not candidate or min(len(lit) for lit in candidate) < MIN_LITERAL_LENGTH:
+        return current
+    if current is None or min(map(len, candidate)) > min(map(len, current)):
+        return candidate
+    return current
+
+
+def _required_literals(parsed) -> Optional[FrozenSet[str]]:
+    """
+    Ensemble de littéraux dont au moins un apparaît dans tout match.
+
+    Returns:
+        frozenset de littéraux (minuscules) ou None si aucun n'est garanti
+    """
+    best = None
+    run: List[str] = []
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            best = _better(best, frozenset([fold(''.join(run))]))
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            best = _better(best, _required_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            branches = [_required_literals(branch) for branch in av[1]]
+            if all(branches):
+                best = _better(best, frozenset().union(*branches))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_count, _max_count, sub = av
+            if min_count >= 1:
+                best = _better(best, _required_literals(sub))
+
+    if run:
+        best = _better(best, frozenset([fold(''.join(run))]))
+    return best
+
+
+def extract_literals(pattern: str, flags: int = 0) -> Optional[FrozenSet[str]]:
+    """Littéraux requis d'un pattern, None si non extractible"""
+    try:
+        return _required_literals(sre_parse.parse(pattern, flags))
+    except Exception:  # pattern exotique: pas de préfiltre, la regex reste évaluée
+        return None
+
+
+# =============================================================================
+# RÈGLES COMPILÉES
+# =============================================================================
+
+class CompiledRule:
+    """Règle WAF précompilée (valeurs simples, indépendante de l'ORM)"""
+
+    __slots__ = (
+        'id', 'name', 'priority', 'action', 'block_message', 'targets', 'flags',
+        'pattern', 'regex', 'literals', 'gated', 'exclude_ips', 'exclude_endpoints', 'exclude_users',
+    )
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.id = rule['id']
+        self.name = rule.get('name') or ''
+        self.priority = rule.get('priority') or 0
+        self.action = rule.get('action') or 'block'
+        self.block_message = rule.get('block_message') or ''
+        target = rule.get('inspect_target') or 'all'
+        self.targets = TARGETS if target == 'all' else (target,)
+        self.flags = compile_flags(rule.get('pattern_flags'))
+        self.pattern = rule['pattern']
+        self.regex = re.compile(self.pattern, self.flags)
+        self.literals = extract_literals(self.pattern, self.flags)
+        self.gated = False  # couvert par une alternation de porte (voir WAFEngine)
+
+        self.exclude_ips = frozenset(
+            ip.strip() for ip in (rule.get('exclude_ips') or '').split('\n') if ip.strip()
+        )
+        endpoints = [p.strip() for p in (rule.get('exclude_endpoints') or '').split('\n') if p.strip()]
+        self.exclude_endpoints = (
+            re.compile('|'.join(fnmatch.translate(p) for p in endpoints)) if endpoints else None
+        )
+        self.exclude_users = frozenset(rule.get('exclude_user_ids') or ())
+
+    def is_excluded(self, ip, url, user_id) -> bool:
+        if ip and ip in self.exclude_ips:
+            return True
+        if self.exclude_endpoints is not None and self.exclude_endpoints.match(url or ''):
+            return True
+        return bool(user_id) and user_id in self.exclude_users
+
+    def search(self, values: Sequence[str]) -> bool:
+        regex = self.regex
+        return any(regex.search(value) for value in values)
+
+
+class _LiteralMatcher:
+    """Recherche multi-motifs: Aho-Corasick si disponible, sinon `in` natif"""
+
+    def __init__(self, literals):
+        self.literals = sorted(literals)
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self.literals:
+            automaton = ahocorasick.Automaton()
+            for literal in self.literals:
+                automaton.add_word(literal, literal)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """Littéraux présents dans text (déjà normalisé par fold)"""
+        if self._automaton is not None:
+            return frozenset(literal for _end, literal in self._automaton.iter(text))
+        return frozenset(literal for literal in self.literals if literal in text)
+
+
+# =============================================================================
+# MOTEUR
+# =============================================================================
+
+def extract_fields(request_data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Contenus inspectables de la requête, par cible (une seule fois par requête)"""
+    def values_of(key):
+        value = request_data.get(key) or {}
+        return [str(v) for v in value.values()] if isinstance(value, dict) else []
+
+    body = request_data.get('body', '')
+    return {
+        'url': [request_data.get('url', '') or ''],
+        'query_params': values_of('params'),
+        'body': [json.dumps(body) if isinstance(body, dict) else str(body)],
+        'headers': values_of('headers'),
+        'cookies': values_of('cookies'),
+    }
+
+
+class WAFEngine:
+    """Ensemble de règles compilées pour une version donnée"""
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], version: Any = None):
+        """
+        Args:
+            rules: dicts de règles actives (champs de quelyos.waf.rule +
+                   exclude_user_ids), l'ordre de priorité est recalculé
+            version: version des règles ayant servi à la compilation
+        """
+        self.version = version
+        self.rules: List[CompiledRule] = []
+        self.invalid: List[str] = []
+        for rule in sorted(rules, key=lambda r: (-(r.get('priority') or 0), r['id'])):
+            if not rule.get('pattern'):
+                continue
+            try:
+                self.rules.append(CompiledRule(rule))
+            except re.error as e:
+                self.invalid.append(rule.get('name') or str(rule['id']))
+                _logger.error(f"WAF règle {rule.get('name')}: pattern regex invalide: {e}")
+
+        literals = set()
+        for rule in self.rules:
+            if rule.literals:
+                literals |= rule.literals
+        self._matcher = _LiteralMatcher(literals)
+
+        # Portes: alternation des règles sans littéral, par (cible, flags)
+        self._gates: Dict[tuple, re.Pattern] = {}
+        grouped: Dict[tuple, List[CompiledRule]] = {}
+        for rule in self.rules:
+            if rule.literals or BACKREF_RE.search(rule.pattern):
+                continue
+            for target in rule.targets:
+                grouped.setdefault((target, rule.flags), []).append(rule)
+        for key, group in grouped.items():
+            gate = self._compile_gate(group, key[1])
+            if gate is not None:
+                self._gates[key] = gate
+        for rule in self.rules:
+            rule.gated = not rule.literals and all(
+                (target, rule.flags) in self._gates and rule in grouped[(target, rule.flags)]
+                for target in rule.targets
+            )
+
+    @staticmethod
+    def _compile_gate(rules: Sequence[CompiledRule], flags: int) -> Optional[re.Pattern]:
+        """Alternation '(?:p1)|(?:p2)|...'; None si non combinable (flags inline...)"""
+        try:
+            return re.compile('|'.join(f'(?:{rule.pattern})' for rule in rules), flags)
+        except re.error:
+            return None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, request_data: Dict[str, Any]) -> List[CompiledRule]:
+        """
+        Règles déclenchées, par priorité, jusqu'à la première règle 'block' incluse.
+        """
+        if not self.rules:
+            return []
+
+        fields_values = extract_fields(request_data)
+        found: Dict[str, FrozenSet[str]] = {}
+        gate_hits: Dict[tuple, bool] = {}
+        ip = request_data.get('ip')
+        url = request_data.get('url', '')
+        user_id = request_data.get('user_id')
+
+        def literals_in(target):
+            if target not in found:
+                found[target] = self._matcher.find(fold('\x00'.join(fields_values[target])))
+            return found[target]
+
+        def gate_open(target, flags):
+            key = (target, flags)
+            if key not in gate_hits:
+                gate = self._gates[key]
+                gate_hits[key] = any(gate.search(v) for v in fields_values[target])
+            return gate_hits[key]
+
+        matched = []
+        for rule in self.rules:
+            hit = False
+            for target in rule.targets:
+                values = fields_values[target]
+                if not values:
+                    continue
+                if rule.literals:
+                    if not rule.literals & literals_in(target):
+                        continue
+                elif rule.gated and not gate_open(target, rule.flags):
+                    continue
+                if rule.search(values):
+                    hit = True
+                    break
+            if not hit or rule.is_excluded(ip, url, user_id):
+                continue
+            matched.append(rule)
+            if rule.action == 'block':
+                break
+        return matched
@@ -17,12 +17,11 @@ import asyncio
 from typing import Dict, Set, Optional, Any
 from datetime import datetime
 import threading
-import os
+
+from .redis_client import get_redis, redis_available
 
 _logger = logging.getLogger(__name__)
 
-# Configuration
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 WS_CHANNEL_PREFIX = 'quelyos:ws:'
 
 
@@ -59,14 +58,10 @@ class PubSubManager:
         self._init_redis()
 
     def _init_redis(self):
-        """Initialise la connexion Redis"""
-        try:
-            import redis
-            self._redis = redis.from_url(REDIS_URL)
+        """Client 'websocket' partagé (connexion dédiée ouverte au premier abonnement)"""
+        self._redis = get_redis('websocket')
+        if self._redis is not None:
             self._pubsub = self._redis.pubsub()
-            _logger.info("WebSocket PubSub connected to Redis")
-        except Exception as e:
-            _logger.warning(f"Redis not available for WebSocket PubSub: {e}")
 
     def subscribe(self, channel: str, callback: callable):
         """S'abonne à un channel"""
@@ -107,7 +102,7 @@ class PubSubManager:
                     _logger.error(f"Callback error on {channel}: {e}")
 
         # Publier via Redis pour les autres instances
-        if self._redis:
+        if self._redis and redis_available():
             try:
                 self._redis.publish(full_channel, json.dumps(message))
             except Exception as e:
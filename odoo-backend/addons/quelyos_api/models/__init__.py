@@ -12,6 +12,12 @@ from . import stock_quant
 from . import stock_location
 from . import stock_scrap
 from . import stock_reservation
+from . import stock_analytics_snapshot
+from . import stock_forecast
+from . import product_import_job
+from . import stock_alert_index
+from . import stock_lot_expiry
+from . import stock_valuation_snapshot
 from . import sale_order
 from . import subscription_quota_mixin
 from . import subscription_plan
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """
 IP Whitelist - Restriction d'accès par adresse IP pour le super admin.
+
+Les entrées 'deny' bloquent une IP / plage sur toutes les routes (ir.http).
+Les vérifications passent par un index de préfixes par worker (lib/ip_policy).
 """
 
 from odoo import models, fields, api
@@ -8,8 +11,16 @@ from odoo.exceptions import AccessDenied
 import ipaddress
 import logging
 
+from ..lib.ip_policy import IPPolicy
+
 _logger = logging.getLogger(__name__)
 
+# Version des entrées (incrémentée à chaque modification)
+POLICY_VERSION_PARAM = 'quelyos_api.ip_policy_version'
+
+# Index par base (cache propre à chaque worker)
+_POLICIES = {}
+
 
 class IPWhitelist(models.Model):
     """Liste blanche des IPs autorisées pour le super admin"""
@@ -27,6 +38,10 @@ class IPWhitelist(models.Model):
         ('single', 'IP unique'),
         ('range', 'Plage CIDR'),
     ], string='Type', compute='_compute_ip_type', store=True)
+    access_type = fields.Selection([
+        ('allow', 'Autoriser (super admin)'),
+        ('deny', 'Bloquer (toutes routes)'),
+    ], string='Accès', default='allow', required=True)
     is_active = fields.Boolean('Actif', default=True)
     sequence = fields.Integer('Séquence', default=10)
     created_by = fields.Many2one('res.users', string='Créé par', default=lambda self: self.env.user)
@@ -60,6 +75,50 @@ class IPWhitelist(models.Model):
             except ValueError as e:
                 raise ValueError(f"Adresse IP invalide: {record.ip_address} - {e}")
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._bump_policy_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._bump_policy_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._bump_policy_version()
+        return res
+
+    @api.model
+    def _bump_policy_version(self):
+        """Invalide les index IP de tous les workers"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        version = int(ICP.get_param(POLICY_VERSION_PARAM, '0') or 0)
+        ICP.set_param(POLICY_VERSION_PARAM, str(version + 1))
+
+    @api.model
+    def _get_ip_policy(self):
+        """
+        Index des entrées actives.
+
+        Reconstruit uniquement quand la version change (paramètre système,
+        lui-même mis en cache et invalidé entre workers par l'ORM).
+        """
+        version = self.env['ir.config_parameter'].sudo().get_param(POLICY_VERSION_PARAM, '0')
+        dbname = self.env.cr.dbname
+        policy = _POLICIES.get(dbname)
+        if policy is not None and policy.version == version:
+            return policy
+
+        entries = self.sudo().search_read(
+            [('is_active', '=', True)],
+            ['name', 'ip_address', 'ip_type', 'access_type', 'user_ids', 'valid_from', 'valid_until'],
+        )
+        policy = _POLICIES[dbname] = IPPolicy(entries, version=version)
+        return policy
+
     @api.model
     def is_ip_allowed(self, ip_string, user_id=None):
         """
@@ -72,44 +131,17 @@ class IPWhitelist(models.Model):
         Returns:
             bool: True si autorisé
         """
-        # Si pas de whitelist active, autoriser tout (mode permissif)
-        active_rules = self.sudo().search([('is_active', '=', True)])
-        if not active_rules:
-            return True
-
-        try:
-            check_ip = ipaddress.ip_address(ip_string)
-        except ValueError:
-            _logger.warning(f"Invalid IP address format: {ip_string}")
-            return False
-
-        now = fields.Datetime.now()
-
-        for rule in active_rules:
-            # Vérifier validité temporelle
-            if rule.valid_from and now < rule.valid_from:
-                continue
-            if rule.valid_until and now > rule.valid_until:
-                continue
-
-            # Vérifier restriction par utilisateur
-            if rule.user_ids and user_id:
-                if user_id not in rule.user_ids.ids:
-                    continue
-
-            # Vérifier l'IP
-            try:
-                if '/' in rule.ip_address:
-                    network = ipaddress.ip_network(rule.ip_address, strict=False)
-                    if check_ip in network:
-                        return True
-                else:
-                    if check_ip == ipaddress.ip_address(rule.ip_address):
-                        return True
-            except ValueError:
-                continue
+        return self._get_ip_policy().is_allowed(ip_string, user_id, fields.Datetime.now())
 
-        return False
+    @api.model
+    def is_ip_denied(self, ip_string):
+        """
+        Vérifie si une IP est bloquée (entrées 'deny').
+
+        Returns:
+            bool: True si bloquée
+        """
+        return self._get_ip_policy().is_denied(ip_string, fields.Datetime.now()) is not None
 
     @api.model
     def check_access(self, ip_string, user_id=None):
@@ -132,15 +164,4 @@ class IPWhitelist(models.Model):
     @api.model
     def get_whitelist_status(self):
         """Retourne le statut de la whitelist"""
-        active_rules = self.sudo().search([('is_active', '=', True)])
-        return {
-            'enabled': len(active_rules) > 0,
-            'rules_count': len(active_rules),
-            'rules': [{
-                'id': r.id,
-                'name': r.name,
-                'ip_address': r.ip_address,
-                'ip_type': r.ip_type,
-                'user_count': len(r.user_ids) if r.user_ids else 0,
-            } for r in active_rules]
-        }
+        return self._get_ip_policy().get_status()
@@ -10,6 +10,10 @@ from odoo.http import request
 from werkzeug.utils import redirect as werkzeug_redirect
 from werkzeug.exceptions import Forbidden
 from ..config import get_cors_headers, is_origin_allowed
+from ..lib.redis_client import request_scope
+from ..lib.profiler import (
+    QUERY_TRACE_HEADER, last_query_trace, query_trace, query_trace_headers, should_trace,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -57,9 +61,36 @@ class IrHttpSecure(models.AbstractModel):
     def _dispatch(cls, endpoint):
         """
         Override de _dispatch pour bloquer les accès non autorisés.
+
+        Les commandes Redis de la requête partagent un auto-pipeline,
+        vidé en fin de requête. Une fraction des requêtes (ou celles portant
+        le header X-Query-Trace avec le bon jeton) est tracée côté SQL.
         """
+        last_query_trace()  # trace orpheline d'une requête précédente en erreur
+        with request_scope():
+            forced = should_trace(request.httprequest.headers.get(QUERY_TRACE_HEADER))
+            if forced is None:
+                return cls._dispatch_secure(endpoint)
+            with query_trace(cls._trace_endpoint(endpoint), request.httprequest.method, forced):
+                return cls._dispatch_secure(endpoint)
+
+    @classmethod
+    def _trace_endpoint(cls, endpoint):
+        """Libellé de trace: règle de route (cardinalité bornée), sinon chemin"""
+        routing = getattr(endpoint, 'routing', None) or {}
+        routes = routing.get('routes')
+        return routes[0] if routes else request.httprequest.path
+
+    @classmethod
+    def _dispatch_secure(cls, endpoint):
         path = request.httprequest.path
 
+        # IPs bloquées (index en mémoire, pas de requête SQL)
+        remote_addr = request.httprequest.remote_addr
+        if request.env['quelyos.ip.whitelist'].sudo().is_ip_denied(remote_addr):
+            _logger.warning(f"BLOCKED IP: {remote_addr} on {path}")
+            raise Forbidden()
+
         # Gérer les requêtes OPTIONS (CORS preflight)
         if request.httprequest.method == 'OPTIONS':
             origin = request.httprequest.headers.get('Origin', '')
@@ -101,6 +132,12 @@ class IrHttpSecure(models.AbstractModel):
         Override de _post_dispatch pour ajouter les headers CORS à toutes les réponses.
         Cette méthode est appelée après la conversion du résultat en Response HTTP.
         """
+        # Trace SQL forcée: compteurs exposés au client (tests de budget, debug)
+        trace = last_query_trace()
+        if trace is not None and trace.forced and hasattr(response, 'headers'):
+            for key, value in query_trace_headers(trace).items():
+                response.headers[key] = value
+
         # Appeler d'abord la méthode parent
         response = super()._post_dispatch(response)
 
@@ -42,24 +42,22 @@ class MarketingBlacklist(models.Model):
     @api.constrains('email', 'company_id')
     def _check_email_unique(self):
         """Contrainte: Cet email est déjà dans la liste noire"""
-        for record in self:
-            # Chercher un doublon
-            duplicate = self.search([
-                ('email', '=', record.email),
-                ('company_id', '=', record.company_id),
-                ('id', '!=', record.id)
-            ], limit=1)
-
-            if duplicate:
-                raise ValidationError(_('Cet email est déjà dans la liste noire'))
-
-
-    @api.model
-    def create(self, vals):
+        # Une seule requête groupée (créations en masse lors des envois de campagne)
+        groups = self._read_group(
+            [('email', 'in', self.mapped('email')), ('company_id', 'in', self.company_id.ids)],
+            ['email', 'company_id'],
+            ['__count'],
+        )
+        if any(count > 1 for _email, _company, count in groups):
+            raise ValidationError(_('Cet email est déjà dans la liste noire'))
+
+    @api.model_create_multi
+    def create(self, vals_list):
         """Générer token unique lors de la création"""
-        if not vals.get('token'):
-            vals['token'] = self._generate_token(vals.get('email', ''))
-        return super().create(vals)
+        for vals in vals_list:
+            if not vals.get('token'):
+                vals['token'] = self._generate_token(vals.get('email', ''))
+        return super().create(vals_list)
 
     def _generate_token(self, email):
         """Générer token sécurisé pour unsubscribe link"""
@@ -1,7 +1,23 @@
 # -*- coding: utf-8 -*-
+import logging
 from odoo import models, fields, api
 from datetime import datetime
 
+from ..lib.mail_transport import (
+    CompiledTemplate,
+    OutgoingEmail,
+    SendStats,
+    DryRunTransport,
+    DEFAULT_BATCH_SIZE,
+    get_transport,
+)
+from ..lib.metrics import record_campaign_batch
+
+_logger = logging.getLogger(__name__)
+
+# Reprises consécutives en échec avant de passer la campagne en échec
+MAX_SEND_ATTEMPTS = 3
+
 
 class MarketingCampaign(models.Model):
     _name = 'quelyos.marketing.campaign'
@@ -19,6 +35,7 @@ class MarketingCampaign(models.Model):
         ('scheduled', 'Planifiée'),
         ('sending', 'En cours d\'envoi'),
         ('sent', 'Envoyée'),
+        ('failed', 'Échec d\'envoi'),
         ('cancelled', 'Annulée'),
     ], string='Statut', default='draft', required=True)
 
@@ -77,6 +94,24 @@ class MarketingCampaign(models.Model):
     stats_bounced = fields.Integer(string='Rebonds', default=0)
     stats_unsubscribed = fields.Integer(string='Désabonnés', default=0)
 
+    # Progression envoi (pipeline batch)
+    stats_failed = fields.Integer(string='Échecs envoi', default=0, copy=False)
+    send_total = fields.Integer(string='Destinataires à traiter', default=0, copy=False)
+    send_last_partner_id = fields.Integer(
+        string='Dernier contact traité',
+        default=0,
+        copy=False,
+        help='Curseur de reprise: les contacts sont envoyés par id croissant'
+    )
+    send_rate = fields.Float(string='Débit (emails/s)', default=0.0, copy=False)
+    send_attempts = fields.Integer(
+        string='Échecs consécutifs',
+        default=0,
+        copy=False,
+        help='Reprises en échec depuis le dernier lot envoyé; la campagne passe en échec au-delà de MAX_SEND_ATTEMPTS'
+    )
+    send_error = fields.Text(string='Dernière erreur d\'envoi', copy=False)
+
     # Taux calculés
     delivery_rate = fields.Float(
         string='Taux de délivrabilité',
@@ -188,61 +223,171 @@ class MarketingCampaign(models.Model):
         self.status = 'sending'
 
         if self.channel == 'email':
-            self._send_email_campaign()
+            # Envoi en tâche de fond (cron déclenché immédiatement)
+            self.write({
+                'send_total': 0,
+                'send_last_partner_id': 0,
+                'stats_sent': 0,
+                'stats_failed': 0,
+                'send_rate': 0.0,
+                'send_attempts': 0,
+                'send_error': False,
+            })
+            self.env.ref('quelyos_api.ir_cron_send_email_campaigns')._trigger()
         elif self.channel == 'sms':
             self._send_sms_campaign()
 
-    def _send_email_campaign(self):
-        """Envoi de campagne email via Brevo/SMTP avec unsubscribe RGPD"""
+    @api.model
+    def _cron_send_email_campaigns(self):
+        """Traite les campagnes email en cours d'envoi (reprise après interruption)"""
+        campaigns = self.search([('status', '=', 'sending'), ('channel', '=', 'email')])
+        for campaign in campaigns:
+            try:
+                # Société de la campagne, pas celle de l'utilisateur du cron
+                campaign.with_company(campaign.company_id)._send_email_campaign()
+            except Exception as e:
+                _logger.error(f"Campaign {campaign.id} send failed: {e}", exc_info=True)
+                self.env.cr.rollback()
+                campaign._record_send_failure(e)
+                self.env.cr.commit()
+
+    def _record_send_failure(self, error):
+        """Compte un échec de reprise; au-delà de MAX_SEND_ATTEMPTS la campagne passe en échec"""
+        self.ensure_one()
+        attempts = self.send_attempts + 1
+        values = {'send_attempts': attempts, 'send_error': str(error)}
+        if attempts >= MAX_SEND_ATTEMPTS:
+            _logger.error(f"Campaign {self.id}: {attempts} failed attempts, marked as failed")
+            values['status'] = 'failed'
+        self.write(values)
+
+    def _get_suppressed_emails(self):
+        """Emails désabonnés (toutes sociétés), chargés une fois en hash set"""
+        self.env['quelyos.marketing.blacklist'].flush_model(['email', 'active'])
+        self.env.cr.execute(
+            "SELECT DISTINCT lower(email) FROM quelyos_marketing_blacklist WHERE active"
+        )
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _get_unsubscribe_tokens(self, company):
+        """Tokens unsubscribe existants de la société: {email: token}"""
+        self.env['quelyos.marketing.blacklist'].flush_model(['email', 'token', 'company_id'])
+        self.env.cr.execute(
+            "SELECT lower(email), token FROM quelyos_marketing_blacklist WHERE company_id = %s",
+            (company.id,)
+        )
+        return dict(self.env.cr.fetchall())
+
+    def _compile_email_template(self, base_url):
+        """Réécrit les liens trackés et injecte le footer une seule fois par campagne"""
+        LinkTracker = self.env['quelyos.link.tracker'].sudo()
+
+        def resolve_link(url):
+            return LinkTracker.get_or_create_link(url=url, campaign_id=self.id).get_redirect_url(base_url)
+
+        html = self._inject_unsubscribe_footer(self.content or '', '{{unsubscribe_url}}')
+        return CompiledTemplate(html, resolve_link=resolve_link)
+
+    def _get_email_transport(self, company):
+        """Transport configuré pour la société, ou simulation si aucun actif"""
+        config = self.env['quelyos.email.config'].sudo().search([
+            ('company_id', '=', company.id),
+            ('is_active', '=', True),
+        ], limit=1)
+        if not config:
+            _logger.warning(f"No active email config for company {company.id}: campaign {self.id} simulated")
+            return DryRunTransport()
+        return get_transport(config)
+
+    def _send_email_campaign(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Envoi de campagne email via Brevo/SMTP avec unsubscribe RGPD.
+
+        Pipeline par lots:
+        1. Suppression list + tokens unsubscribe chargés une fois (hash sets)
+        2. Template compilé une fois (liens trackés + footer à placeholders)
+        3. Contacts lus par lots d'ids croissants, tokens manquants créés en masse
+        4. Messages rendus envoyés par lot au transport (connexions poolées)
+        5. Progression commitée par lot: reprise au dernier contact traité
+        """
+        self.ensure_one()
         if not self.contact_list_id:
             return
 
-        contacts = self.contact_list_id.get_contacts()
+        company = self.company_id or self.env.company
         Blacklist = self.env['quelyos.marketing.blacklist'].sudo()
-
-        sent_count = 0
-        skipped_blacklist = 0
-
-        # Récupérer base_url pour liens unsubscribe
+        Partner = self.env['res.partner'].sudo()
         base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url', 'http://localhost:5175')
 
-        for contact in contacts:
-            if not contact.email:
-                continue
-
-            # Filtrer blacklistés (RGPD)
-            if Blacklist.is_blacklisted(contact.email):
-                skipped_blacklist += 1
-                continue
+        contact_ids = sorted(
+            pid for pid in self.contact_list_id.get_contacts().ids
+            if pid > self.send_last_partner_id
+        )
+        suppressed = self._get_suppressed_emails()
+        tokens = self._get_unsubscribe_tokens(company)
+        template = self._compile_email_template(base_url)
+        subject = self.subject or self.name
+
+        # Compteurs déjà envoyés (reprise) conservés hors stats pour un débit exact
+        sent_offset, failed_offset = self.stats_sent, self.stats_failed
+        stats = SendStats(total=len(contact_ids))
+        if not self.send_total:
+            self.send_total = len(contact_ids)
+
+        with self._get_email_transport(company) as transport:
+            for start in range(0, len(contact_ids), batch_size):
+                chunk_ids = contact_ids[start:start + batch_size]
+                rows = Partner.browse(chunk_ids).read(['email', 'name'])
+
+                recipients = {}
+                for row in rows:
+                    email = (row['email'] or '').strip().lower()
+                    if email and email not in suppressed and email not in recipients:
+                        recipients[email] = row['name'] or ''
+
+                # Tokens manquants: une création groupée par lot
+                missing = [email for email in recipients if email not in tokens]
+                if missing:
+                    created = Blacklist.create([
+                        {'email': email, 'campaign_id': self.id, 'company_id': company.id, 'active': False}
+                        for email in missing
+                    ])
+                    tokens.update({rec.email: rec.token for rec in created})
+
+                messages = [
+                    OutgoingEmail(
+                        to=email,
+                        subject=subject,
+                        html=template.render({
+                            'unsubscribe_url': f"{base_url}/unsubscribe/{tokens[email]}",
+                            'name': name,
+                            'email': email,
+                        }),
+                        headers={'List-Unsubscribe': f"<{base_url}/unsubscribe/{tokens[email]}>"},
+                    )
+                    for email, name in recipients.items()
+                ]
+                sent_before, failed_before = stats.sent, stats.failed
+                transport.send_batch(messages, stats)
+                record_campaign_batch(
+                    stats.sent - sent_before, stats.failed - failed_before, stats.rate
+                )
 
-            # Créer/récupérer entrée blacklist avec token pour ce contact
-            blacklist_entry = Blacklist.search([
-                ('email', '=', contact.email.lower()),
-                ('company_id', '=', self.env.company.id)
-            ], limit=1)
-
-            if not blacklist_entry:
-                blacklist_entry = Blacklist.create({
-                    'email': contact.email.lower(),
-                    'campaign_id': self.id,
-                    'active': False,  # Pas encore désabonné
+                # Progression + curseur de reprise (les emails envoyés ne sont pas annulables)
+                self.write({
+                    'stats_sent': sent_offset + stats.sent,
+                    'stats_failed': failed_offset + stats.failed,
+                    'send_last_partner_id': chunk_ids[-1],
+                    'send_rate': stats.rate,
+                    'send_attempts': 0,
                 })
+                self.env.cr.commit()
 
-            # Générer lien unsubscribe
-            unsubscribe_url = f"{base_url}/unsubscribe/{blacklist_entry.token}"
-
-            # Remplacer toutes les URLs par des liens trackés
-            email_content = self._replace_urls_with_tracked_links(self.content, base_url)
-
-            # Injecter footer unsubscribe dans le contenu
-            email_content = self._inject_unsubscribe_footer(email_content, unsubscribe_url)
-
-            # TODO: Intégrer envoi via email_config avec email_content
-            # Pour l'instant, on simule l'envoi
-            sent_count += 1
+        if stats.errors:
+            _logger.warning(f"Campaign {self.id}: {stats.failed} failures, e.g. {stats.errors[:3]}")
+        _logger.info(f"Campaign {self.id} sent: {stats.to_dict()}")
 
         self.write({
-            'stats_sent': sent_count,
             'sent_date': datetime.now(),
             'status': 'sent',
         })
@@ -270,46 +415,17 @@ class MarketingCampaign(models.Model):
         """
         Remplacer toutes les URLs dans le HTML par des liens trackés.
         Parse le HTML et remplace href="http://example.com" par href="/r/<token>".
+        Chaque URL distincte n'est résolue qu'une fois.
         """
-        import re
-
         if not html_content:
             return html_content
 
         LinkTracker = self.env['quelyos.link.tracker'].sudo()
 
-        # Pattern pour trouver tous les href="..." dans le HTML
-        # Capture : href="(URL)" ou href='(URL)'
-        pattern = r'href=["\']([^"\']+)["\']'
-
-        def replace_url(match):
-            original_url = match.group(1)
+        def resolve_link(url):
+            return LinkTracker.get_or_create_link(url=url, campaign_id=self.id).get_redirect_url(base_url)
 
-            # Ignorer les ancres, mailto:, tel:, javascript:
-            if (original_url.startswith('#') or
-                original_url.startswith('mailto:') or
-                original_url.startswith('tel:') or
-                original_url.startswith('javascript:')):
-                return match.group(0)  # Garder tel quel
-
-            # Ignorer les URLs relatives (commençant par /)
-            if original_url.startswith('/'):
-                return match.group(0)
-
-            # Créer ou récupérer lien tracké
-            try:
-                link = LinkTracker.get_or_create_link(
-                    url=original_url,
-                    campaign_id=self.id
-                )
-                tracked_url = link.get_redirect_url(base_url)
-                return f'href="{tracked_url}"'
-            except Exception:
-                # En cas d'erreur, garder URL originale
-                return match.group(0)
-
-        # Remplacer toutes les URLs
-        return re.sub(pattern, replace_url, html_content)
+        return CompiledTemplate._rewrite_links(html_content, resolve_link)
 
     def _send_sms_campaign(self):
         """
@@ -542,6 +658,12 @@ class MarketingCampaign(models.Model):
                 'clicked': self.stats_clicked,
                 'bounced': self.stats_bounced,
                 'unsubscribed': self.stats_unsubscribed,
+                'failed': self.stats_failed,
+            },
+            'progress': {
+                'total': self.send_total,
+                'processed': self.stats_sent + self.stats_failed,
+                'rate': round(self.send_rate, 1),
             },
             'rates': {
                 'delivery': round(self.delivery_rate, 1),
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+import logging
+import uuid
+
+from odoo import models, fields, api
+
+from ..lib.bulk_operations import BulkStatus
+from ..lib.product_import import ProductImporter, iter_rows
+
+_logger = logging.getLogger(__name__)
+
+# Démarrages d'un job (reprises après arrêt du worker compris) avant échec définitif
+MAX_ATTEMPTS = 3
+
+# Erreurs de lignes conservées sur le job
+MAX_STORED_ERRORS = 100
+
+
+class ProductImportJob(models.Model):
+    """
+    Import de produits en tâche de fond.
+
+    La source (lignes JSON ou fichier CSV/XLSX) et les options sont
+    enregistrées sur le job; le cron les importe un job à la fois, avec un
+    commit par lot. Un job interrompu (redémarrage, recyclage du worker)
+    reprend après la dernière ligne commitée, au plus MAX_ATTEMPTS fois.
+    """
+    _name = 'quelyos.product.import.job'
+    _description = 'Import produits en tâche de fond'
+    _order = 'create_date desc'
+
+    job_id = fields.Char(
+        string='Job ID',
+        required=True,
+        index=True,
+        readonly=True,
+        default=lambda self: str(uuid.uuid4()),
+    )
+    user_id = fields.Many2one('res.users', string='Demandé par', required=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade')
+    filename = fields.Char(string='Fichier')
+    source_file = fields.Binary(string='Fichier source', attachment=True)
+    rows_json = fields.Text(string='Lignes JSON')
+    update_existing = fields.Boolean(string='Mettre à jour les existants')
+
+    status = fields.Selection([
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ], string='Statut', default='pending', required=True, index=True)
+    attempts = fields.Integer(string='Démarrages', default=0)
+    processed_rows = fields.Integer(string='Lignes traitées', default=0)
+    created_count = fields.Integer(string='Créés', default=0)
+    updated_count = fields.Integer(string='Mis à jour', default=0)
+    error_count = fields.Integer(string='Erreurs', default=0)
+    errors_json = fields.Text(string='Erreurs (échantillon)')
+    error_message = fields.Text(string="Message d'erreur", readonly=True)
+    start_time = fields.Datetime(string='Heure de début', readonly=True)
+    end_time = fields.Datetime(string='Heure de fin', readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_product_import_job_job_id_uniq
+                ON quelyos_product_import_job (job_id)
+        """)
+
+    @api.model
+    def create_job(self, source, filename='', update_existing=False):
+        """
+        Enregistre un import pour l'utilisateur et la société courants et
+        déclenche le cron.
+
+        Args:
+            source: liste de lignes (JSON) ou contenu du fichier (bytes)
+        """
+        vals = {
+            'user_id': self.env.uid,
+            'company_id': self.env.company.id,
+            'filename': filename,
+            'update_existing': update_existing,
+        }
+        if isinstance(source, (list, tuple)):
+            vals['rows_json'] = json.dumps(list(source))
+        else:
+            vals['source_file'] = base64.b64encode(source)
+        job = self.create(vals)
+        self.env.ref('quelyos_api.ir_cron_product_import_jobs')._trigger()
+        return job
+
+    def is_owned_by(self, env):
+        """Lecture réservée au demandeur, dans sa société"""
+        self.ensure_one()
+        return self.user_id.id == env.uid and self.company_id.id == env.company.id
+
+    def to_status(self):
+        """Progression au format des opérations bulk"""
+        self.ensure_one()
+        status = {
+            'pending': BulkStatus.PENDING,
+            'running': BulkStatus.PROCESSING,
+            'done': BulkStatus.PARTIAL if self.error_count else BulkStatus.COMPLETED,
+            'failed': BulkStatus.FAILED,
+        }[self.status]
+        errors = json.loads(self.errors_json or '[]')
+        return {
+            'id': self.job_id,
+            'status': status.value,
+            'total': self.processed_rows,
+            'processed': self.processed_rows,
+            'succeeded': self.created_count + self.updated_count,
+            'failed': self.error_count,
+            'created_count': self.created_count,
+            'updated_count': self.updated_count,
+            'errors': errors[:10],
+            'error_count': self.error_count,
+            'error_message': self.error_message or None,
+            'started_at': self.start_time.isoformat() if self.start_time else None,
+            'completed_at': self.end_time.isoformat() if self.end_time else None,
+        }
+
+    # -------------------------------------------------------------------------
+    # Exécution (cron)
+    # -------------------------------------------------------------------------
+
+    def _source(self):
+        if self.rows_json:
+            return json.loads(self.rows_json)
+        return base64.b64decode(self.source_file or b'')
+
+    @api.model
+    def _cron_run_import_jobs(self):
+        """Exécute les imports en attente ou interrompus, un à la fois (cron unique)"""
+        while True:
+            job = self.search([('status', 'in', ['pending', 'running'])], order='id', limit=1)
+            if not job:
+                return
+            job._run()
+
+    def _run(self):
+        self.ensure_one()
+        if self.attempts >= MAX_ATTEMPTS:
+            self.write({
+                'status': 'failed',
+                'error_message': f"Import interrompu {self.attempts} fois, abandonné",
+                'end_time': fields.Datetime.now(),
+            })
+            self.env.cr.commit()
+            return
+
+        self.write({
+            'status': 'running',
+            'attempts': self.attempts + 1,
+            'start_time': self.start_time or fields.Datetime.now(),
+        })
+        self.env.cr.commit()
+
+        # Lignes et compteurs déjà commités (reprise)
+        offset = {
+            'rows': self.processed_rows,
+            'created': self.created_count,
+            'updated': self.updated_count,
+            'errors': json.loads(self.errors_json or '[]'),
+            'error_count': self.error_count,
+        }
+
+        def save_progress(importer):
+            # Écrit avec le lot, avant son commit: reprise exacte
+            self.write({
+                'processed_rows': importer.result.processed,
+                'created_count': offset['created'] + len(importer.created),
+                'updated_count': offset['updated'] + len(importer.updated),
+                'error_count': offset['error_count'] + len(importer.errors),
+                'errors_json': json.dumps((offset['errors'] + importer.errors)[:MAX_STORED_ERRORS]),
+            })
+
+        owner = self.with_user(self.user_id).with_company(self.company_id)
+        importer = ProductImporter(
+            owner.env, update_existing=self.update_existing, job_id=self.job_id,
+            commit=True, on_chunk=save_progress,
+        )
+        try:
+            importer.run(iter_rows(self._source(), self.filename), start_row=offset['rows'])
+        except Exception as e:
+            _logger.error(f"Import products job {self.job_id} error: {e}", exc_info=True)
+            self.env.cr.rollback()
+            importer.result.errors.append({'row': None, 'error': str(e)})
+            importer.result.status = BulkStatus.FAILED
+            importer.processor.save_progress(importer.result)
+            self.write({
+                'status': 'failed',
+                'error_message': str(e),
+                'end_time': fields.Datetime.now(),
+            })
+            self.env.cr.commit()
+            return
+
+        self.write({'status': 'done', 'end_time': fields.Datetime.now()})
+        self.env.cr.commit()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Surstock: seuil haut = seuil bas x multiplicateur (sans règle de réappro)
+HIGH_STOCK_THRESHOLD_MULTIPLIER = 3
+
+# Clé des produits à recalculer dans cr.precommit.data
+DIRTY_KEY = 'quelyos.stock.alert.index.dirty'
+
+# Produits recalculés par requête (rafraîchissement et réconciliation)
+REFRESH_BATCH_SIZE = 5000
+
+
+class StockAlertIndex(models.Model):
+    """
+    Index des alertes stock bas / surstock par produit et entrepôt.
+
+    Mis à jour de façon incrémentale: quants, mouvements validés, règles de
+    réappro et seuils produit marquent les produits touchés, recalculés en une
+    requête juste avant le commit. Une ligne sans entrepôt porte le total
+    société (seuils produit), comme les anciennes alertes.
+    Réconciliation nocturne contre stock.quant (_cron_reconcile).
+    """
+    _name = 'quelyos.stock.alert.index'
+    _description = 'Stock Alert Index (Index alertes stock)'
+    _order = 'gap desc, product_id'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    product_id = fields.Many2one(
+        'product.product',
+        string='Produit',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    warehouse_id = fields.Many2one(
+        'stock.warehouse',
+        string='Entrepôt',
+        index=True,
+        ondelete='cascade',
+        help='Vide: total de la société, tous entrepôts confondus'
+    )
+
+    on_hand = fields.Float(string='Stock', help='Stock en main (emplacements internes)')
+    min_qty = fields.Float(string='Minimum', help='Règle de réappro, sinon seuil stock bas du produit')
+    max_qty = fields.Float(string='Maximum', help='Règle de réappro, sinon seuil bas x 3')
+    state = fields.Selection([
+        ('low', 'Stock bas'),
+        ('ok', 'Normal'),
+        ('high', 'Surstock'),
+    ], string='État', required=True, index=True)
+    gap = fields.Float(
+        string='Écart',
+        help='Quantité sous le minimum (stock bas) ou au-dessus du maximum (surstock)'
+    )
+
+    def init(self):
+        # Listes d'alertes: filtre (société, entrepôt, état) trié par écart
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS quelyos_stock_alert_index_listing_idx
+                ON quelyos_stock_alert_index (company_id, state, COALESCE(warehouse_id, 0), gap DESC)
+        """)
+
+    # -------------------------------------------------------------------------
+    # Calcul
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _expected_rows_sql(self, product_ids=None):
+        """
+        Lignes attendues (company_id, product_id, warehouse_id, on_hand,
+        min_qty, max_qty) calculées depuis quants et règles de réappro.
+        """
+        product_filter = SQL('pp.id = ANY(%s)', list(product_ids)) if product_ids is not None else SQL('TRUE')
+        return SQL(
+            """
+            WITH products AS (
+                SELECT pp.id, pt.company_id, COALESCE(pt.x_low_stock_threshold, 0) AS threshold
+                  FROM product_product pp
+                  JOIN product_template pt ON pt.id = pp.product_tmpl_id
+                 WHERE pp.active AND pt.active AND pt.is_storable AND %(product_filter)s
+            ),
+            onhand AS (
+                SELECT q.company_id, q.product_id, l.warehouse_id, SUM(q.quantity) AS qty
+                  FROM stock_quant q
+                  JOIN stock_location l ON l.id = q.location_id
+                 WHERE l.usage = 'internal'
+                   AND q.product_id IN (SELECT id FROM products)
+                 GROUP BY q.company_id, q.product_id, l.warehouse_id
+            ),
+            rules AS (
+                SELECT op.company_id, op.product_id, op.warehouse_id,
+                       MIN(op.product_min_qty) AS min_qty, MAX(op.product_max_qty) AS max_qty
+                  FROM stock_warehouse_orderpoint op
+                 WHERE op.active
+                   AND op.product_id IN (SELECT id FROM products)
+                 GROUP BY op.company_id, op.product_id, op.warehouse_id
+            ),
+            by_warehouse AS (
+                SELECT COALESCE(o.company_id, r.company_id) AS company_id,
+                       COALESCE(o.product_id, r.product_id) AS product_id,
+                       COALESCE(o.warehouse_id, r.warehouse_id) AS warehouse_id,
+                       COALESCE(o.qty, 0) AS on_hand,
+                       r.min_qty, r.max_qty
+                  FROM (SELECT * FROM onhand WHERE warehouse_id IS NOT NULL) o
+                  FULL JOIN rules r
+                    ON r.company_id = o.company_id
+                   AND r.product_id = o.product_id
+                   AND r.warehouse_id = o.warehouse_id
+            ),
+            by_company AS (
+                SELECT company_id, product_id, SUM(qty) AS on_hand
+                  FROM onhand
+                 GROUP BY company_id, product_id
+                 UNION ALL
+                -- Produits sans quant dans une société où ils sont disponibles
+                -- (la leur, ou chaque société pour un produit partagé): rupture
+                SELECT c.id, p.id, 0
+                  FROM products p
+                  JOIN res_company c ON c.id = p.company_id OR (p.company_id IS NULL AND c.active)
+                 WHERE NOT EXISTS (
+                        SELECT 1 FROM onhand o WHERE o.product_id = p.id AND o.company_id = c.id
+                   )
+            )
+            SELECT w.company_id, w.product_id, w.warehouse_id, w.on_hand,
+                   COALESCE(w.min_qty, p.threshold) AS min_qty,
+                   COALESCE(w.max_qty, p.threshold * %(multiplier)s) AS max_qty
+              FROM by_warehouse w
+              JOIN products p ON p.id = w.product_id
+             UNION ALL
+            SELECT c.company_id, c.product_id, NULL, c.on_hand,
+                   p.threshold, p.threshold * %(multiplier)s
+              FROM by_company c
+              JOIN products p ON p.id = c.product_id
+            """,
+            product_filter=product_filter,
+            multiplier=HIGH_STOCK_THRESHOLD_MULTIPLIER,
+        )
+
+    @api.model
+    def refresh_products(self, product_ids):
+        """Recalcule les lignes des produits donnés (suppression + insertion)"""
+        product_ids = sorted(set(product_ids))
+        for offset in range(0, len(product_ids), REFRESH_BATCH_SIZE):
+            batch = product_ids[offset:offset + REFRESH_BATCH_SIZE]
+            self.env.cr.execute(SQL(
+                "DELETE FROM quelyos_stock_alert_index WHERE product_id = ANY(%s)", batch,
+            ))
+            self.env.cr.execute(SQL(
+                """
+                INSERT INTO quelyos_stock_alert_index
+                       (company_id, product_id, warehouse_id, on_hand, min_qty, max_qty,
+                        state, gap, create_uid, create_date, write_uid, write_date)
+                SELECT e.company_id, e.product_id, e.warehouse_id, e.on_hand, e.min_qty, e.max_qty,
+                       CASE WHEN e.on_hand < e.min_qty THEN 'low'
+                            WHEN e.max_qty > 0 AND e.on_hand > e.max_qty THEN 'high'
+                            ELSE 'ok' END,
+                       CASE WHEN e.on_hand < e.min_qty THEN e.min_qty - e.on_hand
+                            WHEN e.max_qty > 0 AND e.on_hand > e.max_qty THEN e.on_hand - e.max_qty
+                            ELSE 0 END,
+                       %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM (%(expected)s) e
+                """,
+                expected=self._expected_rows_sql(batch),
+                uid=self.env.uid,
+            ))
+        self.invalidate_model()
+
+    # -------------------------------------------------------------------------
+    # Mise à jour incrémentale
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _mark_dirty(self, product_ids):
+        """Produits à recalculer une seule fois, juste avant le commit"""
+        if not product_ids:
+            return
+        dirty = self.env.cr.precommit.data.setdefault(DIRTY_KEY, set())
+        if not dirty:
+            self.env.cr.precommit.add(self.sudo()._flush_dirty)
+        dirty.update(product_ids)
+
+    @api.model
+    def _flush_dirty(self):
+        dirty = self.env.cr.precommit.data.pop(DIRTY_KEY, set())
+        if dirty:
+            self.refresh_products(dirty)
+
+    # -------------------------------------------------------------------------
+    # Réconciliation
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _cron_reconcile(self):
+        """
+        Compare l'index aux quants et règles (différence symétrique) et
+        recalcule les produits divergents (hooks contournés, SQL direct, etc.).
+        """
+        self.env.cr.execute(SQL(
+            """
+            WITH expected AS (%(expected)s),
+            indexed AS (
+                SELECT company_id, product_id, warehouse_id, on_hand, min_qty, max_qty
+                  FROM quelyos_stock_alert_index
+            ),
+            diff AS (
+                (SELECT company_id, product_id, warehouse_id,
+                        ROUND(on_hand::numeric, 4), ROUND(min_qty::numeric, 4), ROUND(max_qty::numeric, 4)
+                   FROM expected
+                 EXCEPT
+                 SELECT company_id, product_id, warehouse_id,
+                        ROUND(on_hand::numeric, 4), ROUND(min_qty::numeric, 4), ROUND(max_qty::numeric, 4)
+                   FROM indexed)
+                UNION ALL
+                (SELECT company_id, product_id, warehouse_id,
+                        ROUND(on_hand::numeric, 4), ROUND(min_qty::numeric, 4), ROUND(max_qty::numeric, 4)
+                   FROM indexed
+                 EXCEPT
+                 SELECT company_id, product_id, warehouse_id,
+                        ROUND(on_hand::numeric, 4), ROUND(min_qty::numeric, 4), ROUND(max_qty::numeric, 4)
+                   FROM expected)
+            )
+            SELECT DISTINCT product_id FROM diff
+            """,
+            expected=self._expected_rows_sql(),
+        ))
+        product_ids = [row[0] for row in self.env.cr.fetchall()]
+        if product_ids:
+            _logger.warning(f"Stock alert index: {len(product_ids)} product(s) out of sync, refreshing")
+            self.refresh_products(product_ids)
+        else:
+            _logger.info("Stock alert index: in sync with quants")
+        return len(product_ids)
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _alert_domain(self, warehouse_id=None):
+        """Lignes société (sans entrepôt) ou lignes d'un entrepôt donné"""
+        return [
+            ('company_id', 'in', self.env.companies.ids),
+            ('warehouse_id', '=', int(warehouse_id) if warehouse_id else False),
+        ]
+
+    @api.model
+    def get_alert_counts(self, warehouse_id=None):
+        """Nombre de produits par état (badges du tableau de bord)"""
+        counts = dict(self._read_group(self._alert_domain(warehouse_id), groupby=['state'], aggregates=['__count']))
+        return {state: counts.get(state, 0) for state in ('low', 'ok', 'high')}
+
+
+class StockWarehouseOrderpoint(models.Model):
+    _inherit = 'stock.warehouse.orderpoint'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        orderpoints = super().create(vals_list)
+        self.env['quelyos.stock.alert.index']._mark_dirty(orderpoints.product_id.ids)
+        return orderpoints
+
+    def write(self, vals):
+        products = self.product_id
+        result = super().write(vals)
+        if {'product_id', 'warehouse_id', 'product_min_qty', 'product_max_qty', 'active'} & set(vals):
+            self.env['quelyos.stock.alert.index']._mark_dirty((products | self.product_id).ids)
+        return result
+
+    def unlink(self):
+        product_ids = self.product_id.ids
+        result = super().unlink()
+        self.env['quelyos.stock.alert.index']._mark_dirty(product_ids)
+        return result
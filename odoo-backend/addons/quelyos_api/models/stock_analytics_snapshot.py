@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+from ..lib.stock_analytics import StockAnalytics
+
+_logger = logging.getLogger(__name__)
+
+
+class StockAnalyticsSnapshot(models.Model):
+    """
+    Photo nocturne des métriques stock par produit (rotation, valeur, ABC).
+    Alimentée en un INSERT ... SELECT par société, lue par les vues de tendance.
+    """
+    _name = 'quelyos.stock.analytics.snapshot'
+    _description = 'Stock Analytics Snapshot (Photo rotation / ABC)'
+    _order = 'snapshot_date desc, product_id'
+
+    snapshot_date = fields.Date(
+        string='Date',
+        required=True,
+        index=True,
+    )
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    product_id = fields.Many2one(
+        'product.product',
+        string='Produit',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    qty_available = fields.Float(string='Stock', help='Stock en main (emplacements internes)')
+    qty_sold = fields.Float(string='Vendu 365j', help='Quantité livrée aux clients sur 365 jours')
+    turnover = fields.Float(string='Rotation', help='Quantité vendue / stock moyen')
+    value = fields.Float(string='Valeur', help='Stock × coût standard')
+    abc_class = fields.Selection(
+        [('A', 'A'), ('B', 'B'), ('C', 'C')],
+        string='Classe ABC',
+        help='Vide si la valeur de stock est nulle',
+    )
+
+    def init(self):
+        # Une seule photo par (date, société, produit)
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_stock_analytics_snapshot_product_uniq
+                ON quelyos_stock_analytics_snapshot (snapshot_date, company_id, product_id)
+        """)
+
+    @api.model
+    def _cron_snapshot(self):
+        """Photo du jour pour chaque société (remplace une photo existante)"""
+        today = fields.Date.today()
+        for company in self.env['res.company'].search([]):
+            env = self.env(context=dict(self.env.context, allowed_company_ids=[company.id]))
+            self.env.cr.execute(SQL(
+                "DELETE FROM quelyos_stock_analytics_snapshot WHERE snapshot_date = %s AND company_id = %s",
+                today, company.id,
+            ))
+            self.env.cr.execute(StockAnalytics(env).snapshot_sql(today))
+            _logger.info(f"Stock analytics snapshot {today}: {self.env.cr.rowcount} rows for {company.name}")
+        self.env.invalidate_all()
+
+    @api.model
+    def get_trend(self, date_from, product_id=None):
+        """
+        Série par date depuis date_from (société courante).
+
+        Returns:
+            Liste [{date, qty_available, qty_sold, turnover, value, abc_class}]
+            pour un produit, sinon agrégat [{date, products, value, turnover_avg,
+            count_a, count_b, count_c}]
+        """
+        domain = [('snapshot_date', '>=', date_from), ('company_id', 'in', self.env.companies.ids)]
+        if product_id:
+            domain.append(('product_id', '=', product_id))
+            return [{
+                'date': row.snapshot_date.isoformat(),
+                'qty_available': row.qty_available,
+                'qty_sold': row.qty_sold,
+                'turnover': row.turnover,
+                'value': row.value,
+                'abc_class': row.abc_class or None,
+            } for row in self.search(domain, order='snapshot_date')]
+
+        groups = self._read_group(
+            domain,
+            groupby=['snapshot_date:day', 'abc_class'],
+            aggregates=['__count', 'value:sum', 'turnover:avg'],
+            order='snapshot_date:day',
+        )
+        trend = {}
+        for day, abc_class, count, value, turnover_avg in groups:
+            point = trend.setdefault(day, {
+                'date': day.isoformat(), 'products': 0, 'value': 0.0, 'turnover_sum': 0.0,
+                'count_a': 0, 'count_b': 0, 'count_c': 0,
+            })
+            point['products'] += count
+            point['value'] += value or 0.0
+            point['turnover_sum'] += (turnover_avg or 0.0) * count
+            if abc_class:
+                point[f'count_{abc_class.lower()}'] += count
+
+        return [{
+            'date': point['date'],
+            'products': point['products'],
+            'value': round(point['value'], 2),
+            'turnover_avg': round(point['turnover_sum'] / point['products'], 2) if point['products'] else 0,
+            'count_a': point['count_a'],
+            'count_b': point['count_b'],
+            'count_c': point['count_c'],
+        } for point in trend.values()]
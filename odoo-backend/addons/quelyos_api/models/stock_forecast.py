@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+import logging
+import math
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+from ..lib import demand_forecast
+from ..lib.demand_forecast import HISTORY_DAYS, METHOD_CROSTON, METHOD_SES
+
+_logger = logging.getLogger(__name__)
+
+# Produits traités par extraction SQL / matrice (mémoire: lot x HISTORY_DAYS x 8 octets)
+FORECAST_BATCH_SIZE = 5000
+
+# Plafond des jours de couverture stockés (date de rupture lisible)
+MAX_DAYS_OF_COVER = 3650
+
+
+class StockForecast(models.Model):
+    """
+    Prévision de demande par produit, recalculée en lot par cron.
+    Les endpoints lisent une ligne indexée (société, produit) au lieu de
+    reconstituer l'historique des mouvements à chaque appel.
+    """
+    _name = 'quelyos.stock.forecast'
+    _description = 'Stock Forecast (Prévision de demande)'
+    _order = 'days_of_cover, product_id'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    product_id = fields.Many2one(
+        'product.product',
+        string='Produit',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    computed_at = fields.Datetime(string='Calculé le', required=True)
+    method = fields.Selection(
+        [(METHOD_SES, 'Lissage exponentiel'), (METHOD_CROSTON, 'Croston (demande intermittente)')],
+        string='Méthode',
+        required=True,
+    )
+    daily_forecast = fields.Float(string='Demande / jour', help='Prévision de demande journalière')
+    ma_7 = fields.Float(string='Moyenne 7j')
+    ma_30 = fields.Float(string='Moyenne 30j')
+    ma_90 = fields.Float(string='Moyenne 90j')
+    trend_slope = fields.Float(string='Pente', help='Tendance linéaire sur 90 jours (unités / jour)')
+    trend_level = fields.Float(string='Niveau tendance', help='Valeur de la tendance au premier jour prévu')
+    adi = fields.Float(string='ADI', help='Intervalle moyen entre deux jours de vente')
+    demand_days = fields.Integer(string='Jours avec vente')
+    current_stock = fields.Float(string='Stock au calcul')
+    days_of_cover = fields.Float(
+        string='Jours de couverture',
+        index=True,
+        help='Stock / demande journalière (vide si aucune demande)',
+    )
+    stockout_date = fields.Date(string='Rupture estimée', index=True)
+
+    def init(self):
+        # Une seule prévision par (société, produit): cible de l'ON CONFLICT de _store_forecasts
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_stock_forecast_company_product_uniq
+                ON quelyos_stock_forecast (company_id, product_id)
+        """)
+
+    # -------------------------------------------------------------------------
+    # Extraction
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _forecast_product_ids(self, company):
+        """Produits stockables actifs de la société (ids triés)"""
+        return self.env['product.product'].with_company(company).search([
+            ('is_storable', '=', True),
+            ('active', '=', True),
+            ('company_id', 'in', [False, company.id]),
+        ], order='id').ids
+
+    @api.model
+    def _compute_forecasts(self, company, product_ids, history_days=HISTORY_DAYS):
+        """
+        Prévisions d'un lot de produits sans écriture.
+
+        Ventes journalières extraites en une requête (date_trunc + GROUP BY),
+        puis calcul vectorisé (lib.demand_forecast) sur la matrice du lot.
+
+        Returns:
+            (today, dict de tableaux alignés sur product_ids)
+        """
+        cr = self.env.cr
+        today = fields.Date.context_today(self)
+        start = today - timedelta(days=history_days - 1)
+        index = {product_id: i for i, product_id in enumerate(product_ids)}
+
+        cr.execute(SQL(
+            """
+            SELECT m.product_id,
+                   date_trunc('day', m.date)::date - %(start)s::date AS day,
+                   SUM(m.product_qty)
+              FROM stock_move m
+              JOIN stock_location src ON src.id = m.location_id
+              JOIN stock_location dst ON dst.id = m.location_dest_id
+             WHERE m.state = 'done'
+               AND src.usage = 'internal'
+               AND dst.usage = 'customer'
+               AND m.date >= %(start)s
+               AND m.date < %(end)s
+               AND m.company_id = %(company)s
+               AND m.product_id = ANY(%(ids)s)
+             GROUP BY 1, 2
+            """,
+            start=start,
+            end=today + timedelta(days=1),
+            company=company.id,
+            ids=list(product_ids),
+        ))
+        np = demand_forecast.np
+        rows = np.array(cr.fetchall(), dtype=np.float64).reshape(-1, 3)
+        # product_ids trié: id -> ligne de la matrice par recherche dichotomique
+        rows[:, 0] = np.searchsorted(np.asarray(product_ids), rows[:, 0])
+        matrix = demand_forecast.build_matrix(rows, len(product_ids), history_days)
+
+        cr.execute(SQL(
+            """
+            SELECT q.product_id, SUM(q.quantity)
+              FROM stock_quant q
+              JOIN stock_location l ON l.id = q.location_id
+             WHERE l.usage = 'internal'
+               AND q.company_id = %s
+               AND q.product_id = ANY(%s)
+             GROUP BY q.product_id
+            """,
+            company.id, list(product_ids),
+        ))
+        on_hand = np.zeros(len(product_ids))
+        for product_id, qty in cr.fetchall():
+            on_hand[index[product_id]] = qty
+
+        result = demand_forecast.forecast_matrix(matrix, on_hand)
+        result['current_stock'] = on_hand
+        return today, result
+
+    @api.model
+    def compute_product_forecast(self, product, company=None):
+        """Prévision d'un seul produit, en mémoire (produit absent de la table)"""
+        if not demand_forecast.NUMPY_AVAILABLE:
+            return None
+        company = company or self.env.company
+        today, result = self._compute_forecasts(company, [product.id])
+        row = {key: values[0].item() for key, values in result.items()}
+        cover = None if math.isnan(row['days_of_cover']) else min(row['days_of_cover'], MAX_DAYS_OF_COVER)
+        row.update(
+            computed_at=fields.Datetime.now(),
+            days_of_cover=cover,
+            stockout_date=today + timedelta(days=int(cover)) if cover is not None else None,
+        )
+        return row
+
+    # -------------------------------------------------------------------------
+    # Rafraîchissement
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _store_forecasts(self, company, product_ids, today, result, computed_at):
+        """Upsert du lot en une requête (unnest des tableaux)"""
+        covers = [
+            None if math.isnan(cover) else min(cover, MAX_DAYS_OF_COVER)
+            for cover in result['days_of_cover'].tolist()
+        ]
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO quelyos_stock_forecast
+                   (company_id, product_id, computed_at, method, daily_forecast,
+                    ma_7, ma_30, ma_90, trend_slope, trend_level, adi, demand_days,
+                    current_stock, days_of_cover, stockout_date,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT %(company)s, f.product_id, %(computed_at)s, f.method, f.daily,
+                   f.ma_7, f.ma_30, f.ma_90, f.slope, f.level, f.adi, f.demand_days,
+                   f.stock, f.cover, %(today)s::date + FLOOR(f.cover)::int,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%(ids)s::int[], %(method)s::varchar[], %(daily)s::float8[],
+                          %(ma_7)s::float8[], %(ma_30)s::float8[], %(ma_90)s::float8[],
+                          %(slope)s::float8[], %(level)s::float8[], %(adi)s::float8[],
+                          %(demand_days)s::int[], %(stock)s::float8[], %(cover)s::float8[])
+                   AS f(product_id, method, daily, ma_7, ma_30, ma_90, slope, level, adi,
+                        demand_days, stock, cover)
+            ON CONFLICT (company_id, product_id) DO UPDATE SET
+                   computed_at = EXCLUDED.computed_at,
+                   method = EXCLUDED.method,
+                   daily_forecast = EXCLUDED.daily_forecast,
+                   ma_7 = EXCLUDED.ma_7,
+                   ma_30 = EXCLUDED.ma_30,
+                   ma_90 = EXCLUDED.ma_90,
+                   trend_slope = EXCLUDED.trend_slope,
+                   trend_level = EXCLUDED.trend_level,
+                   adi = EXCLUDED.adi,
+                   demand_days = EXCLUDED.demand_days,
+                   current_stock = EXCLUDED.current_stock,
+                   days_of_cover = EXCLUDED.days_of_cover,
+                   stockout_date = EXCLUDED.stockout_date,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            """,
+            company=company.id,
+            today=today,
+            computed_at=computed_at,
+            uid=self.env.uid,
+            ids=list(product_ids),
+            method=result['method'].tolist(),
+            daily=result['daily_forecast'].tolist(),
+            ma_7=result['ma_7'].tolist(),
+            ma_30=result['ma_30'].tolist(),
+            ma_90=result['ma_90'].tolist(),
+            slope=result['trend_slope'].tolist(),
+            level=result['trend_level'].tolist(),
+            # ADI infini (aucune vente) stocké à 0
+            adi=[adi if math.isfinite(adi) else 0.0 for adi in result['adi'].tolist()],
+            demand_days=result['demand_days'].tolist(),
+            stock=result['current_stock'].tolist(),
+            cover=covers,
+        ))
+
+    @api.model
+    def refresh_company(self, company, batch_size=FORECAST_BATCH_SIZE):
+        """Recalcule toutes les prévisions d'une société; retourne le nombre de produits"""
+        started = fields.Datetime.now()
+        product_ids = self._forecast_product_ids(company)
+        for offset in range(0, len(product_ids), batch_size):
+            batch = product_ids[offset:offset + batch_size]
+            today, result = self._compute_forecasts(company, batch)
+            self._store_forecasts(company, batch, today, result, started)
+
+        # Produits sortis du périmètre (archivés, non stockables)
+        self.env.cr.execute(SQL(
+            "DELETE FROM quelyos_stock_forecast WHERE company_id = %s AND computed_at < %s",
+            company.id, started,
+        ))
+        return len(product_ids)
+
+    @api.model
+    def _cron_refresh_forecasts(self):
+        """Recalcul nocturne des prévisions, société par société (un commit chacune)"""
+        if not demand_forecast.NUMPY_AVAILABLE:
+            _logger.warning("Stock forecast refresh skipped: numpy not installed")
+            return
+        for company in self.env['res.company'].search([]):
+            count = self.refresh_company(company)
+            self.env.cr.commit()
+            _logger.info(f"Stock forecasts refreshed for {company.name}: {count} products")
+        self.env.invalidate_all()
@@ -2,6 +2,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from ..lib.location_tree import invalidate_location_trees
+from ..lib.stock_availability import invalidate_availability
+
 
 class StockLocation(models.Model):
     _inherit = 'stock.location'
@@ -40,6 +43,23 @@ class StockLocation(models.Model):
         readonly=True,
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        locations = super().create(vals_list)
+        invalidate_location_trees(self.env, locations)
+        return locations
+
+    def write(self, vals):
+        invalidate_location_trees(self.env, self)
+        result = super().write(vals)
+        if {'location_id', 'company_id', 'usage'} & set(vals):
+            invalidate_location_trees(self.env, self)
+        return result
+
+    def unlink(self):
+        invalidate_location_trees(self.env, self)
+        return super().unlink()
+
     def action_lock(self, reason=None):
         """Verrouiller la location"""
         for location in self:
@@ -109,4 +129,18 @@ class StockMove(models.Model):
                     locked_loc.x_locked_date.strftime('%d/%m/%Y %H:%M') if locked_loc.x_locked_date else ''
                 ))
 
-        return super()._action_done(cancel_backorder=cancel_backorder)
+        moves = super()._action_done(cancel_backorder=cancel_backorder)
+        self.env['quelyos.stock.alert.index']._mark_dirty(moves.product_id.ids)
+        invalidate_availability(self.env, moves)
+        return moves
+
+    def _action_confirm(self, merge=True, merge_into=False, **kwargs):
+        # Les mouvements confirmés comptent dans la quantité à recevoir
+        moves = super()._action_confirm(merge=merge, merge_into=merge_into, **kwargs)
+        invalidate_availability(self.env, self | moves)
+        return moves
+
+    def _action_cancel(self):
+        result = super()._action_cancel()
+        invalidate_availability(self.env, self)
+        return result
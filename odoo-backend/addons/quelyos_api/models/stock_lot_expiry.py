@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Clé des lots à recalculer dans cr.precommit.data
+DIRTY_KEY = 'quelyos.stock.lot.expiry.dirty'
+
+# Lots recalculés par requête
+REFRESH_BATCH_SIZE = 5000
+
+# Tranches d'expiration (jours): expiré, < 7 jours, < 30 jours
+EXPIRY_BUCKETS = (('expired', 0), ('within_7_days', 7), ('within_30_days', 30))
+
+
+class StockLotExpiry(models.Model):
+    """
+    Projection des lots en stock avec leur date d'expiration.
+
+    Une ligne par (lot, emplacement interne) avec la quantité en main,
+    synchronisée depuis les quants (recalcul des lots touchés juste avant le
+    commit) et indexée sur (société, date d'expiration): les tranches
+    d'expiration et l'ordre FEFO sont des lectures par plage.
+    Les dates proviennent de stock.lot (module product_expiry); sans lui la
+    projection reste vide.
+    """
+    _name = 'quelyos.stock.lot.expiry'
+    _description = 'Stock Lot Expiry (Expiration des lots en stock)'
+    _order = 'expiration_date, lot_id, location_id'
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        ondelete='cascade',
+    )
+
+    lot_id = fields.Many2one(
+        'stock.lot',
+        string='Lot',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    product_id = fields.Many2one(
+        'product.product',
+        string='Produit',
+        required=True,
+        ondelete='cascade',
+    )
+
+    location_id = fields.Many2one(
+        'stock.location',
+        string='Emplacement',
+        required=True,
+        ondelete='cascade',
+    )
+
+    quantity = fields.Float(string='Quantité', help='Quantité en main du lot dans l\'emplacement')
+    expiration_date = fields.Datetime(string='Date d\'expiration', required=True)
+    removal_date = fields.Datetime(string='Date de retrait')
+    alert_date = fields.Datetime(string='Date d\'alerte')
+
+    def init(self):
+        # Tranches d'expiration: une plage sur expiration_date par société
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS quelyos_stock_lot_expiry_company_date_idx
+                ON quelyos_stock_lot_expiry (company_id, expiration_date)
+        """)
+        # FEFO: lots d'un produit dans l'ordre d'expiration
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS quelyos_stock_lot_expiry_product_date_idx
+                ON quelyos_stock_lot_expiry (product_id, expiration_date, lot_id)
+        """)
+
+    # -------------------------------------------------------------------------
+    # Synchronisation
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _has_expiry_dates(self):
+        return 'expiration_date' in self.env['stock.lot']._fields
+
+    @api.model
+    def _expected_rows_sql(self, lot_ids=None):
+        """Lignes attendues calculées depuis stock.quant et stock.lot"""
+        lot_fields = self.env['stock.lot']._fields
+        lot_filter = SQL('q.lot_id = ANY(%s)', list(lot_ids)) if lot_ids is not None else SQL('q.lot_id IS NOT NULL')
+        return SQL(
+            """
+            SELECT q.company_id, q.lot_id, q.product_id, q.location_id,
+                   SUM(q.quantity) AS quantity,
+                   lot.expiration_date, %(removal_date)s AS removal_date, %(alert_date)s AS alert_date
+              FROM stock_quant q
+              JOIN stock_location l ON l.id = q.location_id
+              JOIN stock_lot lot ON lot.id = q.lot_id
+             WHERE %(lot_filter)s
+               AND l.usage = 'internal'
+               AND lot.expiration_date IS NOT NULL
+             GROUP BY q.company_id, q.lot_id, q.product_id, q.location_id, lot.id
+            HAVING SUM(q.quantity) > 0
+            """,
+            lot_filter=lot_filter,
+            removal_date=SQL('lot.removal_date') if 'removal_date' in lot_fields else SQL('NULL::timestamp'),
+            alert_date=SQL('lot.alert_date') if 'alert_date' in lot_fields else SQL('NULL::timestamp'),
+        )
+
+    @api.model
+    def refresh_lots(self, lot_ids):
+        """Recalcule les lignes des lots donnés (suppression + insertion)"""
+        if not self._has_expiry_dates():
+            return
+        lot_ids = sorted(set(lot_ids))
+        for offset in range(0, len(lot_ids), REFRESH_BATCH_SIZE):
+            batch = lot_ids[offset:offset + REFRESH_BATCH_SIZE]
+            self.env.cr.execute(SQL(
+                "DELETE FROM quelyos_stock_lot_expiry WHERE lot_id = ANY(%s)", batch,
+            ))
+            self.env.cr.execute(SQL(
+                """
+                INSERT INTO quelyos_stock_lot_expiry
+                       (company_id, lot_id, product_id, location_id, quantity,
+                        expiration_date, removal_date, alert_date,
+                        create_uid, create_date, write_uid, write_date)
+                SELECT e.*, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                  FROM (%(expected)s) e
+                """,
+                expected=self._expected_rows_sql(batch),
+                uid=self.env.uid,
+            ))
+        self.invalidate_model()
+
+    @api.model
+    def _mark_dirty(self, lot_ids):
+        """Lots à recalculer une seule fois, juste avant le commit"""
+        if not lot_ids:
+            return
+        dirty = self.env.cr.precommit.data.setdefault(DIRTY_KEY, set())
+        if not dirty:
+            self.env.cr.precommit.add(self.sudo()._flush_dirty)
+        dirty.update(lot_ids)
+
+    @api.model
+    def _flush_dirty(self):
+        dirty = self.env.cr.precommit.data.pop(DIRTY_KEY, set())
+        if dirty:
+            self.refresh_lots(dirty)
+
+    @api.model
+    def _cron_reconcile(self):
+        """
+        Compare la projection aux quants (différence symétrique) et recalcule
+        les lots divergents.
+        """
+        if not self._has_expiry_dates():
+            return 0
+        columns = SQL('company_id, lot_id, product_id, location_id, ROUND(quantity::numeric, 4), '
+                      'expiration_date, removal_date, alert_date')
+        self.env.cr.execute(SQL(
+            """
+            WITH expected AS (%(expected)s),
+            diff AS (
+                (SELECT %(columns)s FROM expected
+                 EXCEPT
+                 SELECT %(columns)s FROM quelyos_stock_lot_expiry)
+                UNION ALL
+                (SELECT %(columns)s FROM quelyos_stock_lot_expiry
+                 EXCEPT
+                 SELECT %(columns)s FROM expected)
+            )
+            SELECT DISTINCT lot_id FROM diff
+            """,
+            expected=self._expected_rows_sql(),
+            columns=columns,
+        ))
+        lot_ids = [row[0] for row in self.env.cr.fetchall()]
+        if lot_ids:
+            _logger.warning(f"Lot expiry projection: {len(lot_ids)} lot(s) out of sync, refreshing")
+            self.refresh_lots(lot_ids)
+        else:
+            _logger.info("Lot expiry projection: in sync with quants")
+        return len(lot_ids)
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def get_expiry_buckets(self, horizon_days=30, limit=100, product_id=None):
+        """
+        Lots expirés / expirant sous 7 jours / sous `horizon_days` jours.
+
+        Une seule requête par plage sur (société, date d'expiration); les
+        compteurs et quantités par tranche sont calculés par fenêtre, les
+        lignes sont limitées à `limit` par tranche.
+
+        Returns:
+            dict tranche -> {'lots': [...], 'count': int, 'quantity': float}
+        """
+        now = fields.Datetime.now()
+        bounds = [(name, now + timedelta(days=days)) for name, days in EXPIRY_BUCKETS]
+        bounds[-1] = (bounds[-1][0], now + timedelta(days=max(horizon_days, 7)))
+        bucket_case = SQL(
+            "CASE WHEN e.expiration_date <= %s THEN 'expired' WHEN e.expiration_date <= %s "
+            "THEN 'within_7_days' ELSE 'within_30_days' END",
+            bounds[0][1], bounds[1][1],
+        )
+        self.env.cr.execute(SQL(
+            """
+            SELECT bucket, lot_id, product_id, location_id, quantity, expiration_date,
+                   bucket_count, bucket_quantity
+              FROM (
+                    SELECT %(bucket)s AS bucket, e.lot_id, e.product_id, e.location_id,
+                           e.quantity, e.expiration_date,
+                           ROW_NUMBER() OVER w AS position,
+                           COUNT(*) OVER (PARTITION BY %(bucket)s) AS bucket_count,
+                           SUM(e.quantity) OVER (PARTITION BY %(bucket)s) AS bucket_quantity
+                      FROM quelyos_stock_lot_expiry e
+                     WHERE e.company_id = ANY(%(company_ids)s)
+                       AND e.expiration_date <= %(horizon)s
+                       AND %(product_filter)s
+                    WINDOW w AS (PARTITION BY %(bucket)s ORDER BY e.expiration_date, e.lot_id, e.location_id)
+              ) ranked
+             WHERE position <= %(limit)s
+             ORDER BY expiration_date, lot_id, location_id
+            """,
+            bucket=bucket_case,
+            company_ids=self.env.companies.ids,
+            horizon=bounds[-1][1],
+            product_filter=SQL('e.product_id = %s', int(product_id)) if product_id else SQL('TRUE'),
+            limit=limit,
+        ))
+        rows = self.env.cr.dictfetchall()
+
+        buckets = {name: {'lots': [], 'count': 0, 'quantity': 0.0} for name, _days in EXPIRY_BUCKETS}
+        for row in rows:
+            bucket = buckets[row['bucket']]
+            bucket['count'] = row['bucket_count']
+            bucket['quantity'] = row['bucket_quantity']
+            bucket['lots'].append({
+                'lot_id': row['lot_id'],
+                'product_id': row['product_id'],
+                'location_id': row['location_id'],
+                'quantity': row['quantity'],
+                'expiration_date': row['expiration_date'],
+                'days_until_expiry': (row['expiration_date'] - now).days,
+            })
+        return buckets
+
+    @api.model
+    def get_fefo_candidates(self, product_id, location_id=None, quantity=None):
+        """
+        Lots d'un produit dans l'ordre FEFO (expiration la plus proche d'abord,
+        puis lot et emplacement), lus sur l'index (produit, expiration).
+
+        Args:
+            location_id: Limiter à un emplacement et ses enfants
+            quantity: S'arrêter dès que la quantité cumulée couvre ce besoin
+
+        Returns:
+            Liste de dicts lot_id, location_id, quantity, expiration_date, cumulative_qty
+        """
+        location_filter = SQL('TRUE')
+        if location_id:
+            location = self.env['stock.location'].browse(int(location_id))
+            location_filter = SQL(
+                "e.location_id IN (SELECT id FROM stock_location WHERE parent_path LIKE %s)",
+                f'{location.parent_path}%',
+            )
+        self.env.cr.execute(SQL(
+            """
+            SELECT lot_id, location_id, quantity, expiration_date, cumulative_qty
+              FROM (
+                    SELECT e.lot_id, e.location_id, e.quantity, e.expiration_date,
+                           SUM(e.quantity) OVER w AS cumulative_qty
+                      FROM quelyos_stock_lot_expiry e
+                     WHERE e.product_id = %(product_id)s
+                       AND e.company_id = ANY(%(company_ids)s)
+                       AND e.expiration_date > %(now)s
+                       AND %(location_filter)s
+                    WINDOW w AS (ORDER BY e.expiration_date, e.lot_id, e.location_id)
+              ) fefo
+             WHERE %(quantity)s::float IS NULL OR cumulative_qty - quantity < %(quantity)s
+             ORDER BY expiration_date, lot_id, location_id
+            """,
+            product_id=int(product_id),
+            company_ids=self.env.companies.ids,
+            now=fields.Datetime.now(),
+            location_filter=location_filter,
+            quantity=quantity,
+        ))
+        return self.env.cr.dictfetchall()
+
+
+class StockLot(models.Model):
+    _inherit = 'stock.lot'
+
+    def write(self, vals):
+        result = super().write(vals)
+        if {'expiration_date', 'removal_date', 'alert_date', 'product_id'} & set(vals):
+            self.env['quelyos.stock.lot.expiry']._mark_dirty(self.ids)
+        return result
@@ -3,6 +3,9 @@ from odoo import api, fields, models
 from datetime import datetime, timedelta
 import logging
 
+from ..lib.location_tree import invalidate_location_trees
+from ..lib.stock_availability import invalidate_availability
+
 _logger = logging.getLogger(__name__)
 
 
@@ -12,6 +15,41 @@ class StockQuant(models.Model):
     # Seuil de stock bas (par défaut 10 unités)
     LOW_STOCK_THRESHOLD = 10
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        quants = super().create(vals_list)
+        self.env['quelyos.stock.alert.index']._mark_dirty(quants.product_id.ids)
+        self.env['quelyos.stock.lot.expiry']._mark_dirty(quants.lot_id.ids)
+        invalidate_location_trees(self.env, quants.location_id)
+        invalidate_availability(self.env, quants)
+        return quants
+
+    def write(self, vals):
+        lots = self.lot_id if 'lot_id' in vals else self.env['stock.lot']
+        if 'location_id' in vals:
+            invalidate_location_trees(self.env, self.location_id)
+        if 'product_id' in vals:
+            invalidate_availability(self.env, self)
+        result = super().write(vals)
+        if {'quantity', 'reserved_quantity', 'location_id', 'product_id'} & set(vals):
+            invalidate_availability(self.env, self)
+        if {'quantity', 'location_id', 'product_id'} & set(vals):
+            self.env['quelyos.stock.alert.index']._mark_dirty(self.product_id.ids)
+            invalidate_location_trees(self.env, self.location_id)
+        if {'quantity', 'location_id', 'product_id', 'lot_id'} & set(vals):
+            self.env['quelyos.stock.lot.expiry']._mark_dirty((lots | self.lot_id).ids)
+        return result
+
+    def unlink(self):
+        product_ids = self.product_id.ids
+        lot_ids = self.lot_id.ids
+        invalidate_location_trees(self.env, self.location_id)
+        invalidate_availability(self.env, self)
+        result = super().unlink()
+        self.env['quelyos.stock.alert.index']._mark_dirty(product_ids)
+        self.env['quelyos.stock.lot.expiry']._mark_dirty(lot_ids)
+        return result
+
     def _cron_check_low_stock(self):
         """
         Cron job : Vérifier les produits en stock bas et créer des alertes
@@ -181,3 +219,11 @@ class ProductTemplate(models.Model):
         default=10.0,
         help='Seuil en dessous duquel une alerte de stock bas sera déclenchée'
     )
+
+    def write(self, vals):
+        result = super().write(vals)
+        if {'x_low_stock_threshold', 'is_storable', 'active'} & set(vals):
+            self.env['quelyos.stock.alert.index']._mark_dirty(
+                self.with_context(active_test=False).product_variant_ids.ids
+            )
+        return result
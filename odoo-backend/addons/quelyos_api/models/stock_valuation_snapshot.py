@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+from ..lib.stock_valuation import StockValuation
+
+_logger = logging.getLogger(__name__)
+
+
+class StockValuationSnapshot(models.Model):
+    """
+    Photo journalière de la valorisation du stock par (entrepôt, catégorie).
+    Alimentée en un INSERT ... SELECT par société: la valorisation à une date
+    passée est une lecture de la dernière photo antérieure.
+    """
+    _name = 'quelyos.stock.valuation.snapshot'
+    _description = 'Stock Valuation Snapshot (Photo valorisation stock)'
+    _order = 'snapshot_date desc, value desc'
+
+    snapshot_date = fields.Date(
+        string='Date',
+        required=True,
+        index=True,
+    )
+
+    company_id = fields.Many2one(
+        'res.company',
+        string='Société',
+        required=True,
+        index=True,
+        ondelete='cascade',
+    )
+
+    warehouse_id = fields.Many2one(
+        'stock.warehouse',
+        string='Entrepôt',
+        ondelete='cascade',
+        help='Vide: emplacements internes hors entrepôt',
+    )
+
+    categ_id = fields.Many2one(
+        'product.category',
+        string='Catégorie',
+        ondelete='cascade',
+    )
+
+    quantity = fields.Float(string='Quantité')
+    value = fields.Float(string='Valeur', help='Stock × coût standard au jour de la photo')
+    product_count = fields.Integer(
+        string='Produits',
+        help='Produits en stock (un produit présent dans deux entrepôts compte deux fois au total)',
+    )
+
+    def init(self):
+        # Une seule photo par (date, société, entrepôt, catégorie), colonnes vides comprises
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_stock_valuation_snapshot_group_uniq
+                ON quelyos_stock_valuation_snapshot
+                   (snapshot_date, company_id, COALESCE(warehouse_id, 0), COALESCE(categ_id, 0))
+        """)
+
+    @api.model
+    def _cron_snapshot(self):
+        """Photo du jour pour chaque société (remplace une photo existante)"""
+        today = fields.Date.today()
+        for company in self.env['res.company'].search([]):
+            env = self.env(context=dict(self.env.context, allowed_company_ids=[company.id]))
+            self.env.cr.execute(SQL(
+                "DELETE FROM quelyos_stock_valuation_snapshot WHERE snapshot_date = %s AND company_id = %s",
+                today, company.id,
+            ))
+            self.env.cr.execute(StockValuation(env).snapshot_sql(today))
+            _logger.info(f"Stock valuation snapshot {today}: {self.env.cr.rowcount} rows for {company.name}")
+        self.env.invalidate_all()
+
+    @api.model
+    def _snapshot_domain(self, warehouse_id=None, category_id=None):
+        domain = [('company_id', 'in', self.env.companies.ids)]
+        if warehouse_id:
+            domain.append(('warehouse_id', '=', int(warehouse_id)))
+        if category_id:
+            domain.append(('categ_id', 'child_of', int(category_id)))
+        return domain
+
+    @api.model
+    def get_valuation_at(self, at_date, warehouse_id=None, category_id=None):
+        """
+        Valorisation à une date: dernière photo antérieure ou égale.
+
+        Returns:
+            (date de la photo ou None, totaux au format StockValuation.totals())
+        """
+        domain = self._snapshot_domain(warehouse_id, category_id)
+        latest = self.search(domain + [('snapshot_date', '<=', at_date)], limit=1, order='snapshot_date desc')
+        totals = {'total': {'quantity': 0.0, 'value': 0.0, 'product_count': 0}, 'categories': {}, 'warehouses': {}}
+        if not latest:
+            return None, totals
+
+        domain.append(('snapshot_date', '=', latest.snapshot_date))
+        aggregates = ['quantity:sum', 'value:sum', 'product_count:sum']
+        for key, groupby in (('categories', 'categ_id'), ('warehouses', 'warehouse_id')):
+            for group, quantity, value, product_count in self._read_group(domain, [groupby], aggregates):
+                totals[key][group.id] = {'quantity': quantity, 'value': value, 'product_count': product_count}
+        [(quantity, value, product_count)] = self._read_group(domain, [], aggregates)
+        totals['total'] = {'quantity': quantity, 'value': value, 'product_count': product_count}
+        return latest.snapshot_date, totals
+
+    @api.model
+    def get_timeline(self, date_from, warehouse_id=None, category_id=None):
+        """Valeur totale par date de photo depuis date_from: [{date, total_value, total_qty}]"""
+        groups = self._read_group(
+            self._snapshot_domain(warehouse_id, category_id) + [('snapshot_date', '>=', date_from)],
+            groupby=['snapshot_date:day'],
+            aggregates=['value:sum', 'quantity:sum'],
+            order='snapshot_date:day',
+        )
+        return [{
+            'date': day.isoformat(),
+            'total_value': round(value, 2),
+            'total_qty': round(quantity, 2),
+        } for day, value, quantity in groups]
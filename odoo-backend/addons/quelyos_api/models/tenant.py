@@ -21,12 +21,31 @@ Workflow automatique lors de la création :
 
 import json
 import base64
+import logging
 import secrets
 from datetime import timedelta
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from odoo.tools.translate import _
 
+from ..lib.theme_compiler import compile_theme
+
+_logger = logging.getLogger(__name__)
+
+# Champs dont dépendent les artefacts thème compilés
+THEME_SOURCE_FIELDS = {
+    'active_theme_id', 'theme_overrides',
+    'primary_color', 'primary_dark', 'primary_light',
+    'secondary_color', 'secondary_dark', 'secondary_light',
+    'accent_color', 'background_color', 'foreground_color',
+    'muted_color', 'muted_foreground', 'border_color', 'ring_color',
+    'font_family', 'enable_dark_mode', 'default_dark',
+}
+
+# Documents thème parsés, par hash de contenu (partagés entre tenants)
+_THEME_DOCUMENTS = {}
+MAX_THEME_DOCUMENTS = 512
+
 
 class QuelyosTenant(models.Model):
     _name = 'quelyos.tenant'
@@ -359,6 +378,24 @@ class QuelyosTenant(models.Model):
         string='Overrides Thème (JSON)',
         help="JSON partiel pour personnaliser des sections du thème actif"
     )
+    theme_compiled_json = fields.Text(
+        string='Thème compilé (JSON)',
+        readonly=True,
+        copy=False,
+        help="Thème actif fusionné avec les overrides, recompilé à chaque modification"
+    )
+    theme_compiled_css = fields.Text(
+        string='Thème compilé (CSS)',
+        readonly=True,
+        copy=False,
+        help="Variables CSS minifiées du thème compilé"
+    )
+    theme_hash = fields.Char(
+        string='Hash thème',
+        readonly=True,
+        copy=False,
+        help="Hash de contenu des artefacts thème (URL versionnée, ETag)"
+    )
 
     # ═══════════════════════════════════════════════════════════════════════════
     # CONTACT
@@ -650,30 +687,7 @@ class QuelyosTenant(models.Model):
                 'slogan': self.slogan or '',
                 'description': self.description or '',
             },
-            'theme': {
-                'colors': {
-                    'primary': self.primary_color,
-                    'primaryDark': self.primary_dark,
-                    'primaryLight': self.primary_light,
-                    'secondary': self.secondary_color,
-                    'secondaryDark': self.secondary_dark,
-                    'secondaryLight': self.secondary_light,
-                    'accent': self.accent_color,
-                    'background': self.background_color,
-                    'foreground': self.foreground_color,
-                    'muted': self.muted_color,
-                    'mutedForeground': self.muted_foreground,
-                    'border': self.border_color,
-                    'ring': self.ring_color,
-                },
-                'typography': {
-                    'fontFamily': self.font_family,
-                },
-                'darkMode': {
-                    'enabled': self.enable_dark_mode,
-                    'defaultDark': self.default_dark,
-                },
-            },
+            'theme': self._get_branding_theme(),
             'contact': {
                 'email': self.email or '',
                 'phone': self.phone or '',
@@ -694,6 +708,34 @@ class QuelyosTenant(models.Model):
             },
         }
 
+    def _get_branding_theme(self):
+        """Palette de branding du tenant (couleurs, police, mode sombre)"""
+        self.ensure_one()
+        return {
+            'colors': {
+                'primary': self.primary_color,
+                'primaryDark': self.primary_dark,
+                'primaryLight': self.primary_light,
+                'secondary': self.secondary_color,
+                'secondaryDark': self.secondary_dark,
+                'secondaryLight': self.secondary_light,
+                'accent': self.accent_color,
+                'background': self.background_color,
+                'foreground': self.foreground_color,
+                'muted': self.muted_color,
+                'mutedForeground': self.muted_foreground,
+                'border': self.border_color,
+                'ring': self.ring_color,
+            },
+            'typography': {
+                'fontFamily': self.font_family,
+            },
+            'darkMode': {
+                'enabled': self.enable_dark_mode,
+                'defaultDark': self.default_dark,
+            },
+        }
+
     def _format_phone(self, phone):
         """Formate un numéro de téléphone pour l'affichage"""
         if not phone:
@@ -1541,82 +1583,89 @@ class QuelyosTenant(models.Model):
     def get_active_theme_config(self):
         """
         Retourne la configuration du thème actif pour ce tenant.
-        Applique les overrides si présents.
+        Overrides appliqués; servie depuis les artefacts compilés
+        (compilés à la volée s'ils manquent).
 
         Returns:
-            dict: Configuration complète du thème
+            dict: Configuration complète du thème (ne pas modifier)
         """
         self.ensure_one()
 
-        # Si pas de thème actif, retourner thème par défaut
-        if not self.active_theme_id:
-            default_theme = self.env['quelyos.theme'].sudo().search([
-                ('code', '=', 'default'),
-                ('is_public', '=', True),
-                ('active', '=', True)
-            ], limit=1)
-
-            if not default_theme:
-                # Si aucun thème default, prendre le premier thème public
-                default_theme = self.env['quelyos.theme'].sudo().search([
-                    ('is_public', '=', True),
-                    ('active', '=', True)
-                ], limit=1, order='sequence')
-
-            if not default_theme:
-                return {
-                    'success': False,
-                    'error': 'No theme available'
-                }
+        if not self.theme_hash or not self.theme_compiled_json:
+            error = self._compile_theme_artifacts()
+            if error:
+                return error
 
-            # Activer ce thème par défaut pour le tenant
-            self.sudo().write({'active_theme_id': default_theme.id})
+        document = _THEME_DOCUMENTS.get(self.theme_hash)
+        if document is None:
+            if len(_THEME_DOCUMENTS) >= MAX_THEME_DOCUMENTS:
+                _THEME_DOCUMENTS.clear()
+            document = _THEME_DOCUMENTS[self.theme_hash] = json.loads(self.theme_compiled_json)
+        return document
 
-        # Récupérer la config du thème
-        theme_data = self.active_theme_id.sudo().get_theme_config()
-
-        if not theme_data.get('success'):
-            return theme_data
-
-        # Appliquer les overrides si présents
-        if self.theme_overrides:
-            try:
-                overrides = json.loads(self.theme_overrides)
-                config = theme_data['theme']['config']
+    def _resolve_active_theme(self):
+        """Thème actif, ou thème par défaut (code 'default', sinon premier public)"""
+        self.ensure_one()
+        if self.active_theme_id:
+            return self.active_theme_id
 
-                # Deep merge des overrides
-                merged_config = self._deep_merge_dict(config, overrides)
-                theme_data['theme']['config'] = merged_config
+        Theme = self.env['quelyos.theme'].sudo()
+        default_theme = Theme.search([
+            ('code', '=', 'default'),
+            ('is_public', '=', True),
+            ('active', '=', True)
+        ], limit=1)
 
-            except json.JSONDecodeError:
-                _logger.warning(
-                    "Invalid theme_overrides JSON for tenant %s",
-                    self.code
-                )
+        if not default_theme:
+            # Si aucun thème default, prendre le premier thème public
+            default_theme = Theme.search([
+                ('is_public', '=', True),
+                ('active', '=', True)
+            ], limit=1, order='sequence')
 
-        return theme_data
+        return default_theme
 
-    def _deep_merge_dict(self, base, override):
+    def _compile_theme_artifacts(self):
         """
-        Merge récursif de deux dictionnaires.
-        Les valeurs d'override écrasent celles de base.
+        (Re)compile le JSON fusionné et la feuille CSS de chaque tenant.
 
-        Args:
-            base (dict): Dictionnaire de base
-            override (dict): Dictionnaire d'override
+        Appelé à la modification du thème actif, des overrides, de la
+        palette (presets) ou du thème lui-même.
 
         Returns:
-            dict: Dictionnaire mergé
+            dict d'erreur du dernier tenant en échec, None sinon
         """
-        result = base.copy()
-
-        for key, value in override.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._deep_merge_dict(result[key], value)
-            else:
-                result[key] = value
-
-        return result
+        error = None
+        for tenant in self.sudo().with_context(theme_compiling=True):
+            theme = tenant._resolve_active_theme()
+            if not theme:
+                error = {'success': False, 'error': 'No theme available'}
+                tenant.write({'theme_compiled_json': False, 'theme_compiled_css': False, 'theme_hash': False})
+                continue
+
+            theme_data = theme.get_theme_config()
+            if not theme_data.get('success'):
+                error = theme_data
+                continue
+
+            compiled = compile_theme(theme_data, tenant.theme_overrides, tenant._get_branding_theme())
+            values = {
+                'theme_compiled_json': compiled.json,
+                'theme_compiled_css': compiled.css,
+                'theme_hash': compiled.hash,
+            }
+            if not tenant.active_theme_id:
+                # Activer ce thème par défaut pour le tenant
+                values['active_theme_id'] = theme.id
+            tenant.write(values)
+        return error
+
+    def write(self, vals):
+        """Recompile les artefacts thème si une de leurs sources change"""
+        res = super().write(vals)
+        if THEME_SOURCE_FIELDS.intersection(vals) and not self.env.context.get('theme_compiling'):
+            self._compile_theme_artifacts()
+        return res
 
     def action_set_theme(self, theme_code):
         """
@@ -14,6 +14,12 @@ from odoo.tools.translate import _
 
 _logger = logging.getLogger(__name__)
 
+# Champs repris dans le thème compilé des tenants (voir quelyos.tenant)
+COMPILED_THEME_FIELDS = {
+    'code', 'name', 'description', 'category', 'version',
+    'is_premium', 'price', 'config_json',
+}
+
 
 class QuelyosTheme(models.Model):
     _name = 'quelyos.theme'
@@ -287,6 +293,24 @@ class QuelyosTheme(models.Model):
                 'error': 'Invalid JSON configuration'
             }
 
+    def write(self, vals):
+        """Recompile les thèmes des tenants qui utilisent ces thèmes"""
+        res = super().write(vals)
+        if COMPILED_THEME_FIELDS.intersection(vals):
+            self._tenants_using_theme()._compile_theme_artifacts()
+        return res
+
+    def unlink(self):
+        """Les tenants concernés retombent sur le thème par défaut"""
+        tenants = self._tenants_using_theme()
+        res = super().unlink()
+        tenants.invalidate_recordset(['active_theme_id'])
+        tenants._compile_theme_artifacts()
+        return res
+
+    def _tenants_using_theme(self):
+        return self.env['quelyos.tenant'].sudo().search([('active_theme_id', 'in', self.ids)])
+
     def action_increment_downloads(self):
         """Incrémente le compteur de téléchargements"""
         self.ensure_one()
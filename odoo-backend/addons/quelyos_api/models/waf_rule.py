@@ -5,13 +5,24 @@ Règles de filtrage contre injections SQL, XSS, patterns suspects
 """
 
 import re
-import json
 from datetime import datetime, timedelta
 from odoo import models, fields, api
+from odoo.exceptions import ValidationError
 import logging
 
+from ..lib.waf_engine import WAFEngine, compile_flags
+
 _logger = logging.getLogger(__name__)
 
+# Version des règles (incrémentée à chaque modification hors statistiques)
+RULES_VERSION_PARAM = 'quelyos_api.waf_rules_version'
+
+# Champs mis à jour à chaque détection: ne déclenchent pas de recompilation
+STATS_FIELDS = {'total_matches', 'total_blocks', 'last_triggered'}
+
+# Moteurs compilés par base (cache propre à chaque worker)
+_ENGINES = {}
+
 
 class WAFRule(models.Model):
     """Règles WAF personnalisables"""
@@ -140,6 +151,69 @@ class WAFRule(models.Model):
                 self.create(rule_data)
                 _logger.info(f"WAF: règle '{rule_data['name']}' créée")
 
+    @api.constrains('pattern', 'pattern_flags')
+    def _check_pattern(self):
+        for rule in self:
+            if not rule.pattern:
+                continue
+            try:
+                re.compile(rule.pattern, compile_flags(rule.pattern_flags))
+            except re.error as e:
+                raise ValidationError(f"Pattern regex invalide pour la règle '{rule.name}': {e}")
+
+    # =========================================================================
+    # MOTEUR COMPILÉ (cache par worker, versionné)
+    # =========================================================================
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._bump_rules_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) - STATS_FIELDS:
+            self._bump_rules_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._bump_rules_version()
+        return res
+
+    @api.model
+    def _bump_rules_version(self):
+        """Invalide les moteurs compilés de tous les workers"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        version = int(ICP.get_param(RULES_VERSION_PARAM, '0') or 0)
+        ICP.set_param(RULES_VERSION_PARAM, str(version + 1))
+
+    @api.model
+    def _get_waf_engine(self):
+        """
+        Moteur compilé des règles actives.
+
+        Recompilé uniquement quand la version change (paramètre système,
+        lui-même mis en cache et invalidé entre workers par l'ORM).
+        """
+        version = self.env['ir.config_parameter'].sudo().get_param(RULES_VERSION_PARAM, '0')
+        dbname = self.env.cr.dbname
+        engine = _ENGINES.get(dbname)
+        if engine is not None and engine.version == version:
+            return engine
+
+        rules = self.sudo().search_read(
+            [('active', '=', True)],
+            ['name', 'priority', 'pattern', 'pattern_flags', 'inspect_target', 'action',
+             'block_message', 'exclude_ips', 'exclude_endpoints', 'exclude_users'],
+        )
+        for rule in rules:
+            rule['exclude_user_ids'] = rule.pop('exclude_users')
+        engine = _ENGINES[dbname] = WAFEngine(rules, version=version)
+        _logger.info(f"WAF: {len(engine)} règles compilées (version {version})")
+        return engine
+
     @api.model
     def check_request(self, request_data):
         """
@@ -147,118 +221,41 @@ class WAFRule(models.Model):
         request_data: dict avec url, params, body, headers, cookies, ip, user_id
         Retourne: (allowed: bool, rule: record, message: str)
         """
-        rules = self.search([('active', '=', True)], order='priority desc')
-
-        for rule in rules:
-            if rule._is_excluded(request_data):
-                continue
-
-            if rule._matches_pattern(request_data):
-                rule.sudo().write({
-                    'total_matches': rule.total_matches + 1,
-                    'last_triggered': fields.Datetime.now()
+        matched = self._get_waf_engine().evaluate(request_data)
+        if not matched:
+            return True, None, ''
+
+        now = fields.Datetime.now()
+        WAFLog = self.env['quelyos.waf.log'].sudo()
+        log_vals = []
+        blocking_rule = None
+        for compiled in matched:
+            rule = self.sudo().browse(compiled.id)
+            stats = {
+                'total_matches': rule.total_matches + 1,
+                'last_triggered': now,
+            }
+            if compiled.action == 'block':
+                stats['total_blocks'] = rule.total_blocks + 1
+                blocking_rule = rule
+            rule.write(stats)
+
+            if compiled.action in ('block', 'log'):
+                log_vals.append({
+                    'rule_id': rule.id,
+                    'ip_address': request_data.get('ip'),
+                    'url': request_data.get('url'),
+                    'matched_content': rule._get_matched_content(request_data)[:500],
+                    'action_taken': compiled.action,
+                    'user_id': request_data.get('user_id'),
                 })
 
-                if rule.action == 'block':
-                    rule.sudo().write({'total_blocks': rule.total_blocks + 1})
-                    self.env['quelyos.waf.log'].sudo().create({
-                        'rule_id': rule.id,
-                        'ip_address': request_data.get('ip'),
-                        'url': request_data.get('url'),
-                        'matched_content': rule._get_matched_content(request_data)[:500],
-                        'action_taken': 'block',
-                        'user_id': request_data.get('user_id'),
-                    })
-                    return False, rule, rule.block_message
-
-                elif rule.action == 'log':
-                    self.env['quelyos.waf.log'].sudo().create({
-                        'rule_id': rule.id,
-                        'ip_address': request_data.get('ip'),
-                        'url': request_data.get('url'),
-                        'matched_content': rule._get_matched_content(request_data)[:500],
-                        'action_taken': 'log',
-                        'user_id': request_data.get('user_id'),
-                    })
-
+        if log_vals:
+            WAFLog.create(log_vals)
+        if blocking_rule:
+            return False, blocking_rule, blocking_rule.block_message
         return True, None, ''
 
-    def _is_excluded(self, request_data):
-        """Vérifie si la requête est exclue de cette règle"""
-        self.ensure_one()
-
-        if self.exclude_ips:
-            excluded_ips = [ip.strip() for ip in self.exclude_ips.split('\n') if ip.strip()]
-            if request_data.get('ip') in excluded_ips:
-                return True
-
-        if self.exclude_endpoints:
-            import fnmatch
-            excluded_patterns = [p.strip() for p in self.exclude_endpoints.split('\n') if p.strip()]
-            url = request_data.get('url', '')
-            for pattern in excluded_patterns:
-                if fnmatch.fnmatch(url, pattern):
-                    return True
-
-        if self.exclude_users:
-            user_id = request_data.get('user_id')
-            if user_id and user_id in self.exclude_users.ids:
-                return True
-
-        return False
-
-    def _matches_pattern(self, request_data):
-        """Vérifie si le pattern match la requête"""
-        self.ensure_one()
-
-        if not self.pattern:
-            return False
-
-        flags = re.IGNORECASE if self.pattern_flags == 'i' else 0
-        if self.pattern_flags == 'm':
-            flags |= re.MULTILINE
-        if self.pattern_flags == 's':
-            flags |= re.DOTALL
-
-        try:
-            regex = re.compile(self.pattern, flags)
-        except re.error as e:
-            _logger.error(f"WAF règle {self.name}: pattern regex invalide: {e}")
-            return False
-
-        content_to_check = []
-
-        if self.inspect_target in ('url', 'all'):
-            content_to_check.append(request_data.get('url', ''))
-
-        if self.inspect_target in ('query_params', 'all'):
-            params = request_data.get('params', {})
-            if isinstance(params, dict):
-                content_to_check.extend(str(v) for v in params.values())
-
-        if self.inspect_target in ('body', 'all'):
-            body = request_data.get('body', '')
-            if isinstance(body, dict):
-                content_to_check.append(json.dumps(body))
-            else:
-                content_to_check.append(str(body))
-
-        if self.inspect_target in ('headers', 'all'):
-            headers = request_data.get('headers', {})
-            if isinstance(headers, dict):
-                content_to_check.extend(str(v) for v in headers.values())
-
-        if self.inspect_target in ('cookies', 'all'):
-            cookies = request_data.get('cookies', {})
-            if isinstance(cookies, dict):
-                content_to_check.extend(str(v) for v in cookies.values())
-
-        for content in content_to_check:
-            if regex.search(content):
-                return True
-
-        return False
-
     def _get_matched_content(self, request_data):
         """Retourne le contenu qui a matché (pour le log)"""
         self.ensure_one()
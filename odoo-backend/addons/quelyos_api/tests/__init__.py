@@ -4,3 +4,18 @@ Quelyos API Tests Suite
 """
 
 from . import test_tenant_isolation
+from . import test_keyset_pagination
+from . import test_redis_client
+from . import test_product_import
+from . import test_theme_compiler
+from . import test_query_budget
+from . import test_db_routing
+from . import test_stock_analytics
+from . import test_demand_forecast
+from . import test_stock_alert_index
+from . import test_stock_lot_expiry
+from . import test_stock_valuation
+from . import test_location_tree
+from . import test_stock_availability
+from . import test_mail_transport
+from . import test_gcra
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Outils partagés des tests Quelyos API"""
+
+import json
+from unittest.mock import patch
+
+from odoo.addons.quelyos_api.lib import profiler
+
+# Jeton de trace utilisé uniquement par les tests
+TEST_TRACE_TOKEN = 'quelyos-test-query-trace'
+
+
+class QueryBudgetMixin:
+    """
+    Budget de requêtes SQL par route (à combiner avec HttpCase).
+
+    La requête est tracée via le header X-Query-Trace; le nombre de
+    requêtes et les empreintes répétées (N+1) reviennent dans les headers
+    X-Query-Count / X-Query-N-Plus-One.
+
+    Usage:
+        self.assertQueryBudget('/api/ecommerce/products', 40, params={'limit': 20})
+    """
+
+    def query_trace(self, route, params=None, headers=None):
+        """Appelle une route JSON-RPC tracée; retourne (réponse, requêtes, N+1)"""
+        payload = {'jsonrpc': '2.0', 'method': 'call', 'params': params or {}}
+        request_headers = {
+            'Content-Type': 'application/json',
+            profiler.QUERY_TRACE_HEADER: TEST_TRACE_TOKEN,
+        }
+        request_headers.update(headers or {})
+        with patch.object(profiler, 'QUERY_TRACE_TOKEN', TEST_TRACE_TOKEN):
+            response = self.url_open(route, data=json.dumps(payload), headers=request_headers)
+
+        self.assertEqual(response.status_code, 200, f"{route}: HTTP {response.status_code}")
+        self.assertIn('X-Query-Count', response.headers, f"{route}: requête non tracée")
+        return (
+            response,
+            int(response.headers['X-Query-Count']),
+            int(response.headers.get('X-Query-N-Plus-One', 0)),
+        )
+
+    def assertQueryBudget(self, route, max_queries, params=None, headers=None, allow_n_plus_one=False):
+        """Échoue si la route dépasse max_queries requêtes SQL ou présente un N+1"""
+        response, count, n_plus_one = self.query_trace(route, params, headers)
+        self.assertLessEqual(
+            count, max_queries,
+            f"{route}: {count} requêtes SQL (budget {max_queries})",
+        )
+        if not allow_n_plus_one:
+            self.assertEqual(n_plus_one, 0, f"{route}: {n_plus_one} empreinte(s) répétée(s) (N+1)")
+        return response
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests du choix de replica (santé, retard de réplication) et du rejeu sur le primary"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
+
+from odoo.tests.common import BaseCase
+from odoo.addons.quelyos_api.lib.db_routing import (
+    DatabaseConfig, DatabaseRouter, RoutingStrategy, replica_env, use_read_replica,
+)
+
+
+class FakeCursor:
+    def __init__(self, status=TRANSACTION_STATUS_IDLE):
+        self.dbname = 'quelyos'
+        self._cnx = SimpleNamespace(get_transaction_status=lambda: status)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeEnv:
+    uid, context, su = 1, {}, False
+
+    def __init__(self, cr):
+        self.cr = cr
+
+    def __call__(self, cr=None, **kwargs):
+        return FakeEnv(cr or self.cr)
+
+
+class TestReplicaSelection(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.router = DatabaseRouter()
+        patcher = patch.multiple(self.router, replicas=[
+            DatabaseConfig(host='replica-a', lag=2.0),
+            DatabaseConfig(host='replica-b', lag=120.0),
+            DatabaseConfig(host='replica-c', lag=0.0, is_healthy=False),
+        ], strategy=RoutingStrategy.FASTEST)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lagging_and_unhealthy_replicas_skipped(self):
+        self.assertEqual(self.router.get_read_replica(max_lag=30).key, 'replica-a:5432')
+        self.assertIsNone(self.router.get_read_replica(max_lag=1))
+
+        self.router.replicas[0].is_healthy = False
+        self.assertIs(self.router.get_read_connection(), self.router.primary)
+
+    def test_cursor_failure_falls_back_to_primary(self):
+        primary_env = SimpleNamespace(cr=SimpleNamespace(dbname='quelyos'))
+        with patch.object(DatabaseRouter, 'replica_cursor', side_effect=OSError('down')):
+            with replica_env(primary_env, max_lag=30) as env:
+                self.assertIs(env, primary_env)
+
+    def test_error_swallowed_on_replica_retried_on_primary(self):
+        primary_env = FakeEnv(FakeCursor())
+        replica_cr = FakeCursor(TRANSACTION_STATUS_INERROR)
+        fake_request = SimpleNamespace(env=primary_env)
+        calls = []
+
+        class Controller:
+            @use_read_replica(max_lag=30)
+            def report(self):
+                # Contrôleur qui intercepte toute erreur
+                calls.append(fake_request.env.cr)
+                return {'success': fake_request.env.cr is not replica_cr}
+
+        with patch('odoo.http.request', fake_request), \
+                patch.object(DatabaseRouter, 'replica_cursor', return_value=replica_cr):
+            result = Controller().report()
+
+        self.assertEqual(calls, [replica_cr, primary_env.cr])
+        self.assertEqual(result, {'success': True})
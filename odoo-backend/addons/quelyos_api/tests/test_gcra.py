@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Tests du limiteur GCRA (en mémoire et bail local de jetons)"""
+
+from odoo.tests.common import BaseCase
+from odoo.addons.quelyos_api.lib import gcra
+from odoo.addons.quelyos_api.lib.gcra import GCRA_REFUND_LUA, GCRALimiter, Limit, LocalGCRA
+
+
+class _Clock:
+    """Horloge monotone factice"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Reply:
+    def __init__(self, value):
+        self.value = value
+
+
+class _ScriptPipeline:
+    """
+    Auto-pipeline factice: le script GCRA accorde les jetons demandés sur
+    un quota de `capacity`, le script de restitution est enregistré.
+    """
+
+    def __init__(self, capacity):
+        self.client = self
+        self.connection_pool = object()
+        self.capacity = capacity
+        self.calls = []
+        self.refunds = []
+
+    def register_script(self, source):
+        return source
+
+    def run_script(self, script, keys, args):
+        if script == GCRA_REFUND_LUA:
+            self.refunds.append((tuple(keys), args[0]))
+            self.capacity += args[0]
+            return _Reply(0)
+        want = args[0]
+        self.calls.append(want)
+        self.capacity -= want
+        return _Reply([want, 0, 0] + [self.capacity] * len(keys))
+
+
+class TestLocalGCRA(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = _Clock()
+        self.patch(gcra, 'time', self.clock)
+        self.limiter = LocalGCRA()
+        # Rafale de 5 puis un jeton toutes les 2 secondes
+        self.burst = Limit(5, 10, 'burst')
+
+    def test_burst_then_retry_after(self):
+        decisions = [self.limiter.check(['k'], [self.burst]) for _i in range(5)]
+        self.assertTrue(all(decision.allowed for decision in decisions))
+        self.assertEqual([decision.remaining for decision in decisions], [(4,), (3,), (2,), (1,), (0,)])
+
+        denied = self.limiter.check(['k'], [self.burst])
+        self.assertFalse(denied.allowed)
+        self.assertEqual((denied.exceeded, denied.retry_after), (0, 2.0))
+
+        self.clock.now += 1
+        self.assertFalse(self.limiter.check(['k'], [self.burst]).allowed)
+        self.clock.now += 1
+        self.assertEqual(self.limiter.check(['k'], [self.burst]).remaining, (0,))
+
+    def test_multi_quota_all_or_nothing(self):
+        minute = Limit(3, 60, 'minute')
+        keys, limits = ['burst', 'minute'], [self.burst, minute]
+        for _i in range(3):
+            self.assertTrue(self.limiter.check(keys, limits).allowed)
+
+        denied = self.limiter.check(keys, limits)
+        self.assertFalse(denied.allowed)
+        self.assertEqual(denied.exceeded, 1)
+        self.assertEqual(denied.remaining, (2, 0))
+        self.assertEqual(denied.retry_after, 20.0)
+        # Refus: la rafale n'a rien consommé
+        self.assertEqual(self.limiter.peek(['burst'], [self.burst]), (2,))
+
+    def test_peek_does_not_consume(self):
+        self.limiter.check(['k'], [self.burst])
+        self.assertEqual(self.limiter.peek(['k'], [self.burst]), (4,))
+        self.assertEqual(self.limiter.peek(['k'], [self.burst]), (4,))
+        self.assertEqual(self.limiter.check(['k'], [self.burst]).remaining, (3,))
+
+        self.limiter.reset(['k'])
+        self.assertEqual(self.limiter.peek(['k'], [self.burst]), (5,))
+
+
+class TestGCRALease(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = _Clock()
+        self.patch(gcra, 'time', self.clock)
+        self.patch(gcra, 'LEASE_FRACTION', 0.05)
+        self.patch(gcra, 'LEASE_MAX', 50)
+        self.pipe = _ScriptPipeline(capacity=1000)
+        self.patch(gcra, 'get_pipeline', lambda name: self.pipe)
+        self.limiter = GCRALimiter('throttling')
+        # Bail de 50 jetons valable 3 secondes
+        self.limits = (Limit(1000, 60, 'minute'),)
+        self.keys = ('quelyos:throttle:42:minute',)
+
+    def test_lease_serves_without_redis(self):
+        decisions = [self.limiter.check(self.keys, self.limits) for _i in range(3)]
+        self.assertEqual(self.pipe.calls, [50])
+        self.assertEqual([decision.remaining for decision in decisions], [(999,), (998,), (997,)])
+        self.assertEqual(self.limiter.peek(self.keys, self.limits), (997,))
+
+    def test_expired_lease_refunds_unused_tokens(self):
+        for _i in range(3):
+            self.limiter.check(self.keys, self.limits)
+
+        self.clock.now += 3.5
+        decision = self.limiter.check(self.keys, self.limits)
+        self.assertTrue(decision.allowed)
+        self.assertEqual(self.pipe.refunds, [(self.keys, 47)])
+        self.assertEqual(self.pipe.calls, [50, 50])
+        self.assertEqual(decision.remaining, (996,))
+
+    def test_forget_refunds_lease(self):
+        self.limiter.check(self.keys, self.limits)
+        self.limiter.forget(self.keys)
+        self.assertEqual(self.pipe.refunds, [(self.keys, 49)])
+        self.limiter.forget(self.keys)
+        self.assertEqual(len(self.pipe.refunds), 1)
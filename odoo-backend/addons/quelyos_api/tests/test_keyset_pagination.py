@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Tests de la pagination keyset (curseurs opaques)"""
+
+from odoo.tests.common import TransactionCase
+from odoo.addons.quelyos_api.lib.keyset_pagination import (
+    KeysetPaginator,
+    InvalidCursorError,
+    approximate_count,
+    encode_cursor,
+    decode_cursor,
+    parse_order,
+)
+
+
+class TestKeysetPagination(TransactionCase):
+    """Parcours complet par curseur vs search() ordonné"""
+
+    def setUp(self):
+        super().setUp()
+        self.Partner = self.env['res.partner'].sudo()
+        # Noms dupliqués + NULL-safe: le départage par id doit rester stable
+        names = ['Keyset A', 'Keyset A', 'Keyset B', 'Keyset B', 'Keyset B', 'Keyset C', 'Keyset D']
+        self.partners = self.Partner.create([{'name': name, 'ref': f'KS{i}'} for i, name in enumerate(names)])
+        self.domain = [('id', 'in', self.partners.ids)]
+
+    def _walk(self, order, limit):
+        paginator = KeysetPaginator('res.partner', order=order)
+        seen, cursor = [], None
+        while True:
+            page = paginator.paginate(self.Partner, self.domain, cursor=cursor, limit=limit)
+            seen.extend(page.records.ids)
+            if not page.has_more:
+                return seen
+            cursor = page.next_cursor
+
+    def test_walk_matches_search_order(self):
+        """Toutes les pages concaténées = search() avec le même tri"""
+        for order in ('name asc', 'name desc', 'id desc', 'create_date desc, name asc'):
+            expected = self.Partner.search(self.domain, order=f'{order}, id {parse_order(order)[-1][1]}').ids
+            self.assertEqual(self._walk(order, limit=2), expected, order)
+
+    def test_nullable_column(self):
+        """Les NULL (ref vide) sont renvoyés en fin de parcours, sans doublon"""
+        self.partners[:3].write({'ref': False})
+        seen = self._walk('ref asc', limit=2)
+        self.assertEqual(sorted(seen), sorted(self.partners.ids))
+        self.assertEqual(set(seen[-3:]), set(self.partners[:3].ids))
+
+    def test_cursor_roundtrip_and_tampering(self):
+        """Un curseur émis pour un tri est refusé pour un autre"""
+        sort_keys = parse_order('name asc')
+        cursor = encode_cursor(['Keyset A', 42], sort_keys)
+        self.assertEqual(decode_cursor(cursor, sort_keys), ['Keyset A', 42])
+        with self.assertRaises(InvalidCursorError):
+            decode_cursor(cursor, parse_order('name desc'))
+        with self.assertRaises(InvalidCursorError):
+            decode_cursor('not-a-cursor', sort_keys)
+
+    def test_non_stored_field_rejected(self):
+        """Un champ non stocké ne peut pas servir de clé keyset"""
+        with self.assertRaises(ValueError):
+            KeysetPaginator('res.partner', order='display_name asc').paginate(self.Partner, self.domain)
+
+    def test_approximate_count_small_is_exact(self):
+        total, exact = approximate_count(self.Partner, self.domain)
+        self.assertTrue(exact)
+        self.assertEqual(total, len(self.partners))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests de l'arbre des emplacements (parent_path, stock cumulé, invalidation)"""
+
+from odoo.tests.common import TransactionCase
+from odoo.addons.quelyos_api.lib.location_tree import DIRTY_KEY, LocationTree
+
+
+class TestLocationTree(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        Location = cls.env['stock.location']
+        cls.aisle = Location.create({'name': 'Tree Aisle', 'usage': 'view', 'location_id': cls.stock.id})
+        cls.bin_a = Location.create({'name': 'Tree Bin A', 'usage': 'internal', 'location_id': cls.aisle.id})
+        cls.bin_b = Location.create({'name': 'Tree Bin B', 'usage': 'internal', 'location_id': cls.aisle.id})
+        cls.product = cls.env['product.product'].create({
+            'name': 'Tree Product', 'is_storable': True, 'standard_price': 3.0,
+        })
+        cls.env['stock.quant']._update_available_quantity(cls.product, cls.bin_a, 4)
+        cls.env['stock.quant']._update_available_quantity(cls.product, cls.bin_b, 6)
+
+    def test_tree_rollup(self):
+        tree = LocationTree(self.env, warehouse_id=self.warehouse.id).compute()
+        nodes = {node['id']: node for node in tree}
+        ids = [node['id'] for node in tree]
+
+        # Parents avant enfants
+        self.assertLess(ids.index(self.warehouse.view_location_id.id), ids.index(self.aisle.id))
+        self.assertLess(ids.index(self.aisle.id), ids.index(self.bin_a.id))
+
+        self.assertEqual(nodes[self.bin_a.id]['stock_count'], 4)
+        self.assertEqual(nodes[self.aisle.id]['stock_count'], 0)
+        self.assertEqual(nodes[self.aisle.id]['rollup_count'], 10)
+        self.assertEqual(nodes[self.aisle.id]['rollup_value'], 30)
+        self.assertGreaterEqual(nodes[self.warehouse.view_location_id.id]['rollup_count'], 10)
+        self.assertEqual(nodes[self.aisle.id]['parent_id'], self.stock.id)
+
+    def test_changes_invalidate_warehouse_tree(self):
+        self.env.cr.postcommit.data.pop(DIRTY_KEY, None)
+        self.env['stock.quant']._update_available_quantity(self.product, self.bin_a, 1)
+        self.assertIn(
+            (self.env.company.id, self.warehouse.id),
+            self.env.cr.postcommit.data.get(DIRTY_KEY, set()),
+        )
+
+        self.env.cr.postcommit.data.pop(DIRTY_KEY, None)
+        self.bin_b.name = 'Tree Bin B2'
+        self.assertIn(
+            (self.env.company.id, self.warehouse.id),
+            self.env.cr.postcommit.data.get(DIRTY_KEY, set()),
+        )
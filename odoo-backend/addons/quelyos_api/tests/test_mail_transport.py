@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Tests du transport email en masse et des reprises de campagne"""
+
+from types import SimpleNamespace
+
+from odoo.tests.common import BaseCase, TransactionCase
+from odoo.addons.quelyos_api.lib.mail_transport import (
+    BrevoTransport, CompiledTemplate, OutgoingEmail, SendStats,
+)
+from odoo.addons.quelyos_api.models.marketing_campaign import MAX_SEND_ATTEMPTS
+
+
+class FakeSession:
+    def __init__(self, status_code=201):
+        self.payloads = []
+        self.status_code = status_code
+
+    def post(self, url, json=None, timeout=None):
+        self.payloads.append(json)
+        return SimpleNamespace(status_code=self.status_code, text='')
+
+    def close(self):
+        pass
+
+
+class TestBrevoTransport(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.transport = BrevoTransport('key', 'news@example.com', 'News')
+        self.transport._session = self.session = FakeSession()
+
+    def test_per_recipient_headers_sent_in_one_request(self):
+        messages = [
+            OutgoingEmail(f'c{i}@example.com', 'Promo', f'<p>{i}</p>',
+                          {'List-Unsubscribe': f'<https://shop/unsubscribe/t{i}>'})
+            for i in range(3)
+        ]
+        stats = SendStats(total=3)
+        self.transport.send_batch(messages, stats)
+
+        self.assertEqual(len(self.session.payloads), 1)
+        versions = self.session.payloads[0]['messageVersions']
+        self.assertEqual([v['to'][0]['email'] for v in versions], [m.to for m in messages])
+        self.assertEqual(
+            [v['headers']['List-Unsubscribe'] for v in versions],
+            [m.headers['List-Unsubscribe'] for m in messages],
+        )
+        self.assertEqual((stats.sent, stats.failed), (3, 0))
+
+    def test_http_error_fails_whole_chunk(self):
+        self.session.status_code = 400
+        stats = SendStats(total=2)
+        self.transport.send_batch([
+            OutgoingEmail('a@example.com', 'S', 'h'), OutgoingEmail('b@example.com', 'S', 'h'),
+        ], stats)
+        self.assertEqual((stats.sent, stats.failed), (0, 2))
+
+    def test_contact_placeholders_escaped(self):
+        template = CompiledTemplate('<p>{{name}}</p><a href="{{unsubscribe_url}}">x</a>')
+        body = template.render({'name': '<b>A&B</b>', 'unsubscribe_url': 'https://shop/u/t'})
+        self.assertEqual(body, '<p>&lt;b&gt;A&amp;B&lt;/b&gt;</p><a href="https://shop/u/t">x</a>')
+
+
+class TestCampaignSendFailures(TransactionCase):
+
+    def test_campaign_failed_after_max_attempts(self):
+        campaign = self.env['quelyos.marketing.campaign'].create({
+            'name': 'MT Campaign', 'channel': 'email', 'status': 'sending',
+        })
+        for _attempt in range(MAX_SEND_ATTEMPTS - 1):
+            campaign._record_send_failure(RuntimeError('smtp down'))
+        self.assertEqual(campaign.status, 'sending')
+
+        campaign._record_send_failure(RuntimeError('smtp down'))
+        self.assertEqual(campaign.status, 'failed')
+        self.assertEqual(campaign.send_attempts, MAX_SEND_ATTEMPTS)
+        self.assertEqual(campaign.send_error, 'smtp down')
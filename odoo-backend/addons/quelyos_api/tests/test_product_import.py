@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Tests de l'import de produits par lots"""
+
+from odoo.tests.common import TransactionCase, new_test_user
+from odoo.addons.quelyos_api.lib.product_import import ProductImporter, iter_rows
+from odoo.addons.quelyos_api.models.product_import_job import MAX_ATTEMPTS
+
+
+class TestProductImport(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Template = self.env['product.template'].sudo()
+        self.existing = self.Template.create({
+            'name': 'PI Existing', 'default_code': 'PI-SKU-1', 'barcode': 'PI-BAR-1',
+        })
+
+    def _run(self, rows, **kwargs):
+        return ProductImporter(self.env, chunk_size=3, **kwargs).run(iter_rows(rows), total=len(rows))
+
+    def test_create_and_update_by_sku_or_barcode(self):
+        result = self._run([
+            {'name': 'PI Updated', 'sku': 'PI-SKU-1', 'price': '12.5', 'category': 'PI Category'},
+            {'name': 'PI New', 'default_code': 'PI-SKU-2', 'category': 'pi category'},
+            {'name': 'PI Again', 'default_code': 'PI-SKU-2', 'price': '3'},
+            {'name': 'PI By Barcode', 'barcode': 'PI-BAR-1'},
+        ], update_existing=True)
+
+        self.assertEqual(result['summary']['error_count'], 0, result['errors'])
+        self.assertEqual([r['row'] for r in result['created']], [2])
+        self.assertEqual([r['row'] for r in result['updated']], [1, 3, 4])
+        self.assertEqual(self.existing.name, 'PI By Barcode')
+
+        new = self.Template.search([('default_code', '=', 'PI-SKU-2')])
+        self.assertEqual(len(new), 1, "une référence répétée met à jour le produit créé")
+        self.assertEqual(new.list_price, 3)
+        categories = self.env['product.category'].search([('name', '=ilike', 'pi category')])
+        self.assertEqual(len(categories), 1)
+        self.assertEqual(new.categ_id, categories)
+
+    def test_failing_row_isolated_under_savepoint(self):
+        """Un code-barres en doublon n'empêche pas la création des autres lignes du lot"""
+        result = self._run([
+            {'name': 'PI Ok 1', 'default_code': 'PI-OK-1'},
+            {'name': 'PI Duplicate', 'barcode': 'PI-BAR-1'},
+            {'name': 'PI Ok 2', 'default_code': 'PI-OK-2'},
+            {'name': '', 'default_code': 'PI-NONAME'},
+            {'name': 'PI Bad Price', 'price': 'abc'},
+        ])
+
+        self.assertEqual([r['row'] for r in result['created']], [1, 3])
+        self.assertEqual([e['row'] for e in result['errors']], [2, 4, 5])
+        self.assertEqual(self.Template.search_count([('default_code', 'in', ['PI-OK-1', 'PI-OK-2'])]), 2)
+
+    def test_csv_source(self):
+        content = 'name;price;sku\nPI Csv 1;4.5;PI-CSV-1\nPI Csv 2;6;PI-CSV-2\n'.encode()
+        result = ProductImporter(self.env).run(iter_rows(content, 'produits.csv'))
+        self.assertEqual(result['summary']['created_count'], 2, result['errors'])
+        product = self.Template.search([('default_code', '=', 'PI-CSV-1')])
+        self.assertEqual(product.list_price, 4.5)
+
+    def test_resume_skips_committed_rows(self):
+        progress = []
+        rows = [{'name': f'PI Resume {i}', 'default_code': f'PI-RES-{i}'} for i in range(1, 6)]
+        importer = ProductImporter(self.env, chunk_size=2, on_chunk=lambda imp: progress.append(imp.result.processed))
+        result = importer.run(iter_rows(rows), start_row=2)
+
+        self.assertEqual([r['row'] for r in result['created']], [3, 4, 5])
+        self.assertEqual(progress, [4, 5])
+        self.assertFalse(self.Template.search([('default_code', 'in', ['PI-RES-1', 'PI-RES-2'])]))
+
+
+class TestProductImportJob(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        # Le job commite chaque lot: sans effet dans la transaction de test
+        self.patch(type(self.env.cr), 'commit', lambda cr: None)
+        self.Job = self.env['quelyos.product.import.job'].sudo()
+
+    def test_interrupted_job_resumes_after_last_committed_row(self):
+        job = self.Job.create_job([
+            {'name': 'PI Job 1', 'default_code': 'PI-JOB-1'},
+            {'name': 'PI Job 2', 'default_code': 'PI-JOB-2'},
+            {'name': 'PI Job 3', 'default_code': 'PI-JOB-3'},
+        ])
+        self.assertTrue(job.job_id)
+        # Worker arrêté après le premier lot commité
+        job.write({'status': 'running', 'attempts': 1, 'processed_rows': 1, 'created_count': 1})
+
+        job._run()
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual((job.processed_rows, job.created_count), (3, 3))
+        codes = self.env['product.template'].search([('default_code', 'like', 'PI-JOB-')]).mapped('default_code')
+        self.assertEqual(sorted(codes), ['PI-JOB-2', 'PI-JOB-3'])
+
+    def test_job_failed_after_max_attempts(self):
+        job = self.Job.create_job([{'name': 'PI Job Stuck'}])
+        job.write({'status': 'running', 'attempts': MAX_ATTEMPTS})
+        job._run()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error_message)
+        self.assertFalse(self.env['product.template'].search([('name', '=', 'PI Job Stuck')]))
+
+    def test_status_readable_by_owner_only(self):
+        job = self.Job.create_job([{'name': 'PI Job Owner'}])
+        other = new_test_user(self.env, login='pi_job_other')
+        self.assertTrue(job.is_owned_by(self.env))
+        self.assertFalse(job.is_owned_by(self.env(user=other)))
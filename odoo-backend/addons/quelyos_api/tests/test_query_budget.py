@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Budgets de requêtes SQL des endpoints critiques (régressions N+1)
+
+Usage:
+    docker exec quelyos-odoo python3 -m odoo -d quelyos --test-tags query_budget --stop-after-init
+"""
+
+from odoo.tests import HttpCase, tagged
+from odoo.tests.common import BaseCase
+from odoo.addons.quelyos_api.lib.profiler import QueryTrace, fingerprint
+
+from .common import QueryBudgetMixin
+
+
+class TestQueryFingerprint(BaseCase):
+
+    def test_literals_and_in_lists_normalized(self):
+        self.assertEqual(
+            fingerprint("SELECT id FROM product_product WHERE id IN (1, 2, 3) AND name = 'x''y'"),
+            'SELECT id FROM product_product WHERE id IN (?...) AND name = ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT  *\n FROM stock_quant WHERE product_id = %s'),
+            fingerprint('SELECT * FROM stock_quant WHERE product_id = 42'),
+        )
+
+    def test_repeated_fingerprint_flagged(self):
+        trace = QueryTrace('/api/test')
+        for product_id in range(6):
+            trace.record(f'SELECT qty FROM stock_quant WHERE product_id = {product_id}', 0.5)
+        trace.record('SELECT 1', 0.1)
+
+        data = trace.to_dict()
+        self.assertEqual(data['query_count'], 7)
+        self.assertEqual(data['distinct_queries'], 2)
+        self.assertEqual([p['count'] for p in data['n_plus_one']], [6])
+
+
+@tagged('post_install', '-at_install', 'query_budget')
+class TestQueryBudget(QueryBudgetMixin, HttpCase):
+    """Budgets volontairement larges: à resserrer à mesure des optimisations"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tenant = cls.env['quelyos.tenant'].sudo().create({
+            'name': 'Tenant Query Budget',
+            'code': 'query_budget_test',
+            'domain': 'query-budget.test.local',
+        })
+        company = cls.tenant.company_id
+        cls.products = cls.env['product.template'].sudo().create([
+            {'name': f'QB Product {i}', 'list_price': 10.0 + i, 'company_id': company.id,
+             'sale_ok': True, 'is_storable': True}
+            for i in range(15)
+        ])
+        cls.tenant_headers = {'X-Tenant-Domain': cls.tenant.domain}
+
+    def test_products_list(self):
+        self.assertQueryBudget('/api/ecommerce/products', 80, params={
+            'tenant_id': self.tenant.id, 'limit': 12,
+        }, headers=self.tenant_headers)
+
+    def test_product_detail(self):
+        product = self.products[0]
+        self.assertQueryBudget(f'/api/ecommerce/products/{product.id}', 80, headers=self.tenant_headers)
+
+    def test_cart(self):
+        self.assertQueryBudget('/api/ecommerce/cart', 40, headers=self.tenant_headers)
+
+    def test_checkout_validate(self):
+        self.assertQueryBudget('/api/ecommerce/checkout/validate', 40, headers=self.tenant_headers)
+
+    def test_pos_catalog(self):
+        company = self.tenant.company_id
+        warehouse = self.env['stock.warehouse'].sudo().search([('company_id', '=', company.id)], limit=1)
+        pricelist = self.env['product.pricelist'].sudo().create({
+            'name': 'QB Pricelist', 'company_id': company.id,
+        })
+        config = self.env['quelyos.pos.config'].sudo().create({
+            'name': 'QB Terminal',
+            'code': 'QB01',
+            'tenant_id': self.tenant.id,
+            'company_id': company.id,
+            'warehouse_id': warehouse.id,
+            'pricelist_id': pricelist.id,
+        })
+        self.authenticate('admin', 'admin')
+        self.assertQueryBudget('/api/pos/products', 80, params={
+            'config_id': config.id, 'limit': 50,
+        }, headers={'X-Session-Id': self.session.sid})
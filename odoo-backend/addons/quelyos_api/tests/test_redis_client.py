@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Tests de l'accès Redis partagé (circuit breaker, auto-pipeline)"""
+
+from odoo.tests.common import BaseCase
+from odoo.addons.quelyos_api.lib.redis_client import AutoPipeline, RedisHealth
+
+
+class _RecordingPipeline:
+    """Pipeline factice: enregistre les commandes, renvoie leur nom à l'exécution"""
+
+    def __init__(self, executions):
+        self.commands = []
+        self.executions = executions
+
+    def __getattr__(self, command):
+        def queue(*args, **kwargs):
+            self.commands.append(command)
+            return self
+        return queue
+
+    def execute(self, raise_on_error=True):
+        self.executions.append(list(self.commands))
+        return [f'{command}-ok' for command in self.commands]
+
+
+class _RecordingClient:
+    def __init__(self):
+        self.executions = []
+
+    def pipeline(self, transaction=True):
+        return _RecordingPipeline(self.executions)
+
+
+class TestRedisHealth(BaseCase):
+
+    def test_opens_after_threshold_then_probes(self):
+        health = RedisHealth(failure_threshold=2, cooldown=60)
+        health.record_failure(ConnectionError('down'))
+        self.assertEqual(health.state, RedisHealth.CLOSED)
+        health.record_failure(ConnectionError('down'))
+        self.assertEqual(health.state, RedisHealth.OPEN)
+        self.assertFalse(health.allow())
+        self.assertFalse(health.available())
+
+        # Refroidissement écoulé: une seule sonde
+        health.opened_at -= 61
+        self.assertTrue(health.available())
+        self.assertTrue(health.allow())
+        self.assertFalse(health.allow())
+        health.record_success()
+        self.assertEqual(health.state, RedisHealth.CLOSED)
+        self.assertTrue(health.allow())
+
+    def test_failed_probe_reopens(self):
+        health = RedisHealth(failure_threshold=5, cooldown=60)
+        for _i in range(5):
+            health.record_failure(ConnectionError('down'))
+        health.opened_at -= 61
+        self.assertTrue(health.allow())
+        health.record_failure(ConnectionError('still down'))
+        self.assertEqual(health.state, RedisHealth.OPEN)
+        self.assertFalse(health.allow())
+
+
+class TestAutoPipeline(BaseCase):
+
+    def test_writes_ride_with_next_read(self):
+        client = _RecordingClient()
+        pipe = AutoPipeline(client)
+        pipe.setex('a', 60, '1')
+        pipe.hincrby('h', 'f', 1)
+        reply = pipe.get('b')
+        self.assertEqual(client.executions, [])
+
+        self.assertEqual(reply.value, 'get-ok')
+        self.assertEqual(client.executions, [['setex', 'hincrby', 'get']])
+
+        # Réponse déjà résolue: pas de nouvel aller-retour
+        self.assertEqual(reply.value, 'get-ok')
+        pipe.flush()
+        self.assertEqual(len(client.executions), 1)
+
+    def test_immediate_mode_outside_request(self):
+        client = _RecordingClient()
+        pipe = AutoPipeline(client, immediate=True)
+        pipe.set('a', 1)
+        pipe.set('b', 2)
+        self.assertEqual(client.executions, [['set'], ['set']])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Tests de l'index incrémental des alertes stock bas / surstock"""
+
+from odoo.tests.common import TransactionCase
+
+
+class TestStockAlertIndex(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Index = cls.env['quelyos.stock.alert.index']
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.product = cls.env['product.product'].create({
+            'name': 'Alert Index Product', 'is_storable': True, 'x_low_stock_threshold': 10,
+        })
+
+    def _entry(self, warehouse=False):
+        self.env.cr.precommit.run()
+        return self.Index.search([
+            ('product_id', '=', self.product.id),
+            ('company_id', '=', self.env.company.id),
+            ('warehouse_id', '=', warehouse.id if warehouse else False),
+        ])
+
+    def test_quant_updates_refresh_index(self):
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, 4)
+        entry = self._entry()
+        self.assertEqual((entry.state, entry.on_hand, entry.gap), ('low', 4, 6))
+
+        # Seuil haut = 10 x 3
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, 36)
+        entry = self._entry()
+        self.assertEqual((entry.state, entry.max_qty, entry.gap), ('high', 30, 10))
+
+        self.product.product_tmpl_id.x_low_stock_threshold = 20
+        self.assertEqual(self._entry().state, 'ok')
+
+    def test_orderpoint_overrides_thresholds(self):
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, 15)
+        self.assertEqual(self._entry(self.warehouse).state, 'ok')
+
+        orderpoint = self.env['stock.warehouse.orderpoint'].create({
+            'product_id': self.product.id,
+            'warehouse_id': self.warehouse.id,
+            'location_id': self.stock.id,
+            'product_min_qty': 20,
+            'product_max_qty': 50,
+        })
+        entry = self._entry(self.warehouse)
+        self.assertEqual((entry.state, entry.min_qty, entry.gap), ('low', 20, 5))
+        # La ligne société garde le seuil produit
+        self.assertEqual(self._entry().state, 'ok')
+
+        orderpoint.product_max_qty = 12
+        orderpoint.product_min_qty = 5
+        self.assertEqual(self._entry(self.warehouse).state, 'high')
+
+        counts = self.Index.get_alert_counts(self.warehouse.id)
+        self.assertGreaterEqual(counts['high'], 1)
+
+    def test_reconcile_repairs_index(self):
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, 4)
+        self._entry().unlink()
+        self.env.cr.execute(
+            "UPDATE stock_quant SET quantity = 50 WHERE product_id = %s", [self.product.id]
+        )
+        self.env.invalidate_all()
+
+        self.assertGreaterEqual(self.Index._cron_reconcile(), 1)
+        entry = self._entry()
+        self.assertEqual((entry.state, entry.on_hand), ('high', 50))
+
+    def test_shared_product_sold_out_and_unlinked(self):
+        # Produit partagé (sans société): la ligne société reste en rupture sans quant
+        self.assertFalse(self.product.company_id)
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, 4)
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, -4)
+        entry = self._entry()
+        self.assertEqual((entry.state, entry.on_hand, entry.gap), ('low', 0, 10))
+
+        self.env['stock.quant'].search([('product_id', '=', self.product.id)]).sudo().unlink()
+        entry = self._entry()
+        self.assertEqual((entry.state, entry.on_hand, entry.gap), ('low', 0, 10))
+        self.assertEqual(self.Index._cron_reconcile(), 0)
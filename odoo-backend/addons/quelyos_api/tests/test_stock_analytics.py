@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Tests du moteur d'analytique stock SQL (rotation, ABC)"""
+
+from odoo.tests.common import TransactionCase
+from odoo.addons.quelyos_api.lib.stock_analytics import StockAnalytics
+
+
+class TestStockAnalytics(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.category = cls.env['product.category'].create({'name': 'Analytics Test'})
+        # Valeurs 800 / 150 / 40 / 10 -> cumul 80 / 95 / 99 / 100 %
+        cls.products = cls.env['product.product'].create([
+            {'name': f'SA Product {i}', 'is_storable': True, 'categ_id': cls.category.id,
+             'standard_price': cost}
+            for i, cost in enumerate((8.0, 1.5, 0.4, 0.1))
+        ])
+        for product in cls.products:
+            cls.env['stock.quant']._update_available_quantity(product, cls.stock, 100)
+        cls.domain = [('categ_id', '=', cls.category.id)]
+
+    def _deliver(self, product, qty):
+        move = self.env['stock.move'].create({
+            'product_id': product.id,
+            'product_uom_qty': qty,
+            'product_uom': product.uom_id.id,
+            'location_id': self.stock.id,
+            'location_dest_id': self.env.ref('stock.stock_location_customers').id,
+        })
+        move._action_confirm()
+        move._action_assign()
+        move.quantity = qty
+        move.picked = True
+        move._action_done()
+
+    def test_abc_classification(self):
+        result = StockAnalytics(self.env, domain=self.domain).abc(threshold_a=80, threshold_b=95)
+
+        self.assertEqual([p['id'] for p in result['products']], self.products.ids)
+        self.assertEqual([p['category'] for p in result['products']], ['A', 'B', 'C', 'C'])
+        self.assertEqual([p['cumulative_pct'] for p in result['products']], [80.0, 95.0, 99.0, 100.0])
+        self.assertAlmostEqual(result['total_value'], 1000.0)
+        self.assertEqual(result['kpis']['category_c']['count'], 2)
+        self.assertEqual(result['kpis']['category_a']['value_pct'], 80.0)
+
+        page = StockAnalytics(self.env, domain=self.domain).abc(limit=1, offset=1)
+        self.assertEqual([p['id'] for p in page['products']], self.products[1].ids)
+        self.assertEqual(page['total_products'], 4)
+
+    def test_turnover_sorted_and_paginated(self):
+        self._deliver(self.products[2], 20)
+        self._deliver(self.products[3], 50)
+
+        engine = StockAnalytics(self.env, domain=self.domain, warehouse_id=self.warehouse.id)
+        rows, total = engine.turnover(sort='turnover_desc', limit=2)
+        self.assertEqual(total, 4)
+        self.assertEqual([row['id'] for row in rows], self.products[3:].ids + self.products[2:3].ids)
+        # 50 vendus / 50 restants = 1.0 ; 20 / 80 = 0.25 -> 1460 jours
+        self.assertEqual(float(rows[0]['turnover']), 1.0)
+        self.assertEqual(float(rows[1]['days_of_stock']), 1460.0)
+        self.assertEqual(float(rows[1]['qty_available']), 80.0)
+
+        rows, total = engine.turnover(min_turnover=0.5, limit=10)
+        self.assertEqual((total, [row['id'] for row in rows]), (1, self.products[3].ids))
+
+        rows, total = engine.turnover(limit=10, offset=10)
+        self.assertEqual((rows, total), ([], 4))
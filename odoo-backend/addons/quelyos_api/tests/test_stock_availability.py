@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Tests du service de disponibilité (en main, réservé, libre, à recevoir)"""
+
+from odoo.tests.common import TransactionCase
+from odoo.addons.quelyos_api.lib.stock_availability import DIRTY_KEY, StockAvailability
+
+
+class TestStockAvailability(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.product = cls.env['product.product'].create({'name': 'Availability Product', 'is_storable': True})
+        cls.other = cls.env['product.product'].create({'name': 'Availability Empty', 'is_storable': True})
+        cls.env['stock.quant']._update_available_quantity(cls.product, cls.stock, 10)
+        cls.env['stock.quant']._update_reserved_quantity(cls.product, cls.stock, 4)
+
+        supplier = cls.env.ref('stock.stock_location_suppliers')
+        cls.receipt = cls.env['stock.move'].create({
+            'product_id': cls.product.id,
+            'product_uom_qty': 7,
+            'location_id': supplier.id,
+            'location_dest_id': cls.stock.id,
+        })
+        cls.receipt._action_confirm()
+
+    def test_batch_availability(self):
+        availability = StockAvailability(self.env, use_cache=False).get(
+            [self.product.id, self.other.id], [self.warehouse.id],
+        )
+        stock = availability[self.product.id]
+        self.assertEqual(stock['on_hand'], 10)
+        self.assertEqual(stock['reserved'], 4)
+        self.assertEqual(stock['free'], 6)
+        self.assertEqual(stock['incoming'], 7)
+        self.assertEqual(set(stock['warehouses']), {self.warehouse.id})
+
+        # Produit sans stock: présent, à zéro
+        self.assertEqual(availability[self.other.id]['free'], 0)
+        self.assertEqual(availability[self.other.id]['warehouses'], {})
+
+    def test_free_qty_never_negative(self):
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, -8)
+        free = StockAvailability(self.env, use_cache=False).free_qty([self.product.id], self.warehouse.id)
+        self.assertEqual(free[self.product.id], 0)
+
+    def test_quant_changes_invalidate_cache(self):
+        self.env.cr.postcommit.data.pop(DIRTY_KEY, None)
+        self.env['stock.quant']._update_reserved_quantity(self.product, self.stock, 1)
+        self.assertIn(
+            (self.env.company.id, self.product.id),
+            self.env.cr.postcommit.data.get(DIRTY_KEY, set()),
+        )
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests de la projection d'expiration des lots (tranches, FEFO)"""
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+
+class TestStockLotExpiry(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Expiry = cls.env['quelyos.stock.lot.expiry']
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.product = cls.env['product.product'].create({
+            'name': 'Expiry Product', 'is_storable': True, 'tracking': 'lot',
+        })
+
+    def setUp(self):
+        super().setUp()
+        if not self.Expiry._has_expiry_dates():
+            self.skipTest("product_expiry non installé (pas de date d'expiration sur stock.lot)")
+
+    def _lot(self, name, days, qty):
+        lot = self.env['stock.lot'].create({
+            'name': name,
+            'product_id': self.product.id,
+            'expiration_date': fields.Datetime.now() + timedelta(days=days),
+        })
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, qty, lot_id=lot)
+        self.env.cr.precommit.run()
+        return lot
+
+    def test_expiry_buckets(self):
+        expired = self._lot('EXP-1', -2, 5)
+        soon = self._lot('EXP-2', 3, 7)
+        later = self._lot('EXP-3', 20, 11)
+        self._lot('EXP-4', 90, 13)
+
+        buckets = self.Expiry.get_expiry_buckets(product_id=self.product.id)
+        self.assertEqual([row['lot_id'] for row in buckets['expired']['lots']], expired.ids)
+        self.assertEqual([row['lot_id'] for row in buckets['within_7_days']['lots']], soon.ids)
+        self.assertEqual([row['lot_id'] for row in buckets['within_30_days']['lots']], later.ids)
+        self.assertEqual(buckets['within_30_days']['quantity'], 11)
+        self.assertLess(buckets['expired']['lots'][0]['days_until_expiry'], 0)
+
+        # Lot consommé: sort de la projection
+        self.env['stock.quant']._update_available_quantity(self.product, self.stock, -7, lot_id=soon)
+        self.env.cr.precommit.run()
+        buckets = self.Expiry.get_expiry_buckets(product_id=self.product.id)
+        self.assertEqual(buckets['within_7_days']['count'], 0)
+
+    def test_fefo_order(self):
+        self._lot('FEFO-EXPIRED', -1, 100)
+        late = self._lot('FEFO-LATE', 60, 10)
+        early = self._lot('FEFO-EARLY', 10, 4)
+
+        candidates = self.Expiry.get_fefo_candidates(self.product.id)
+        self.assertEqual([row['lot_id'] for row in candidates], early.ids + late.ids)
+
+        # 3 unités: le premier lot suffit
+        candidates = self.Expiry.get_fefo_candidates(self.product.id, location_id=self.warehouse.view_location_id.id, quantity=3)
+        self.assertEqual([row['lot_id'] for row in candidates], early.ids)
+
+        # Date modifiée sur le lot: ordre mis à jour
+        late.expiration_date = fields.Datetime.now() + timedelta(days=5)
+        self.env.cr.precommit.run()
+        candidates = self.Expiry.get_fefo_candidates(self.product.id)
+        self.assertEqual([row['lot_id'] for row in candidates], late.ids + early.ids)
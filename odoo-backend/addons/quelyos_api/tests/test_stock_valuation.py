@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Tests du moteur de valorisation stock SQL et des photos journalières"""
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+from odoo.addons.quelyos_api.lib.stock_valuation import StockValuation
+
+
+class TestStockValuation(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.warehouse = cls.env['stock.warehouse'].search([('company_id', '=', cls.env.company.id)], limit=1)
+        cls.stock = cls.warehouse.lot_stock_id
+        cls.parent_category = cls.env['product.category'].create({'name': 'Valuation Test'})
+        cls.child_category = cls.env['product.category'].create({
+            'name': 'Valuation Child', 'parent_id': cls.parent_category.id,
+        })
+        cls.products = cls.env['product.product'].create([
+            {'name': 'SV Product 1', 'is_storable': True, 'categ_id': cls.parent_category.id, 'standard_price': 2.0},
+            {'name': 'SV Product 2', 'is_storable': True, 'categ_id': cls.child_category.id, 'standard_price': 5.0},
+            {'name': 'SV Product 3', 'is_storable': True, 'categ_id': cls.child_category.id, 'standard_price': 1.0},
+        ])
+        for product, qty in zip(cls.products[:2], (10, 4)):
+            cls.env['stock.quant']._update_available_quantity(product, cls.stock, qty)
+
+    def test_totals_by_category_and_warehouse(self):
+        totals = StockValuation(self.env, category_id=self.parent_category.id).totals()
+
+        self.assertEqual(totals['total'], {'quantity': 14.0, 'value': 40.0, 'product_count': 2})
+        self.assertEqual(totals['categories'][self.parent_category.id]['value'], 20.0)
+        self.assertEqual(totals['categories'][self.child_category.id]['value'], 20.0)
+        self.assertEqual(totals['warehouses'][self.warehouse.id]['value'], 40.0)
+
+        report = StockValuation(self.env, category_id=self.child_category.id).report()
+        self.assertEqual(report['kpis']['total_value'], 20.0)
+        self.assertEqual([row['category_id'] for row in report['by_category']], self.child_category.ids)
+
+    def test_by_product(self):
+        engine = StockValuation(self.env, category_id=self.parent_category.id)
+        self.assertEqual([row['id'] for row in engine.by_product()], self.products[:2].ids)
+        rows = engine.by_product(include_zero_stock=True)
+        self.assertEqual([row['id'] for row in rows], self.products.ids)
+        self.assertEqual(rows[-1]['value'], 0)
+
+    def test_snapshot_lookup(self):
+        Snapshot = self.env['quelyos.stock.valuation.snapshot']
+        Snapshot._cron_snapshot()
+        today = fields.Date.today()
+
+        snapshot_date, totals = Snapshot.get_valuation_at(today, category_id=self.parent_category.id)
+        self.assertEqual(snapshot_date, today)
+        self.assertEqual(totals['total']['value'], 40.0)
+        self.assertEqual(totals['categories'][self.child_category.id]['quantity'], 4.0)
+
+        # Le stock bouge après la photo: la valorisation passée ne change pas
+        self.env['stock.quant']._update_available_quantity(self.products[0], self.stock, 10)
+        _snapshot_date, totals = Snapshot.get_valuation_at(today, category_id=self.parent_category.id)
+        self.assertEqual(totals['total']['value'], 40.0)
+
+        self.assertEqual(Snapshot.get_valuation_at(today - timedelta(days=1), category_id=self.parent_category.id)[0], None)
+        timeline = Snapshot.get_timeline(today - timedelta(days=7), category_id=self.parent_category.id)
+        self.assertEqual(timeline, [{'date': today.isoformat(), 'total_value': 40.0, 'total_qty': 14.0}])
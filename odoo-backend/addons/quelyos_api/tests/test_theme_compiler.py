@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Tests de la compilation des thèmes tenant (JSON fusionné + CSS)"""
+
+import json
+
+from odoo.tests.common import BaseCase
+from odoo.addons.quelyos_api.lib.theme_compiler import compile_theme, split_asset_name
+
+
+def _theme_data(**config):
+    base = {
+        'colors': {'primary': '#10b981', 'secondary': '#6ee7b7', 'text': '#1e293b'},
+        'typography': {'headings': 'Inter', 'body': 'Inter'},
+        'spacing': {'containerWidth': '1280px'},
+    }
+    base.update(config)
+    return {'success': True, 'theme': {'id': 'default', 'name': 'Défaut', 'config': base}}
+
+
+class TestThemeCompiler(BaseCase):
+
+    def test_overrides_merged_and_css_variables(self):
+        compiled = compile_theme(
+            _theme_data(),
+            json.dumps({'colors': {'primary': '#ff0000'}}),
+            {'colors': {'primaryDark': '#aa0000', 'ring': None}},
+        )
+        document = json.loads(compiled.json)
+        self.assertEqual(document['theme']['config']['colors']['primary'], '#ff0000')
+        self.assertEqual(document['theme']['config']['colors']['secondary'], '#6ee7b7')
+        self.assertEqual(document['theme']['hash'], compiled.hash)
+        self.assertTrue(compiled.css.startswith(':root{--primary-dark:#aa0000;--primary:#ff0000;'))
+        self.assertIn('--foreground:#1e293b', compiled.css)
+        self.assertIn('--container-width:1280px', compiled.css)
+        self.assertIn("--font-sans:'Inter', -apple-system", compiled.css)
+        self.assertNotIn('--ring', compiled.css)
+
+    def test_hash_tracks_content(self):
+        first = compile_theme(_theme_data(), None, None)
+        self.assertEqual(first.hash, compile_theme(_theme_data(), '', {}).hash)
+        self.assertNotEqual(first.hash, compile_theme(_theme_data(), '{"spacing": {"gutter": "2rem"}}').hash)
+        self.assertEqual(split_asset_name(f'{first.hash}.css'), (first.hash, 'css'))
+        self.assertEqual(split_asset_name(f'{first.hash}.js')[1], '')
+
+    def test_unsafe_values_and_custom_css(self):
+        compiled = compile_theme(
+            _theme_data(colors={'primary': 'red;}body{display:none', 'accent': '#123456'},
+                        customCSS='/* promo */\n.banner {\n  color: red;\n}\n'),
+            'not json',
+        )
+        self.assertNotIn('display:none', compiled.css.split('}')[0])
+        self.assertIn('--accent:#123456', compiled.css)
+        self.assertTrue(compiled.css.endswith('.banner{color:red}'))
@@ -26,6 +26,8 @@
         'security/ir.model.access.csv',
         'data/mail_template_cash_alert.xml',
         'data/ir_cron_cash_alerts.xml',
+        'data/ir_cron_budget_consumption.xml',
+        'data/ir_cron_customer_risk_score.xml',
     ],
     'installable': True,
     'application': False,
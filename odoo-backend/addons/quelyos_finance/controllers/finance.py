@@ -5,6 +5,8 @@ from datetime import datetime, date, timedelta
 from odoo import http, SUPERUSER_ID
 from odoo.http import request, Response
 
+from odoo.addons.quelyos_api.lib.stock_valuation import StockValuation, format_report
+
 _logger = logging.getLogger(__name__)
 
 
@@ -276,6 +278,18 @@ class FinanceController(http.Controller):
         except Exception as e:
             return self._error_response(str(e), 500)
 
+    @http.route('/api/ecommerce/finance/budgets/dashboard', type='http', auth='public', cors='*', methods=['GET'], csrf=False)
+    def get_budgets_dashboard(self, **kwargs):
+        """Budgets avec écart au prorata et projection de fin de période, et leurs totaux"""
+        try:
+            env = self._get_env()
+            return self._json_response({
+                'success': True,
+                'data': env['quelyos.budget'].get_dashboard(),
+            })
+        except Exception as e:
+            return self._error_response(str(e), 500)
+
     @http.route('/api/ecommerce/finance/budgets', type='jsonrpc', auth='public', methods=['POST'], csrf=False)
     def create_budget(self, **kwargs):
         """Crée un nouveau budget"""
@@ -942,130 +956,55 @@ class FinanceController(http.Controller):
         """
         Valorisation du stock avec agrégations par entrepôt et catégorie
 
+        Totaux calculés en SQL par le moteur StockValuation (quelyos_api);
+        une date passée est lue dans la photo journalière de valorisation.
+
         Query params:
         - warehouse_id: Filtrer par entrepôt (optionnel)
-        - category_id: Filtrer par catégorie produit (optionnel)
+        - category_id: Filtrer par catégorie produit et sous-catégories (optionnel)
         - date_str: Date de valorisation (défaut: aujourd'hui)
         """
         try:
             env = self._get_env()
-            StockQuant = env['stock.quant']
-            Product = env['product.product']
-
-            # Construire le domaine de recherche
-            domain = [
-                ('quantity', '>', 0),
-                ('location_id.usage', '=', 'internal')
-            ]
-
-            if warehouse_id:
-                try:
-                    warehouse_id = int(warehouse_id)
-                    domain.append(('location_id.warehouse_id', '=', warehouse_id))
-                except (ValueError, TypeError):
-                    return self._error_response('Invalid warehouse_id', 400)
-
-            # Récupérer tous les quants actifs
-            quants = StockQuant.search(domain)
-
-            # Structures pour agréger les données
-            warehouse_valuation = {}
-            category_valuation = {}
-            total_value = 0.0
-            total_qty = 0.0
-            product_ids = set()
-
-            # Calculer la valorisation par quant
-            for quant in quants:
-                product = quant.product_id
-                if not product:
-                    continue
 
-                product_ids.add(product.id)
-                qty = quant.quantity
-                # Utiliser standard_price pour la valorisation
-                unit_price = product.standard_price or 0.0
-                value = qty * unit_price
-
-                total_value += value
-                total_qty += qty
-
-                # Agrégation par entrepôt
-                warehouse = quant.location_id.warehouse_id
-                if warehouse:
-                    wh_id = warehouse.id
-                    if wh_id not in warehouse_valuation:
-                        warehouse_valuation[wh_id] = {
-                            'warehouse_id': wh_id,
-                            'warehouse_name': warehouse.name,
-                            'total_value': 0.0,
-                            'total_qty': 0.0,
-                            'product_count': set()
-                        }
-                    warehouse_valuation[wh_id]['total_value'] += value
-                    warehouse_valuation[wh_id]['total_qty'] += qty
-                    warehouse_valuation[wh_id]['product_count'].add(product.id)
-
-                # Agrégation par catégorie
-                category = product.categ_id
-                if category:
-                    cat_id = category.id
-                    if cat_id not in category_valuation:
-                        category_valuation[cat_id] = {
-                            'category_id': cat_id,
-                            'category_name': category.complete_name or category.name,
-                            'total_value': 0.0,
-                            'total_qty': 0.0,
-                            'product_count': set()
-                        }
-                    category_valuation[cat_id]['total_value'] += value
-                    category_valuation[cat_id]['total_qty'] += qty
-                    category_valuation[cat_id]['product_count'].add(product.id)
-
-            # Convertir les sets en counts et formatter pour JSON
-            by_warehouse = []
-            for wh_data in warehouse_valuation.values():
-                by_warehouse.append({
-                    'warehouse_id': wh_data['warehouse_id'],
-                    'warehouse_name': wh_data['warehouse_name'],
-                    'total_value': round(wh_data['total_value'], 2),
-                    'total_qty': round(wh_data['total_qty'], 2),
-                    'product_count': len(wh_data['product_count'])
-                })
-
-            by_category = []
-            for cat_data in category_valuation.values():
-                by_category.append({
-                    'category_id': cat_data['category_id'],
-                    'category_name': cat_data['category_name'],
-                    'total_value': round(cat_data['total_value'], 2),
-                    'total_qty': round(cat_data['total_qty'], 2),
-                    'product_count': len(cat_data['product_count'])
-                })
+            try:
+                warehouse_id = int(warehouse_id) if warehouse_id else None
+                category_id = int(category_id) if category_id else None
+            except (ValueError, TypeError):
+                return self._error_response('Invalid warehouse_id or category_id', 400)
 
-            # Calculer KPIs globaux
-            product_count = len(product_ids)
-            avg_value_per_product = round(total_value / product_count, 2) if product_count > 0 else 0.0
+            try:
+                valuation_date = date.fromisoformat(date_str) if date_str else date.today()
+            except ValueError:
+                return self._error_response('Invalid date_str', 400)
+
+            Snapshot = env['quelyos.stock.valuation.snapshot']
+            snapshot_date = None
+            if valuation_date < date.today():
+                snapshot_date, totals = Snapshot.get_valuation_at(
+                    valuation_date, warehouse_id=warehouse_id, category_id=category_id,
+                )
+            else:
+                totals = StockValuation(env, warehouse_id=warehouse_id, category_id=category_id).totals()
+            report = format_report(env, totals)
 
-            # Timeline simple (pour MVP, juste la date actuelle)
-            valuation_date = date_str or date.today().strftime('%Y-%m-%d')
-            timeline = [{
-                'date': valuation_date,
-                'total_value': round(total_value, 2)
-            }]
+            # Historique sur 30 jours depuis les photos, point du jour calculé
+            timeline = Snapshot.get_timeline(
+                valuation_date - timedelta(days=30), warehouse_id=warehouse_id, category_id=category_id,
+            )
+            timeline = [point for point in timeline if point['date'] < valuation_date.isoformat()]
+            timeline.append({
+                'date': valuation_date.isoformat(),
+                'total_value': report['kpis']['total_value'],
+                'total_qty': report['kpis']['total_qty'],
+            })
 
             return self._json_response({
                 'success': True,
                 'data': {
-                    'kpis': {
-                        'total_value': round(total_value, 2),
-                        'total_qty': round(total_qty, 2),
-                        'avg_value_per_product': avg_value_per_product,
-                        'valuation_method': 'standard_price',
-                        'product_count': product_count
-                    },
-                    'by_warehouse': sorted(by_warehouse, key=lambda x: x['total_value'], reverse=True),
-                    'by_category': sorted(by_category, key=lambda x: x['total_value'], reverse=True),
+                    'kpis': dict(report['kpis'], snapshot_date=snapshot_date.isoformat() if snapshot_date else None),
+                    'by_warehouse': report['by_warehouse'],
+                    'by_category': report['by_category'],
                     'timeline': timeline
                 }
             })
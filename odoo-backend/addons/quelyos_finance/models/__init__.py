@@ -2,6 +2,7 @@ from . import category
 from . import portfolio
 from . import payment_flow
 from . import budget
+from . import budget_consumption
 from . import cash_alert
 from . import cash_flow_forecast
 from . import customer_risk_score
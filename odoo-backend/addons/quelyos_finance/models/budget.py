@@ -54,6 +54,24 @@ class QuelyosBudget(models.Model):
         ('warning', 'Attention'),
         ('exceeded', 'Dépassé'),
     ], string='Statut', compute='_compute_spending')
+    expected_spending = fields.Monetary(
+        string='Dépenses attendues',
+        compute='_compute_spending',
+        currency_field='currency_id',
+        help='Montant budgété au prorata des jours écoulés de la période'
+    )
+    variance = fields.Monetary(
+        string='Écart',
+        compute='_compute_spending',
+        currency_field='currency_id',
+        help='Dépenses actuelles - dépenses attendues (positif: en avance sur le budget)'
+    )
+    forecast_spending = fields.Monetary(
+        string='Projection fin de période',
+        compute='_compute_spending',
+        currency_field='currency_id',
+        help='Dépenses projetées en fin de période au rythme actuel'
+    )
 
     def _get_period_dates(self):
         """Retourne les dates de début et fin de la période actuelle"""
@@ -84,29 +102,34 @@ class QuelyosBudget(models.Model):
 
         return start, end
 
-    @api.depends('amount', 'category_id', 'period')
+    @api.depends('amount', 'category_id', 'period', 'start_date', 'end_date', 'start_day')
     def _compute_spending(self):
-        for budget in self:
-            start_date, end_date = budget._get_period_dates()
-
-            # Calculer les dépenses depuis account.move.line
-            domain = [
-                ('company_id', '=', budget.company_id.id),
-                ('date', '>=', start_date),
-                ('date', '<=', end_date),
-                ('parent_state', '=', 'posted'),
-            ]
-
-            if budget.category_id:
-                domain.append(('analytic_distribution', 'ilike', str(budget.category_id.id)))
+        """
+        Dépenses de tous les budgets en une requête sur les dépenses
+        journalières (quelyos.budget.consumption), puis écart au prorata de la
+        période écoulée et projection en fin de période au rythme actuel.
+        """
+        today = date.today()
+        periods = {budget: budget._get_period_dates() for budget in self}
+        spending = self.env['quelyos.budget.consumption'].sudo().get_spending([
+            (budget.id, budget.company_id.id, budget.category_id.id, start_date, end_date)
+            for budget, (start_date, end_date) in periods.items()
+        ])
 
-            move_lines = self.env['account.move.line'].search(domain)
-            total_debit = sum(move_lines.mapped('debit'))
+        for budget, (start_date, end_date) in periods.items():
+            total_debit = spending.get(budget.id, 0.0)
 
             budget.current_spending = total_debit
             budget.remaining = budget.amount - total_debit
             budget.percentage_used = (total_debit / budget.amount * 100) if budget.amount else 0
 
+            # Prorata de la période écoulée et projection linéaire
+            total_days = max((end_date - start_date).days + 1, 1)
+            elapsed_days = min(max((today - start_date).days + 1, 0), total_days)
+            budget.expected_spending = budget.amount * elapsed_days / total_days
+            budget.variance = total_debit - budget.expected_spending
+            budget.forecast_spending = total_debit * total_days / elapsed_days if elapsed_days else total_debit
+
             if budget.percentage_used >= 100:
                 budget.status = 'exceeded'
             elif budget.percentage_used >= 80:
@@ -114,6 +137,23 @@ class QuelyosBudget(models.Model):
             else:
                 budget.status = 'on_track'
 
+    @api.model
+    def get_dashboard(self, domain=None):
+        """Totaux budgétés / consommés / projetés et détail des budgets du domaine"""
+        budgets = self.search(domain or [])
+        return {
+            'totals': {
+                'amount': sum(budgets.mapped('amount')),
+                'currentSpending': sum(budgets.mapped('current_spending')),
+                'expectedSpending': sum(budgets.mapped('expected_spending')),
+                'variance': sum(budgets.mapped('variance')),
+                'forecastSpending': sum(budgets.mapped('forecast_spending')),
+                'exceededCount': len(budgets.filtered(lambda b: b.status == 'exceeded')),
+                'forecastExceededCount': len(budgets.filtered(lambda b: b.forecast_spending > b.amount)),
+            },
+            'budgets': [budget._to_dict() for budget in budgets],
+        }
+
     def _to_dict(self):
         """Convertit le record en dictionnaire pour l'API"""
         return {
@@ -131,4 +171,7 @@ class QuelyosBudget(models.Model):
             'remaining': self.remaining,
             'percentageUsed': self.percentage_used,
             'status': self.status,
+            'expectedSpending': self.expected_spending,
+            'variance': self.variance,
+            'forecastSpending': self.forecast_spending,
         }
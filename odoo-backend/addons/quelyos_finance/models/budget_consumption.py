@@ -0,0 +1,277 @@
+import logging
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Clé des jours à recalculer dans cr.precommit.data: {(company_id, date)}
+DIRTY_KEY = 'quelyos.budget.consumption.dirty'
+
+# Champs des lignes lus par _expected_rows_sql
+LINE_FIELDS = {'debit', 'credit', 'balance', 'amount_currency', 'date', 'company_id', 'analytic_distribution', 'move_id'}
+
+
+class QuelyosBudgetConsumption(models.Model):
+    """
+    Dépenses journalières (débit des écritures comptabilisées) par société,
+    et par compte analytique.
+
+    Une ligne sans compte analytique porte le total du jour; une ligne par
+    compte analytique présent dans analytic_distribution porte le débit des
+    écritures qui l'imputent. Les jours touchés par une comptabilisation,
+    une remise en brouillon, une annulation ou la modification d'une ligne
+    comptabilisée sont mis en file (quelyos.budget.consumption.queue, en
+    insertion seule: aucune contention entre transactions de saisie) et
+    recalculés par un cron court: la consommation d'un budget est une somme
+    sur sa période.
+    """
+    _name = 'quelyos.budget.consumption'
+    _description = 'Consommation budgétaire journalière'
+    _order = 'date desc'
+
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade')
+    date = fields.Date(string='Date', required=True)
+    analytic_account_id = fields.Many2one(
+        'account.analytic.account',
+        string='Compte analytique',
+        ondelete='cascade',
+        help='Vide: total du jour, toutes écritures confondues',
+    )
+    debit = fields.Monetary(string='Débit', currency_field='currency_id')
+    currency_id = fields.Many2one('res.currency', related='company_id.currency_id', string='Devise')
+
+    def init(self):
+        # Une ligne par (société, date, compte analytique), total du jour compris
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_budget_consumption_day_uniq
+                ON quelyos_budget_consumption (company_id, date, COALESCE(analytic_account_id, 0))
+        """)
+
+    # -------------------------------------------------------------------------
+    # Synchronisation
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _expected_rows_sql(self, days=None):
+        """Lignes attendues calculées depuis account.move.line (jours donnés ou tous)"""
+        day_filter = SQL('TRUE')
+        if days is not None:
+            company_ids, dates = zip(*days) if days else ((), ())
+            day_filter = SQL(
+                '(aml.company_id, aml.date) IN (SELECT * FROM unnest(%s::int[], %s::date[]))',
+                list(company_ids), list(dates),
+            )
+        return SQL(
+            """
+            WITH lines AS (
+                SELECT aml.company_id, aml.date, aml.debit, aml.analytic_distribution
+                  FROM account_move_line aml
+                 WHERE aml.parent_state = 'posted'
+                   AND aml.debit <> 0
+                   AND %(day_filter)s
+            )
+            SELECT company_id, date, NULL::int AS analytic_account_id, SUM(debit) AS debit
+              FROM lines
+             GROUP BY company_id, date
+             UNION ALL
+            SELECT l.company_id, l.date, aa.id, SUM(l.debit)
+              FROM lines l
+             CROSS JOIN LATERAL (
+                    SELECT DISTINCT unnest(string_to_array(k, ','))::int AS analytic_account_id
+                      FROM jsonb_object_keys(l.analytic_distribution) k
+             ) a
+              JOIN account_analytic_account aa ON aa.id = a.analytic_account_id
+             WHERE jsonb_typeof(l.analytic_distribution) = 'object'
+             GROUP BY l.company_id, l.date, aa.id
+            """,
+            day_filter=day_filter,
+        )
+
+    @api.model
+    def refresh_days(self, days):
+        """Recalcule les lignes des (société, date) donnés (suppression + insertion)"""
+        days = sorted(set(days))
+        if not days:
+            return
+        self.env['account.move.line'].flush_model()
+        company_ids, dates = zip(*days)
+        self.env.cr.execute(SQL(
+            """
+            DELETE FROM quelyos_budget_consumption
+             WHERE (company_id, date) IN (SELECT * FROM unnest(%s::int[], %s::date[]))
+            """,
+            list(company_ids), list(dates),
+        ))
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO quelyos_budget_consumption
+                   (company_id, date, analytic_account_id, debit,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT e.*, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM (%(expected)s) e
+            """,
+            expected=self._expected_rows_sql(days),
+            uid=self.env.uid,
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _mark_dirty(self, records):
+        """
+        Jours des pièces ou lignes donnés, mis en file une seule fois juste
+        avant le commit.
+        """
+        days = {(record.company_id.id, record.date) for record in records if record.date and record.company_id}
+        if not days:
+            return
+        dirty = self.env.cr.precommit.data.setdefault(DIRTY_KEY, set())
+        if not dirty:
+            self.env.cr.precommit.add(self.sudo()._flush_dirty)
+        dirty.update(days)
+
+    @api.model
+    def _flush_dirty(self):
+        """Insère les jours en file (sans clé unique: pas d'attente entre transactions)"""
+        dirty = self.env.cr.precommit.data.pop(DIRTY_KEY, set())
+        if not dirty:
+            return
+        company_ids, dates = zip(*dirty)
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO quelyos_budget_consumption_queue (company_id, date)
+            SELECT * FROM unnest(%s::int[], %s::date[])
+            """,
+            list(company_ids), list(dates),
+        ))
+        self.env.ref('quelyos_finance.ir_cron_budget_consumption_queue')._trigger()
+
+    @api.model
+    def _cron_process_queue(self):
+        """Recalcule les jours en file (seul écrivain de la table de consommation)"""
+        self.env.cr.execute("DELETE FROM quelyos_budget_consumption_queue RETURNING company_id, date")
+        days = set(self.env.cr.fetchall())
+        if days:
+            self.refresh_days(days)
+        return len(days)
+
+    @api.model
+    def _cron_reconcile(self):
+        """
+        Compare la table aux écritures (différence symétrique) et recalcule
+        les jours divergents.
+        """
+        self.env['account.move.line'].flush_model()
+        columns = SQL('company_id, date, analytic_account_id, ROUND(debit::numeric, 2)')
+        self.env.cr.execute(SQL(
+            """
+            WITH expected AS (%(expected)s),
+            diff AS (
+                (SELECT %(columns)s FROM expected
+                 EXCEPT
+                 SELECT %(columns)s FROM quelyos_budget_consumption)
+                UNION ALL
+                (SELECT %(columns)s FROM quelyos_budget_consumption
+                 EXCEPT
+                 SELECT %(columns)s FROM expected)
+            )
+            SELECT DISTINCT company_id, date FROM diff
+            """,
+            expected=self._expected_rows_sql(),
+            columns=columns,
+        ))
+        days = self.env.cr.fetchall()
+        if days:
+            _logger.warning(f"Budget consumption: {len(days)} day(s) out of sync, refreshing")
+            self.refresh_days(days)
+        else:
+            _logger.info("Budget consumption: in sync with posted move lines")
+        return len(days)
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def get_spending(self, periods):
+        """
+        Dépenses de plusieurs périodes en une requête.
+
+        Args:
+            periods: [(clé, company_id, analytic_account_id ou None, date_from, date_to)]
+
+        Returns:
+            {clé: montant}
+        """
+        if not periods:
+            return {}
+        keys = {str(index): period[0] for index, period in enumerate(periods)}
+        values = SQL(', ').join(
+            SQL('(%s, %s, %s::int, %s::date, %s::date)', str(index), company_id, analytic_id or None, date_from, date_to)
+            for index, (_key, company_id, analytic_id, date_from, date_to) in enumerate(periods)
+        )
+        self.env.cr.execute(SQL(
+            """
+            WITH periods(period_key, company_id, analytic_account_id, date_from, date_to) AS (VALUES %(values)s)
+            SELECT p.period_key, COALESCE(SUM(c.debit), 0)
+              FROM periods p
+              LEFT JOIN quelyos_budget_consumption c
+                ON c.company_id = p.company_id
+               AND COALESCE(c.analytic_account_id, 0) = COALESCE(p.analytic_account_id, 0)
+               AND c.date BETWEEN p.date_from AND p.date_to
+             GROUP BY p.period_key
+            """,
+            values=values,
+        ))
+        return {keys[period_key]: amount for period_key, amount in self.env.cr.fetchall()}
+
+
+class QuelyosBudgetConsumptionQueue(models.Model):
+    """Jours à recalculer (insertion seule depuis les transactions de saisie)"""
+    _name = 'quelyos.budget.consumption.queue'
+    _description = 'File de recalcul de la consommation budgétaire'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade')
+    date = fields.Date(string='Date', required=True)
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def write(self, vals):
+        # Comptabilisation, remise en brouillon, annulation ou changement de date
+        tracked = {'state', 'date'} & set(vals)
+        if tracked:
+            self.env['quelyos.budget.consumption']._mark_dirty(self)
+        result = super().write(vals)
+        if tracked:
+            self.env['quelyos.budget.consumption']._mark_dirty(self)
+        return result
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    def _posted(self):
+        return self.filtered(lambda line: line.parent_state == 'posted')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env['quelyos.budget.consumption']._mark_dirty(lines._posted())
+        return lines
+
+    def write(self, vals):
+        # Montants, date, société ou répartition analytique d'une ligne comptabilisée
+        tracked = bool(LINE_FIELDS & set(vals))
+        if tracked:
+            self.env['quelyos.budget.consumption']._mark_dirty(self._posted())
+        result = super().write(vals)
+        if tracked:
+            self.env['quelyos.budget.consumption']._mark_dirty(self._posted())
+        return result
+
+    def unlink(self):
+        self.env['quelyos.budget.consumption']._mark_dirty(self._posted())
+        return super().unlink()
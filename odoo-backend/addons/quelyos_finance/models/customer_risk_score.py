@@ -16,18 +16,55 @@ Algorithme : XGBoost (classification binaire)
 Précision cible : 80%+ (F1-score)
 
 Workflow :
-1. Calcul scoring automatique nightly (cron)
-2. Mise à jour temps réel après paiement/relance
-3. Alerte CFO si score client >90 avec facture impayée >30j
+1. Extraction des features de tous les clients en une requête SQL groupée
+2. Scoring vectorisé (numpy) et écriture en masse (INSERT ... ON CONFLICT)
+3. Recalcul incrémental (cron) des seuls clients dont factures ou paiements
+   ont changé depuis leur dernier score
+4. Alerte CFO si score client >90 avec facture impayée >30j
 """
 
+import json
 import logging
-from datetime import datetime, timedelta
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import SQL
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    _logger.warning("numpy not installed - customer risk scoring falls back to Python")
+
+MODEL_VERSION = '1.1.0'
+
+# Clients scorés par requête d'extraction / d'écriture
+SCORING_BATCH_SIZE = 2000
+
+# Pondération : (feature, valeur à saturation, points max)
+SCORE_WEIGHTS = (
+    ('avg_payment_delay', 30, 25),        # 0j = 0 pts, 30j+ = 25 pts
+    ('late_payment_rate', 50, 20),        # 0% = 0 pts, 50%+ = 20 pts
+    ('total_overdue', 50000, 20),         # aucune = 0 pts, 50k€+ = 20 pts
+    ('payment_delay_stddev', 15, 15),     # 0j = 0 pts, 15j+ = 15 pts
+    ('reminder_count', 10, 10),           # 0 = 0 pts, 10+ = 10 pts
+    ('dispute_count', 3, 5),              # 0 = 0 pts, 3+ = 5 pts
+    ('largest_invoice_ratio', 0.5, 5),    # 0% = 0 pts, 50%+ = 5 pts
+)
+
+# Confiance selon CA total : (seuil, confiance)
+CONFIDENCE_LEVELS = ((100000, 90.0), (50000, 75.0), (10000, 60.0))
+DEFAULT_CONFIDENCE = 40.0
+
+# Score d'un client sans historique de paiement (risque moyen)
+DEFAULT_SCORE = 50
+
+DISPUTE_PATTERN = 'litige|contestation|réclamation'
+REMINDER_PATTERN = '%relance%'
+
 
 class CustomerRiskScore(models.Model):
     """Scoring risque impayé par client"""
@@ -75,6 +112,16 @@ class CustomerRiskScore(models.Model):
     relationship_months = fields.Integer(string='Ancienneté relation (mois)')
     reminder_count = fields.Integer(string='Nombre relances historiques')
     dispute_count = fields.Integer(string='Nombre litiges')
+    invoice_count = fields.Integer(string='Nombre factures')
+    dso = fields.Float(
+        string='DSO (jours)',
+        help='Encours client / CA des 365 derniers jours × 365',
+        digits=(8, 1)
+    )
+    score_drivers = fields.Json(
+        string='Facteurs du score',
+        help='Points apportés par chaque feature au score'
+    )
 
     # Métadonnées scoring
     last_computed = fields.Datetime(string='Dernière mise à jour', default=fields.Datetime.now, index=True)
@@ -95,18 +142,28 @@ class CustomerRiskScore(models.Model):
         )
     ]
 
+    def init(self):
+        # Cible de l'écriture en masse (INSERT ... ON CONFLICT)
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS quelyos_customer_risk_score_tenant_partner_uniq
+                ON quelyos_customer_risk_score (tenant_id, partner_id)
+        """)
+
+    @staticmethod
+    def _score_to_category(score):
+        if score <= 30:
+            return 'low'
+        elif score <= 60:
+            return 'medium'
+        elif score <= 80:
+            return 'high'
+        return 'critical'
+
     @api.depends('score')
     def _compute_score_category(self):
         """Calcul catégorie selon score"""
         for record in self:
-            if record.score <= 30:
-                record.score_category = 'low'
-            elif record.score <= 60:
-                record.score_category = 'medium'
-            elif record.score <= 80:
-                record.score_category = 'high'
-            else:
-                record.score_category = 'critical'
+            record.score_category = self._score_to_category(record.score)
 
     @api.model
     def compute_customer_score(self, tenant_id, partner_id):
@@ -123,191 +180,287 @@ class CustomerRiskScore(models.Model):
                 'category': str,
                 'features': dict,
                 'confidence': float,
+                'drivers': dict,
             }
         """
         try:
-            # 1. Récupérer données historiques client
-            features = self._extract_customer_features(tenant_id, partner_id)
-
-            if not features['has_payment_history']:
-                _logger.info(f"Pas d'historique paiement pour client {partner_id}, score par défaut")
-                return self._default_score(tenant_id, partner_id)
-
-            # 2. Calcul score via features (version simple : weighted sum)
-            # TODO: Remplacer par vrai modèle XGBoost quand dataset suffisant
-            score = self._calculate_weighted_score(features)
-
-            # 3. Clamp score 0-100
-            score = max(0, min(100, score))
-
-            # 4. Calculer catégorie
-            if score <= 30:
-                category = 'low'
-            elif score <= 60:
-                category = 'medium'
-            elif score <= 80:
-                category = 'high'
-            else:
-                category = 'critical'
-
-            # 5. Confiance (basée sur quantité données)
-            confidence = self._calculate_confidence(features)
-
-            # 6. Enregistrer ou mettre à jour
-            existing = self.search([
-                ('tenant_id', '=', tenant_id),
-                ('partner_id', '=', partner_id),
-            ], limit=1)
-
-            values = {
-                'tenant_id': tenant_id,
-                'partner_id': partner_id,
-                'score': int(score),
-                'avg_payment_delay': features['avg_payment_delay'],
-                'payment_delay_stddev': features['payment_delay_stddev'],
-                'late_payment_rate': features['late_payment_rate'],
-                'total_invoiced': features['total_invoiced'],
-                'total_overdue': features['total_overdue'],
-                'largest_invoice_ratio': features['largest_invoice_ratio'],
-                'relationship_months': features['relationship_months'],
-                'reminder_count': features['reminder_count'],
-                'dispute_count': features['dispute_count'],
-                'last_computed': fields.Datetime.now(),
-                'confidence': confidence,
-            }
-
-            if existing:
-                existing.write(values)
-            else:
-                self.create(values)
-
+            result = self._score_partners(tenant_id, [partner_id])[partner_id]
             _logger.info(
                 f"Score risque calculé pour client {partner_id} (tenant {tenant_id}): "
-                f"{score} ({category}), confiance {confidence:.1f}%"
+                f"{result['score']} ({result['category']}), confiance {result['confidence']:.1f}%"
             )
-
-            return {
-                'score': int(score),
-                'category': category,
-                'features': features,
-                'confidence': confidence,
-            }
+            return result
 
         except Exception as e:
             _logger.error(f"Erreur calcul score client {partner_id}: {e}", exc_info=True)
             raise UserError(f"Erreur calcul score risque: {str(e)}")
 
+    # -------------------------------------------------------------------------
+    # Pipeline : extraction SQL -> scoring vectorisé -> écriture en masse
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _score_partners(self, tenant_id, partner_ids):
+        """
+        Score un lot de clients : features en une requête groupée par lot,
+        scoring vectorisé, upsert en une requête par lot.
+
+        Returns:
+            dict: {partner_id: {'score', 'category', 'features', 'confidence', 'drivers'}}
+        """
+        partner_ids = sorted(set(partner_ids))
+        results = {}
+        for offset in range(0, len(partner_ids), SCORING_BATCH_SIZE):
+            batch = partner_ids[offset:offset + SCORING_BATCH_SIZE]
+            features = self._extract_features_batch(tenant_id, batch)
+            scores = self._score_features(list(features.values()))
+            for partner_id, feature, scored in zip(features, features.values(), scores):
+                results[partner_id] = dict(scored, features=feature)
+            self._write_scores(tenant_id, results, batch)
+        self.invalidate_model()
+        return results
+
     def _extract_customer_features(self, tenant_id, partner_id):
         """Extraire features ML depuis historique client"""
-        AccountMove = self.env['account.move'].sudo()
+        return self._extract_features_batch(tenant_id, [partner_id])[partner_id]
 
-        # Factures payées (pour historique paiements)
-        paid_invoices = AccountMove.search([
-            ('tenant_id', '=', tenant_id),
-            ('partner_id', '=', partner_id),
-            ('move_type', '=', 'out_invoice'),
-            ('payment_state', '=', 'paid'),
-            ('state', '=', 'posted'),
-        ])
+    @api.model
+    def _extract_features_batch(self, tenant_id, partner_ids):
+        """
+        Features de tous les clients donnés en une requête : factures
+        (volumes, encours, retards, litiges), délais de paiement (date du
+        dernier lettrage - échéance, par facture payée), relances.
 
-        # Factures en retard (impayées après échéance)
+        Returns:
+            dict: {partner_id: features} dans l'ordre des partner_ids
+        """
         today = fields.Date.today()
-        overdue_invoices = AccountMove.search([
-            ('tenant_id', '=', tenant_id),
-            ('partner_id', '=', partner_id),
-            ('move_type', '=', 'out_invoice'),
-            ('payment_state', 'in', ['not_paid', 'partial']),
-            ('state', '=', 'posted'),
-            ('invoice_date_due', '<', today),
-        ])
-
-        # Toutes factures (pour CA)
-        all_invoices = AccountMove.search([
-            ('tenant_id', '=', tenant_id),
-            ('partner_id', '=', partner_id),
-            ('move_type', '=', 'out_invoice'),
-            ('state', '=', 'posted'),
-        ])
-
-        if not paid_invoices:
-            return {
-                'has_payment_history': False,
-                'avg_payment_delay': 0.0,
-                'payment_delay_stddev': 0.0,
-                'late_payment_rate': 0.0,
-                'total_invoiced': sum(inv.amount_total for inv in all_invoices),
-                'total_overdue': sum(inv.amount_residual for inv in overdue_invoices),
-                'largest_invoice_ratio': 0.0,
-                'relationship_months': 0,
-                'reminder_count': 0,
-                'dispute_count': 0,
+        self.env.cr.execute(SQL(
+            """
+            WITH partners AS (
+                SELECT unnest(%(partner_ids)s::int[]) AS id
+            ),
+            inv AS (
+                SELECT m.id, m.partner_id, m.amount_total, m.amount_residual, m.payment_state,
+                       m.invoice_date, m.invoice_date_due, m.narration
+                  FROM account_move m
+                  JOIN partners p ON p.id = m.partner_id
+                 WHERE m.tenant_id = %(tenant_id)s
+                   AND m.move_type = 'out_invoice'
+                   AND m.state = 'posted'
+            ),
+            invoices AS (
+                SELECT partner_id,
+                       COUNT(*) AS invoice_count,
+                       COUNT(*) FILTER (WHERE payment_state = 'paid') AS paid_count,
+                       SUM(amount_total) AS total_invoiced,
+                       MAX(amount_total) AS largest_invoice,
+                       MIN(invoice_date) AS first_invoice_date,
+                       SUM(amount_residual) FILTER (
+                           WHERE payment_state IN ('not_paid', 'partial') AND invoice_date_due < %(today)s
+                       ) AS total_overdue,
+                       SUM(amount_residual) FILTER (WHERE payment_state IN ('not_paid', 'partial')) AS open_amount,
+                       SUM(amount_total) FILTER (WHERE invoice_date > %(today)s::date - 365) AS invoiced_365,
+                       COUNT(*) FILTER (WHERE narration ~* %(dispute_pattern)s) AS dispute_count
+                  FROM inv
+                 GROUP BY partner_id
+            ),
+            delays AS (
+                SELECT inv.partner_id, MAX(apr.max_date) - inv.invoice_date_due AS delay
+                  FROM inv
+                  JOIN account_move_line aml ON aml.move_id = inv.id AND aml.display_type = 'payment_term'
+                  JOIN account_partial_reconcile apr ON apr.debit_move_id = aml.id
+                 WHERE inv.payment_state = 'paid'
+                   AND inv.invoice_date_due IS NOT NULL
+                 GROUP BY inv.id, inv.partner_id, inv.invoice_date_due
+            ),
+            payments AS (
+                SELECT partner_id,
+                       AVG(delay) AS avg_payment_delay,
+                       CASE WHEN COUNT(*) > 1 THEN STDDEV_POP(delay) ELSE 0 END AS payment_delay_stddev,
+                       COUNT(*) FILTER (WHERE delay > 0) * 100.0 / COUNT(*) AS late_payment_rate
+                  FROM delays
+                 GROUP BY partner_id
+            ),
+            reminders AS (
+                SELECT inv.partner_id, COUNT(*) AS reminder_count
+                  FROM mail_activity a
+                  JOIN mail_activity_type t ON t.id = a.activity_type_id
+                  JOIN inv ON inv.id = a.res_id
+                 WHERE a.res_model = 'account.move'
+                   AND t.name::text ILIKE %(reminder_pattern)s
+                 GROUP BY inv.partner_id
+            )
+            SELECT p.id AS partner_id,
+                   COALESCE(i.invoice_count, 0) AS invoice_count,
+                   COALESCE(i.paid_count, 0) AS paid_count,
+                   COALESCE(i.total_invoiced, 0) AS total_invoiced,
+                   COALESCE(i.largest_invoice, 0) AS largest_invoice,
+                   i.first_invoice_date,
+                   COALESCE(i.total_overdue, 0) AS total_overdue,
+                   COALESCE(i.open_amount, 0) AS open_amount,
+                   COALESCE(i.invoiced_365, 0) AS invoiced_365,
+                   COALESCE(i.dispute_count, 0) AS dispute_count,
+                   COALESCE(pay.avg_payment_delay, 0) AS avg_payment_delay,
+                   COALESCE(pay.payment_delay_stddev, 0) AS payment_delay_stddev,
+                   COALESCE(pay.late_payment_rate, 0) AS late_payment_rate,
+                   COALESCE(r.reminder_count, 0) AS reminder_count
+              FROM partners p
+              LEFT JOIN invoices i ON i.partner_id = p.id
+              LEFT JOIN payments pay ON pay.partner_id = p.id
+              LEFT JOIN reminders r ON r.partner_id = p.id
+             ORDER BY p.id
+            """,
+            partner_ids=list(partner_ids),
+            tenant_id=tenant_id,
+            today=today,
+            dispute_pattern=DISPUTE_PATTERN,
+            reminder_pattern=REMINDER_PATTERN,
+        ))
+
+        features = {}
+        for row in self.env.cr.dictfetchall():
+            total_invoiced = float(row['total_invoiced'])
+            has_history = row['paid_count'] > 0
+            features[row['partner_id']] = {
+                'has_payment_history': has_history,
+                'avg_payment_delay': float(row['avg_payment_delay']),
+                'payment_delay_stddev': float(row['payment_delay_stddev']),
+                'late_payment_rate': float(row['late_payment_rate']),
+                'total_invoiced': total_invoiced,
+                'total_overdue': float(row['total_overdue']),
+                'largest_invoice_ratio': (
+                    float(row['largest_invoice']) / total_invoiced if has_history and total_invoiced > 0 else 0.0
+                ),
+                'relationship_months': (
+                    (today - row['first_invoice_date']).days // 30
+                    if has_history and row['first_invoice_date'] else 0
+                ),
+                'reminder_count': row['reminder_count'] if has_history else 0,
+                'dispute_count': row['dispute_count'] if has_history else 0,
+                'invoice_count': row['invoice_count'],
+                'dso': (
+                    float(row['open_amount']) / float(row['invoiced_365']) * 365
+                    if row['invoiced_365'] else 0.0
+                ),
             }
+        return features
 
-        # Feature 1: Délai paiement moyen
-        payment_delays = []
-        for inv in paid_invoices:
-            if inv.invoice_date_due and inv.invoice_payment_date:
-                delay = (inv.invoice_payment_date - inv.invoice_date_due).days
-                payment_delays.append(delay)
-
-        avg_delay = sum(payment_delays) / len(payment_delays) if payment_delays else 0.0
-        stddev_delay = self._calculate_stddev(payment_delays) if len(payment_delays) > 1 else 0.0
-
-        # Feature 2: Taux retard (paiements après échéance)
-        late_payments = [d for d in payment_delays if d > 0]
-        late_rate = (len(late_payments) / len(payment_delays) * 100) if payment_delays else 0.0
-
-        # Feature 3: CA total
-        total_invoiced = sum(inv.amount_total for inv in all_invoices)
-
-        # Feature 4: Créances en retard
-        total_overdue = sum(inv.amount_residual for inv in overdue_invoices)
-
-        # Feature 5: Ratio plus grosse facture
-        if all_invoices and total_invoiced > 0:
-            largest_invoice = max(inv.amount_total for inv in all_invoices)
-            largest_ratio = (largest_invoice / total_invoiced) if total_invoiced else 0
-        else:
-            largest_ratio = 0.0
-
-        # Feature 6: Ancienneté relation (première facture)
-        if all_invoices:
-            first_invoice_date = min(inv.invoice_date for inv in all_invoices if inv.invoice_date)
-            relationship_months = (today - first_invoice_date).days // 30
-        else:
-            relationship_months = 0
-
-        # Feature 7: Relances (approx via mail.activity)
-        reminder_count = self.env['mail.activity'].search_count([
-            ('res_model', '=', 'account.move'),
-            ('res_id', 'in', all_invoices.ids),
-            ('activity_type_id.name', 'ilike', 'relance'),
-        ])
-
-        # Feature 8: Litiges (approx via claim/dispute dans notes)
-        dispute_count = 0
-        for inv in all_invoices:
-            if inv.narration and any(keyword in inv.narration.lower() for keyword in ['litige', 'contestation', 'réclamation']):
-                dispute_count += 1
+    @api.model
+    def _score_features(self, features_list):
+        """
+        Score, catégorie, confiance et points par feature d'une liste de
+        features (calcul matriciel numpy, boucle Python sans numpy).
 
+        Un client sans historique de paiement reçoit le score par défaut
+        (50) avec une confiance nulle.
+        """
+        if not features_list:
+            return []
+        if not NUMPY_AVAILABLE:
+            return [self._score_features_python(features) for features in features_list]
+
+        names = [name for name, _saturation, _points in SCORE_WEIGHTS]
+        matrix = np.array([[features[name] for name in names] for features in features_list], dtype=np.float64)
+        saturation = np.array([value for _name, value, _points in SCORE_WEIGHTS], dtype=np.float64)
+        max_points = np.array([points for _name, _value, points in SCORE_WEIGHTS], dtype=np.float64)
+
+        points = np.minimum(matrix / saturation * max_points, max_points)
+        has_history = np.array([features['has_payment_history'] for features in features_list])
+        scores = np.where(has_history, np.clip(points.sum(axis=1), 0, 100).astype(int), DEFAULT_SCORE)
+
+        total_invoiced = np.array([features['total_invoiced'] for features in features_list], dtype=np.float64)
+        confidence = np.select(
+            [total_invoiced >= threshold for threshold, _level in CONFIDENCE_LEVELS],
+            [level for _threshold, level in CONFIDENCE_LEVELS],
+            default=DEFAULT_CONFIDENCE,
+        )
+        confidence = np.where(has_history, confidence, 0.0)
+
+        return [{
+            'score': int(score),
+            'category': self._score_to_category(int(score)),
+            'confidence': float(level),
+            'drivers': dict(zip(names, np.round(row_points, 2).tolist())) if history else {},
+        } for score, level, row_points, history in zip(scores, confidence, points, has_history)]
+
+    def _score_features_python(self, features):
+        """Score d'un client sans numpy (même pondération que _score_features)"""
+        if not features['has_payment_history']:
+            return {'score': DEFAULT_SCORE, 'category': self._score_to_category(DEFAULT_SCORE),
+                    'confidence': 0.0, 'drivers': {}}
+        drivers = {
+            name: round(min(features[name] / saturation * points, points), 2)
+            for name, saturation, points in SCORE_WEIGHTS
+        }
+        score = int(max(0, min(100, self._calculate_weighted_score(features))))
         return {
-            'has_payment_history': True,
-            'avg_payment_delay': avg_delay,
-            'payment_delay_stddev': stddev_delay,
-            'late_payment_rate': late_rate,
-            'total_invoiced': total_invoiced,
-            'total_overdue': total_overdue,
-            'largest_invoice_ratio': largest_ratio,
-            'relationship_months': relationship_months,
-            'reminder_count': reminder_count,
-            'dispute_count': dispute_count,
+            'score': score,
+            'category': self._score_to_category(score),
+            'confidence': self._calculate_confidence(features),
+            'drivers': drivers,
         }
 
+    @api.model
+    def _write_scores(self, tenant_id, results, partner_ids):
+        """Upsert des scores, features, facteurs et horodatage en une requête par lot"""
+        if not partner_ids:
+            return
+        now = fields.Datetime.now()
+        rows = SQL(', ').join(
+            SQL(
+                '(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s)',
+                tenant_id, partner_id, results[partner_id]['score'], results[partner_id]['category'],
+                features['avg_payment_delay'], features['payment_delay_stddev'], features['late_payment_rate'],
+                features['total_invoiced'], features['total_overdue'], features['largest_invoice_ratio'],
+                features['relationship_months'], features['reminder_count'], features['dispute_count'],
+                features['invoice_count'], features['dso'], json.dumps(results[partner_id]['drivers']),
+                results[partner_id]['confidence'], now, MODEL_VERSION,
+            )
+            for partner_id in partner_ids
+            for features in (results[partner_id]['features'],)
+        )
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO quelyos_customer_risk_score AS s
+                   (tenant_id, partner_id, score, score_category,
+                    avg_payment_delay, payment_delay_stddev, late_payment_rate,
+                    total_invoiced, total_overdue, largest_invoice_ratio,
+                    relationship_months, reminder_count, dispute_count,
+                    invoice_count, dso, score_drivers, confidence, last_computed, model_version,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT v.*, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM (VALUES %(rows)s) v
+            ON CONFLICT (tenant_id, partner_id) DO UPDATE SET
+                   score = EXCLUDED.score,
+                   score_category = EXCLUDED.score_category,
+                   avg_payment_delay = EXCLUDED.avg_payment_delay,
+                   payment_delay_stddev = EXCLUDED.payment_delay_stddev,
+                   late_payment_rate = EXCLUDED.late_payment_rate,
+                   total_invoiced = EXCLUDED.total_invoiced,
+                   total_overdue = EXCLUDED.total_overdue,
+                   largest_invoice_ratio = EXCLUDED.largest_invoice_ratio,
+                   relationship_months = EXCLUDED.relationship_months,
+                   reminder_count = EXCLUDED.reminder_count,
+                   dispute_count = EXCLUDED.dispute_count,
+                   invoice_count = EXCLUDED.invoice_count,
+                   dso = EXCLUDED.dso,
+                   score_drivers = EXCLUDED.score_drivers,
+                   confidence = EXCLUDED.confidence,
+                   last_computed = EXCLUDED.last_computed,
+                   model_version = EXCLUDED.model_version,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            """,
+            rows=rows,
+            uid=self.env.uid,
+        ))
+
     def _calculate_weighted_score(self, features):
         """
         Calcul score via weighted sum (version simple)
 
-        Poids basés sur impact business :
+        Poids basés sur impact business (SCORE_WEIGHTS) :
         - Délai paiement moyen : 25%
         - Taux retard : 20%
         - Créances en retard : 20%
@@ -316,121 +469,100 @@ class CustomerRiskScore(models.Model):
         - Litiges : 5%
         - Ratio concentration : 5%
         """
-        score = 0.0
-
-        # Délai moyen (0j = 0 pts, 30j+ = 25 pts)
-        delay_score = min(features['avg_payment_delay'] / 30 * 25, 25)
-        score += delay_score
-
-        # Taux retard (0% = 0 pts, 50%+ = 20 pts)
-        late_rate_score = min(features['late_payment_rate'] / 50 * 20, 20)
-        score += late_rate_score
-
-        # Créances en retard (aucune = 0 pts, 50k€+ = 20 pts)
-        overdue_score = min(features['total_overdue'] / 50000 * 20, 20)
-        score += overdue_score
-
-        # Écart-type délais (0j = 0 pts, 15j+ = 15 pts)
-        stddev_score = min(features['payment_delay_stddev'] / 15 * 15, 15)
-        score += stddev_score
-
-        # Relances (0 = 0 pts, 10+ = 10 pts)
-        reminder_score = min(features['reminder_count'] / 10 * 10, 10)
-        score += reminder_score
-
-        # Litiges (0 = 0 pts, 3+ = 5 pts)
-        dispute_score = min(features['dispute_count'] / 3 * 5, 5)
-        score += dispute_score
-
-        # Concentration (0% = 0 pts, 50%+ = 5 pts)
-        concentration_score = min(features['largest_invoice_ratio'] * 100 / 50 * 5, 5)
-        score += concentration_score
-
-        return score
+        return sum(
+            min(features[name] / saturation * points, points)
+            for name, saturation, points in SCORE_WEIGHTS
+        )
 
-    def _calculate_stddev(self, values):
-        """Calcul écart-type"""
-        if not values or len(values) < 2:
-            return 0.0
+    def _calculate_confidence(self, features):
+        """Calcul confiance prédiction selon quantité données (CA total)"""
+        for threshold, level in CONFIDENCE_LEVELS:
+            if features['total_invoiced'] >= threshold:
+                return level
+        return DEFAULT_CONFIDENCE
 
-        mean = sum(values) / len(values)
-        variance = sum((x - mean) ** 2 for x in values) / len(values)
-        return variance ** 0.5
+    # -------------------------------------------------------------------------
+    # Recalcul
+    # -------------------------------------------------------------------------
 
-    def _calculate_confidence(self, features):
-        """Calcul confiance prédiction selon quantité données"""
-        # Confiance basée sur nombre factures payées
-        total_invoiced = features['total_invoiced']
-
-        if total_invoiced >= 100000:  # 100K€+ CA
-            return 90.0
-        elif total_invoiced >= 50000:  # 50K€+
-            return 75.0
-        elif total_invoiced >= 10000:  # 10K€+
-            return 60.0
-        else:
-            return 40.0
-
-    def _default_score(self, tenant_id, partner_id):
-        """Score par défaut si pas d'historique"""
-        # Nouveau client = risque moyen (score 50)
-        existing = self.search([
+    @api.model
+    def _customer_ids(self, tenant_id):
+        return self.env['res.partner'].sudo().search([
             ('tenant_id', '=', tenant_id),
-            ('partner_id', '=', partner_id),
-        ], limit=1)
-
-        values = {
-            'tenant_id': tenant_id,
-            'partner_id': partner_id,
-            'score': 50,
-            'last_computed': fields.Datetime.now(),
-            'confidence': 0.0,
-        }
-
-        if existing:
-            existing.write(values)
-        else:
-            self.create(values)
+            ('customer_rank', '>', 0),
+        ]).ids
 
-        return {
-            'score': 50,
-            'category': 'medium',
-            'features': {},
-            'confidence': 0.0,
-        }
+    @api.model
+    def _changed_customer_ids(self, tenant_id):
+        """
+        Clients à rescorer : sans score, ou dont une facture ou un paiement a
+        changé depuis leur dernier score, ou dont une facture est passée en
+        retard depuis.
+        """
+        customer_ids = self._customer_ids(tenant_id)
+        if not customer_ids:
+            return []
+        self.env.cr.execute(SQL(
+            """
+            SELECT p.id
+              FROM unnest(%(partner_ids)s::int[]) AS p(id)
+              LEFT JOIN quelyos_customer_risk_score s
+                ON s.partner_id = p.id AND s.tenant_id = %(tenant_id)s
+             WHERE s.id IS NULL
+                OR s.last_computed IS NULL
+                OR EXISTS (
+                    SELECT 1
+                      FROM account_move m
+                     WHERE m.partner_id = p.id
+                       AND m.tenant_id = %(tenant_id)s
+                       AND m.move_type = 'out_invoice'
+                       AND (m.write_date > s.last_computed
+                            OR (m.payment_state IN ('not_paid', 'partial')
+                                AND m.invoice_date_due >= s.last_computed::date
+                                AND m.invoice_date_due < %(today)s))
+                )
+                OR EXISTS (
+                    SELECT 1
+                      FROM account_payment pay
+                     WHERE pay.partner_id = p.id
+                       AND pay.write_date > s.last_computed
+                )
+            """,
+            partner_ids=customer_ids,
+            tenant_id=tenant_id,
+            today=fields.Date.today(),
+        ))
+        return [row[0] for row in self.env.cr.fetchall()]
 
     @api.model
-    def recompute_all_scores(self, tenant_id):
+    def recompute_all_scores(self, tenant_id, only_changed=False):
         """
-        Recalculer tous les scores clients (cron nightly)
+        Recalculer les scores clients par lots
 
         Args:
             tenant_id (int): ID tenant
+            only_changed (bool): Seulement les clients modifiés depuis leur dernier score
 
         Returns:
             dict: Stats recalcul
         """
-        Partner = self.env['res.partner'].sudo()
-
-        # Récupérer tous clients avec factures
-        customers = Partner.search([
-            ('tenant_id', '=', tenant_id),
-            ('customer_rank', '>', 0),
-        ])
+        partner_ids = self._changed_customer_ids(tenant_id) if only_changed else self._customer_ids(tenant_id)
 
         stats = {
-            'total': len(customers),
+            'total': len(partner_ids),
             'computed': 0,
             'errors': 0,
         }
 
-        for partner in customers:
+        for offset in range(0, len(partner_ids), SCORING_BATCH_SIZE):
+            batch = partner_ids[offset:offset + SCORING_BATCH_SIZE]
             try:
-                self.compute_customer_score(tenant_id, partner.id)
-                stats['computed'] += 1
+                with self.env.cr.savepoint():
+                    self._score_partners(tenant_id, batch)
+                stats['computed'] += len(batch)
             except Exception as e:
-                _logger.error(f"Erreur calcul score client {partner.id}: {e}")
-                stats['errors'] += 1
+                _logger.error(f"Erreur calcul scores ({len(batch)} clients): {e}", exc_info=True)
+                stats['errors'] += len(batch)
 
         _logger.info(
             f"Recalcul scores terminé pour tenant {tenant_id}: "
@@ -438,3 +570,9 @@ class CustomerRiskScore(models.Model):
         )
 
         return stats
+
+    @api.model
+    def _cron_recompute_changed(self):
+        """Cron : rescoring incrémental de chaque tenant"""
+        for tenant in self.env['quelyos.tenant'].sudo().search([]):
+            self.recompute_all_scores(tenant.id, only_changed=True)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Quelyos Finance Tests Suite
+"""
+
+from . import test_budget_consumption
+from . import test_customer_risk_score
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Tests de la consommation budgétaire journalière (file de recalcul et réconciliation)"""
+
+from odoo import Command
+from odoo.tests import tagged
+from odoo.tools import SQL
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBudgetConsumption(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Consumption = cls.env['quelyos.budget.consumption']
+        plan = cls.env['account.analytic.plan'].create({'name': 'BC Plan'})
+        cls.project_a, cls.project_b = cls.env['account.analytic.account'].create([
+            {'name': 'BC Project A', 'plan_id': plan.id},
+            {'name': 'BC Project B', 'plan_id': plan.id},
+        ])
+
+    def _entry(self, amount, date='2026-03-10', analytic=None):
+        return self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': date,
+            'journal_id': self.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({
+                    'account_id': self.company_data['default_account_expense'].id,
+                    'debit': amount,
+                    'analytic_distribution': {str(analytic.id): 100} if analytic else False,
+                }),
+                Command.create({
+                    'account_id': self.company_data['default_account_revenue'].id,
+                    'credit': amount,
+                }),
+            ],
+        })
+
+    def _sync(self):
+        """Commit simulé (file alimentée) puis passage du cron"""
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+        self.Consumption._cron_process_queue()
+
+    def _rows(self, query):
+        self.env.cr.execute(query)
+        return sorted(
+            (str(date), analytic_id or 0, round(float(debit), 2))
+            for date, analytic_id, debit in self.env.cr.fetchall()
+        )
+
+    def _stored(self):
+        return self._rows(SQL(
+            "SELECT date, analytic_account_id, debit FROM quelyos_budget_consumption WHERE company_id = %s",
+            self.env.company.id,
+        ))
+
+    def assertInSync(self):
+        self.env.flush_all()
+        expected = self._rows(SQL(
+            "SELECT date, analytic_account_id, debit FROM (%s) e WHERE company_id = %s",
+            self.Consumption._expected_rows_sql(), self.env.company.id,
+        ))
+        self.assertEqual(self._stored(), expected)
+
+    def test_post_redate_and_cancel(self):
+        move = self._entry(100.0, analytic=self.project_a)
+        move.action_post()
+        self._sync()
+        self.assertInSync()
+        self.assertEqual(self._stored(), [('2026-03-10', 0, 100.0), ('2026-03-10', self.project_a.id, 100.0)])
+
+        move.button_draft()
+        move.date = '2026-03-12'
+        move.action_post()
+        self._sync()
+        self.assertInSync()
+        self.assertEqual({row[0] for row in self._stored()}, {'2026-03-12'})
+
+        move.button_draft()
+        move.button_cancel()
+        self._sync()
+        self.assertInSync()
+        self.assertEqual(self._stored(), [])
+
+    def test_posted_line_edits_refresh_day(self):
+        move = self._entry(80.0, analytic=self.project_a)
+        move.action_post()
+        self._sync()
+
+        expense_line = move.line_ids.filtered('debit')
+        expense_line.analytic_distribution = {str(self.project_b.id): 100}
+        self._sync()
+        self.assertInSync()
+        self.assertEqual(self._stored(), [('2026-03-10', 0, 80.0), ('2026-03-10', self.project_b.id, 80.0)])
+
+    def test_queue_only_written_by_posting_transactions(self):
+        """La saisie n'écrit que dans la file; la table de consommation attend le cron"""
+        self._entry(50.0).action_post()
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+        self.assertEqual(self._stored(), [])
+        self.env.cr.execute(
+            "SELECT count(*) FROM quelyos_budget_consumption_queue WHERE company_id = %s", (self.env.company.id,)
+        )
+        self.assertGreater(self.env.cr.fetchone()[0], 0)
+
+        self.Consumption._cron_process_queue()
+        self.assertInSync()
+
+    def test_reconcile_repairs_drift(self):
+        self._entry(100.0, analytic=self.project_a).action_post()
+        self._entry(40.0, date='2026-03-11').action_post()
+        self._sync()
+
+        self.env.cr.execute(SQL(
+            "UPDATE quelyos_budget_consumption SET debit = 1 WHERE company_id = %s AND date = '2026-03-10'",
+            self.env.company.id,
+        ))
+        self.env.cr.execute(SQL(
+            "DELETE FROM quelyos_budget_consumption WHERE company_id = %s AND date = '2026-03-11'",
+            self.env.company.id,
+        ))
+        self.Consumption.invalidate_model()
+
+        self.assertGreaterEqual(self.Consumption._cron_reconcile(), 2)
+        self.assertInSync()
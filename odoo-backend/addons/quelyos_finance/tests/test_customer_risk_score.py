@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Tests du scoring risque client (vectorisé / Python, recalcul incrémental)"""
+
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
+
+from odoo import Command, fields
+from odoo.tests import tagged
+from odoo.tools import SQL
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.addons.quelyos_finance.models import customer_risk_score
+from odoo.addons.quelyos_finance.models.customer_risk_score import DEFAULT_SCORE, NUMPY_AVAILABLE
+
+
+@tagged('post_install', '-at_install')
+class TestCustomerRiskScore(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Score = cls.env['quelyos.customer_risk_score']
+        cls.tenant = cls.env['quelyos.tenant'].create({
+            'name': 'Risk Score Tenant', 'code': 'RISK_SCORE', 'domain': 'risk-score.test',
+        })
+        cls.late_payer, cls.good_payer, cls.untouched = cls.env['res.partner'].create([
+            {'name': name, 'tenant_id': cls.tenant.id, 'customer_rank': 1}
+            for name in ('Risk Late Payer', 'Risk Good Payer', 'Risk Untouched')
+        ])
+
+    def _invoice(self, partner, amount, days_ago, due_in=0):
+        today = fields.Date.today()
+        invoice = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': partner.id,
+            'tenant_id': self.tenant.id,
+            'invoice_date': today - timedelta(days=days_ago),
+            'invoice_line_ids': [Command.create({
+                'name': 'Risk Score Line', 'quantity': 1, 'price_unit': amount, 'tax_ids': False,
+            })],
+        })
+        invoice.action_post()
+        self.env.cr.execute(SQL(
+            "UPDATE account_move SET invoice_date_due = %s WHERE id = %s",
+            today - timedelta(days=days_ago) + timedelta(days=due_in), invoice.id,
+        ))
+        invoice.invalidate_recordset(['invoice_date_due'])
+        return invoice
+
+    def _pay(self, invoice, days_ago=0):
+        self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoice.ids,
+        ).create({'payment_date': fields.Date.today() - timedelta(days=days_ago)})._create_payments()
+
+    def _backdate(self, days):
+        """Factures, paiements et scores existants vus comme plus anciens"""
+        self.env.flush_all()
+        partner_ids = (self.late_payer | self.good_payer | self.untouched).ids
+        self.env.cr.execute(SQL(
+            "UPDATE account_move SET write_date = write_date - %s * interval '1 day' WHERE partner_id = ANY(%s)",
+            days + 1, partner_ids,
+        ))
+        self.env.cr.execute(SQL(
+            "UPDATE account_payment SET write_date = write_date - %s * interval '1 day' WHERE partner_id = ANY(%s)",
+            days + 1, partner_ids,
+        ))
+        self.env.cr.execute(SQL(
+            "UPDATE quelyos_customer_risk_score SET last_computed = last_computed - %s * interval '1 day'"
+            " WHERE tenant_id = %s",
+            days, self.tenant.id,
+        ))
+        self.env.invalidate_all()
+
+    @skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_and_python_scores_match(self):
+        base = {
+            'has_payment_history': True, 'avg_payment_delay': 0.0, 'payment_delay_stddev': 0.0,
+            'late_payment_rate': 0.0, 'total_invoiced': 0.0, 'total_overdue': 0.0,
+            'largest_invoice_ratio': 0.0, 'reminder_count': 0, 'dispute_count': 0,
+        }
+        features_list = [
+            dict(base, total_invoiced=5000.0),
+            dict(base, avg_payment_delay=12.5, late_payment_rate=33.3, total_invoiced=20000.0,
+                 total_overdue=7000.0, payment_delay_stddev=4.2, reminder_count=2, largest_invoice_ratio=0.2),
+            dict(base, avg_payment_delay=90.0, late_payment_rate=100.0, total_invoiced=150000.0,
+                 total_overdue=80000.0, payment_delay_stddev=40.0, reminder_count=12, dispute_count=5,
+                 largest_invoice_ratio=0.9),
+            dict(base, avg_payment_delay=15.0, total_invoiced=50000.0, total_overdue=25000.0),
+            dict(base, has_payment_history=False, total_invoiced=60000.0, total_overdue=60000.0),
+        ]
+
+        vectorized = self.Score._score_features(features_list)
+        with patch.object(customer_risk_score, 'NUMPY_AVAILABLE', False):
+            python = self.Score._score_features(features_list)
+
+        self.assertEqual(len(vectorized), len(features_list))
+        for numpy_result, python_result in zip(vectorized, python):
+            self.assertEqual(
+                (numpy_result['score'], numpy_result['category'], numpy_result['confidence']),
+                (python_result['score'], python_result['category'], python_result['confidence']),
+            )
+        self.assertEqual(
+            {result['category'] for result in vectorized}, {'low', 'medium', 'critical'},
+        )
+
+    def test_no_paid_invoice_gets_default_score(self):
+        self._invoice(self.late_payer, 30000.0, days_ago=40, due_in=10)
+
+        result = self.Score.compute_customer_score(self.tenant.id, self.late_payer.id)
+        self.assertEqual((result['score'], result['confidence'], result['drivers']), (DEFAULT_SCORE, 0.0, {}))
+        self.assertEqual(result['features']['total_overdue'], 30000.0)
+
+        score = self.Score.search([('tenant_id', '=', self.tenant.id), ('partner_id', '=', self.late_payer.id)])
+        self.assertEqual((score.score, score.confidence), (DEFAULT_SCORE, 0.0))
+
+    def test_only_changed_rescoring(self):
+        for partner in (self.late_payer, self.good_payer, self.untouched):
+            self._pay(self._invoice(partner, 1000.0, days_ago=60, due_in=30), days_ago=30)
+        # Échue hier: en retard depuis le dernier score
+        self._invoice(self.late_payer, 2000.0, days_ago=31, due_in=30)
+        to_pay = self._invoice(self.good_payer, 500.0, days_ago=5, due_in=30)
+        self._invoice(self.untouched, 800.0, days_ago=5, due_in=30)
+
+        self.assertEqual(self.Score.recompute_all_scores(self.tenant.id, only_changed=True)['total'], 3)
+        self._backdate(2)
+        self.assertEqual(self.Score._changed_customer_ids(self.tenant.id), [self.late_payer.id])
+
+        self._pay(to_pay)
+        self.env.flush_all()
+        self.assertEqual(
+            sorted(self.Score._changed_customer_ids(self.tenant.id)),
+            sorted((self.late_payer | self.good_payer).ids),
+        )
+
+        untouched_before = self.Score.search([('partner_id', '=', self.untouched.id)]).last_computed
+        stats = self.Score.recompute_all_scores(self.tenant.id, only_changed=True)
+        self.assertEqual((stats['total'], stats['computed']), (2, 2))
+        self.assertEqual(self.Score.search([('partner_id', '=', self.untouched.id)]).last_computed, untouched_before)
+        self.assertEqual(self.Score._changed_customer_ids(self.tenant.id), [])
@@ -8,8 +8,16 @@ Définit un scénario marketing automatisé avec :
 - Activités : séquence d'actions automatiques
 """
 
+import logging
+import time
+
 from odoo import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
+# Budget temps d'un run cron (le reste est traité au run suivant)
+SCHEDULER_TIME_BUDGET = 15 * 60
+
 
 class MarketingAutomation(models.Model):
     _name = 'quelyos.marketing.automation'
@@ -160,23 +168,53 @@ class MarketingAutomation(models.Model):
 
     def cron_process_workflows(self):
         """
-        Cron quotidien : traite tous les workflows actifs.
-        
-        Exécute les activités en attente pour tous participants.
+        Cron : traite les participants dont l'activité est due.
+
+        Le coût dépend du travail dû, pas du nombre total de participants:
+        les lots sont réclamés via l'index d'échéance (FOR UPDATE SKIP LOCKED),
+        exécutés par activité puis commités. Plusieurs crons appelant cette
+        méthode travaillent en parallèle sur des lots disjoints.
         """
-        active_workflows = self.search([('active', '=', True)])
-        for workflow in active_workflows:
-            workflow.process_activities()
+        self._run_scheduler()
         return True
 
+    @api.model
+    def _run_scheduler(self, automation_ids=None, time_budget=SCHEDULER_TIME_BUDGET, commit=True):
+        """
+        Boucle de traitement par lots.
+
+        Args:
+            automation_ids (list): Restreindre à certains workflows
+            time_budget (int): Durée max en secondes
+            commit (bool): Commit après chaque lot (libère les verrous)
+
+        Returns:
+            dict: Statistiques du run
+        """
+        Participant = self.env['quelyos.marketing.automation.participant'].sudo()
+        started = time.monotonic()
+        last_id, batches, executed = 0, 0, 0
+
+        while time.monotonic() - started < time_budget:
+            batch = Participant._claim_due_participants(after_id=last_id, automation_ids=automation_ids)
+            if not batch:
+                break
+            last_id = max(batch.ids)
+            executed += batch._process_due_batch()
+            batches += 1
+            if commit:
+                self.env.cr.commit()
+
+        stats = {
+            'batches': batches,
+            'executed': executed,
+            'duration': round(time.monotonic() - started, 2),
+        }
+        _logger.info(f"Marketing automation scheduler: {stats}")
+        return stats
+
     def process_activities(self):
         """Traite toutes les activités en attente pour ce workflow."""
         self.ensure_one()
-        
-        # Récupérer participants actifs
-        participants = self.participant_ids.filtered(lambda p: p.state == 'running')
-        
-        for participant in participants:
-            participant.process_next_activity()
-        
+        self._run_scheduler(automation_ids=self.ids, commit=False)
         return True
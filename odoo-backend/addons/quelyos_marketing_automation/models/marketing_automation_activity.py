@@ -10,6 +10,8 @@ Une activité = une action dans le workflow :
 - Modifier score lead
 """
 
+import json
+
 from odoo import models, fields
 
 
@@ -113,6 +115,102 @@ class MarketingAutomationActivity(models.Model):
         
         return True
 
+    # ═══════════════════════════════════════════════════════════════════
+    # EXÉCUTION PAR LOTS (scheduler)
+    # ═══════════════════════════════════════════════════════════════════
+
+    def _filter_condition_batch(self, participants):
+        """Applique condition_domain en une seule recherche pour tout le lot"""
+        if not self.condition_domain or self.condition_domain == '[]':
+            return participants
+        domain = json.loads(self.condition_domain)
+        domain.append(('id', 'in', participants.partner_id.ids))
+        allowed = set(self.env['res.partner'].search(domain).ids)
+        return participants.filtered(lambda p: p.partner_id.id in allowed)
+
+    def execute_batch(self, participants):
+        """
+        Exécute l'activité pour un lot de participants (opérations groupées).
+
+        Args:
+            participants (quelyos.marketing.automation.participant)
+
+        Returns:
+            quelyos.marketing.automation.participant: Participants exécutés
+            (les autres restent sur l'activité, comme execute() retournant False)
+        """
+        self.ensure_one()
+        participants = self._filter_condition_batch(participants)
+        if not participants:
+            return participants
+
+        if self.activity_type == 'email':
+            return self._execute_email_batch(participants)
+        elif self.activity_type in ('add_list', 'remove_list'):
+            return self._execute_list_batch(participants)
+        elif self.activity_type == 'set_tag':
+            participants._message_log_batch({p.id: "Tag ajouté (placeholder)" for p in participants})
+            return participants
+        elif self.activity_type == 'update_field':
+            return participants
+
+        # wait: l'attente est portée par next_activity_date
+        return participants
+
+    def _execute_email_batch(self, participants):
+        """Un seul appel send_mail_batch (mis en file mail.mail) pour le lot"""
+        if not self.email_template_id:
+            return participants.browse()
+
+        self.email_template_id.send_mail_batch(
+            participants.partner_id.ids,
+            force_send=False,
+            raise_exception=False,
+        )
+        body = f"Email envoyé : {self.email_template_id.name}"
+        participants._message_log_batch({p.id: body for p in participants})
+        return participants
+
+    def _execute_list_batch(self, participants):
+        """Ajout/retrait liste: une recherche + écritures/créations groupées"""
+        if not self.mailing_list_id:
+            return participants.browse()
+
+        MailingContact = self.env['mailing.contact']
+        list_id = self.mailing_list_id.id
+        emails = {p.partner_id.email for p in participants if p.partner_id.email}
+        contacts = MailingContact.search([('email', 'in', list(emails))])
+
+        if self.activity_type == 'remove_list':
+            in_list = contacts.filtered(lambda c: list_id in c.list_ids.ids)
+            if in_list:
+                in_list.write({'list_ids': [(3, list_id)]})
+            removed = set(in_list.mapped('email'))
+            done = participants.filtered(lambda p: p.partner_id.email in removed)
+            done._message_log_batch({p.id: f"Retiré de liste : {self.mailing_list_id.name}" for p in done})
+            return participants
+
+        to_link = contacts.filtered(lambda c: list_id not in c.list_ids.ids)
+        if to_link:
+            to_link.write({'list_ids': [(4, list_id)]})
+
+        known = set(contacts.mapped('email'))
+        vals_list, seen = [], set()
+        for participant in participants:
+            email = participant.partner_id.email
+            if email and email not in known and email not in seen:
+                seen.add(email)
+                vals_list.append({
+                    'name': participant.partner_id.name,
+                    'email': email,
+                    'list_ids': [(4, list_id)],
+                })
+        if vals_list:
+            MailingContact.create(vals_list)
+
+        participants._message_log_batch({p.id: f"Ajouté à liste : {self.mailing_list_id.name}" for p in participants})
+        return participants
+
     def _execute_email(self, participant):
         """Envoie email via template."""
         if not self.email_template_id:
@@ -8,9 +8,14 @@ Représente un contact dans un workflow :
 - Historique activités exécutées
 """
 
-from odoo import models, fields, api
+from collections import defaultdict
 from datetime import timedelta
 
+from odoo import models, fields, api
+
+# Taille des lots réclamés par un worker du scheduler
+CLAIM_BATCH_SIZE = 1000
+
 
 class MarketingAutomationParticipant(models.Model):
     _name = 'quelyos.marketing.automation.participant'
@@ -50,7 +55,7 @@ class MarketingAutomationParticipant(models.Model):
     
     next_activity_date = fields.Datetime(
         string='Date Prochaine Activité',
-        help='Date exécution prochaine activité'
+        help='Date exécution prochaine activité (échéance indexée du scheduler)'
     )
     
     # Statistiques
@@ -72,6 +77,14 @@ class MarketingAutomationParticipant(models.Model):
         help='Pourcentage avancement workflow'
     )
 
+    def init(self):
+        """Index partiel des échéances: le scheduler ne lit que les participants dus"""
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS quelyos_ma_participant_due_idx
+            ON quelyos_marketing_automation_participant (next_activity_date, id)
+            WHERE state = 'running'
+        """)
+
     @api.depends('automation_id.activity_ids')
     def _compute_activities_total(self):
         """Calcule nombre total activités workflow."""
@@ -152,6 +165,110 @@ class MarketingAutomationParticipant(models.Model):
         
         return executed
 
+    # ═══════════════════════════════════════════════════════════════════
+    # SCHEDULER PAR LOTS
+    # ═══════════════════════════════════════════════════════════════════
+
+    @api.model
+    def _claim_due_participants(self, after_id=0, limit=CLAIM_BATCH_SIZE, automation_ids=None):
+        """
+        Réclame un lot de participants dus (FOR UPDATE SKIP LOCKED).
+
+        Plusieurs workers peuvent appeler cette méthode en parallèle: chacun
+        obtient des lignes disjointes, verrouillées jusqu'au commit du lot.
+
+        Args:
+            after_id (int): Curseur id (exclut les lignes déjà vues dans ce run)
+            limit (int): Taille du lot
+            automation_ids (list): Restreindre à certains workflows
+
+        Returns:
+            quelyos.marketing.automation.participant: Participants verrouillés
+        """
+        self.flush_model(['state', 'next_activity_date', 'automation_id'])
+        query = """
+            SELECT p.id
+              FROM quelyos_marketing_automation_participant p
+              JOIN quelyos_marketing_automation a ON a.id = p.automation_id
+             WHERE p.state = 'running'
+               AND a.active
+               AND (p.next_activity_date IS NULL OR p.next_activity_date <= %s)
+               AND p.id > %s
+        """
+        params = [fields.Datetime.now(), after_id]
+        if automation_ids:
+            query += " AND p.automation_id = ANY(%s)"
+            params.append(list(automation_ids))
+        query += " ORDER BY p.id LIMIT %s FOR UPDATE OF p SKIP LOCKED"
+        params.append(limit)
+
+        self.env.cr.execute(query, params)
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _process_due_batch(self):
+        """
+        Exécute l'activité courante d'un lot de participants.
+
+        Les participants sont groupés par activité: chaque activité est
+        exécutée une fois pour tout le groupe (envoi email, ajout liste...),
+        puis les participants avancent par écritures groupées.
+
+        Returns:
+            int: Nombre d'activités exécutées
+        """
+        now = fields.Datetime.now()
+
+        finished = self.filtered(lambda p: not p.current_activity_id)
+        if finished:
+            finished.write({'state': 'completed'})
+
+        # Séquence ordonnée des activités par workflow (calculée une fois)
+        next_by_activity = {}
+        for automation in self.automation_id:
+            activities = automation.activity_ids.sorted('sequence')
+            for current, following in zip(activities, list(activities[1:]) + [None]):
+                next_by_activity[current.id] = following
+
+        by_activity = defaultdict(lambda: self.browse())
+        for participant in self - finished:
+            by_activity[participant.current_activity_id] |= participant
+
+        executed_count = 0
+        # Avancement groupé: (activité suivante, activités faites) -> participants
+        advance = defaultdict(lambda: self.browse())
+        for activity, participants in by_activity.items():
+            executed = activity.execute_batch(participants)
+            executed_count += len(executed)
+            following = next_by_activity.get(activity.id)
+            for participant in executed:
+                advance[(following, participant.activities_done + 1)] |= participant
+
+        completed = self.browse()
+        for (following, done), participants in advance.items():
+            if following:
+                delay = (
+                    timedelta(days=following.wait_days, hours=following.wait_hours)
+                    if following.activity_type == 'wait' else timedelta()
+                )
+                participants.write({
+                    'activities_done': done,
+                    'current_activity_id': following.id,
+                    'next_activity_date': now + delay,
+                })
+            else:
+                participants.write({
+                    'activities_done': done,
+                    'state': 'completed',
+                    'current_activity_id': False,
+                    'next_activity_date': False,
+                })
+                completed |= participants
+
+        if completed:
+            completed._message_log_batch({p.id: "Workflow terminé" for p in completed})
+
+        return executed_count
+
     def action_cancel(self):
         """Annule participation au workflow."""
         self.write({'state': 'cancelled'})
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Bibliothèques utilitaires SMS (sans dépendance Odoo):
+- sms_dispatcher: Envoi concurrent avec token bucket par compte provider
+"""
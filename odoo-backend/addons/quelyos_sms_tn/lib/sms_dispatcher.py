@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur d'envoi SMS concurrent (sans dépendance Odoo)
+
+- Pool de threads borné + session HTTP à connexions persistantes
+- Token bucket par compte provider (partagé entre crons d'un même worker)
+- Regroupement des destinataires d'un même texte en appels batch
+  (l'API Tunisie SMS accepte une liste 'recipients')
+
+Usage:
+    dispatcher = SMSDispatcher(endpoint, api_key, sender='Quelyos',
+                               rate=20, concurrency=4, batch_size=100)
+    with dispatcher:
+        results = dispatcher.dispatch([OutgoingSMS(id=1, mobile='+216...', message='...')])
+    results[1]  # {'success': True, 'response': {...}}
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 20          # SMS par seconde et par compte provider
+DEFAULT_CONCURRENCY = 4    # Appels HTTP simultanés
+DEFAULT_BATCH_SIZE = 100   # Destinataires par appel batch
+REQUEST_TIMEOUT = 30
+
+
+@dataclass
+class OutgoingSMS:
+    """SMS à envoyer (id = quelyos.sms.log)"""
+    id: int
+    mobile: str
+    message: str
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe.
+
+    rate jetons par seconde, capacité = rafale maximale (1 seconde par défaut).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Bloque jusqu'à disposer de `tokens` jetons.
+
+        Au-delà de la capacité, les jetons sont pris par tranches de la
+        capacité: un lot plus grand que la rafale attend le temps nécessaire
+        au lieu de dépasser le débit.
+        """
+        remaining = float(tokens)
+        while remaining > 0:
+            chunk = min(remaining, self.capacity)
+            self._take(chunk)
+            remaining -= chunk
+
+    def _take(self, tokens):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(account_key, rate):
+    """Token bucket partagé d'un compte provider (recréé si le débit change)"""
+    with _buckets_lock:
+        bucket = _buckets.get(account_key)
+        if bucket is None or bucket.rate != float(rate):
+            bucket = _buckets[account_key] = TokenBucket(rate)
+        return bucket
+
+
+def clean_mobile(mobile):
+    return (mobile or '').replace(' ', '').replace('-', '')
+
+
+class SMSDispatcher:
+    """Envoi concurrent et limité en débit vers un compte Tunisie SMS"""
+
+    def __init__(self, endpoint, api_key, sender='Quelyos', rate=DEFAULT_RATE,
+                 concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+                 timeout=REQUEST_TIMEOUT):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.sender = sender or 'Quelyos'
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        account_key = hashlib.sha1(f"{endpoint}|{api_key}".encode()).hexdigest()
+        self.bucket = get_bucket(account_key, max(1, rate))
+        self._session = None
+        self._executor = None
+
+    def __enter__(self):
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        })
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix='sms-dispatch'
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        self._session.close()
+        self._executor = self._session = None
+
+    def _batches(self, messages):
+        """Regroupe par texte identique, puis découpe en lots de batch_size"""
+        by_text = defaultdict(list)
+        for sms in messages:
+            by_text[sms.message].append(sms)
+        for text, group in by_text.items():
+            for i in range(0, len(group), self.batch_size):
+                yield text, group[i:i + self.batch_size]
+
+    def _send_batch(self, text, group):
+        """Un appel API pour plusieurs destinataires du même texte"""
+        self.bucket.acquire(len(group))
+        payload = {
+            'api_key': self.api_key,
+            'sender': self.sender,
+            'recipients': [clean_mobile(sms.mobile) for sms in group],
+            'message': text,
+        }
+        try:
+            response = self._session.post(self.endpoint, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _logger.error('SMS batch API call error: %s', str(e))
+            return {sms.id: {'success': False, 'error': f'Connection error: {str(e)}'} for sms in group}
+
+        if not isinstance(data, dict):
+            # Réponse inattendue: lot en échec (statut de livraison inconnu)
+            _logger.error('SMS batch API unexpected response: %r', data)
+            return {sms.id: {'success': False, 'error': f'Unexpected response: {data!r}'[:200]} for sms in group}
+
+        if data.get('status') == 'success' or data.get('success'):
+            result = {'success': True, 'response': data}
+        else:
+            result = {'success': False, 'error': data.get('message', 'Unknown error'), 'response': data}
+        return {sms.id: result for sms in group}
+
+    def dispatch(self, messages):
+        """
+        Envoie les SMS en parallèle.
+
+        Returns:
+            dict {sms_id: {'success': bool, 'error': str, 'response': dict}}
+        """
+        futures = [
+            self._executor.submit(self._send_batch, text, group)
+            for text, group in self._batches(messages)
+        ]
+        results = {}
+        for future in as_completed(futures):
+            results.update(future.result())
+        return results
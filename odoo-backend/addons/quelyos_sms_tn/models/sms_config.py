@@ -38,6 +38,25 @@ class SMSConfig(models.Model):
         help='Activer/désactiver l\'envoi de SMS'
     )
 
+    # Dispatch (file d'attente)
+    rate_limit = fields.Integer(
+        string='Débit max (SMS/s)',
+        default=20,
+        help='Nombre maximum de SMS par seconde autorisés par le compte provider'
+    )
+
+    concurrency = fields.Integer(
+        string='Envois simultanés',
+        default=4,
+        help='Nombre d\'appels API en parallèle lors du traitement de la file'
+    )
+
+    batch_size = fields.Integer(
+        string='Destinataires par appel',
+        default=100,
+        help='Nombre de destinataires regroupés dans un appel API batch (même message)'
+    )
+
     # Module activation flags
     store_enabled = fields.Boolean(string='Store activé', default=True)
     finance_enabled = fields.Boolean(string='Finance activé', default=False)
@@ -88,6 +107,13 @@ class SMSConfig(models.Model):
             if record.sender_name and len(record.sender_name) > 11:
                 raise ValidationError(_('Le nom de l\'expéditeur ne peut pas dépasser 11 caractères.'))
 
+    @api.constrains('rate_limit', 'concurrency', 'batch_size')
+    def _check_dispatch_settings(self):
+        """Validate dispatch settings"""
+        for record in self:
+            if min(record.rate_limit, record.concurrency, record.batch_size) < 1:
+                raise ValidationError(_('Le débit, les envois simultanés et la taille des lots doivent être positifs.'))
+
     @api.constrains('api_key')
     def _check_api_key(self):
         """Validate API key format"""
@@ -116,6 +116,14 @@ class SMSLog(models.Model):
         compute='_compute_can_retry'
     )
 
+    def init(self):
+        """Partial index for the dispatch queue (pending SMS only)"""
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS quelyos_sms_log_pending_idx
+            ON quelyos_sms_log (id)
+            WHERE status = 'pending'
+        """)
+
     @api.depends('message')
     def _compute_message_length(self):
         """Compute message length"""
@@ -3,11 +3,21 @@ import requests
 import json
 import logging
 import time
-from odoo import models, api, _
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from ..lib.sms_dispatcher import OutgoingSMS, SMSDispatcher
+
 _logger = logging.getLogger(__name__)
 
+# File d'attente : SMS réclamés par lot et budget temps d'un run cron (< intervalle 5 min)
+QUEUE_CLAIM_SIZE = 2000
+QUEUE_TIME_BUDGET = 240
+# Comptes provider (sociétés) servis en parallèle
+MAX_PARALLEL_ACCOUNTS = 4
+
 
 class SMSProviderTunisie(models.AbstractModel):
     _name = 'quelyos.sms.provider.tunisie'
@@ -267,70 +277,185 @@ class SMSProviderTunisie(models.AbstractModel):
             _logger.exception('Failed to send fallback email: %s', str(e))
 
     @api.model
-    def process_pending_sms_queue(self):
+    def process_pending_sms_queue(self, claim_size=QUEUE_CLAIM_SIZE, time_budget=QUEUE_TIME_BUDGET):
         """
         Cron job: Process pending SMS in queue
         Called every 5 minutes
+
+        Pending SMS are claimed by batches (FOR UPDATE SKIP LOCKED), grouped
+        by company config and sent concurrently (bounded pool, token bucket
+        per provider account, batch API calls). Log statuses are updated in
+        bulk, with one commit per claimed batch.
         """
         _logger.info('Processing pending SMS queue...')
+        started = time.monotonic()
+        cutoff_date = fields.Datetime.now() - timedelta(hours=24)
+        totals = {'sent': 0, 'retry': 0, 'failed': 0}
+        last_id = 0
+
+        while time.monotonic() - started < time_budget:
+            rows = self._claim_pending_sms(cutoff_date, last_id, claim_size)
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            for key, count in self._dispatch_claimed_sms(rows).items():
+                totals[key] += count
+            self.env.cr.commit()
+
+        _logger.info('SMS queue processing complete in %.1fs: %s', time.monotonic() - started, totals)
+        return True
 
-        # Find pending SMS (not older than 24h)
-        from datetime import datetime, timedelta
-        cutoff_date = datetime.now() - timedelta(hours=24)
-
-        pending_sms = self.env['quelyos.sms.log'].search([
-            ('status', '=', 'pending'),
-            ('create_date', '>=', cutoff_date)
-        ], order='create_date', limit=100)
-
-        _logger.info('Found %d pending SMS', len(pending_sms))
-
-        for sms in pending_sms:
-            try:
-                # Get config for SMS company
-                config = self.env['quelyos.sms.config'].sudo().search([
-                    ('company_id', '=', sms.company_id.id)
-                ], limit=1)
-
-                if not config or not config.is_active:
-                    sms.write({
-                        'status': 'failed',
-                        'error_message': 'SMS désactivé'
-                    })
-                    continue
-
-                # Try to send
-                result = self._call_tunisie_sms_api(
-                    config=config,
-                    mobile=sms.mobile,
-                    message=sms.message
-                )
+    @api.model
+    def _claim_pending_sms(self, cutoff_date, after_id, limit):
+        """
+        Claim a batch of pending SMS (rows locked until commit)
 
-                if result.get('success'):
-                    sms.write({
-                        'status': 'sent',
-                        'sent_date': fields.Datetime.now(),
-                        'provider_response': json.dumps(result),
-                        'cost': self._calculate_sms_cost(sms.mobile, sms.message),
-                    })
-                else:
-                    sms.write({
-                        'retry_count': sms.retry_count + 1
-                    })
-
-                    if sms.retry_count >= sms.max_retries:
-                        sms.write({
-                            'status': 'failed',
-                            'error_message': result.get('error', 'Max retries reached'),
-                        })
+        :return: list of (id, company_id, mobile, message)
+        """
+        self.env['quelyos.sms.log'].flush_model(['status', 'company_id', 'mobile', 'message'])
+        self.env.cr.execute("""
+            SELECT id, company_id, mobile, message
+              FROM quelyos_sms_log
+             WHERE status = 'pending'
+               AND create_date >= %s
+               AND id > %s
+             ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (cutoff_date, after_id, limit))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _dispatch_claimed_sms(self, rows):
+        """
+        Send claimed SMS grouped by company config
+
+        :param rows: list of (id, company_id, mobile, message)
+        :return: dict of counters (sent, retry, failed)
+        """
+        by_company = {}
+        for sms_id, company_id, mobile, message in rows:
+            by_company.setdefault(company_id, []).append(OutgoingSMS(sms_id, mobile, message))
+
+        configs = {}
+        for config in self.env['quelyos.sms.config'].sudo().search(
+            [('company_id', 'in', list(by_company))], order='id'
+        ):
+            configs.setdefault(config.company_id.id, config)
+
+        disabled_ids = []
+        jobs = []
+        for company_id, messages in by_company.items():
+            config = configs.get(company_id)
+            if not config or not config.is_active:
+                disabled_ids.extend(sms.id for sms in messages)
+            else:
+                # Plain values: the worker threads must not touch the ORM
+                settings = {
+                    name: config[name]
+                    for name in ('endpoint', 'api_key', 'sender_name', 'rate_limit', 'concurrency', 'batch_size')
+                }
+                jobs.append((settings, messages))
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_ACCOUNTS) as executor:
+            for batch_results in executor.map(lambda job: self._dispatch_account(*job), jobs):
+                results.update(batch_results)
+
+        messages_by_id = {sms.id: sms for messages in by_company.values() for sms in messages}
+        sent = {sms_id: res for sms_id, res in results.items() if res.get('success')}
+        errors = {
+            sms_id: res.get('error', 'Max retries reached')
+            for sms_id, res in results.items() if not res.get('success')
+        }
+        self._bulk_mark_sent(sent, messages_by_id)
+        failed_count = self._bulk_mark_error(errors)
+        self._bulk_mark_disabled(disabled_ids)
+
+        return {
+            'sent': len(sent),
+            'retry': len(errors) - failed_count,
+            'failed': failed_count + len(disabled_ids),
+        }
 
-                # Commit after each SMS to avoid losing work
-                self.env.cr.commit()
+    @api.model
+    def _dispatch_account(self, config, messages):
+        """
+        Send the SMS of one provider account (runs in a worker thread)
 
-            except Exception as e:
-                _logger.exception('Error processing SMS %d: %s', sms.id, str(e))
-                self.env.cr.rollback()
+        :param config: dict of SMS config values
+        :param messages: list of OutgoingSMS
+        :return: dict {sms_id: result}
+        """
+        if not config['api_key']:
+            return {sms.id: {'success': False, 'error': 'API Key SMS non configurée'} for sms in messages}
+        dispatcher = SMSDispatcher(
+            endpoint=config['endpoint'],
+            api_key=config['api_key'],
+            sender=config['sender_name'],
+            rate=config['rate_limit'],
+            concurrency=config['concurrency'],
+            batch_size=config['batch_size'],
+        )
+        with dispatcher:
+            return dispatcher.dispatch(messages)
 
-        _logger.info('SMS queue processing complete')
+    @api.model
+    def _bulk_mark_sent(self, results, messages_by_id):
+        """Mark SMS as sent with one UPDATE"""
+        if not results:
+            return
+        ids = list(results)
+        responses = [json.dumps(results[sms_id]) for sms_id in ids]
+        costs = [
+            self._calculate_sms_cost(messages_by_id[sms_id].mobile, messages_by_id[sms_id].message)
+            for sms_id in ids
+        ]
+        self.env.cr.execute("""
+            UPDATE quelyos_sms_log l
+               SET status = 'sent',
+                   sent_date = %s,
+                   provider_response = v.response,
+                   cost = v.cost,
+                   write_date = %s,
+                   write_uid = %s
+              FROM unnest(%s::int[], %s::text[], %s::numeric[]) AS v(id, response, cost)
+             WHERE l.id = v.id
+        """, (self.env.cr.now(), self.env.cr.now(), self.env.uid, ids, responses, costs))
+        self.env['quelyos.sms.log'].invalidate_model()
 
-        return True
+    @api.model
+    def _bulk_mark_error(self, errors):
+        """
+        Increment retry counters with one UPDATE, failing SMS out of retries
+
+        :return: number of SMS marked as failed
+        """
+        if not errors:
+            return 0
+        self.env.cr.execute("""
+            UPDATE quelyos_sms_log l
+               SET retry_count = l.retry_count + 1,
+                   status = CASE WHEN l.retry_count + 1 >= l.max_retries
+                                 THEN 'failed' ELSE l.status END,
+                   error_message = CASE WHEN l.retry_count + 1 >= l.max_retries
+                                        THEN v.error ELSE l.error_message END,
+                   write_date = %s,
+                   write_uid = %s
+              FROM unnest(%s::int[], %s::text[]) AS v(id, error)
+             WHERE l.id = v.id
+         RETURNING l.status
+        """, (self.env.cr.now(), self.env.uid, list(errors), list(errors.values())))
+        failed = sum(1 for (status,) in self.env.cr.fetchall() if status == 'failed')
+        self.env['quelyos.sms.log'].invalidate_model()
+        return failed
+
+    @api.model
+    def _bulk_mark_disabled(self, sms_ids):
+        """Fail SMS of companies without active config"""
+        if not sms_ids:
+            return
+        self.env['quelyos.sms.log'].browse(sms_ids).write({
+            'status': 'failed',
+            'error_message': 'SMS désactivé',
+        })
@@ -7,23 +7,56 @@ import logging
 from odoo import http
 from odoo.http import request
 
+from odoo.addons.quelyos_api.lib.stock_availability import StockAvailability
+
 _logger = logging.getLogger(__name__)
 
 
 class StockUnreservedAPI(http.Controller):
     """API pour stock disponible hors réservations"""
 
+    def _location_groups(self, domain):
+        """Stock et réservations par (produit, emplacement interne) de la société en une requête groupée"""
+        return request.env['stock.quant'].sudo()._read_group(
+            domain + [
+                ('company_id', '=', request.env.company.id),
+                ('quantity', '>', 0),
+                ('location_id.usage', '=', 'internal'),
+            ],
+            groupby=['product_id', 'location_id'],
+            aggregates=['quantity:sum', 'reserved_quantity:sum'],
+            order='product_id, location_id',
+        )
+
+    @staticmethod
+    def _incoming(product_ids):
+        """Quantités à recevoir (service de disponibilité, société courante)"""
+        availability = StockAvailability(request.env(su=True)).get(product_ids)
+        return {product_id: values['incoming'] for product_id, values in availability.items()}
+
+    @staticmethod
+    def _serialize_location(location, quantity, reserved):
+        unreserved = max(quantity - reserved, 0.0)
+        return {
+            'location_id': location.id,
+            'location_name': location.complete_name,
+            'quantity': quantity,
+            'reserved': reserved,
+            'unreserved': unreserved,
+            'availability_status': 'available' if unreserved > 0 else 'reserved',
+        }
+
     @http.route('/api/stock/available-unreserved', type='json', auth='user', methods=['POST'], csrf=False)
     def get_available_unreserved(self, **kwargs):
         """
         Récupère le stock disponible (hors réservations) pour un ou plusieurs produits
-        
+
         Params:
             product_id (int, optional): ID produit spécifique
             product_ids (list, optional): Liste IDs produits
             location_id (int, optional): Filtrer par emplacement
             category_id (int, optional): Filtrer par catégorie
-        
+
         Returns:
             dict: Liste produits avec stock disponible réel
         """
@@ -32,53 +65,45 @@ class StockUnreservedAPI(http.Controller):
             product_ids = kwargs.get('product_ids', [])
             location_id = kwargs.get('location_id')
             category_id = kwargs.get('category_id')
-            
+
             # Construction domaine recherche
-            domain = [('quantity', '>', 0)]
-            
+            domain = []
+
             if product_id:
                 domain.append(('product_id', '=', product_id))
             elif product_ids:
                 domain.append(('product_id', 'in', product_ids))
-            
+
             if location_id:
                 domain.append(('location_id', '=', location_id))
-            
+
             if category_id:
                 domain.append(('product_id.categ_id', '=', category_id))
-            
-            # Recherche quants avec stock
-            quants = request.env['stock.quant'].sudo().search(domain)
-            
-            # Regroupement par produit
+
+            groups = self._location_groups(domain)
+
+            # Totaux = somme des lignes (même périmètre); à recevoir via le service
+            incoming = self._incoming({product.id for product, _location, _qty, _reserved in groups})
+
             products_stock = {}
-            
-            for quant in quants:
-                product_id_key = quant.product_id.id
-                
-                if product_id_key not in products_stock:
-                    products_stock[product_id_key] = {
-                        'product_id': product_id_key,
-                        'product_name': quant.product_id.name,
-                        'product_sku': quant.product_id.default_code or '',
+            for product, location, quantity, reserved in groups:
+                if product.id not in products_stock:
+                    products_stock[product.id] = {
+                        'product_id': product.id,
+                        'product_name': product.name,
+                        'product_sku': product.default_code or '',
                         'total_quantity': 0.0,
                         'total_reserved': 0.0,
                         'total_unreserved': 0.0,
+                        'total_incoming': incoming[product.id],
                         'locations': []
                     }
-                
-                products_stock[product_id_key]['total_quantity'] += quant.quantity
-                products_stock[product_id_key]['total_reserved'] += quant.reserved_quantity_detail
-                products_stock[product_id_key]['total_unreserved'] += quant.unreserved_quantity
-                
-                products_stock[product_id_key]['locations'].append({
-                    'location_id': quant.location_id.id,
-                    'location_name': quant.location_id.complete_name,
-                    'quantity': quant.quantity,
-                    'reserved': quant.reserved_quantity_detail,
-                    'unreserved': quant.unreserved_quantity,
-                })
-            
+                line = self._serialize_location(location, quantity, reserved)
+                products_stock[product.id]['locations'].append(line)
+                products_stock[product.id]['total_quantity'] += line['quantity']
+                products_stock[product.id]['total_reserved'] += line['reserved']
+                products_stock[product.id]['total_unreserved'] += line['unreserved']
+
             return {
                 'success': True,
                 'data': {
@@ -86,7 +111,7 @@ class StockUnreservedAPI(http.Controller):
                     'products': list(products_stock.values()),
                 }
             }
-        
+
         except Exception as e:
             _logger.error("Erreur get_available_unreserved: %s", e)
             return {'success': False, 'error': str(e)}
@@ -95,17 +120,14 @@ class StockUnreservedAPI(http.Controller):
     def get_product_unreserved(self, product_id, **kwargs):
         """
         Stock disponible pour un produit spécifique
-        
+
         Returns:
             dict: Détail stock disponible par emplacement
         """
         try:
-            quants = request.env['stock.quant'].sudo().search([
-                ('product_id', '=', product_id),
-                ('quantity', '>', 0),
-            ])
-            
-            if not quants:
+            groups = self._location_groups([('product_id', '=', product_id)])
+
+            if not groups:
                 return {
                     'success': True,
                     'data': {
@@ -113,26 +135,20 @@ class StockUnreservedAPI(http.Controller):
                         'total_quantity': 0.0,
                         'total_reserved': 0.0,
                         'total_unreserved': 0.0,
+                        'total_incoming': 0.0,
                         'locations': []
                     }
                 }
-            
-            product = quants[0].product_id
-            total_qty = sum(q.quantity for q in quants)
-            total_reserved = sum(q.reserved_quantity_detail for q in quants)
-            total_unreserved = sum(q.unreserved_quantity for q in quants)
-            
-            locations_detail = []
-            for quant in quants:
-                locations_detail.append({
-                    'location_id': quant.location_id.id,
-                    'location_name': quant.location_id.complete_name,
-                    'quantity': quant.quantity,
-                    'reserved': quant.reserved_quantity_detail,
-                    'unreserved': quant.unreserved_quantity,
-                    'availability_status': 'available' if quant.unreserved_quantity > 0 else 'reserved',
-                })
-            
+
+            product = groups[0][0]
+            locations_detail = [
+                self._serialize_location(location, quantity, reserved)
+                for _product, location, quantity, reserved in groups
+            ]
+            total_qty = sum(line['quantity'] for line in locations_detail)
+            total_reserved = sum(line['reserved'] for line in locations_detail)
+            total_unreserved = sum(line['unreserved'] for line in locations_detail)
+
             return {
                 'success': True,
                 'data': {
@@ -142,11 +158,12 @@ class StockUnreservedAPI(http.Controller):
                     'total_quantity': total_qty,
                     'total_reserved': total_reserved,
                     'total_unreserved': total_unreserved,
+                    'total_incoming': self._incoming([product.id])[product.id],
                     'availability_percentage': (total_unreserved / total_qty * 100) if total_qty > 0 else 0,
                     'locations': locations_detail,
                 }
             }
-        
+
         except Exception as e:
             _logger.error("Erreur get_product_unreserved: %s", e)
             return {'success': False, 'error': str(e)}
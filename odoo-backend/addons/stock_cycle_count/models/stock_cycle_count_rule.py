@@ -167,87 +167,48 @@ class StockCycleCountRule(models.Model):
     @api.model
     def _compute_rule_periodic(self, locs):
         cycle_counts = []
-        for loc in locs:
-            latest_inventory_date = (
-                self.env["stock.inventory"]
-                .search(
-                    [
-                        ("location_ids", "in", [loc.id]),
-                        ("state", "in", ["in_progress", "done", "draft"]),
-                    ],
-                    order="date desc",
-                    limit=1,
+        latest_inventory_dates = locs._get_last_inventory_dates(
+            ["in_progress", "done", "draft"]
+        )
+        try:
+            period = self.periodic_count_period / self.periodic_qty_per_period
+        except AttributeError as e:
+            raise UserError(
+                _(
+                    "Error found determining the frequency of periodic "
+                    "cycle count rule. %s"
                 )
-                .date
-            )
+                % str(e)
+            ) from e
+        today = datetime.today()
+        for loc in locs:
+            latest_inventory_date = latest_inventory_dates.get(loc.id)
             if latest_inventory_date:
-                try:
-                    period = self.periodic_count_period / self.periodic_qty_per_period
-                    next_date = fields.Datetime.from_string(
-                        latest_inventory_date
-                    ) + timedelta(days=period)
-                    if next_date < datetime.today():
-                        next_date = datetime.today()
-                except AttributeError as e:
-                    raise UserError(
-                        _(
-                            "Error found determining the frequency of periodic "
-                            "cycle count rule. %s"
-                        )
-                        % str(e)
-                    ) from e
+                next_date = fields.Datetime.from_string(
+                    latest_inventory_date
+                ) + timedelta(days=period)
+                if next_date < today:
+                    next_date = today
             else:
-                next_date = datetime.today()
+                next_date = today
             cycle_count = self._propose_cycle_count(next_date, loc)
             cycle_counts.append(cycle_count)
         return cycle_counts
 
-    @api.model
-    def _get_turnover_moves(self, location, date):
-        moves = self.env["stock.move"].search(
-            [
-                "|",
-                ("location_id", "=", location.id),
-                ("location_dest_id", "=", location.id),
-                ("date", ">", date),
-                ("state", "=", "done"),
-            ]
-        )
-        return moves
-
-    @api.model
-    def _compute_turnover(self, move):
-        price = move._get_price_unit()
-        turnover = move.product_uom_qty * price
-        return turnover
-
     @api.model
     def _compute_rule_turnover(self, locs):
         cycle_counts = []
-        location_ids = locs.mapped("id")
-        inventories = self.env["stock.inventory"].search(
-            [
-                ("location_ids", "in", location_ids),
-                ("state", "in", ["confirm", "done", "draft"]),
-            ]
+        latest_inventory_dates = locs._get_last_inventory_dates(
+            ["confirm", "done", "draft"]
         )
-        inventory_dates_by_location = {loc.id: [] for loc in locs}
-        for inventory in inventories:
-            for location in inventory.location_ids:
-                if location.id in inventory_dates_by_location:
-                    inventory_dates_by_location[location.id].append(inventory.date)
-
+        turnovers = locs._get_turnover_since(latest_inventory_dates)
+        today = datetime.today()
         for loc in locs:
-            last_inventories = inventory_dates_by_location.get(loc.id, [])
-            if last_inventories:
-                latest_inventory = sorted(last_inventories, reverse=True)[0]
-                moves = self._get_turnover_moves(loc, latest_inventory)
-                if moves:
-                    total_turnover = sum(self._compute_turnover(m) for m in moves)
+            if loc.id in latest_inventory_dates:
+                if loc.id in turnovers:
                     try:
-                        if total_turnover > self.turnover_inventory_value_threshold:
-                            next_date = datetime.today()
-                            cycle_count = self._propose_cycle_count(next_date, loc)
+                        if turnovers[loc.id] > self.turnover_inventory_value_threshold:
+                            cycle_count = self._propose_cycle_count(today, loc)
                             cycle_counts.append(cycle_count)
                     except AttributeError as e:
                         raise UserError(
@@ -258,17 +219,17 @@ class StockCycleCountRule(models.Model):
                             % str(e)
                         ) from e
             else:
-                next_date = datetime.today()
-                cycle_count = self._propose_cycle_count(next_date, loc)
+                cycle_count = self._propose_cycle_count(today, loc)
                 cycle_counts.append(cycle_count)
         return cycle_counts
 
     def _compute_rule_accuracy(self, locs):
         self.ensure_one()
         cycle_counts = []
+        accuracies = locs._get_loc_accuracy_map()
+        today = datetime.today()
         for loc in locs:
-            if loc.loc_accuracy < self.accuracy_threshold:
-                next_date = datetime.today()
-                cycle_count = self._propose_cycle_count(next_date, loc)
+            if accuracies.get(loc.id, 0) < self.accuracy_threshold:
+                cycle_count = self._propose_cycle_count(today, loc)
                 cycle_counts.append(cycle_count)
         return cycle_counts
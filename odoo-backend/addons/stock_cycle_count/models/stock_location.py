@@ -5,18 +5,11 @@
 import logging
 from datetime import datetime
 
-from odoo import fields, models, tools
-from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
+from odoo import fields, models
+from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT, SQL
 
 _logger = logging.getLogger(__name__)
 
-try:
-    from statistics import mean
-
-    STATS_PATH = tools.find_in_path("statistics")
-except (ImportError, IOError) as err:
-    _logger.debug(err)
-
 
 class StockLocation(models.Model):
     _inherit = "stock.location"
@@ -39,27 +32,143 @@ class StockLocation(models.Model):
     )
 
     def _compute_loc_accuracy(self):
-        history = self.env["stock.inventory"].search(
-            [("location_ids", "in", self.ids), ("state", "=", "done")],
-            order="write_date desc",
+        accuracies = self._get_loc_accuracy_map()
+        for rec in self:
+            rec.loc_accuracy = accuracies.get(rec.id, 0)
+
+    def _inventory_location_rel(self):
+        """Relation table, inventory column and location column of
+        stock.inventory.location_ids."""
+        field = self.env["stock.inventory"]._fields["location_ids"]
+        return field.relation, field.column1, field.column2
+
+    def _get_last_inventory_dates(self, states):
+        """Latest date of the inventories in the given states, per location.
+
+        :return: dict {location_id: datetime}, locations without inventory
+            are omitted.
+        """
+        if not self:
+            return {}
+        groups = self.env["stock.inventory"]._read_group(
+            [("location_ids", "in", self.ids), ("state", "in", states)],
+            groupby=["location_ids"],
+            aggregates=["date:max"],
         )
+        location_ids = set(self.ids)
+        return {
+            location.id: date
+            for location, date in groups
+            if location.id in location_ids
+        }
+
+    def _get_loc_accuracy_map(self):
+        """Average accuracy of the latest done inventories of each location.
+
+        Only the ``counts_for_accuracy_qty`` latest inventories of the
+        location warehouse are considered (all of them when it is not set).
+        One query per distinct setting instead of one search per location.
+
+        :return: dict {location_id: accuracy}, locations without done
+            inventory are omitted.
+        """
+        relation, inventory_col, location_col = self._inventory_location_rel()
+        by_limit = {}
         for rec in self:
-            loc_history = history.filtered_domain([("location_ids", "in", rec.id)])
-            if loc_history:
-                wh = rec.warehouse_id
-                if (
-                    wh.counts_for_accuracy_qty
-                    and len(loc_history) > wh.counts_for_accuracy_qty
-                ):
-                    rec.loc_accuracy = mean(
-                        loc_history[: wh.counts_for_accuracy_qty].mapped(
-                            "inventory_accuracy"
-                        )
-                    )
-                else:
-                    rec.loc_accuracy = mean(loc_history.mapped("inventory_accuracy"))
-            else:
-                rec.loc_accuracy = 0
+            limit = rec.warehouse_id.counts_for_accuracy_qty or 0
+            by_limit.setdefault(limit, []).append(rec.id)
+        accuracies = {}
+        for limit, location_ids in by_limit.items():
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT location_id, AVG(accuracy)
+                      FROM (
+                            SELECT rel.%(location_col)s AS location_id,
+                                   COALESCE(inv.inventory_accuracy, 0) AS accuracy,
+                                   ROW_NUMBER() OVER (
+                                       PARTITION BY rel.%(location_col)s
+                                       ORDER BY inv.write_date DESC, inv.id DESC
+                                   ) AS position
+                              FROM %(relation)s rel
+                              JOIN stock_inventory inv
+                                ON inv.id = rel.%(inventory_col)s
+                             WHERE rel.%(location_col)s = ANY(%(location_ids)s)
+                               AND inv.state = 'done'
+                      ) history
+                     WHERE %(limit)s = 0 OR position <= %(limit)s
+                     GROUP BY location_id
+                    """,
+                    relation=SQL.identifier(relation),
+                    inventory_col=SQL.identifier(inventory_col),
+                    location_col=SQL.identifier(location_col),
+                    location_ids=location_ids,
+                    limit=limit,
+                )
+            )
+            accuracies.update(self.env.cr.fetchall())
+        return accuracies
+
+    def _get_turnover_since(self, dates):
+        """Value of the done moves going into or out of each location after
+        the given date.
+
+        Moves are grouped per location and product in SQL. Moves without a
+        unit price are valued at the product cost, read once per product.
+
+        :param dates: dict {location_id: datetime}
+        :return: dict {location_id: turnover value}
+        """
+        if not dates:
+            return {}
+        location_ids = list(dates)
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH since(location_id, date) AS (
+                    SELECT *
+                      FROM unnest(%(location_ids)s::int[], %(dates)s::timestamp[])
+                ),
+                moves AS (
+                    SELECT since.location_id, m.product_id,
+                           m.product_uom_qty, m.price_unit
+                      FROM since
+                      JOIN stock_move m
+                        ON m.location_id = since.location_id AND m.date > since.date
+                     WHERE m.state = 'done'
+                    UNION ALL
+                    SELECT since.location_id, m.product_id,
+                           m.product_uom_qty, m.price_unit
+                      FROM since
+                      JOIN stock_move m
+                        ON m.location_dest_id = since.location_id
+                       AND m.location_id != since.location_id
+                       AND m.date > since.date
+                     WHERE m.state = 'done'
+                )
+                SELECT location_id, product_id,
+                       SUM(CASE WHEN COALESCE(price_unit, 0) != 0
+                                THEN product_uom_qty * price_unit ELSE 0 END),
+                       SUM(CASE WHEN COALESCE(price_unit, 0) = 0
+                                THEN product_uom_qty ELSE 0 END)
+                  FROM moves
+                 GROUP BY location_id, product_id
+                """,
+                location_ids=location_ids,
+                dates=[dates[location_id] for location_id in location_ids],
+            )
+        )
+        rows = self.env.cr.fetchall()
+        products = self.env["product.product"].browse({row[1] for row in rows})
+        costs = {product.id: product.standard_price for product in products}
+        turnover = {}
+        for location_id, product_id, priced_value, unpriced_qty in rows:
+            turnover[location_id] = (
+                turnover.get(location_id, 0.0)
+                + priced_value
+                + unpriced_qty * costs[product_id]
+            )
+        return turnover
 
     def _get_zero_confirmation_domain(self):
         self.ensure_one()
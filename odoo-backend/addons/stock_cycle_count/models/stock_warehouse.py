@@ -3,6 +3,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
 import logging
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from odoo import api, fields, models
@@ -41,7 +43,7 @@ class StockWarehouse(models.Model):
     @api.model
     def _get_cycle_count_locations_search_domain(self, parent):
         domain = [
-            ("id", "child_of", parent.id),
+            ("id", "child_of", parent.ids),
             ("cycle_count_disabled", "=", False),
         ]
         return domain
@@ -53,11 +55,11 @@ class StockWarehouse(models.Model):
             locations = self.env["stock.location"].search(
                 self._get_cycle_count_locations_search_domain(self.view_location_id)
             )
-        elif rule.apply_in == "location":
-            for loc in rule.location_ids:
-                locations += self.env["stock.location"].search(
-                    self._get_cycle_count_locations_search_domain(loc)
-                )
+        elif rule.apply_in == "location" and rule.location_ids:
+            # child_of accepts several parents: one search for all the zones
+            locations = self.env["stock.location"].search(
+                self._get_cycle_count_locations_search_domain(rule.location_ids)
+            )
         return locations
 
     def _cycle_count_rules_to_compute(self):
@@ -82,37 +84,53 @@ class StockWarehouse(models.Model):
         returns a list with required dates for the cycle count of each
         location"""
         for rec in self:
+            start = time.perf_counter()
             proposed_cycle_counts = rec._get_proposed_cycle_counts()
+            cc_vals_list = []
             if proposed_cycle_counts:
                 cc_vals_list = rec._process_cycle_counts(proposed_cycle_counts)
                 self.env["stock.cycle.count"].create(cc_vals_list)
+            _logger.info(
+                "Cycle count planner: warehouse %s, %d proposals, %d counts "
+                "created in %.2fs.",
+                rec.name,
+                len(proposed_cycle_counts),
+                len(cc_vals_list),
+                time.perf_counter() - start,
+            )
 
     def _get_proposed_cycle_counts(self):
         proposed_cycle_counts = []
         rules = self._cycle_count_rules_to_compute()
+        # Rules applied on the whole warehouse share the same locations
+        locations_cache = {}
         for rule in rules:
-            locations = self._search_cycle_count_locations(rule)
+            key = (rule.apply_in, tuple(rule.location_ids.ids))
+            if key not in locations_cache:
+                locations_cache[key] = self._search_cycle_count_locations(rule)
+            locations = locations_cache[key]
             if locations:
                 proposed_cycle_counts.extend(rule.compute_rule(locations))
         return proposed_cycle_counts
 
     def _process_cycle_counts(self, proposed_cycle_counts):
         cc_vals_list = []
-        locations = list({d["location"] for d in proposed_cycle_counts})
-        for loc in locations:
-            proposed_for_loc = list(
-                filter(lambda x: x["location"] == loc, proposed_cycle_counts)
-            )
-            earliest_date = min(d["date"] for d in proposed_for_loc)
-            cycle_count_proposed = next(
-                filter(lambda x: x["date"] == earliest_date, proposed_for_loc)
-            )
+        proposed_by_location = defaultdict(list)
+        for proposed in proposed_cycle_counts:
+            proposed_by_location[proposed["location"]].append(proposed)
+        locations = self.env["stock.location"].union(*proposed_by_location)
+        existing_by_location = self._get_existing_cycle_counts(locations)
+        today = datetime.today()
+        for loc, proposed_for_loc in proposed_by_location.items():
+            # First proposal with the earliest date
+            cycle_count_proposed = min(proposed_for_loc, key=lambda x: x["date"])
             existing_cycle_counts = self._handle_existing_cycle_counts(
-                loc, cycle_count_proposed
+                loc,
+                cycle_count_proposed,
+                existing_by_location.get(loc.id, self.env["stock.cycle.count"]),
             )
             delta = (
-                fields.Datetime.from_string(cycle_count_proposed["date"])
-                - datetime.today()
+                fields.Datetime.from_string(cycle_count_proposed["date"]) - today
             )
             if (
                 not existing_cycle_counts
@@ -122,9 +140,23 @@ class StockWarehouse(models.Model):
                 cc_vals_list.append(cc_vals)
         return cc_vals_list
 
-    def _handle_existing_cycle_counts(self, location, cycle_count_proposed):
-        domain = [("location_id", "=", location.id), ("state", "in", ["draft"])]
-        existing_cycle_counts = self.env["stock.cycle.count"].search(domain)
+    @api.model
+    def _get_existing_cycle_counts(self, locations):
+        """Planned cycle counts of the given locations, grouped by location."""
+        existing = self.env["stock.cycle.count"].search(
+            [("location_id", "in", locations.ids), ("state", "in", ["draft"])]
+        )
+        existing_by_location = defaultdict(lambda: self.env["stock.cycle.count"])
+        for cycle_count in existing:
+            existing_by_location[cycle_count.location_id.id] |= cycle_count
+        return existing_by_location
+
+    def _handle_existing_cycle_counts(
+        self, location, cycle_count_proposed, existing_cycle_counts=None
+    ):
+        if existing_cycle_counts is None:
+            domain = [("location_id", "=", location.id), ("state", "in", ["draft"])]
+            existing_cycle_counts = self.env["stock.cycle.count"].search(domain)
         if existing_cycle_counts:
             existing_earliest_date = sorted(
                 existing_cycle_counts.mapped("date_deadline")
@@ -231,6 +231,65 @@ class TestStockCycleCount(common.TransactionCase):
         )
         self.assertTrue(count, "Zero confirmation not being created.")
 
+    def test_cycle_count_planner_batch(self):
+        """Rules are evaluated for all the locations of a warehouse at once."""
+        wh = self.small_wh
+        wh.cycle_count_planning_horizon = 30
+        rule = self._create_stock_cycle_count_rule_periodic(
+            self.manager, "rule_batch", [1, 7]
+        )
+        wh.write({"cycle_count_rule_ids": [(6, 0, rule.ids)]})
+        locs = self.stock_location_model.create(
+            [
+                {
+                    "name": f"Bin {i}",
+                    "usage": "internal",
+                    "location_id": wh.lot_stock_id.id,
+                }
+                for i in range(5)
+            ]
+        )
+        self.inventory_model.create(
+            {
+                "name": "Recent inventory",
+                "location_ids": [(4, locs[0].id)],
+                "date": datetime.today() - timedelta(days=1),
+            }
+        )
+        wh.action_compute_cycle_count_rules()
+        counts = self.cycle_count_model.search([("location_id", "in", locs.ids)])
+        self.assertEqual(counts.location_id, locs)
+        self.assertEqual(
+            counts.filtered(lambda c: c.location_id == locs[0]).date_deadline,
+            (datetime.today() + timedelta(days=6)).date(),
+        )
+        # Existing planned counts are kept, not duplicated
+        wh.action_compute_cycle_count_rules()
+        self.assertEqual(
+            self.cycle_count_model.search_count([("location_id", "in", locs.ids)]), 5
+        )
+
+    def test_location_accuracy_latest_inventories(self):
+        """Accuracy averages the latest inventories set on the warehouse."""
+        loc = self.stock_location_model.create(
+            {
+                "name": "Accuracy bin",
+                "usage": "internal",
+                "location_id": self.small_wh.lot_stock_id.id,
+            }
+        )
+        self.assertEqual(loc.loc_accuracy, 0)
+        for accuracy in (10, 50, 90):
+            self.inventory_model.create(
+                {"name": f"Inventory {accuracy}", "location_ids": [(4, loc.id)]}
+            ).write({"state": "done", "inventory_accuracy": accuracy})
+        self.small_wh.counts_for_accuracy_qty = 2
+        loc.invalidate_recordset(["loc_accuracy"])
+        self.assertAlmostEqual(loc.loc_accuracy, 70)
+        self.small_wh.counts_for_accuracy_qty = 0
+        loc.invalidate_recordset(["loc_accuracy"])
+        self.assertAlmostEqual(loc.loc_accuracy, 50)
+
     def test_cycle_count_workflow(self):
         """Tests workflow."""
         self.cycle_count_1.action_create_inventory_adjustment()
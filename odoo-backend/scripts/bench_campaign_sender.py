@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du pipeline d'envoi de campagnes email
+
+Démarre un sink SMTP local (aiosmtpd), compile un template de campagne
+puis envoie N messages via SMTPTransport (pool de connexions persistantes).
+Compare avec l'approche historique (1 connexion SMTP + regex par email).
+
+Usage:
+    pip install aiosmtpd
+    python scripts/bench_campaign_sender.py --messages 20000 --pool 4
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+import smtplib
+import time
+from email.message import EmailMessage
+
+from aiosmtpd.controller import Controller
+
+MODULE_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'addons', 'quelyos_api', 'lib', 'mail_transport.py'
+)
+spec = importlib.util.spec_from_file_location('mail_transport', MODULE_PATH)
+mail_transport = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(mail_transport)
+
+HTML = """<html><body>
+<h1>Bonjour {{name}}</h1>
+<p>Découvrez nos <a href="https://shop.example.com/promo">promotions</a>
+et notre <a href="https://shop.example.com/new">nouvelle collection</a>.</p>
+%s
+</body></html>""" % ('<p>Lorem ipsum dolor sit amet.</p>' * 40)
+
+
+class CountingHandler:
+    def __init__(self):
+        self.count = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.count += 1
+        return '250 OK'
+
+
+def bench_pipeline(port, n, pool_size, batch_size):
+    template = mail_transport.CompiledTemplate(
+        HTML + '<a href="{{unsubscribe_url}}">Se désabonner</a>',
+        resolve_link=lambda url: f"https://t.example.com/r/{abs(hash(url)) % 10**8}",
+    )
+    stats = mail_transport.SendStats(total=n)
+    recipients = ((f"user{i}@example.com", f"User {i}") for i in range(n))
+    transport = mail_transport.SMTPTransport(
+        host='127.0.0.1', port=port, encryption='none',
+        email_from='news@example.com', pool_size=pool_size,
+    )
+    with transport:
+        for batch in mail_transport.chunked(recipients, batch_size):
+            messages = [
+                mail_transport.OutgoingEmail(
+                    to=email, subject='Promo',
+                    html=template.render({'name': name, 'unsubscribe_url': f"https://x/u/{i}"}),
+                )
+                for i, (email, name) in enumerate(batch)
+            ]
+            transport.send_batch(messages, stats)
+    return stats
+
+
+def bench_legacy(port, n):
+    """Approche historique: regex par destinataire + nouvelle connexion par email"""
+    pattern = r'href=["\']([^"\']+)["\']'
+    start = time.monotonic()
+    for i in range(n):
+        html = re.sub(pattern, lambda m: 'href="https://t.example.com/r/x"', HTML)
+        msg = EmailMessage()
+        msg['From'], msg['To'], msg['Subject'] = 'news@example.com', f"user{i}@example.com", 'Promo'
+        msg.set_content(html, subtype='html')
+        with smtplib.SMTP('127.0.0.1', port) as server:
+            server.send_message(msg)
+    return n / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--pool', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=mail_transport.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--legacy-sample', type=int, default=500)
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+    try:
+        stats = bench_pipeline(8025, args.messages, args.pool, args.batch)
+        print(f"Pipeline batch : {stats.to_dict()}")
+        legacy_rate = bench_legacy(8025, args.legacy_sample)
+        print(f"Legacy         : {legacy_rate:.1f} emails/s (échantillon {args.legacy_sample})")
+        print(f"Reçus par le sink: {handler.count}")
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
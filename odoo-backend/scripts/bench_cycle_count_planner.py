@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du planificateur de comptages tournants (stock_cycle_count)
+
+Crée un entrepôt de N emplacements (défaut: 10 000) avec des inventaires
+passés sur une partie d'entre eux, attache les règles périodique / rotation /
+précision, puis mesure action_compute_cycle_count_rules (durée, requêtes SQL,
+comptages créés). Tout est annulé en fin de script.
+
+Usage (dans le conteneur Odoo):
+    odoo shell -d quelyos --no-http < scripts/bench_cycle_count_planner.py
+
+Variables d'environnement:
+    BENCH_LOCATIONS     Nombre d'emplacements (défaut: 10000)
+    BENCH_INVENTORIED   Part des emplacements déjà inventoriés (défaut: 0.3)
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+LOCATIONS = int(os.environ.get('BENCH_LOCATIONS', 10000))
+INVENTORIED = float(os.environ.get('BENCH_INVENTORIED', 0.3))
+
+
+def setup(env):
+    warehouse = env['stock.warehouse'].create({
+        'name': 'Bench Cycle Count', 'code': 'BCC', 'cycle_count_planning_horizon': 30,
+    })
+    locations = env['stock.location'].create([
+        {'name': f'BIN-{i:05d}', 'usage': 'internal', 'location_id': warehouse.lot_stock_id.id}
+        for i in range(LOCATIONS)
+    ])
+    inventoried = locations[:int(LOCATIONS * INVENTORIED)]
+    inventories = env['stock.inventory'].create([
+        {'name': f'Bench {loc.name}', 'location_ids': [(4, loc.id)],
+         'date': datetime.now() - timedelta(days=i % 20)}
+        for i, loc in enumerate(inventoried)
+    ])
+    inventories.write({'state': 'done', 'inventory_accuracy': 95})
+
+    Rule = env['stock.cycle.count.rule']
+    rules = Rule.create([
+        {'name': 'Bench periodic', 'rule_type': 'periodic',
+         'periodic_qty_per_period': 1, 'periodic_count_period': 14},
+        {'name': 'Bench turnover', 'rule_type': 'turnover',
+         'turnover_inventory_value_threshold': 1000},
+        {'name': 'Bench accuracy', 'rule_type': 'accuracy', 'accuracy_threshold': 90},
+    ])
+    warehouse.cycle_count_rule_ids = [(6, 0, rules.ids)]
+    env.flush_all()
+    env.invalidate_all()
+    return warehouse
+
+
+def run(env):
+    try:
+        start = time.perf_counter()
+        warehouse = setup(env)
+        print(f"Jeu de données: {LOCATIONS} emplacements "
+              f"({time.perf_counter() - start:.1f} s de préparation)")
+
+        queries = env.cr.sql_log_count
+        start = time.perf_counter()
+        warehouse.action_compute_cycle_count_rules()
+        env.flush_all()
+        elapsed = time.perf_counter() - start
+        queries = env.cr.sql_log_count - queries
+
+        counts = env['stock.cycle.count'].search_count([
+            ('location_id', 'child_of', warehouse.view_location_id.id),
+        ])
+        print(f"Planificateur: {elapsed:.2f} s, {queries} requêtes SQL, {counts} comptages créés")
+    finally:
+        env.cr.rollback()
+
+
+if 'env' in globals():
+    run(env)  # noqa: F821 (injecté par odoo shell)
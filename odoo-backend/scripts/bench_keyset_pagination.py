@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark pagination OFFSET vs keyset (page 1 vs page 1000)
+
+Mesure la latence d'une page profonde sur account.move (tri invoice_date desc)
+avec OFFSET/LIMIT puis avec le curseur keyset de quelyos_api.
+
+Usage (dans le conteneur Odoo, base avec >= 50k factures):
+    odoo shell -d quelyos --no-http < scripts/bench_keyset_pagination.py
+
+Variables d'environnement:
+    BENCH_MODEL   Modèle (défaut: account.move)
+    BENCH_ORDER   Tri (défaut: invoice_date desc)
+    BENCH_LIMIT   Taille de page (défaut: 50)
+    BENCH_PAGE    Page profonde mesurée (défaut: 1000)
+"""
+
+import os
+import time
+
+from odoo.addons.quelyos_api.lib.keyset_pagination import KeysetPaginator
+
+MODEL = os.environ.get('BENCH_MODEL', 'account.move')
+ORDER = os.environ.get('BENCH_ORDER', 'invoice_date desc')
+LIMIT = int(os.environ.get('BENCH_LIMIT', 50))
+DEEP_PAGE = int(os.environ.get('BENCH_PAGE', 1000))
+
+
+def _timed(func, repeat=5):
+    """Médiane en millisecondes"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def run(env):
+    Model = env[MODEL].sudo()
+    domain = []
+    total = Model.search_count(domain)
+    if total < LIMIT * DEEP_PAGE:
+        print(f"⚠️  {total} lignes seulement: page {DEEP_PAGE} sera partiellement vide")
+
+    paginator = KeysetPaginator(MODEL, order=ORDER)
+    order_sql = ', '.join(f'{field} {direction}' for field, direction in paginator.sort_keys)
+
+    # Curseur de la page profonde: on parcourt une fois (hors mesure)
+    cursor = None
+    for _ in range(DEEP_PAGE - 1):
+        page = paginator.paginate(Model, domain, cursor=cursor, limit=LIMIT)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
+    env.invalidate_all()
+
+    results = {
+        'offset_page_1': _timed(lambda: Model.search(domain, limit=LIMIT, offset=0, order=order_sql).ids),
+        f'offset_page_{DEEP_PAGE}': _timed(
+            lambda: Model.search(domain, limit=LIMIT, offset=(DEEP_PAGE - 1) * LIMIT, order=order_sql).ids
+        ),
+        'keyset_page_1': _timed(lambda: paginator.paginate(Model, domain, limit=LIMIT).records.ids),
+        f'keyset_page_{DEEP_PAGE}': _timed(
+            lambda: paginator.paginate(Model, domain, cursor=cursor, limit=LIMIT).records.ids
+        ),
+    }
+
+    print(f"\n=== {MODEL} ({total} lignes) tri '{ORDER}', {LIMIT}/page ===")
+    for name, ms in results.items():
+        print(f"  {name:<22} {ms:8.2f} ms")
+
+
+if 'env' in globals():
+    run(env)  # noqa: F821 (injecté par odoo shell)
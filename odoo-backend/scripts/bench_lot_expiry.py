@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la projection d'expiration des lots (quelyos.stock.lot.expiry)
+
+Insère N lots (défaut: 500 000) répartis sur 1 000 produits, chacun avec un
+quant dans le stock principal et une date d'expiration entre -30 et +365
+jours, puis mesure :
+- l'ancien calcul des alertes (un search de quants par lot), extrapolé
+  depuis un échantillon
+- le remplissage complet de la projection (_cron_reconcile)
+- les tranches expiré / < 7 j / < 30 j (une requête par plage)
+- la liste FEFO d'un produit et le recalcul incrémental de 1 000 lots
+Tout est annulé en fin de script. Nécessite product_expiry.
+
+Usage (dans le conteneur Odoo):
+    odoo shell -d quelyos --no-http < scripts/bench_lot_expiry.py
+
+Variables d'environnement:
+    BENCH_LOTS          Nombre de lots (défaut: 500000)
+    BENCH_LEGACY_SAMPLE Lots mesurés avec l'ancien calcul (défaut: 2000)
+"""
+
+import os
+import time
+
+LOTS = int(os.environ.get('BENCH_LOTS', 500000))
+LEGACY_SAMPLE = int(os.environ.get('BENCH_LEGACY_SAMPLE', 2000))
+PRODUCTS = 1000
+
+
+def setup(env):
+    warehouse = env['stock.warehouse'].search([('company_id', '=', env.company.id)], limit=1)
+    products = env['product.product'].create([
+        {'name': f'Bench Expiry {i:04d}', 'is_storable': True, 'tracking': 'lot'}
+        for i in range(PRODUCTS)
+    ])
+    env.flush_all()
+    env.cr.execute("""
+        INSERT INTO stock_lot (name, product_id, company_id, expiration_date,
+                               create_uid, create_date, write_uid, write_date)
+        SELECT 'BENCH-' || n, (%(product_ids)s::int[])[1 + n %% %(products)s], %(company_id)s,
+               NOW() AT TIME ZONE 'UTC' + ((n %% 395) - 30) * INTERVAL '1 day',
+               %(uid)s, NOW(), %(uid)s, NOW()
+          FROM generate_series(1, %(lots)s) n
+    """, {'product_ids': products.ids, 'products': PRODUCTS, 'company_id': env.company.id,
+          'uid': env.uid, 'lots': LOTS})
+    env.cr.execute("""
+        INSERT INTO stock_quant (product_id, lot_id, location_id, company_id, quantity,
+                                 reserved_quantity, in_date,
+                                 create_uid, create_date, write_uid, write_date)
+        SELECT lot.product_id, lot.id, %(location_id)s, lot.company_id, 1 + lot.id %% 50, 0, NOW(),
+               %(uid)s, NOW(), %(uid)s, NOW()
+          FROM stock_lot lot
+         WHERE lot.name LIKE 'BENCH-%%'
+    """, {'location_id': warehouse.lot_stock_id.id, 'uid': env.uid})
+    env.invalidate_all()
+    return products
+
+
+def legacy_alerts(env, lots):
+    """Ancien /lots/expiry-alerts: une recherche de quants par lot"""
+    StockQuant = env['stock.quant'].sudo()
+    for lot in lots:
+        quants = StockQuant.search([
+            ('lot_id', '=', lot.id),
+            ('location_id.usage', '=', 'internal'),
+            ('quantity', '>', 0),
+        ])
+        sum(quants.mapped('quantity'))
+
+
+def run(env):
+    Expiry = env['quelyos.stock.lot.expiry']
+    if not Expiry._has_expiry_dates():
+        print("product_expiry non installé: rien à mesurer")
+        return
+    try:
+        start = time.perf_counter()
+        products = setup(env)
+        print(f"Jeu de données: {LOTS} lots / {PRODUCTS} produits "
+              f"({time.perf_counter() - start:.1f} s de préparation)")
+
+        sample = env['stock.lot'].search([('name', '=like', 'BENCH-%')], limit=LEGACY_SAMPLE,
+                                         order='expiration_date')
+        start = time.perf_counter()
+        legacy_alerts(env, sample)
+        legacy_s = (time.perf_counter() - start) / len(sample) * LOTS
+        print(f"Ancien calcul (extrapolé) : {legacy_s:8.2f} s")
+
+        start = time.perf_counter()
+        Expiry._cron_reconcile()
+        print(f"Remplissage projection   : {time.perf_counter() - start:8.2f} s")
+        env.cr.execute("ANALYZE quelyos_stock_lot_expiry")
+
+        start = time.perf_counter()
+        buckets = Expiry.get_expiry_buckets(horizon_days=30, limit=100)
+        counts = ', '.join(f"{name}={bucket['count']}" for name, bucket in buckets.items())
+        print(f"Tranches d'expiration    : {(time.perf_counter() - start) * 1000:8.1f} ms ({counts})")
+
+        start = time.perf_counter()
+        candidates = Expiry.get_fefo_candidates(products[0].id, quantity=100)
+        print(f"FEFO (100 unités)        : {(time.perf_counter() - start) * 1000:8.1f} ms "
+              f"({len(candidates)} lots)")
+
+        start = time.perf_counter()
+        Expiry.refresh_lots(sample[:1000].ids)
+        print(f"Recalcul de 1 000 lots   : {(time.perf_counter() - start) * 1000:8.1f} ms")
+    finally:
+        env.cr.rollback()
+
+
+if 'env' in globals():
+    run(env)  # noqa: F821 (injecté par odoo shell)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la limitation de débit (rate limiter + throttler)
+
+Compare, sur un Redis réel (REDIS_URL) :
+- l'approche historique : sorted set par clé (ZREMRANGEBYSCORE, ZCARD,
+  ZADD, EXPIRE) pour le rate limiter, 4 compteurs + sorted set burst
+  (13 commandes) pour le throttler
+- GCRA : un script Lua par vérification, tous quotas confondus
+- GCRA + bail local : jetons réservés par lot, la plupart des
+  vérifications ne touchent pas Redis
+
+Mesure les vérifications/s et la mémoire moyenne par clé (MEMORY USAGE).
+
+Usage:
+    REDIS_URL=redis://localhost:6379/15 python scripts/bench_rate_limit.py --checks 20000 --keys 200
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+import types
+
+# Chargement de quelyos_api/lib comme paquet, sans son __init__ (ni Odoo)
+LIB_PATH = os.path.join(os.path.dirname(__file__), '..', 'addons', 'quelyos_api', 'lib')
+package = types.ModuleType('quelyos_lib')
+package.__path__ = [os.path.abspath(LIB_PATH)]
+sys.modules['quelyos_lib'] = package
+redis_client = importlib.import_module('quelyos_lib.redis_client')
+gcra = importlib.import_module('quelyos_lib.gcra')
+
+# Quotas du plan PRO (voir throttling.PLAN_QUOTAS)
+PRO_LIMITS = (
+    gcra.Limit(20, 1, 'burst'),
+    gcra.Limit(100, 60, 'minute'),
+    gcra.Limit(3000, 3600, 'hour'),
+    gcra.Limit(50000, 86400, 'day'),
+)
+# Quota élevé (plan UNLIMITED): le bail local s'applique
+HIGH_LIMITS = (
+    gcra.Limit(1000, 1, 'burst'),
+    gcra.Limit(10000, 60, 'minute'),
+    gcra.Limit(1000000, 3600, 'hour'),
+    gcra.Limit(10000000, 86400, 'day'),
+)
+
+
+def legacy_rate_limit(client, key, max_requests, window):
+    now = time.time()
+    pipe = client.pipeline()
+    pipe.zremrangebyscore(key, 0, now - window)
+    pipe.zcard(key)
+    pipe.zadd(key, {str(now): now})
+    pipe.expire(key, window + 1)
+    return pipe.execute()[1] < max_requests
+
+
+def legacy_throttle(client, user, limits):
+    now = time.time()
+    burst, minute, hour, day = limits
+    prefix = f'bench:legacy:throttle:{user}'
+    pipe = client.pipeline()
+    pipe.incr(f'{prefix}:minute:{int(now // 60)}')
+    pipe.expire(f'{prefix}:minute:{int(now // 60)}', 60)
+    pipe.incr(f'{prefix}:hour:{int(now // 3600)}')
+    pipe.expire(f'{prefix}:hour:{int(now // 3600)}', 3600)
+    pipe.incr(f'{prefix}:day:{int(now // 86400)}')
+    pipe.expire(f'{prefix}:day:{int(now // 86400)}', 86400)
+    pipe.zremrangebyscore(f'{prefix}:burst', 0, now - burst.period)
+    pipe.zadd(f'{prefix}:burst', {str(now): now})
+    pipe.zcard(f'{prefix}:burst')
+    pipe.expire(f'{prefix}:burst', burst.period + 1)
+    results = pipe.execute()
+    return results[8] <= burst.limit and results[0] <= minute.limit
+
+
+def memory_per_key(client, pattern):
+    keys = list(client.scan_iter(match=pattern, count=1000))
+    if not keys:
+        return 0
+    return sum(client.memory_usage(key) or 0 for key in keys) / len(keys)
+
+
+def run(client, label, checks, keys, call, pattern):
+    """Vérifications en boucle, puis mémoire moyenne des clés créées (avant expiration)"""
+    allowed = 0
+    start = time.monotonic()
+    for i in range(checks):
+        allowed += bool(call(i % keys))
+    elapsed = time.monotonic() - start
+    print(f'{label:<42}: {checks / elapsed:9.0f} vérif/s, '
+          f'{memory_per_key(client, pattern):6.0f} octets/clé ({allowed}/{checks} admises)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=200)
+    parser.add_argument('--window-requests', type=int, default=1000,
+                        help='Limite du rate limiter (requêtes / 60 s)')
+    args = parser.parse_args()
+
+    client = redis_client.get_redis('rate_limit')
+    client.ping()
+    for key in client.scan_iter(match='bench:*'):
+        client.delete(key)
+
+    print(f'Redis: {redis_client.REDIS_URL} (base rate_limit), {args.checks} vérifications, {args.keys} clés')
+    print('-- Rate limiter (1 quota) --')
+    limit = args.window_requests
+    run(client, 'sorted set (historique)', args.checks, args.keys,
+        lambda k: legacy_rate_limit(client, f'bench:legacy:rate:{k}', limit, 60),
+        'bench:legacy:rate:*')
+
+    limiter = gcra.GCRALimiter('rate_limit')
+    one = (gcra.Limit(limit, 60),)
+    run(client, 'GCRA Lua', args.checks, args.keys,
+        lambda k: limiter.check((f'bench:gcra:rate:{k}',), one, lease=False).allowed,
+        'bench:gcra:rate:*')
+    run(client, f'GCRA Lua + bail ({gcra.lease_size(one)} jetons)', args.checks, args.keys,
+        lambda k: limiter.check((f'bench:lease:rate:{k}',), one).allowed,
+        'bench:lease:rate:*')
+
+    print('-- Throttler (burst/minute/heure/jour, mémoire par quota) --')
+    run(client, 'compteurs + sorted set (historique)', args.checks, args.keys,
+        lambda k: legacy_throttle(client, k, PRO_LIMITS),
+        'bench:legacy:throttle:*')
+
+    def keys_of(prefix, k):
+        return tuple(f'bench:{prefix}:throttle:{k}:{quota.name}' for quota in PRO_LIMITS)
+
+    run(client, 'GCRA Lua (plan PRO)', args.checks, args.keys,
+        lambda k: limiter.check(keys_of('gcra', k), PRO_LIMITS).allowed,
+        'bench:gcra:throttle:*')
+    run(client, f'GCRA Lua + bail (UNLIMITED, {gcra.lease_size(HIGH_LIMITS)} jetons)', args.checks, args.keys,
+        lambda k: limiter.check(keys_of('high', k), HIGH_LIMITS).allowed,
+        'bench:high:throttle:*')
+
+    for key in client.scan_iter(match='bench:*'):
+        client.delete(key)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la file SMS contre un provider simulé
+
+Démarre un faux serveur Tunisie SMS (latence configurable, format de
+réponse de l'API), puis compare :
+- l'envoi historique : un appel HTTP synchrone par SMS
+- SMSDispatcher : pool borné, appels batch par texte, token bucket
+
+Le serveur peut aussi tourner seul pour tester la file depuis Odoo
+(endpoint de la config SMS = http://127.0.0.1:8099/api/v1/send) :
+    python scripts/bench_sms_dispatch.py --serve
+
+Usage:
+    python scripts/bench_sms_dispatch.py --messages 5000 --latency 0.05 --rate 500
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+MODULE_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'addons', 'quelyos_sms_tn', 'lib', 'sms_dispatcher.py'
+)
+spec = importlib.util.spec_from_file_location('sms_dispatcher', MODULE_PATH)
+sms_dispatcher = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sms_dispatcher)
+
+PORT = 8099
+ENDPOINT = f'http://127.0.0.1:{PORT}/api/v1/send'
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Faux provider : accepte tout, compte appels et destinataires"""
+    latency = 0.05
+    calls = 0
+    recipients = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        with self.lock:
+            StubProvider.calls += 1
+            StubProvider.recipients += len(payload.get('recipients', []))
+        body = json.dumps({'status': 'success', 'count': len(payload.get('recipients', []))}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def build_messages(n, distinct_texts):
+    return [
+        sms_dispatcher.OutgoingSMS(
+            id=i,
+            mobile=f'+2162{i:07d}',
+            message=f'Votre commande #{i % distinct_texts} est confirmée.',
+        )
+        for i in range(n)
+    ]
+
+
+def bench_legacy(messages):
+    """Approche historique : un POST par SMS, sans session"""
+    start = time.monotonic()
+    for sms in messages:
+        requests.post(ENDPOINT, json={
+            'api_key': 'bench-api-key', 'sender': 'Quelyos',
+            'recipients': [sms.mobile], 'message': sms.message,
+        }, timeout=30).json()
+    return len(messages) / (time.monotonic() - start)
+
+
+def bench_dispatcher(messages, rate, concurrency, batch_size):
+    dispatcher = sms_dispatcher.SMSDispatcher(
+        ENDPOINT, 'bench-api-key', rate=rate, concurrency=concurrency, batch_size=batch_size,
+    )
+    start = time.monotonic()
+    with dispatcher:
+        results = dispatcher.dispatch(messages)
+    elapsed = time.monotonic() - start
+    ok = sum(1 for res in results.values() if res['success'])
+    return ok, len(messages) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--distinct-texts', type=int, default=5000,
+                        help='Textes distincts (1 = campagne, n = SMS transactionnels)')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rate', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--legacy-sample', type=int, default=200)
+    parser.add_argument('--serve', action='store_true', help='Lancer uniquement le faux provider')
+    args = parser.parse_args()
+
+    StubProvider.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), StubProvider)
+    if args.serve:
+        print(f'Faux provider SMS sur {ENDPOINT}')
+        server.serve_forever()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        messages = build_messages(args.messages, args.distinct_texts)
+        legacy_rate = bench_legacy(messages[:args.legacy_sample])
+        print(f'Legacy     : {legacy_rate:8.1f} SMS/s (échantillon {args.legacy_sample})')
+        StubProvider.calls = StubProvider.recipients = 0
+        ok, rate = bench_dispatcher(messages, args.rate, args.concurrency, args.batch)
+        print(f'Dispatcher : {rate:8.1f} SMS/s ({ok}/{len(messages)} envoyés, '
+              f'{StubProvider.calls} appels API, plafond {args.rate} SMS/s)')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
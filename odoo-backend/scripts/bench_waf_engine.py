@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du moteur WAF compilé
+
+Compare, pour une requête bénigne (corps JSON de 64 Ko) :
+- l'évaluation historique : re.compile + recherche règle par règle
+- WAFEngine : regex précompilées, préfiltre littéral, portes par cible
+
+Les règles = règles par défaut + variantes synthétiques (listes de mots-clés,
+signatures d'outils, patterns sans littéral exploitable).
+
+Usage:
+    python scripts/bench_waf_engine.py --rules 200 --body-kb 64 --iterations 200
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import time
+
+MODULE_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'addons', 'quelyos_api', 'lib', 'waf_engine.py'
+)
+spec = importlib.util.spec_from_file_location('waf_engine', MODULE_PATH)
+waf_engine = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(waf_engine)
+
+DEFAULT_RULES = [
+    (r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|UNION|ALTER)\b.*\b(FROM|INTO|WHERE|TABLE)\b)|('.*--)|(\bOR\b.*=.*\bOR\b)", 'all', 100),
+    (r"<script[^>]*>.*?</script>|javascript:|on\w+\s*=", 'all', 100),
+    (r"\.\./|\.\.\\|%2e%2e%2f|%2e%2e/|\.%2e/|%2e\./", 'url', 90),
+    (r"[;&|`$]|\b(cat|ls|dir|wget|curl|nc|bash|sh|cmd)\b.*[|;]", 'all', 100),
+    (r"(sqlmap|nikto|nmap|masscan|zgrab|gobuster|dirbuster|burpsuite)", 'headers', 80),
+]
+
+KEYWORDS = [
+    'xp_cmdshell', 'sp_executesql', 'waitfor delay', 'benchmark(', 'pg_sleep', 'load_file',
+    'information_schema', 'sleep(', 'document.cookie', 'eval(', 'fromcharcode', 'iframe',
+    '/etc/passwd', 'boot.ini', 'php://input', 'data://', 'expect://', '${jndi:', 'ognl',
+    'base64_decode', 'system(', 'passthru', 'shell_exec', 'acunetix', 'wpscan', 'hydra',
+]
+
+
+def build_rules(count, seed=42):
+    rnd = random.Random(seed)
+    rules = []
+    for i, (pattern, target, priority) in enumerate(DEFAULT_RULES):
+        rules.append({'id': i + 1, 'name': f'default-{i}', 'pattern': pattern,
+                      'pattern_flags': 'i', 'inspect_target': target,
+                      'action': 'block', 'priority': priority})
+    targets = ['all', 'body', 'query_params', 'headers', 'url', 'cookies']
+    while len(rules) < count:
+        idx = len(rules) + 1
+        kind = idx % 4
+        if kind == 0:
+            words = rnd.sample(KEYWORDS, 3)
+            pattern = '|'.join(re.escape(w) for w in words)
+        elif kind == 1:
+            pattern = rf"{re.escape(rnd.choice(KEYWORDS))}\s*\(?\s*[\w'\"]+"
+        elif kind == 2:
+            pattern = rf"\b(union|select)\s+{re.escape(rnd.choice(KEYWORDS))}"
+        else:
+            # Sans littéral exploitable: évalué via une porte
+            pattern = rf"[<>]\s*\w{{{rnd.randint(3, 8)}}}\s*=\s*['\"]"
+        rules.append({'id': idx, 'name': f'synthetic-{idx}', 'pattern': pattern,
+                      'pattern_flags': rnd.choice(['i', 'i', 'm', 's']),
+                      'inspect_target': rnd.choice(targets),
+                      'action': rnd.choice(['block', 'log']), 'priority': rnd.choice([10, 20, 50])})
+    return rules
+
+
+def build_request(body_kb, seed=7):
+    rnd = random.Random(seed)
+    words = ['produit', 'commande', 'client', 'quantite', 'prix', 'description',
+             'livraison', 'adresse', 'Tunis', 'Sfax', 'remise', 'stock']
+    items = []
+    size = 0
+    while size < body_kb * 1024:
+        item = {
+            'ref': f'SKU-{rnd.randint(1000, 9999)}',
+            'name': ' '.join(rnd.choice(words) for _ in range(6)),
+            'qty': rnd.randint(1, 50),
+            'price': round(rnd.uniform(1, 500), 3),
+        }
+        items.append(item)
+        size += len(json.dumps(item))
+    return {
+        'url': '/api/ecommerce/orders/create',
+        'params': {'lang': 'fr_FR', 'page': '1'},
+        'body': {'lines': items, 'note': 'Merci de livrer avant 18h'},
+        'headers': {'User-Agent': 'QuelyosPOS/2.4 python-requests/2.31', 'Accept': 'application/json'},
+        'cookies': {'session_id': 'a1b2c3d4e5f6'},
+        'ip': '41.226.10.20',
+        'user_id': 7,
+    }
+
+
+def evaluate_legacy(rules, request_data):
+    """Reproduit WAFRule._matches_pattern: re.compile et extraction par règle"""
+    for rule in sorted(rules, key=lambda r: -r['priority']):
+        regex = re.compile(rule['pattern'], waf_engine.compile_flags(rule['pattern_flags']))
+        fields = waf_engine.extract_fields(request_data)
+        targets = waf_engine.TARGETS if rule['inspect_target'] == 'all' else (rule['inspect_target'],)
+        if any(regex.search(v) for t in targets for v in fields[t]) and rule['action'] == 'block':
+            return rule['id']
+    return None
+
+
+def timed(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=200)
+    parser.add_argument('--body-kb', type=int, default=64)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    rules = build_rules(args.rules)
+    request_data = build_request(args.body_kb)
+
+    start = time.perf_counter()
+    engine = waf_engine.WAFEngine(rules, version='bench')
+    build_ms = (time.perf_counter() - start) * 1000
+
+    assert evaluate_legacy(rules, request_data) is None
+    assert engine.evaluate(request_data) == []
+
+    legacy_ms = timed(lambda: evaluate_legacy(rules, request_data), max(1, args.iterations // 10))
+    engine_ms = timed(lambda: engine.evaluate(request_data), args.iterations)
+
+    print(f'Règles: {len(engine)} ({len(engine._gates)} portes), corps {args.body_kb} Ko, '
+          f'Aho-Corasick: {"oui" if waf_engine.AHOCORASICK_AVAILABLE else "non (fallback `in`)"}')
+    print(f'Compilation moteur : {build_ms:8.2f} ms (une fois par worker et par version)')
+    print(f'Legacy             : {legacy_ms:8.2f} ms/requête')
+    print(f'WAFEngine          : {engine_ms:8.2f} ms/requête (x{legacy_ms / engine_ms:.1f})')
+
+
+if __name__ == '__main__':
+    main()